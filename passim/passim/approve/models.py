@@ -17,7 +17,7 @@ import json, copy
 # Take from my own app
 from passim.utils import ErrHandle
 from passim.settings import TIME_ZONE
-from passim.seeker.models import get_current_datetime, get_crpp_date, build_abbr_list, \
+from passim.seeker.models import get_current_datetime, get_crpp_date, lazy_abbr_list, \
     APPROVAL_TYPE, ACTION_TYPE, \
     EqualGold, Profile, Project2, ProjectApprover
 
@@ -40,7 +40,7 @@ class EqualChange(models.Model):
     change = models.TextField("Proposed value", default="{}")
 
     # [1] The approval status of this proposed change
-    atype = models.CharField("Approval", choices=build_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
+    atype = models.CharField("Approval", choices=lazy_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
     # [0-1] A system-created comment on the approval and processing
     comment = models.TextField("Comment", null=True, blank=True)
 
@@ -333,7 +333,7 @@ class EqualApproval(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="profileapprovals")
 
     # [1] The approval status of this proposed change
-    atype = models.CharField("Approval", choices=build_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
+    atype = models.CharField("Approval", choices=lazy_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
     # [0-1] A comment on the reason for rejecting a proposal
     comment = models.TextField("Comment", null=True, blank=True)
 
@@ -396,10 +396,10 @@ class EqualAdd(models.Model):
     project = models.ForeignKey(Project2, on_delete=models.CASCADE, related_name="projectaddings")
 
     # [1] The kind of action: adding or removing ('add', 'rem')
-    action = models.CharField("Action", choices=build_abbr_list(ACTION_TYPE), max_length=5, default="add")
+    action = models.CharField("Action", choices=lazy_abbr_list(ACTION_TYPE), max_length=5, default="add")
 
     # [1] The approval status of this proposed change
-    atype = models.CharField("Approval", choices=build_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
+    atype = models.CharField("Approval", choices=lazy_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
     # [0-1] A comment on the reason for rejecting an addition
     comment = models.TextField("Comment", null=True, blank=True)
 
@@ -666,7 +666,7 @@ class EqualAddApproval(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="profileaddapprovals")
 
     # [1] The approval status of this proposed addition
-    atype = models.CharField("Approval", choices=build_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
+    atype = models.CharField("Approval", choices=lazy_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
     # [0-1] A comment on the reason for rejecting an addition
     comment = models.TextField("Comment", null=True, blank=True)
 
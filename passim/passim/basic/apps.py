@@ -1,7 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class basicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'passim.basic'
     # name = 'basic'
+
+    def ready(self):
+        from .blocklist import blocklist_changed
+
+        # Let the blocklist of every process know that it is out of date
+        model = self.get_model('Address')
+        post_save.connect(blocklist_changed, sender=model, dispatch_uid="blocklist_save")
+        post_delete.connect(blocklist_changed, sender=model, dispatch_uid="blocklist_delete")
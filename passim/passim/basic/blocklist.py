@@ -0,0 +1,183 @@
+"""
+Compiled blocklist for the BlockedIpMiddleware.
+
+The blocked IP addresses (the Address table plus settings.BLOCKED_IPS) are loaded
+once per process into a set of exact addresses and a table of networks per prefix
+length, so that checking an address takes a fixed number of set lookups. The bot
+signatures and the suspicious path fragments are compiled into one regular
+expression each.
+
+A version number in the cache is bumped when an Address is saved or deleted (see
+apps.py), after which every process loads the blocklist again. New blocks are
+active in this process immediately and are stored in the database by a thread.
+"""
+
+import ipaddress
+import json
+import re
+import threading
+from django.conf import settings
+from django.db import connection
+
+# provide error handling
+from .utils import ErrHandle
+from .models import Address
+from passim.utils import CacheVersion
+
+
+# Parts of a user agent that betray a bot
+BOT_LIST = ['googlebot', 'bot.htm', 'bot.com', '/petalbot', 'crawler.com', 'robot', 'crawler',
+            'semrush', 'bingbot' ]
+
+# Parts of a path that no decent user asks for
+SUSPICIOUS_PATHS = [
+    ".php", "%3dphp", "win.ini", "/passwd", ".env", "config.ini", ".local", ".zip", "jasperserver"
+    ]
+
+def compile_any(lst_item):
+    """Compile a list of literal strings into one regular expression that finds any of them"""
+
+    return re.compile("|".join(re.escape(x) for x in sorted(lst_item, key=len, reverse=True)))
+
+
+class Blocklist():
+    """In-memory set of blocked addresses and networks"""
+
+    version_key = "passim_blocklist_version"
+    recheck_interval = 10   # Seconds between two looks at the version in the cache
+
+    def __init__(self, bot_list=BOT_LIST, path_list=SUSPICIOUS_PATHS):
+        self.re_bot = compile_any(bot_list)
+        self.re_path = compile_any(path_list)
+        # Addresses (strings) that are blocked as a whole
+        self.exact = None
+        # Prefix length => set of network addresses (int); separately for IPv4 and IPv6
+        self.networks = {4: {}, 6: {}}
+        self.cache_version = CacheVersion(self.version_key, self.recheck_interval)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def ensure(self):
+        """Make sure the blocklist is loaded and not out of date"""
+
+        self.cache_version.ensure(self.load)
+
+    def load(self, version):
+        exact = set()
+        networks = {4: {}, 6: {}}
+        for sIp in list(settings.BLOCKED_IPS) + list(Address.objects.values_list('ip', flat=True)):
+            network = self.get_network(sIp)
+            if network == None:
+                exact.add(sIp.strip())
+            else:
+                networks[network.version].setdefault(network.prefixlen, set()).add(int(network.network_address))
+        self.exact = exact
+        self.networks = networks
+
+    def get_network(self, sIp):
+        """Turn a CIDR ('1.2.3.0/24') or prefix ('1.2.3.') entry into a network; None for plain addresses"""
+
+        sIp = sIp.strip()
+        try:
+            if "/" in sIp:
+                return ipaddress.ip_network(sIp, strict=False)
+            if sIp.endswith(".") and sIp.count(".") < 4:
+                # An IPv4 prefix: as many octets as there are dots
+                lst_octet = sIp[:-1].split(".")
+                sNet = ".".join(lst_octet + ["0"] * (4 - len(lst_octet)))
+                return ipaddress.ip_network("{}/{}".format(sNet, 8 * len(lst_octet)))
+        except ValueError:
+            pass
+        return None
+
+    def invalidate(self):
+        """Tell all processes that the blocklist has changed"""
+
+        self.cache_version.invalidate()
+
+    # ------------------------------------------------------------------
+    # Checking
+    # ------------------------------------------------------------------
+
+    def is_blocked_ip(self, ip):
+        """Check whether [ip] is blocked, either as address or as part of a network"""
+
+        self.ensure()
+        if ip in self.exact:
+            return True
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        iAddress = int(address)
+        iBits = address.max_prefixlen
+        for prefixlen, lst_network in self.networks[address.version].items():
+            if (iAddress >> (iBits - prefixlen)) << (iBits - prefixlen) in lst_network:
+                return True
+        return False
+
+    def get_bot(self, user_agent):
+        """Get the bot signature found in [user_agent], or None"""
+
+        match = self.re_bot.search(user_agent.lower())
+        return None if match == None else match.group(0)
+
+    def get_suspicious(self, path):
+        """Get the suspicious part of [path], or None"""
+
+        match = self.re_path.search(path.lower())
+        return None if match == None else match.group(0)
+
+    def is_blocked(self, ip, request):
+        """Check if an IP address is blocked, and block it when it asks for a suspicious path"""
+
+        bResult = False
+        oErr = ErrHandle()
+        try:
+            if self.is_blocked_ip(ip):
+                bResult = True
+            elif request.path != "/":
+                reason = self.get_suspicious(request.path)
+                if reason != None:
+                    self.block(ip, request, reason)
+                    bResult = True
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("Blocklist/is_blocked")
+        return bResult
+
+    # ------------------------------------------------------------------
+    # Adding
+    # ------------------------------------------------------------------
+
+    def block(self, ip, request, reason):
+        """Block [ip] in this process right away, and store it in the background"""
+
+        if ip == "127.0.0.1":
+            return
+        self.exact.add(ip)
+        get = request.POST if request.POST else request.GET
+        body = json.dumps(get)
+        thread = threading.Thread(target=self.store, args=(ip, request.path, body, reason), daemon=True)
+        thread.start()
+
+    def store(self, ip, path, body, reason):
+        oErr = ErrHandle()
+        try:
+            if not Address.objects.filter(ip=ip).exists():
+                Address.objects.create(ip=ip, path=path, body=body, reason=reason)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("Blocklist/store")
+        finally:
+            # This thread has its own database connection
+            connection.close()
+
+
+# The blocklist of this process
+BLOCKLIST = Blocklist()
+
+def blocklist_changed(sender, instance, **kwargs):
+    BLOCKLIST.invalidate()
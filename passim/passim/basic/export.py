@@ -0,0 +1,162 @@
+"""
+Streaming downloads for the BASIC app.
+
+A download of a list (all sermons, all SSGs, a dataset) may contain many thousands
+of objects. Instead of building the whole workbook or JSON string in memory, the
+rows are produced one at a time:
+
+- the objects are read from the queryset in chunks, and what they need from related
+  tables is prefetched per chunk
+- CSV and JSON are sent to the browser while they are being made
+- Excel uses a write-only workbook, whose rows are kept in a temporary file
+"""
+
+from django.db.models import prefetch_related_objects
+from django.db.models.query import QuerySet
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils.cell import get_column_letter
+import csv
+import json
+import openpyxl
+import tempfile
+
+# ======= imports from my own application ======
+from .utils import ErrHandle
+
+
+EXPORT_CHUNK_SIZE = 500
+
+CONTENT_TYPES = {
+    'csv':  "text/tab-separated-values",
+    'json': "application/json",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+
+class EchoBuffer():
+    """File-like object for csv.writer that just hands back what is written"""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(qs, lst_prefetch=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the objects of [qs] in lists of at most [chunk_size], with [lst_prefetch] applied to each list"""
+
+    if isinstance(qs, QuerySet):
+        qs = qs.iterator(chunk_size=chunk_size)
+    chunk = []
+    for obj in qs:
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            if lst_prefetch:
+                prefetch_related_objects(chunk, *lst_prefetch)
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        if lst_prefetch:
+            prefetch_related_objects(chunk, *lst_prefetch)
+        yield chunk
+
+def get_spec_related(model, specification):
+    """Get the foreign keys that the 'fk' items of [specification] follow"""
+
+    lst_related = []
+    for item in specification:
+        if item['type'] == "fk" and not item['path'] in lst_related:
+            try:
+                field = model._meta.get_field(item['path'])
+            except:
+                continue
+            if field.many_to_one:
+                lst_related.append(item['path'])
+    return lst_related
+
+def iter_spec_rows(qs, specification, kwargs, lst_prefetch=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a header row and then one row per object of [qs], with the values of [specification]"""
+
+    lst_spec = [x for x in specification if x['type'] != ""]
+    headers = [x['name'] for x in lst_spec]
+    headers.insert(0, "Id")
+    yield headers
+
+    if isinstance(qs, QuerySet):
+        lst_related = get_spec_related(qs.model, lst_spec)
+        if len(lst_related) > 0 and qs.query.select_related is not True:
+            qs = qs.select_related(*lst_related)
+    for chunk in iter_chunks(qs, lst_prefetch, chunk_size):
+        for obj in chunk:
+            row = [obj.id]
+            for item in lst_spec:
+                key, value = obj.custom_getkv(item, kwargs=kwargs)
+                row.append(value)
+            yield row
+
+def iter_json_rows(rows, use_header=False):
+    """Yield [rows] as one JSON list, one row at a time
+
+    With [use_header] the first row has the names, and each of the other rows
+    becomes an object with these names as keys.
+    """
+
+    headers = next(rows, None) if use_header else None
+    yield "["
+    for idx, row in enumerate(rows):
+        if not headers is None:
+            row = dict(zip(headers, row))
+        yield "{}\n  {}".format("" if idx == 0 else ",", json.dumps(row, default=str))
+    yield "\n]\n"
+
+def get_bold_cells(ws, row):
+    """Turn the values of [row] into bold cells for the write-only worksheet [ws]"""
+
+    lst_cell = []
+    for value in row:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = openpyxl.styles.Font(bold=True)
+        lst_cell.append(cell)
+    return lst_cell
+
+def get_xlsx_file(rows, title="Data", header_rows=1, col_width=None):
+    """Write [rows] into a write-only workbook, and return it as an (open) temporary file"""
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for idx, row in enumerate(rows):
+        if idx == 0 and not col_width is None:
+            # Set all columns to a fixed width (before the first row is written)
+            for col_num in range(len(row)):
+                ws.column_dimensions[get_column_letter(col_num+1)].width = col_width
+        if idx < header_rows:
+            # Header rows are bold
+            row = get_bold_cells(ws, row)
+        ws.append(row)
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return tmp
+
+def get_stream_response(rows, dtype, filename, header_rows=1, use_header=False, col_width=None):
+    """Get a response that sends [rows] as CSV (tab-separated), JSON or Excel
+
+    For CSV and JSON the response is made while it is being sent; [use_header] is
+    passed on to iter_json_rows().
+    """
+
+    response = None
+    oErr = ErrHandle()
+    try:
+        if dtype == "csv":
+            writer = csv.writer(EchoBuffer(), delimiter="\t", quotechar='"')
+            response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type=CONTENT_TYPES[dtype])
+        elif dtype == "json":
+            response = StreamingHttpResponse(iter_json_rows(rows, use_header), content_type=CONTENT_TYPES[dtype])
+        else:
+            response = FileResponse(get_xlsx_file(rows, header_rows=header_rows, col_width=col_width), content_type=CONTENT_TYPES['xlsx'])
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("get_stream_response")
+        response = HttpResponse(msg, content_type="text/plain")
+    return response
@@ -233,34 +233,10 @@ class Address(models.Model):
         return bResult
 
     def is_blocked(ip, request):
-        """Check if an IP address is blocked or not"""
+        """Check if an IP address is blocked or not (using the in-memory blocklist)"""
 
-        bResult = False
-        oErr = ErrHandle()
-        look_for = [
-            ".php", "%3dphp", "win.ini", "/passwd", ".env", "config.ini", ".local", ".zip", "jasperserver"
-            ]
-        try:
-            # Check if it is on there already
-            obj = Address.objects.filter(ip=ip).first()
-            if obj is None:
-                # Double check
-                path = request.path.lower()
-                if path != "/":
-                    # We need to look further
-                    for item in look_for:
-                        if item in path:
-                            # Block it
-                            Address.add_address(ip, request, item)
-                            bResult = True
-                            break
-            else:
-                # It is already blocked
-                bResult = True
-        except:
-            msg = oErr.get_error_message()
-            oErr.DoError("Address/is_blocked")
+        from .blocklist import BLOCKLIST
 
-        return bResult
+        return BLOCKLIST.is_blocked(ip, request)
 
 
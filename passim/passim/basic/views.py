@@ -8,7 +8,7 @@ from django.contrib.auth.models import User, Group
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.files.base import File
 from django.db import transaction
-from django.db.models import Q, Prefetch, Count, F
+from django.db.models import Q, Prefetch, Count, F, prefetch_related_objects
 from django.db.models.fields.files import FieldFile
 from django.db.models.functions import Lower
 from django.db.models.query import QuerySet 
@@ -37,6 +37,7 @@ from datetime import datetime
 
 # provide error handling
 from .utils import ErrHandle
+from .export import CONTENT_TYPES, iter_spec_rows, get_xlsx_file, get_stream_response
 
 from passim.basic.models import UserSearch
 from passim.cms.view_utils import cms, cms_translate
@@ -339,6 +340,7 @@ def make_search_list(filters, oFields, search_list, qd, lstExclude):
                 filter_type = get_value(search_item, "filter")
                 code_function = get_value(search_item, "code")
                 regex_function = get_value(search_item, "regex")
+                fts_function = get_value(search_item, "fts")
                 full_filter_id = "filter_{}".format(filter_type)
                 s_q = ""
                 arFkField = []
@@ -436,8 +438,12 @@ def make_search_list(filters, oFields, search_list, qd, lstExclude):
                             if isinstance(val, int):
                                 s_q = Q(**{"{}".format(dbfield): val})
                             elif "*" in val or "#" in val:
+                                # Possibly narrow down the rows through a full-text index
+                                q_fts = None if fts_function == None else fts_function(dbfield, val)
                                 val = adapt_search(val, regex_function)
                                 s_q = Q(**{"{}__iregex".format(dbfield): val})
+                                if q_fts != None:
+                                    s_q = q_fts & s_q
                             elif "$" in dbfield:
                                 val = adapt_search(val, regex_function)
                             else:
@@ -1023,6 +1029,11 @@ class BasicList(ListView):
     param_list = []
     qfilter = []
     qs = None
+    # Prefetch plan: per column (custom or field name) an optional dictionary with
+    #   'select_related', 'prefetch_related' (lists) and 'annotate' (dictionary)
+    prefetch_plan = {}
+    download_prefetch = []      # prefetch_related lookups for each chunk of a [specification] download
+    page_data = {}
     page_function = "ru.basic.search_paged_start"
 
     def initializations(self):
@@ -1329,63 +1340,39 @@ class BasicList(ListView):
         # Default behaviour
         return True
 
+    def get_rows(self, prefix):
+        """Yield the rows of the download: a header line and then one row per object"""
+
+        # Sanity check - should have been done already
+        if not hasattr(self.model, 'specification'):
+            return
+
+        # Get the specification
+        specification = getattr(self.model, 'specification')
+
+        # Need to know who this user (profile) is
+        user = self.request.user
+        username = user.username
+        profile = user.user_profiles.first()
+        team_group = app_editor
+        kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
+
+        # Get the queryset, which is based on the listview parameters
+        qs = self.get_queryset()
+
+        # The objects are read in chunks
+        yield from iter_spec_rows(qs, specification, kwargs, self.download_prefetch)
+
     def get_data(self, prefix, dtype, response=None):
-        """Gather the data as CSV, including a header line and comma-separated"""
+        """Gather the data as Excel, including a header line"""
 
-        # Initialize
-        lData = []
         sData = ""
         oErr = ErrHandle()
         try:
-            # Sanity check - should have been done already
-            if not hasattr(self.model, 'specification'):
-                return sData
-
-            # Get the specification
-            specification = getattr(self.model, 'specification')
-
-            # Need to know who this user (profile) is
-            user = self.request.user
-            username = user.username
-            profile = user.user_profiles.first()
-            team_group = app_editor
-            kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
-
-            # Get the queryset, which is based on the listview parameters
-            qs = self.get_queryset()
-
-            # Start workbook
-            wb = openpyxl.Workbook()
-            # Create worksheet with data
-            ws = wb.active
-            ws.title = "Data"
-
-            # Create header cells
-            headers = [x['name'] for x in specification if x['type'] != "" ]
-            headers.insert(0, "Id")
-            for col_num in range(len(headers)):
-                c = ws.cell(row=1, column=col_num+1)
-                c.value = headers[col_num]
-                c.font = openpyxl.styles.Font(bold=True)
-                # Set width to a fixed size
-                ws.column_dimensions[get_column_letter(col_num+1)].width = 5.0        
-
-            row_num = 1
-            # Walk the items in the queryset
-            for obj in qs:
-                row_num += 1
-                # Add the object id
-                ws.cell(row=row_num, column=1).value = obj.id
-                col_num = 2
-                # Walk the items
-                for item in specification:
-                    if item['type'] != "":
-                        key, value = obj.custom_getkv(item, kwargs=kwargs)
-                        ws.cell(row=row_num, column=col_num).value = value
-                        col_num += 1
-
-            # Save it
-            wb.save(response)
+            # Write the rows into [response]
+            tmp = get_xlsx_file(self.get_rows(prefix), col_width=5.0)
+            response.write(tmp.read())
+            tmp.close()
             sData = response
         except:
             msg = oErr.get_error_message()
@@ -1398,18 +1385,17 @@ class BasicList(ListView):
         response = None
         oErr = ErrHandle()
         try:
+            # Excel, unless CSV or JSON is asked for
+            if not dtype in ["csv", "json"]:
+                dtype = "xlsx"
 
             # Make a download name
             downloadname = self.model.__name__
             appl_name = APPLICATION_NAME
-            sDbName = "{}_{}.xlsx".format(appl_name, downloadname)
+            sDbName = "{}_{}.{}".format(appl_name, downloadname, dtype)
 
-            # Convert 'compressed_content' to an Excel worksheet
-            sContentType = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            response = HttpResponse(content_type=sContentType)
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(sDbName)    
-            # Get the Data
-            sData = self.get_data('', dtype, response)
+            # The rows are made while the download is being sent
+            response = get_stream_response(self.get_rows(''), dtype, sDbName, use_header=True, col_width=5.0)
 
         except:
             msg = oErr.get_error_message()
@@ -1417,8 +1403,73 @@ class BasicList(ListView):
 
         return response
 
+    def get_plan_items(self, key):
+        """Collect the [key] items of the prefetch plan for all columns that are rendered
+
+        A 'colwrap' column is rendered too (the user can unfold it on the client), so it
+        is not skipped.
+        """
+
+        lBack = []
+        for head in self.order_heads:
+            column = head.get('custom', head.get('field'))
+            oPlan = self.prefetch_plan.get(column)
+            if not oPlan is None:
+                items = oPlan.get(key, [])
+                if isinstance(items, dict):
+                    items = list(items.items())
+                for item in items:
+                    if not item in lBack:
+                        lBack.append(item)
+        return lBack
+
+    def prefetch_page(self, obj_list):
+        """Apply the prefetch_related and annotate parts of the prefetch plan to one page of objects"""
+
+        oErr = ErrHandle()
+        try:
+            if len(obj_list) > 0:
+                lst_prefetch = self.get_plan_items('prefetch_related')
+                if len(lst_prefetch) > 0:
+                    prefetch_related_objects(obj_list, *lst_prefetch)
+                lst_annotate = self.get_plan_items('annotate')
+                if len(lst_annotate) > 0:
+                    dict_obj = {obj.id: obj for obj in obj_list}
+                    oAnnotate = dict(lst_annotate)
+                    qs = self.model.objects.filter(id__in=dict_obj.keys()).annotate(**oAnnotate)
+                    for item in qs.values('id', *oAnnotate.keys()):
+                        obj = dict_obj[item['id']]
+                        for k in oAnnotate.keys():
+                            setattr(obj, k, item[k])
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("BasicList/prefetch_page")
+
+    def get_page_data(self, obj_list):
+        """Pre-load any per-page information that get_field_value() can use through self.page_data
+
+        The get_field_value() of a view should not depend on it: outside get_result_list()
+        the page data is empty, and a missing key means 'look it up for this object'.
+        """
+        return {}
+
     def get_result_list(self, obj_list, context):
         result_list = []
+
+        # Load everything needed for this page at once
+        obj_list = list(obj_list)
+        self.prefetch_page(obj_list)
+        self.page_data = self.get_page_data(obj_list)
+
+        # The admin URL only differs by id
+        admin_url = None
+        try:
+            admin_url = reverse("admin:seeker_{}_change".format(self.basic_name), args=[0])
+            idx = admin_url.rfind("/0/")
+            admin_url = None if idx < 0 else admin_url[:idx] + "/{}/" + admin_url[idx+3:]
+        except:
+            pass
+
         # Walk all items in the object list
         for obj in obj_list:
             # Transform this object into a list of objects that can be shown
@@ -1475,11 +1526,8 @@ class BasicList(ListView):
                 fields.append(fobj)
             # Make the list of field-values available
             result['fields'] = fields
-            admindetails = "admin:seeker_{}_change".format(self.basic_name)
-            try:
-                result['admindetails'] = reverse(admindetails, args=[obj.id])
-            except:
-                pass
+            if not admin_url is None:
+                result['admindetails'] = admin_url.format(obj.id)
 
             # Fill in the selection information
             selectitem_info = ""
@@ -1744,6 +1792,11 @@ class BasicList(ListView):
             # Allow doing something additionally with the queryset
             self.view_queryset(qs)
 
+            # Joins needed for the visible columns
+            lst_related = self.get_plan_items('select_related')
+            if not qs is None and len(lst_related) > 0:
+                qs = qs.select_related(*lst_related)
+
             # Return the resulting filtered and sorted queryset
             self.qs = qs
         except:
@@ -2639,6 +2692,7 @@ class BasicPart(View):
     previous = None         # Return to this
     downloadname = None     # Name used for downloading
     spec_download = False   # Use model's [specification] for default Excel download
+    download_prefetch = []  # prefetch_related lookups for each chunk of a [specification] download
     bDebug = False          # Debugging information
     redirectpage = ""       # Where to redirect to
     data = {'status': 'ok', 'html': ''}       # Create data to be returned    
@@ -3181,12 +3235,10 @@ class BasicPart(View):
             appl_name = APPLICATION_NAME
             sDbName = "{}_{}.xlsx".format(appl_name, downloadname)
 
-            # Convert 'compressed_content' to an Excel worksheet
-            sContentType = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            response = HttpResponse(content_type=sContentType)
+            # The rows are written into a write-only workbook
+            tmp = get_xlsx_file(self.get_rows(''), col_width=5.0)
+            response = FileResponse(tmp, content_type=CONTENT_TYPES['xlsx'])
             response['Content-Disposition'] = 'attachment; filename="{}"'.format(sDbName)    
-            # Get the Data
-            sData = self.get_data('', dtype, response)
 
             # Check for errors
             if len(self.arErr) > 0:
@@ -3201,63 +3253,39 @@ class BasicPart(View):
 
         return response
 
+    def get_rows(self, prefix):
+        """Yield the rows of the [specification] download: a header line and then one row per object"""
+
+        # Sanity check - should have been done already
+        if not hasattr(self.model, 'specification'):
+            return
+
+        # Get the specification
+        specification = getattr(self.model, 'specification')
+
+        # Need to know who this user (profile) is
+        user = self.request.user
+        username = user.username
+        profile = user.user_profiles.first()
+        team_group = app_editor
+        kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
+
+        # Get the queryset, which is based on the listview parameters
+        qs = self.get_queryset(prefix)
+
+        # The objects are read in chunks
+        yield from iter_spec_rows(qs, specification, kwargs, self.download_prefetch)
+
     def get_data(self, prefix, dtype, response=None):
-        """Gather the data as CSV, including a header line and comma-separated"""
+        """Gather the data as Excel, including a header line"""
 
-        # Initialize
-        lData = []
         sData = ""
         oErr = ErrHandle()
         try:
-            # Sanity check - should have been done already
-            if not hasattr(self.model, 'specification'):
-                return sData
-
-            # Get the specification
-            specification = getattr(self.model, 'specification')
-
-            # Need to know who this user (profile) is
-            user = self.request.user
-            username = user.username
-            profile = user.user_profiles.first()
-            team_group = app_editor
-            kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
-
-            # Get the queryset, which is based on the listview parameters
-            qs = self.get_queryset(prefix)
-
-            # Start workbook
-            wb = openpyxl.Workbook()
-            # Create worksheet with data
-            ws = wb.active
-            ws.title = "Data"
-
-            # Create header cells
-            headers = [x['name'] for x in specification if x['type'] != "" ]
-            headers.insert(0, "Id")
-            for col_num in range(len(headers)):
-                c = ws.cell(row=1, column=col_num+1)
-                c.value = headers[col_num]
-                c.font = openpyxl.styles.Font(bold=True)
-                # Set width to a fixed size
-                ws.column_dimensions[get_column_letter(col_num+1)].width = 5.0        
-
-            row_num = 1
-            # Walk the items in the queryset
-            for obj in qs:
-                row_num += 1
-                # Add the object id
-                ws.cell(row=row_num, column=1).value = obj.id
-                col_num = 2
-                # Walk the items
-                for item in specification:
-                    if item['type'] != "":
-                        key, value = obj.custom_getkv(item, kwargs=kwargs)
-                        ws.cell(row=row_num, column=col_num).value = value
-                        col_num += 1
-
-            # Save it
-            wb.save(response)
+            # Write the rows into [response]
+            tmp = get_xlsx_file(self.get_rows(prefix), col_width=5.0)
+            response.write(tmp.read())
+            tmp.close()
             sData = response
         except:
             msg = oErr.get_error_message()
@@ -15,7 +15,7 @@ import lxml.html
 # From own stuff
 from passim.settings import APP_PREFIX, WRITABLE_DIR, TIME_ZONE
 from passim.utils import *
-from passim.seeker.models import build_abbr_list, STATUS_TYPE
+from passim.seeker.models import lazy_abbr_list, STATUS_TYPE
 
 LONG_STRING=255
 STANDARD_LENGTH=100
@@ -81,7 +81,7 @@ class Cpage(models.Model):
     urlname = models.CharField("Name in urls", null=True, blank=True, max_length=LONG_STRING)
 
     # [1] Every manuscript has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
@@ -172,7 +172,7 @@ class Clocation(models.Model):
     page = models.ForeignKey(Cpage, on_delete=models.CASCADE, related_name="page_locations")
 
     # [1] Every manuscript has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
@@ -279,7 +279,7 @@ class Citem(models.Model):
     original = models.TextField("Original", null=True, blank=True)
 
     # [1] Every manuscript has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
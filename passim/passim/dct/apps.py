@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class dctConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'passim.dct'
     # name = 'dct'
+
+    def ready(self):
+        from django.apps import apps
+        from passim.dct.models import setlists_changed
+
+        # Changes in S-SSG links and collection-SSG links make the setlists that depend on them dirty
+        for model_name in ['SermonDescrEqual', 'CollectionSuper']:
+            model = apps.get_model("seeker", model_name)
+            post_save.connect(setlists_changed, sender=model, dispatch_uid="setlists_save_{}".format(model_name))
+            post_delete.connect(setlists_changed, sender=model, dispatch_uid="setlists_delete_{}".format(model_name))
@@ -0,0 +1,98 @@
+"""
+Matching of SSG lists for research sets (DCT) and stemma sets.
+
+A research set consists of a number of lists of SSGs (from manuscripts or
+collections). To choose the pivot list and to build the comparison table, the
+SSGs of the lists are compared with each other. The lists are mapped to a
+matrix of SSG counts (one row per list, one column per distinct SSG), so that
+all pairwise overlaps follow from one matrix product.
+"""
+
+import numpy as np
+
+
+def get_count_matrix(lst_ids):
+    """Get the (list x SSG) matrix with the number of times each SSG occurs in each list"""
+
+    arIds = np.array([x for ids in lst_ids for x in ids], dtype=np.int64)
+    arRow = np.repeat(np.arange(len(lst_ids)), [len(ids) for ids in lst_ids])
+    ssg_ids, arCol = np.unique(arIds, return_inverse=True)
+    counts = np.zeros((len(lst_ids), len(ssg_ids)), dtype=np.int64)
+    np.add.at(counts, (arRow, arCol.ravel()), 1)
+    return counts
+
+def calculate_matches(ssglists):
+    """Calculate the number of pm-matches for each list from ssglists
+
+    For each list this sets:
+    - 'ssgid':          the list of SSG ids
+    - 'unique_matches': the number of distinct SSGs it shares with any of the other lists
+    - title 'matchset': per other list (by its order) the number of SSGs of that list
+                        that occur in this one
+    """
+
+    # Preparation: create a list of SSG ids per list
+    for oItem in ssglists:
+        oItem['ssgid'] = [x['super'] for x in oItem['ssglist']]
+        oItem['unique_matches'] = 0
+    if len(ssglists) == 0:
+        return ssglists
+
+    counts = get_count_matrix([x['ssgid'] for x in ssglists])
+    present = (counts > 0)
+    # matches[i, j] = number of SSGs of list j that occur in list i
+    matches = present.astype(np.int64).dot(counts.T)
+    # An SSG of list i is a unique match if at least one other list has it too
+    in_others = (present.sum(axis=0) - present) > 0
+    unique_matches = (present & in_others).sum(axis=1)
+
+    for idx_list, oItem in enumerate(ssglists):
+        oMatches = oItem['title'].get('matchset', {})
+        for idx, setlist in enumerate(ssglists):
+            if idx != idx_list:
+                oMatches[str(setlist['title']['order'])] = int(matches[idx_list, idx])
+        oItem['title']['matchset'] = oMatches
+        oItem['unique_matches'] = int(unique_matches[idx_list])
+    return ssglists
+
+def count_matches(lst_a, lst_b):
+    """Count the pairs of equal SSG ids between the lists [lst_a] and [lst_b]"""
+
+    if len(lst_a) == 0 or len(lst_b) == 0:
+        return 0
+    counts = get_count_matrix([lst_a, lst_b])
+    return int(counts[0].dot(counts[1]))
+
+def get_first_items(lst_items, lst_ssglists):
+    """Get per list of [lst_ssglists] the first item with the SSG of each of [lst_items] (None if absent)"""
+
+    arWanted = np.array([x['super'] for x in lst_items], dtype=np.int64)
+    lst_columns = []
+    for lst_this in lst_ssglists:
+        lst_item = lst_this['ssglist']
+        arIds = np.array([x['super'] for x in lst_item], dtype=np.int64)
+        ssg_ids, first = np.unique(arIds, return_index=True)
+        pos = np.minimum(np.searchsorted(ssg_ids, arWanted), max(len(ssg_ids) - 1, 0))
+        found = (ssg_ids[pos] == arWanted) if len(ssg_ids) > 0 else np.zeros(len(arWanted), dtype=bool)
+        lst_columns.append([lst_item[first[pos[i]]] if found[i] else None for i in range(len(arWanted))])
+    return lst_columns
+
+def get_pivot_rows(lst_ssglists):
+    """Get the rows of the comparison table, one for each SSG of the first (pivot) list
+
+    Each row has the signature and order of the SSG in the pivot list, followed by
+    the order of its first occurrence in each of the other lists ("" if absent).
+    """
+
+    rows = []
+    lst_pivot = lst_ssglists[0]['ssglist']
+    # Per other list: the first occurrence of each pivot SSG
+    lst_columns = get_first_items(lst_pivot, lst_ssglists[1:])
+
+    for idx, oPivot in enumerate(lst_pivot):
+        # (1) row header, (2) pivot SSG number, (3) SSG number in all other lists
+        oRow = [oPivot['sig'], oPivot['order']]
+        for lst_column in lst_columns:
+            oRow.append("" if lst_column[idx] is None else lst_column[idx]['order'])
+        rows.append(oRow)
+    return rows
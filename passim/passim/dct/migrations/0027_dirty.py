@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dct', '0026_importset_projects'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='researchset',
+            name='dirty',
+            field=models.BooleanField(default=False, verbose_name='Needs re-calculation'),
+        ),
+        migrations.AddField(
+            model_name='setlist',
+            name='dirty',
+            field=models.BooleanField(default=False, verbose_name='Needs re-calculation'),
+        ),
+    ]
@@ -25,10 +25,12 @@ from passim.utils import ErrHandle
 from passim.settings import TIME_ZONE, MEDIA_ROOT
 from passim.basic.models import UserSearch
 from passim.basic.views import base64_decode, base64_encode
-from passim.seeker.models import Author, Keyword, get_current_datetime, get_crpp_date, build_abbr_list, COLLECTION_SCOPE, \
-    Collection, Manuscript, Profile, CollectionSuper, Signature, SermonDescrKeyword, \
+from passim.seeker.models import Author, Keyword, get_current_datetime, get_crpp_date, lazy_abbr_list, COLLECTION_SCOPE, \
+    Collection, Manuscript, Profile, CollectionSuper, Signature, SignatureResolver, SIGNATURE_RESOLVER, SermonDescrKeyword, \
     SermonDescr, EqualGold, Feast, Project2
 from passim.reader.excel import ManuscriptUploadExcel
+from passim.reader.lookup import ImportLookup
+from passim.dct.matching import calculate_matches, count_matches, get_pivot_rows
 
 STANDARD_LENGTH=255
 ABBR_LENGTH = 5
@@ -43,45 +45,35 @@ def get_passimcode(super_id, super_code):
     code = super_code if super_code and super_code != "" else "(nocode_{})".format(super_id)
     return code
 
-def get_goldsig_dct(super_id):
+def get_goldsig_dct(super_id, resolver=None):
     """Get the best signature according to DCT rules"""
 
-    sBack = ""
-    first = None
-    editype_preferences = ['gr', 'cl', 'ot']
-    for editype in editype_preferences:
-        siglist = Signature.objects.filter(gold__equal_id=super_id, editype=editype).order_by('code').values('code')
-        if len(siglist) > 0:
-            code = siglist[0]['code']
-            ellipsis = "" if len(siglist) == 1 else "..."
-            sBack = "{}: {}{}".format(editype, code, ellipsis)
-            break
+    if resolver == None:
+        resolver = SIGNATURE_RESOLVER
+    sBack = resolver.get_best_dct(super_id)
     return sBack
 
-def get_goldsiglist_dct(super_id):
+def get_goldsiglist_dct(super_id, resolver=None):
     """Get the list of signature according to DCT rules"""
 
-    lBack = []
-    first = None
-    editype_preferences = ['gr', 'cl', 'ot']
-    siglist = []
-    for editype in editype_preferences:
-        siglist = Signature.objects.filter(gold__equal_id=super_id, editype=editype).order_by('code').values('code')
-        for item in siglist:
-            sSig = "{}: {}".format(editype, item['code'])
-            lBack.append(sSig)
+    if resolver == None:
+        resolver = SIGNATURE_RESOLVER
+    lBack = resolver.get_list_dct(super_id)
     return lBack
 
+def get_hcs_dict(lst_super):
+    """Get the names of the historical collections of the SSGs in [lst_super], as SSG id => string"""
+
+    dict_hcs = {}
+    qs = CollectionSuper.objects.filter(super__in=lst_super, collection__settype="hc").order_by('id')
+    for super_id, name in qs.values_list('super_id', 'collection__name'):
+        dict_hcs.setdefault(super_id, []).append(name)
+    return {k: ", ".join(v) for k, v in dict_hcs.items()}
+
 def get_list_matches(oPMlist, oSsgList):
     """Calculate the number of matches between the two lists"""
 
-    matches = 0
-    for oPm in oPMlist['ssglist']:
-        ssg = oPm['super']
-        # Check how manu times this SSG appears in [oSsgList]
-        for oSsg in oSsgList['ssglist']:
-            if ssg == oSsg['super']:
-                matches += 1
+    matches = count_matches([x['super'] for x in oPMlist['ssglist']], [x['super'] for x in oSsgList['ssglist']])
     return matches
 
 def import_path(instance, filename):
@@ -153,10 +145,12 @@ class ResearchSet(models.Model):
 
     # [1] A list of all the DCT parameters for this DCT
     contents = models.TextField("Contents", default="[]")
+    # [1] Set when one of the setlists has changed, so that [contents] must be re-calculated
+    dirty = models.BooleanField("Needs re-calculation", default=False)
 
     # [1] The scope of this collection: who can view it?
     #     E.g: private, team, global - default is 'private'
-    scope = models.CharField("Scope", choices=build_abbr_list(COLLECTION_SCOPE), default="priv", max_length=5)
+    scope = models.CharField("Scope", choices=lazy_abbr_list(COLLECTION_SCOPE), default="priv", max_length=5)
 
     # [1] And a date: the date of saving this manuscript
     created = models.DateTimeField(default=get_current_datetime)
@@ -285,49 +279,8 @@ class ResearchSet(models.Model):
         oErr = ErrHandle()
         lBack = []
         try:
-            # Preparation: create a list of SSG ids per list
-            for oItem in ssglists:
-                oItem['ssgid'] = [x['super'] for x in oItem['ssglist']]
-                oItem['unique_matches'] = 0
-
-            # Calculate the number of matches for each SSglist
-            for idx_list in range(len(ssglists)):
-                # Take this as the possible pivot list
-                lPivot = ssglists[idx_list]['ssgid']
-
-                # Walk all lists that are not this pivot and count matches
-                lUnique = []
-                oMatches = {}
-                if 'matchset' in ssglists[idx_list]['title']:
-                    oMatches = ssglists[idx_list]['title']['matchset']
-                for idx, setlist in enumerate(ssglists):
-                    if idx != idx_list:
-                        # Get this ssglist
-                        lSsgId = setlist['ssgid']
-
-                        # Start calculating the number of matches this list has with the currently suggested PM
-                        sKey = str(ssglists[idx]['title']['order'])
-                        lMatches = []
-
-                        # Consider all ssg id's in this list
-                        for ssg_id in lSsgId:
-                            # Global unique matches
-                            if ssg_id in lPivot and not ssg_id in lUnique:
-                                lUnique.append(ssg_id)
-                            # Calculation with respect to the currently suggested PM
-                            if ssg_id in lPivot: # and not ssg_id in lMatches:
-                                lMatches.append(ssg_id)
-                        # Keep track of the matches (for sorting)
-                        oMatches[sKey] = len(lMatches)
-                # Store the between-list matches
-                ssglists[idx_list]['title']['matchset'] = oMatches
-
-                # Store the number of matches for this list
-                unique_matches = len(lUnique)
-                ssglists[idx_list]['unique_matches'] = unique_matches
-
-            # What we return
-            lBack = ssglists
+            # The matching itself is shared with the stemma sets
+            lBack = calculate_matches(ssglists)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("ResearchSet/calculate_matches")
@@ -433,14 +386,14 @@ class ResearchSet(models.Model):
                 lst_contents = json.loads(self.contents)
             else:
                 lst_contents = []
-            if not recalculate and len(lst_contents) > 0:
+            if not recalculate and len(lst_contents) > 0 and not self.dirty:
                 # Should the unique_matches be re-calculated?
                 if not 'unique_matches' in lst_contents[0]:
                     # Yes, re-calculate
                     lst_contents = self.calculate_matches(lst_contents)
                     # And make sure this gets saved!
                     self.contents = json.dumps(lst_contents)
-                    self.save()
+                    self.save(update_fields=['contents', 'saved'])
                 lBack = lst_contents
             else:
                 # Re-calculate the lists
@@ -460,6 +413,10 @@ class ResearchSet(models.Model):
         bResult = True
         lst_ssglists = []
         try:
+            # NOTE: clear the flag before calculating, so that a change made meanwhile marks it dirty again
+            ResearchSet.objects.filter(id=self.id, dirty=True).update(dirty=False)
+            self.dirty = False
+
             oPMlist = None
             # Double check and remove setlists of collection or manuscript that has been removed
             delete_setlist = []
@@ -472,7 +429,7 @@ class ResearchSet(models.Model):
             # Get the lists of SSGs for each list in the set
             for idx, setlist in enumerate(self.researchset_setlists.all().order_by('order')):
                 # Check for the contents
-                if force or setlist.contents == "" or len(setlist.contents) < 3 or setlist.contents[0] == "[":
+                if force or setlist.dirty or setlist.contents == "" or len(setlist.contents) < 3 or setlist.contents[0] == "[":
                     setlist.calculate_contents()
 
                 # Retrieve the SSG-list from the contents
@@ -493,9 +450,9 @@ class ResearchSet(models.Model):
             # Calculate the unique_matches for each list
             lst_ssglists = self.calculate_matches(lst_ssglists)
 
-            # Put it in the ResearchSet and save it
+            # Put it in the ResearchSet and save it (without touching the flag)
             self.contents = json.dumps(lst_ssglists)
-            self.save()
+            self.save(update_fields=['contents', 'saved'])
 
             # All related SetDef items should be warned
             # with transaction.atomic():
@@ -522,13 +479,15 @@ class SetList(models.Model):
     # [1] The lists must be ordered (and they can be re-ordered by the user)
     order = models.IntegerField("Order", default=0)
     # [1] Each setlist must be of a particular type
-    setlisttype = models.CharField("Setlist type", choices=build_abbr_list(SETLIST_TYPE), max_length=5)
+    setlisttype = models.CharField("Setlist type", choices=lazy_abbr_list(SETLIST_TYPE), max_length=5)
 
     # [0-1] A user-defined name, if this is a SSGD type
     name = models.CharField("Setlist name", max_length=STANDARD_LENGTH, blank=True, null=True)
 
     # [1] For convenience and faster operation: keep a JSON list of the SSGs in this setlist
     contents = models.TextField("Contents", default="{}")
+    # [1] Set when the manuscript or collection has changed, so that [contents] must be re-calculated
+    dirty = models.BooleanField("Needs re-calculation", default=False)
 
     # Depending on the type of setlist, there is a pointer to the actual list of SSGs
     # [0-1] Manuscript pointer
@@ -542,16 +501,14 @@ class SetList(models.Model):
         return sBack
 
     def adapt_rset(self, rset_type = None):
+        """Mark this setlist (and its research set) for re-calculation when next needed"""
+
         oErr = ErrHandle()
         try:
-            # Adapt the research set which I am part of
-            rset = self.researchset
-            if not rset is None:
-                rset_type = "-" if rset_type is None else rset_type
-                # Show what happens
-                oErr.Status("adapt_rset on setlist id={} rset_type={}".format(self.id, rset_type))
-                # Adapt from the setlist
-                rset.adapt_from_setlist(self)
+            rset_type = "-" if rset_type is None else rset_type
+            # Show what happens
+            oErr.Status("adapt_rset on setlist id={} rset_type={}".format(self.id, rset_type))
+            SetList.set_dirty(SetList.objects.filter(id=self.id))
         except:
             msg = oErr.get_error_message()
             oErr.DoError("adapt_rset")
@@ -561,6 +518,10 @@ class SetList(models.Model):
         oErr = ErrHandle()
         bResult = True
         try:
+            # NOTE: clear the flag before calculating, so that a change made meanwhile marks it dirty again
+            SetList.objects.filter(id=self.id, dirty=True).update(dirty=False)
+            self.dirty = False
+
             oSsgList = {}
             # Only calculate contents, if there is any
             if not self.collection is None or not self.manuscript is None:
@@ -568,14 +529,22 @@ class SetList(models.Model):
                 oSsgList['title'] = self.get_title_object()
                 # Get the list of SSGs for this list
                 oSsgList['ssglist'] = self.get_ssg_list()
-            # Add this contents and save myself
+            # Add this contents and save myself (without touching the flag)
             self.contents = json.dumps(oSsgList)
-            self.save()
+            self.save(update_fields=['contents'])
         except:
             msg = oErr.get_error_message()
             oErr.DoError("SetList/calculate_contents")
         return bResult
 
+    def set_dirty(qs):
+        """Mark the setlists in [qs] and their research sets for re-calculation"""
+
+        rset_ids = list(qs.values_list('researchset_id', flat=True))
+        if len(rset_ids) > 0:
+            qs.update(dirty=True)
+            ResearchSet.objects.filter(id__in=rset_ids).update(dirty=True)
+
     def get_ssg_list(self):
         """Create a list of SSGs,depending on the type I am"""
 
@@ -661,6 +630,12 @@ class SetList(models.Model):
                 'super', 'super__code', 'super__author__name',
                 'super__incipit', 'super__explicit', 'super__sgcount', 'super__ssgcount')
             lBack = []
+            # Get the signatures, the HCs and the URLs of all these SSGs at once
+            lst_super = [x['super'] for x in qs]
+            resolver = SignatureResolver()
+            resolver.fetch(lst_super)
+            dict_hcs = get_hcs_dict(lst_super)
+            dict_url = {}
             with transaction.atomic():
                 for obj in qs:
                     # Get the order number
@@ -678,21 +653,18 @@ class SetList(models.Model):
                     sgcount = obj['super__sgcount']
                     ssgcount = obj['super__ssgcount']
                     # Get the name(s) of the HC
-                    lst_hc = CollectionSuper.objects.filter(super=super, collection__settype="hc").values(
-                        'collection__id', 'collection__name')
-                    hcs = ", ".join( [x['collection__name'] for x in lst_hc])
-                    # ======== DEBUGGING ============
-                    if hcs != "":
-                        iStop = 1
-                    # ===============================
+                    hcs = dict_hcs.get(super, "")
                     # Get a URL for this ssg
-                    url = reverse('equalgold_details', kwargs={'pk': super})
+                    url = dict_url.get(super)
+                    if url is None:
+                        url = reverse('equalgold_details', kwargs={'pk': super})
+                        dict_url[super] = url
                     # Treat signatures for this SSG
-                    sigbest = get_goldsig_dct(super)
+                    sigbest = get_goldsig_dct(super, resolver)
                     if sigbest == "":
                         sigbest = "ssg_{}".format(super)
                     # Signatures for this SSG: get the full list
-                    siglist = get_goldsiglist_dct(super)
+                    siglist = get_goldsiglist_dct(super, resolver)
                     # Put into object
                     oItem = dict(super=super, sig=sigbest, siglist=siglist,
                                  name=name, descr=descr, type=settype,
@@ -744,6 +716,16 @@ class SetList(models.Model):
                 'sermon__bibleref', 'sermon__additional', 'sermon__note')
             # NOTE: the 'keywords' for issue #402 are a bit more cumbersome to collect...
             lBack = []
+            # Get the signatures, the HCs, the URLs and the keywords of all these SSGs and sermons at once
+            lst_super = [x['super'] for x in qs]
+            resolver = SignatureResolver()
+            resolver.fetch(lst_super)
+            dict_hcs = get_hcs_dict(lst_super)
+            dict_url = {}
+            dict_kws = {}
+            for sermon_id, name in SermonDescrKeyword.objects.filter(sermon__in=[x['sermon'] for x in qs]).order_by('id').values_list(
+                    'sermon_id', 'keyword__name'):
+                dict_kws.setdefault(sermon_id, []).append(name)
             with transaction.atomic():
                 for obj in qs:
                     # Get the order number
@@ -771,27 +753,22 @@ class SetList(models.Model):
                     srm_notes = obj['sermon__note']
 
                     # Get the name(s) of the HC
-                    lst_hc = CollectionSuper.objects.filter(super=super, collection__settype="hc").values(
-                        'collection__id', 'collection__name')
-                    hcs = ", ".join( [x['collection__name'] for x in lst_hc])
-                    # ======== DEBUGGING ============
-                    if hcs != "":
-                        iStop = 1
-                    # ===============================
-
-                    # TODO: Get the keywords
-                    lst_kw = SermonDescrKeyword.objects.filter(sermon=sermon).values(
-                        'keyword__name')
-                    kws = ", ".join( [x['keyword__name'] for x in lst_kw])
+                    hcs = dict_hcs.get(super, "")
+
+                    # Get the keywords
+                    kws = ", ".join(dict_kws.get(sermon, []))
 
                     # Get a URL for this ssg
-                    url = reverse('equalgold_details', kwargs={'pk': super})
+                    url = dict_url.get(super)
+                    if url is None:
+                        url = reverse('equalgold_details', kwargs={'pk': super})
+                        dict_url[super] = url
                     # Treat signatures for this SSG: get the best for showing
-                    sigbest = get_goldsig_dct(super)
+                    sigbest = get_goldsig_dct(super, resolver)
                     if sigbest == "":
                         sigbest = "ssg_{}".format(super)
                     # Signatures for this SSG: get the full list
-                    siglist = get_goldsiglist_dct(super)
+                    siglist = get_goldsiglist_dct(super, resolver)
                     # Put into object
                     oItem = dict(super=super, sig=sigbest, siglist=siglist, hcs=hcs, kws=kws,
                                  order=order, code=code, url=url, author=authorname, type='ms',
@@ -819,6 +796,23 @@ class SetList(models.Model):
         return lBack
     
 
+def setlists_changed(sender, instance, **kwargs):
+    """An S-SSG link or a collection-SSG link has changed: mark the setlists that depend on it"""
+
+    oErr = ErrHandle()
+    try:
+        qs = None
+        if sender.__name__ == "SermonDescrEqual" and not instance.manu_id is None:
+            qs = SetList.objects.filter(manuscript_id=instance.manu_id)
+        elif sender.__name__ == "CollectionSuper" and not instance.collection_id is None:
+            qs = SetList.objects.filter(collection_id=instance.collection_id)
+        if not qs is None:
+            SetList.set_dirty(qs)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("setlists_changed")
+
+
 class SetDef(models.Model):
     """THe definition of a DCT"""
 
@@ -975,28 +969,7 @@ class SetDef(models.Model):
             rows.append(oRow)
 
             # Start out with the pivot: the *first* one in 'ssglist'
-            lst_pivot = lst_ssglists[0]
-            for oPivot in lst_pivot['ssglist']:
-                # Create a row based on this pivot
-                oRow = []
-                # (1) row header
-                oRow.append(oPivot['sig'])
-                # (2) pivot SSG number
-                oRow.append(oPivot['order'])
-                # (3) SSG number in all other manuscripts
-                ssg_id = oPivot['super']
-                for lst_this in lst_ssglists[1:]:
-                    bFound = False
-                    order = ""
-                    for oItem in lst_this['ssglist']:
-                        if ssg_id == oItem['super']:
-                            # Found it!
-                            order = oItem['order']
-                            bFound = True
-                            break
-                    oRow.append(order)
-                # (4) add the row to the list
-                rows.append(oRow)
+            rows += get_pivot_rows(lst_ssglists)
             # Make sure we return the right information
             oBack['setlist'] = rows
         except:
@@ -1134,7 +1107,7 @@ class SavedItem(models.Model):
     order = models.IntegerField("Order", default=0)
     # [1] Each saved item must be of a particular type
     #     Possibilities: manu, serm, ssg, hist, pd
-    sitemtype = models.CharField("Saved item type", choices=build_abbr_list(SAVEDITEM_TYPE), max_length=5)
+    sitemtype = models.CharField("Saved item type", choices=lazy_abbr_list(SAVEDITEM_TYPE), max_length=5)
 
     # [0-1] A SavedItem can optionally belong to a [SaveGroup]
     group = models.ForeignKey(SaveGroup, blank=True, null=True, on_delete=models.SET_NULL, related_name="group_saveditems")
@@ -1180,6 +1153,23 @@ class SavedItem(models.Model):
             oErr.DoError("SavedItem/get_saveditem")
         return obj
 
+    def get_saveditems(item_ids, profile, sitemtype):
+        """Get a dictionary of item id to saved item for a whole list of items at once"""
+
+        oBack = {}
+        oErr = ErrHandle()
+        try:
+            if not profile is None:
+                field = dict(manu="manuscript", serm="sermon", ssg="equal", hc="collection", pd="collection").get(sitemtype)
+                if not field is None:
+                    kwargs = {'profile': profile, 'sitemtype': sitemtype, '{}__in'.format(field): item_ids}
+                    for obj in SavedItem.objects.filter(**kwargs).order_by('id'):
+                        oBack.setdefault(getattr(obj, "{}_id".format(field)), obj)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SavedItem/get_saveditems")
+        return oBack
+
     def get_saveditem_button(item, profile, sitemtype):
         """Provide a button to either turn this into a saved item or remove it as saved item"""
 
@@ -1417,7 +1407,7 @@ class SelectItem(models.Model):
     order = models.IntegerField("Order", default=0)
     # [1] Each saved item must be of a particular type
     #     Possibilities: manu, serm, ssg, hist, pd
-    selitemtype = models.CharField("Select item type", choices=build_abbr_list(SELITEM_TYPE), max_length=5)
+    selitemtype = models.CharField("Select item type", choices=lazy_abbr_list(SELITEM_TYPE), max_length=5)
 
     # Depending on the type of SelectItem, there is a pointer to the actual item
     # [0-1] Manuscript pointer
@@ -1480,6 +1470,24 @@ class SelectItem(models.Model):
             oErr.DoError("SelectItem/get_selectitem")
         return obj
 
+    def get_selectitems(item_ids, profile, selitemtype):
+        """Get a dictionary of item id to selected item for a whole list of items at once"""
+
+        oBack = {}
+        oErr = ErrHandle()
+        try:
+            if not profile is None:
+                field = dict(manu="manuscript", serm="sermon", ssg="equal", hc="collection", pd="collection", 
+                             svdi="saveditem").get(selitemtype)
+                if not field is None:
+                    kwargs = {'profile': profile, 'selitemtype': selitemtype, '{}__in'.format(field): item_ids}
+                    for obj in SelectItem.objects.filter(**kwargs).order_by('id'):
+                        oBack.setdefault(getattr(obj, "{}_id".format(field)), obj)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SelectItem/get_selectitems")
+        return oBack
+
     def get_selectcount(profile, selitemtype):
         """Get the amount of selected items for this particular user / selitemtype"""
 
@@ -1510,7 +1518,7 @@ class ImportSet(models.Model):
     order = models.IntegerField("Order", default=0)
     # [1] Each import-set item must be of a particular type
     #     Possibilities: manu, serm, ssg, hist, pd
-    importtype = models.CharField("Import type", choices=build_abbr_list(IMPORT_TYPE), max_length=5)
+    importtype = models.CharField("Import type", choices=lazy_abbr_list(IMPORT_TYPE), max_length=5)
 
     # [0-1] Optional notes for this set
     notes = models.TextField("Notes", blank=True, null=True)
@@ -1531,7 +1539,7 @@ class ImportSet(models.Model):
 
     # [1] Each importset item has a status, defining where it is on the acceptance scale
     #     Scale: cre[ated], ch[an]g[ed], sub[mitted], rej[ected], acc[epted]
-    status = models.CharField("Import status", choices=build_abbr_list(IMPORT_STATUS), max_length=5, default="cre")
+    status = models.CharField("Import status", choices=lazy_abbr_list(IMPORT_STATUS), max_length=5, default="cre")
 
     # [1] And a date: the date of saving this manuscript
     created = models.DateTimeField(default=get_current_datetime)
@@ -1661,7 +1669,7 @@ class ImportSet(models.Model):
                                 if any( ele in exclude for ele in sRef):
                                     html_err.append("Sermon: `{}` may not contain '{}' at row **{}**".format(sKey, exclude, idx+2))
                             if not cls is None:
-                                obj = cls.objects.filter(name__iexact=sRef).first()
+                                obj = lookup.get(cls, sRef)
                                 if obj is None:
                                     html_wrn.append("Sermon: unknown `{}` item [{}] at row **{}**".format(sKey, sRef, idx+2))
                             if not allowed is None:
@@ -1687,10 +1695,7 @@ class ImportSet(models.Model):
                             try:
                                 lst_item = json.loads(sItem)
                                 for sItem in lst_item:
-                                    if field is None:
-                                        obj = cls.objects.filter(name__iexact=sItem).first()
-                                    else:
-                                        obj = cls.objects.filter(**{"{}__iexact".format(field): sItem}).first()
+                                    obj = lookup.get(cls, sItem, "name" if field is None else field)
                                     if obj is None:
                                         html_list = html_err if obligatory else html_wrn
                                         sMainPart = "Sermon: unknown `{}` item [{}]".format(sKey, sItem)
@@ -1711,6 +1716,8 @@ class ImportSet(models.Model):
         oErr = ErrHandle()
         html_err = []
         html_wrn = []
+        # All names and codes are looked up in memory
+        lookup = ImportLookup()
         lst_column = ["Order", "Parent", "FirstChild", "Next", "Type", "External ids", "Status", "Locus", 
                       "Attributed author", "Section title", "Lectio", "Title", "Incipit", "Explicit", "Postscriptum", 
                       "Feast", "Bible reference(s)", "Cod. notes", "Note", "Keywords", "Keywords (user)", 
@@ -2194,7 +2201,7 @@ class ImportReview(models.Model):
 
     # [1] Each review item has a status, defining what the suggestion is
     #     Scale: cre[ated], ch[an]g[ed], sub[mitted], rej[ected], acc[epted]
-    status = models.CharField("Review status", choices=build_abbr_list(IMPORT_STATUS), max_length=5, default="cre")
+    status = models.CharField("Review status", choices=lazy_abbr_list(IMPORT_STATUS), max_length=5, default="cre")
 
     # [1] And a date: the date of saving this manuscript
     created = models.DateTimeField(default=get_current_datetime)
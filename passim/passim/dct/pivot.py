@@ -0,0 +1,159 @@
+"""
+The pivot table of a DCT (dynamic comparative table), calculated on the server.
+
+The browser (ru.dct.js, dct_show) builds the DCT from the SSG lists of the research
+set and the parameters of the DCT (pivot column, view mode, column order, excluded
+columns). The same table is built here, one row at a time, so that it can be
+exported without holding the whole table in memory.
+
+Every row is a list of cells in the format that dct_getdata() uses:
+- the header row:   {'txt': 'Gryson/Clavis'}, then per column {'header': {...}}
+- the other rows:   {'txt': sig, 'siglist': [...]}, then per column {'txt': order, 'author': ...}
+"""
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+from passim.dct.matching import get_first_items
+
+
+HEADER_FIELDS = ['url', 'top', 'middle', 'main', 'yearstart', 'yearfinish', 'size']
+
+
+def get_author(oSsgItem):
+    """Get the author of an SSG item (see dct_author)"""
+
+    for key in ['srm_author', 'author']:
+        if key in oSsgItem:
+            return "" if oSsgItem[key] is None else oSsgItem[key]
+    return ""
+
+def get_alpha_title(oTitle):
+    """Get the title by which a column is sorted alphabetically"""
+
+    if oTitle.get('top') in ["hc", "pd"]:
+        return oTitle.get('main', "")
+    return "{}_{}_{}".format(oTitle.get('top'), oTitle.get('middle'), oTitle.get('main'))
+
+def get_columns(ssglists, params):
+    """Put the SSG lists in the order of the DCT columns: the pivot first, then the others"""
+
+    pivot_col = params.get('pivot_col', -1)
+    col_mode = params.get('col_mode', "match_decr")
+    lst_order = params.get('lst_order', [])
+
+    # The pivot is identified by its 'order'
+    pivot_idx = 0
+    for idx, oSsgList in enumerate(ssglists):
+        if oSsgList['title']['order'] == pivot_col:
+            pivot_idx = idx
+            break
+    pivot = ssglists[pivot_idx]
+    order_key = str(pivot['title']['order'])
+
+    lst_other = []
+    for idx, oSsgList in enumerate(ssglists):
+        if idx != pivot_idx:
+            lst_other.append(oSsgList)
+
+    def get_matches(oSsgList):
+        oTitle = oSsgList['title']
+        return oTitle.get('matchset', {}).get(order_key, oTitle.get('matches', 0))
+
+    if col_mode == "rset":
+        lst_other.sort(key=lambda x: x['title']['order'])
+    elif col_mode == "match_decr":
+        lst_other.sort(key=lambda x: (-get_matches(x), x['title']['order']))
+    elif col_mode == "match_incr":
+        lst_other.sort(key=lambda x: (get_matches(x), x['title']['order']))
+    elif col_mode == "alpha":
+        lst_other.sort(key=lambda x: get_alpha_title(x['title']))
+    elif col_mode == "custom":
+        lst_other.sort(key=lambda x: lst_order.index(x['title']['order']) if x['title']['order'] in lst_order else -1)
+    return [pivot] + lst_other
+
+def iter_pivot_rows(ssglists, params):
+    """Yield the rows of the DCT defined by [ssglists] and [params], starting with the header row"""
+
+    oErr = ErrHandle()
+    try:
+        if ssglists == None or len(ssglists) == 0:
+            return
+        view_mode = params.get('view_mode', "all")
+        lst_exclude = params.get('lst_exclude', [])
+
+        columns = get_columns(ssglists, params)
+        pivot = columns[0]
+        # The non-pivot columns that are shown
+        others = [x for x in columns[1:] if not x['title']['order'] in lst_exclude]
+
+        # Header row
+        row = [{'txt': "Gryson/Clavis"}]
+        for oSsgList in columns:
+            oTitle = oSsgList['title']
+            if not oTitle['order'] in lst_exclude:
+                row.append({'header': {k: oTitle.get(k) for k in HEADER_FIELDS}})
+        yield row
+
+        def iter_rows(lst_item, bShowPivot):
+            """Yield the row of each item in [lst_item], and whether it occurs in a shown column"""
+
+            # Per shown column: the first item with the SSG of each row
+            lst_columns = get_first_items(lst_item, others)
+            for idx, oSsgThis in enumerate(lst_item):
+                row = [{'txt': oSsgThis['sig'], 'siglist': oSsgThis.get('siglist', [])}]
+                if bShowPivot:
+                    row.append({'txt': str(oSsgThis['order']), 'author': get_author(oSsgThis)})
+                else:
+                    row.append({'txt': ""})
+                bFound = False
+                for lst_column in lst_columns:
+                    oSsgItem = lst_column[idx]
+                    if oSsgItem == None:
+                        row.append({'txt': ""})
+                    else:
+                        bFound = True
+                        row.append({'txt': str(oSsgItem['order']), 'author': get_author(oSsgItem)})
+                yield row, bFound
+
+        # The rows of the pivot
+        dealt_with = set(x['super'] for x in pivot['ssglist'])
+        for row, bFound in iter_rows(pivot['ssglist'], True):
+            if bFound or view_mode == "all":
+                yield row
+
+        if view_mode == "all":
+            # Every item of the other lists whose SSG is not in the pivot (as dct_remaining_ssgs)
+            #   NOTE: an SSG that occurs more than once gets more than one row, as on the screen
+            remainder = []
+            for oSsgList in columns[1:]:
+                for oSsgItem in oSsgList['ssglist']:
+                    if not oSsgItem['super'] in dealt_with:
+                        remainder.append(oSsgItem)
+            remainder.sort(key=lambda x: (x['order'], x['sig']))
+            for row, bFound in iter_rows(remainder, False):
+                yield row
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("iter_pivot_rows")
+
+def iter_table_rows(rows):
+    """Turn the rows from iter_pivot_rows() into rows of plain strings
+
+    The header row becomes four rows (top, middle, main, size); in the other rows
+    the first cell is the list of signatures.
+    """
+
+    header = next(rows, None)
+    if header == None:
+        return
+    for field in ['top', 'middle', 'main', 'size']:
+        row = ["Gryson/Clavis" if field == "top" else ""]
+        for item in header[1:]:
+            value = item['header'].get(field)
+            row.append("" if value == None else value)
+        yield row
+    for lst_row in rows:
+        row = [", ".join(lst_row[0]['siglist'])]
+        for col in lst_row[1:]:
+            row.append(col['txt'])
+        yield row
@@ -1634,8 +1634,9 @@ var ru = (function ($, ru) {
           switch ($(elStart).attr("downloadtype")) {
             case "json":
             case "xlsx":
-              // Prepare a JSON to work from
-              $("#downloaddata").val(private_methods.dct_getdata());
+            case "csv":
+              // The server calculates the data from the DCT as it is shown now
+              $("#downloadparams").val(JSON.stringify(loc_params));
               break;
           }
 
@@ -8,6 +8,9 @@ Replace this with more appropriate tests for your application.
 import django
 from django.test import TestCase
 
+from passim.dct.matching import calculate_matches, count_matches, get_pivot_rows
+from passim.dct.pivot import iter_pivot_rows, iter_table_rows
+
 # TODO: Configure your database in settings.py and sync before running tests.
 
 class SimpleTest(TestCase):
@@ -23,3 +26,58 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class MatchingTest(TestCase):
+    """Tests for the matching of SSG lists"""
+
+    @classmethod
+    def setUpClass(cls):
+        django.setup()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def get_ssglists(self):
+        lst_super = [[1, 2, 3, 2], [2, 4, 2], [5, 3], []]
+        ssglists = []
+        for idx, lst_id in enumerate(lst_super):
+            ssglist = [dict(super=x, order=order + 1, sig="sig{}".format(x)) for order, x in enumerate(lst_id)]
+            ssglists.append(dict(title=dict(order=idx + 1), ssglist=ssglist))
+        return ssglists
+
+    def test_matches(self):
+        """Unique matches and the matches per list"""
+
+        ssglists = calculate_matches(self.get_ssglists())
+        self.assertEqual([x['unique_matches'] for x in ssglists], [2, 1, 1, 0])
+        self.assertEqual(ssglists[0]['title']['matchset'], {"2": 2, "3": 1, "4": 0})
+        self.assertEqual(ssglists[1]['title']['matchset'], {"1": 2, "3": 0, "4": 0})
+        self.assertEqual(count_matches([1, 2, 3, 2], [2, 4, 2]), 4)
+
+    def test_pivot(self):
+        """The order of the first occurrence of every pivot SSG in the other lists"""
+
+        rows = get_pivot_rows(self.get_ssglists())
+        self.assertEqual(rows[0], ["sig1", 1, "", "", ""])
+        self.assertEqual(rows[1], ["sig2", 2, 1, "", ""])
+        self.assertEqual(rows[2], ["sig3", 3, "", 2, ""])
+        self.assertEqual(rows[3], ["sig2", 4, 1, "", ""])
+
+    def test_export(self):
+        """The rows of a DCT export, with the pivot and the view mode of the DCT"""
+
+        ssglists = calculate_matches(self.get_ssglists())
+        params = dict(pivot_col=2, view_mode="match", col_mode="rset", lst_exclude=[4])
+        rows = list(iter_table_rows(iter_pivot_rows(ssglists, params)))
+        # Four header rows, then the pivot SSGs that occur in list 1 or 3
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0], ["Gryson/Clavis", "", "", ""])
+        self.assertEqual(rows[4], ["", "1", "2", ""])
+        self.assertEqual(rows[5], ["", "3", "2", ""])
+        params['view_mode'] = "all"
+        rows = list(iter_table_rows(iter_pivot_rows(ssglists, params)))
+        # All pivot SSGs, then the items of SSGs 1, 5, 3 (list 3) and 3 (list 1) that are not in the pivot
+        self.assertEqual([x[1:] for x in rows[4:]], [["1", "2", ""], ["2", "", ""], ["3", "2", ""],
+                                                     ["", "1", ""], ["", "", "1"], ["", "3", "2"], ["", "3", "2"]])
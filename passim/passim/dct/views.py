@@ -29,13 +29,15 @@ import os
 from passim.settings import APP_PREFIX, MEDIA_DIR, MEDIA_ROOT, WRITABLE_DIR
 from passim.utils import ErrHandle
 from passim.basic.views import BasicList, BasicDetails, BasicPart
+from passim.basic.export import get_stream_response
 from passim.seeker.views import get_application_context, get_breadcrumbs, user_is_ingroup, nlogin, user_is_authenticated, \
     user_is_superuser, get_selectitem_info, adapt_m2m
 from passim.seeker.models import COLLECTION_SCOPE, FieldChoice, SermonDescr, EqualGold, Manuscript, Signature, Profile, CollectionSuper, Collection, Project2, \
-    Basket, BasketMan, BasketSuper, BasketGold
+    Basket, BasketMan, BasketSuper, BasketGold, SignatureResolver
 from passim.seeker.models import get_crpp_date, get_current_datetime, process_lib_entries, get_searchable, get_now_time
 from passim.dct.models import ImportSetProject, ResearchSet, SetList, SetDef, get_passimcode, get_goldsig_dct, \
     SavedItem, SavedSearch, SelectItem, SavedVis, SaveGroup, ImportSet, ImportReview
+from passim.dct.pivot import iter_pivot_rows, iter_table_rows
 from passim.dct.forms import ResearchSetForm, SetDefForm, RsetSelForm, SaveGroupForm, SgroupSelForm, \
     ImportSetForm, ImportReviewForm
 from passim.approve.models import EqualChange, EqualApproval
@@ -102,6 +104,9 @@ def manuscript_ssgs(manu, bDebug = False):
         qs = manu.sermondescr_super.all().order_by('sermon__msitem__order').values(
             'sermon__msitem__order', 'super', 'super__code')
         lBack = []
+        # Get the signatures of all these SSGs at once
+        resolver = SignatureResolver()
+        resolver.fetch([x['super'] for x in qs])
         with transaction.atomic():
             for obj in qs:
                 # Get the order number
@@ -110,7 +115,7 @@ def manuscript_ssgs(manu, bDebug = False):
                 super = obj['super']
                 code = obj['super__code']
                 # Treat signatures for this SSG
-                sigbest = get_goldsig_dct(super)
+                sigbest = get_goldsig_dct(super, resolver)
                 if sigbest == "":
                     sigbest = "ssg_{}".format(super)
                 # Put into object
@@ -143,6 +148,9 @@ def collection_ssgs(coll, bDebug = False):
         qs = CollectionSuper.objects.filter(collection=coll).order_by('order').values(
             'order', 'super', 'super__code')
         lBack = []
+        # Get the signatures of all these SSGs at once
+        resolver = SignatureResolver()
+        resolver.fetch([x['super'] for x in qs])
         with transaction.atomic():
             for obj in qs:
                 # Get the order number
@@ -151,7 +159,7 @@ def collection_ssgs(coll, bDebug = False):
                 super = obj['super']
                 code = obj['super__code']
                 # Treat signatures for this SSG
-                sigbest = get_goldsig_dct(super)
+                sigbest = get_goldsig_dct(super, resolver)
                 if sigbest == "":
                     sigbest = "ssg_{}".format(super)
                 # Put into object
@@ -2856,6 +2864,7 @@ class SetDefDownload(BasicPart):
     template_name = None
     action = "download"
     dtype = ""
+    stream_types = ["csv", "json", "xlsx"]
 
     def custom_init(self):
         """Calculate stuff"""
@@ -2878,84 +2887,55 @@ class SetDefDownload(BasicPart):
             oErr.DoError("SetDefDownload/userpermissions")
         return bResult
 
+    def post(self, request, pk=None):
+        # The data downloads are calculated from the DCT itself, and are streamed
+        self.initializations(request, pk)
+        if self.dtype in self.stream_types and not self.obj is None and \
+           self.checkAuthentication(request) and self.userpermissions("w"):
+            return self.get_stream(self.dtype)
+        return super(SetDefDownload, self).post(request, pk)
+
     def get_data(self, prefix, dtype, response=None):
-        """Gather the data as CSV, including a header line and comma-separated"""
+        """The image downloads get their data from the Javascript routine"""
 
-        # Initialize
-        lData = []
-        sData = ""
-        oErr = ErrHandle()
+        # Note: 'dct-svg' does not occur, and for 'hist-png' the Javascript routine provides the needed information
+        return ""
 
-        try:
+    def get_params(self):
+        """Get the DCT parameters: the ones of the DCT as shown to the user, or else the stored ones"""
 
-            if dtype == "json":
-                # Retrieve the actual data from self.data
-                sData = self.qd.get('downloaddata', "[]")
-                # Load it as object (from JSON)
-                oData = json.loads(sData)
-                # Save it as string, but with indentation for easy reading
-                sData = json.dumps(oData, indent=2)
-            elif dtype == "dct-svg":
-                # Note: this does not occur - no SVG is used
-                pass
-            elif dtype == "dct-png":
-                # Note: the Javascript routine provides the needed information
-                pass
-            elif dtype == "csv" or dtype == "xlsx":
-                # Retrieve the actual data from self.data
-                sData = self.qd.get('downloaddata', "[]")
-                # Load it as object (from JSON)
-                lst_rows = json.loads(sData)
-
-                # Create CSV string writer
-                output = StringIO()
-                delimiter = "\t" if dtype == "csv" else ","
-                csvwriter = csv.writer(output, delimiter=delimiter, quotechar='"')
-
-                # Headers: the column names are largely determined by the first row in the JSON information
-                row = lst_rows[0]
-                header_fields = ['top', 'middle', 'main', 'size']
-                for field in header_fields:
-                    headers = []
-                    # First column processing
-                    if field == "top": 
-                        headers.append("Gryson/Clavis")
-                    else:
-                        headers.append("")
-                    # Processing of the remaining columns
-                    for item in row[1:]:
-                        oHeader = item['header']
-                        if field in oHeader:
-                            headers.append(oHeader[field])
-                        else:
-                            headers.append("")
-                    # Output this header row
-                    csvwriter.writerow(headers)
-
-                # Process the remaining rows in the list of input rows
-                for lst_row in lst_rows[1:]:
-                    # Start an output row
-                    row = []
-                    # Walk through the columns
-                    for idx, col in enumerate(lst_row):
-                        if idx == 0:
-                            # THis is the first column: get the siglist
-                            siglist = ", ".join(col['siglist'])
-                            row.append(siglist)
-                        else:
-                            # This is a different column
-                            row.append(col['txt'])
-                    # Output this row
-                    csvwriter.writerow(row)
-
-                # Convert to string
-                sData = output.getvalue()
-                output.close()
+        params = {}
+        oErr = ErrHandle()
+        try:
+            sParams = self.qd.get('downloadparams', "")
+            if sParams != None and sParams != "" and sParams[0] == "{":
+                params = json.loads(sParams)
+            elif self.obj.contents != "" and self.obj.contents[0] == "{":
+                params = json.loads(self.obj.contents)
         except:
             msg = oErr.get_error_message()
-            oErr.DoError("SetDefDownload/get_data")
+            oErr.DoError("SetDefDownload/get_params")
+        return params
 
-        return sData
+    def get_stream(self, dtype):
+        """Export the DCT row by row as CSV (tab-separated), JSON or Excel"""
+
+        response = None
+        oErr = ErrHandle()
+        try:
+            ssglists = self.obj.researchset.get_ssglists()
+            rows = iter_pivot_rows(ssglists, self.get_params())
+            sDbName = "passim_{}_{}.{}".format(self.MainModel.__name__, self.obj.id, dtype)
+
+            # JSON keeps the cells of the DCT; CSV and Excel get plain strings with four header rows
+            if dtype != "json":
+                rows = iter_table_rows(rows)
+            response = get_stream_response(rows, dtype, sDbName, header_rows=4)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SetDefDownload/get_stream")
+            response = HttpResponse(msg, content_type="text/plain")
+        return response
 
 
 
@@ -18,7 +18,7 @@ import csv
 from passim.settings import APP_PREFIX, WRITABLE_DIR, TIME_ZONE, PLUGIN_DIR
 from passim.utils import *
 from passim.basic.models import get_current_datetime, get_crpp_date
-from passim.seeker.models import build_abbr_list, Manuscript
+from passim.seeker.models import lazy_abbr_list, Manuscript
 
 LONG_STRING=255
 STANDARD_LENGTH=100
@@ -40,7 +40,7 @@ class BoardDataset(models.Model):
     notes = models.TextField("Notes", blank=True, null=True)
 
     # [1] Whether this location is usable right now or not
-    status = models.CharField("Board dataset status", choices=build_abbr_list(BOARD_DSET_STATUS), default="act", max_length=6)
+    status = models.CharField("Board dataset status", choices=lazy_abbr_list(BOARD_DSET_STATUS), default="act", max_length=6)
 
     # [1] And a date: the date of saving this BoardDataset
     created = models.DateTimeField(default=get_current_datetime)
@@ -36,7 +36,8 @@ from passim.settings import APP_PREFIX, MEDIA_DIR
 from passim.utils import ErrHandle
 
 from passim.seeker.models import Manuscript, SermonDescr, Profile, Report, Codico, Location, LocationType, Library, \
-    SermonGoldExternal, EqualGoldExternal
+    SermonGoldExternal, EqualGoldExternal, MsItem
+from passim.reader.lookup import ImportLookup, ImportBulk
 # from passim.seeker.views import app_editor
 from passim.basic.views import app_editor
 from passim.reader.views import ReaderImport
@@ -65,6 +66,8 @@ class ManuscriptUploadExcel(ReaderImport):
             profile = Profile.get_user_profile(username)
             team_group = app_editor
             kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
+            # Names and codes of authors, keywords etc are looked up in memory, for all files together
+            kwargs['lookup'] = ImportLookup()
 
             # Get the contents of the imported file
             files = request.FILES.getlist('files_field')
@@ -342,12 +345,47 @@ class ManuscriptUploadExcel(ReaderImport):
         return bOkay, code
 
     def upload_one_excel(sPath, filename, lst_err, oResult, kwargs, manucreate=True):
-        """Upload one Excel file at the indicated location"""
+        """Upload one Excel file at the indicated location
+
+        The import has two phases:
+        1 - read the whole workbook into memory and check it
+        2 - write the manuscript, codicological units and sermons in one transaction,
+            looking up authors, keywords, signatures etc in memory (see reader/lookup.py);
+            each sermon row has a savepoint of its own (see add_import_row)
+        The caller may pass one ImportLookup for a batch of files in kwargs['lookup'].
+        """
+
+        def get_header(lst_row):
+            """Get the lower-case column names from the first row"""
+
+            header = []
+            for v in ([] if len(lst_row) == 0 else lst_row[0]):
+                if v == None or v == "" or v == "-":
+                    break
+                header.append(v.lower())
+            return header
+
+        def get_items(lst_row, header):
+            """Get an object for each row after the first one that has a value in column 1"""
+
+            lst_item = []
+            for row_values in lst_row[1:]:
+                v = None if len(row_values) == 0 else row_values[0]
+                if not v is None and v != "":
+                    oItem = {}
+                    for idx, col_name in enumerate(header):
+                        oItem[col_name] = row_values[idx] if idx < len(row_values) else None
+                    lst_item.append(oItem)
+            return lst_item
 
         oErr = ErrHandle()
         bResult = True
+        lookup_mark = None
         try:
-            # Read string file
+            if kwargs.get('lookup') is None:
+                kwargs['lookup'] = ImportLookup()
+
+            # ========== Phase 1: read and check the workbook ===========
             wb = openpyxl.load_workbook(sPath, read_only=True)
             sheetnames = wb.sheetnames
             ws_manu = None
@@ -365,14 +403,14 @@ class ManuscriptUploadExcel(ReaderImport):
                     ws_sermo = wb[sname]
                     lst_ws.append(ws_sermo)
 
-            # Check the contents of JSON coded cells
+            # Read the values of all sheets, and check the contents of JSON coded cells
             err_json = []
+            dict_rows = {}
             for ws in lst_ws:
+                lst_row = []
                 row_num = 1
                 for value_tuple in ws.iter_rows():
-                    # ------------ DEBUGGING -----------------------
-                    print("File={}, sheet={}, row={}".format(filename, ws.title, row_num))
-                    # ----------------------------------------------
+                    row_values = []
                     col_num = 1
                     for cell in value_tuple:
                         value = cell.value
@@ -384,9 +422,12 @@ class ManuscriptUploadExcel(ReaderImport):
                                 # This one is bad...
                                 oBad = dict(sheet=ws.title, row=row_num, column=col_num, coordinate=cell.coordinate, value=value)
                                 err_json.append(oBad)
+                        row_values.append(value)
                         col_num += 1
-
+                    lst_row.append(row_values)
                     row_num += 1
+                dict_rows[ws.title] = lst_row
+            wb.close()
 
             if len(err_json) > 0:
                 # We cannot process this one
@@ -400,27 +441,37 @@ class ManuscriptUploadExcel(ReaderImport):
                 code = "\n".join(html)
                 lst_err.append(code)
 
-            else:
-                # Do we have a manuscript worksheet?
-                if ws_manu != None:
-                    # Process the manuscript-proper details: columns Name and Value
-                    oManu = {}
-                    row_num = 1
-                    if ws_manu.cell(row=row_num, column=1).value.lower() == "field" and \
-                        ws_manu.cell(row=row_num, column=2).value.lower() == "value":
-                        # we can skip the first row
-                        row_num += 1
-                    bStop = False
-                    while not bStop:
-                        k = ws_manu.cell(row=row_num, column=1).value
-                        v = ws_manu.cell(row=row_num, column=2).value
-                        if k == "" or k == None:
-                            bStop = True
-                        else:
-                            row_num += 1
-                            k = k.lower()
-                            oManu[k] = v
-
+            # Do we have a manuscript worksheet?
+            elif ws_manu != None:
+                # Process the manuscript-proper details: columns Name and Value
+                lst_row = [x + [None, None] for x in dict_rows[ws_manu.title]]
+                oManu = {}
+                row_num = 0
+                if lst_row[0][0].lower() == "field" and lst_row[0][1].lower() == "value":
+                    # we can skip the first row
+                    row_num += 1
+                while row_num < len(lst_row):
+                    k = lst_row[row_num][0]
+                    v = lst_row[row_num][1]
+                    if k == "" or k == None:
+                        break
+                    row_num += 1
+                    oManu[k.lower()] = v
+
+                # Get the codicological units and the sermons
+                codico_list = None
+                if not ws_codico is None:
+                    lst_row = dict_rows[ws_codico.title]
+                    codico_list = get_items(lst_row, get_header(lst_row))
+                sermo_list = []
+                if not ws_sermo is None:
+                    lst_row = dict_rows[ws_sermo.title]
+                    sermo_list = get_items(lst_row, get_header(lst_row))
+
+                # ========== Phase 2: write everything in one transaction ===========
+                kwargs['bulk'] = ImportBulk()
+                lookup_mark = kwargs['lookup'].savepoint()
+                with transaction.atomic():
                     params = {}
 
                     # We have an object with key/value pairs: process it
@@ -431,7 +482,7 @@ class ManuscriptUploadExcel(ReaderImport):
 
                     # Process codicological unit - if it has been provided in the Excel
                     dict_codico = {}
-                    if ws_codico is None:
+                    if codico_list is None:
                         # No codicological info has been provided...
 
                         # Now get the codicological unit that has been automatically created and adapt it
@@ -444,129 +495,112 @@ class ManuscriptUploadExcel(ReaderImport):
 
                     else:
                         # We have codicological information!!!
-                        # Get the column names
-                        row_num = 1
-                        column = 1
-                        header = []
-                        v = ws_codico.cell(row=row_num, column=column).value
-                        while v != None and v != "" and v != "-":                                        
-                            header.append(v.lower())
-                            column += 1
-                            v = ws_codico.cell(row=row_num, column=column).value
-                        # Process the codico units in this sheet
-                        codico_list = []
-                        column = 1
-
-                        # Iterate over the rows
-                        for row in ws_codico.iter_rows():
-                            row_values = [x.value for x in row]
-                            v = row_values[0]
-                            if row_num > 1 and not v is None and v!= "":
-                                # Create a new codico object
-                                oCodico = {}
-                                # Process this row
-                                for idx, col_name in enumerate(header):
-                                    column = idx + 1
-                                    oCodico[col_name] = row_values[idx]
-                                # Process this sermon
-                                order = oCodico['order']
-                                oCodico['manuscript'] = manu
-                                codico = Codico.custom_add(oCodico, **kwargs)
-
-                                # Make sure there is a link between the codico order and the codico object
-                                dict_codico[str(order)] = codico
-                            # GO to the next row for the next sermon
-                            row_num += 1
+                        for oCodico in codico_list:
+                            order = oCodico['order']
+                            oCodico['manuscript'] = manu
+                            codico = Codico.custom_add(oCodico, **kwargs)
+
+                            # Make sure there is a link between the codico order and the codico object
+                            dict_codico[str(order)] = codico
 
                     oResult['count'] += 1
                     oResult['obj'] = manu
                     oResult['name'] = manu.idno
 
-                    # Check if there is a "Sermon" worksheet
-                    if ws_sermo != None:
-                        # Get the column names
-                        row_num = 1
-                        column = 1
-                        header = []
-                        v = ws_sermo.cell(row=row_num, column=column).value
-                        while v != None and v != "" and v != "-":                                        
-                            header.append(v.lower())
-                            column += 1
-                            v = ws_sermo.cell(row=row_num, column=column).value
-                        # Process the sermons in this sheet
-                        sermon_list = []
-                        column = 1
-
-                        # Iterate over the rows
-                        for row in ws_sermo.iter_rows():
-                            row_values = [x.value for x in row]
-                            v = None if len(row_values) ==0 else row_values[0]
-                            if row_num > 1 and not v is None and v!= "":
-                                # ==== DEBUG ====
-                                oErr.Status("Upload excel row_num={}".format(row_num))
-                                # ===============
-                                                
-                                # Create a new sermon object
-                                oSermon = {}
-                                # Process this row
-                                for idx, col_name in enumerate(header):
-                                    column = idx + 1
-                                    oSermon[col_name] = row_values[idx]
-
-                                # Get the codico that should be used
-                                codi_order = str(oSermon.get("codico", 1))
-                                codico = dict_codico[codi_order]
-                                # Process this sermon
-                                order = oSermon['order']
-                                sermon = SermonDescr.custom_add(oSermon, manu, codico, order, **kwargs)
-
-                                oResult['sermons'] += 1
-
-                                # Get parent, firstchild, next
-                                parent = oSermon['parent']
-                                firstchild = oSermon['firstchild']
-                                nextone = oSermon['next']
-                                # Add to list
-                                sermon_list.append({'order': order, 'parent': parent, 'firstchild': firstchild,
-                                                    'next': nextone, 'sermon': sermon})
-                            # GO to the next row for the next sermon
-                            row_num += 1
-
-                        # Now process the parent/firstchild/next items
-                        with transaction.atomic():
-                            for oSermo in sermon_list:
-                                # Get the p/f/n numbers
-                                parent_id = oSermo['parent']
-                                firstchild_id = oSermo['firstchild']
-                                next_id = oSermo['next']
-                                # Process parent
-                                if parent_id != '' and parent_id != None:
-                                    # parent_id = str(parent_id)
-                                    parent = next((obj['sermon'] for obj in sermon_list if obj['order'] == parent_id), None)
-                                    if not parent is None:
-                                        oSermo['sermon'].msitem.parent = parent.msitem
-                                        oSermo['sermon'].msitem.save()
-                                # Process firstchild
-                                if firstchild_id != '' and firstchild_id != None:
-                                    # firstchild_id = str(firstchild_id)
-                                    firstchild = next((obj['sermon'] for obj in sermon_list if obj['order'] == firstchild_id), None)
-                                    if not firstchild is None:
-                                        oSermo['sermon'].msitem.firstchild = firstchild.msitem
-                                        oSermo['sermon'].msitem.save()
-                                # Process next
-                                if next_id != '' and next_id != None:
-                                    # next_id = str(next_id)
-                                    nextone = next((obj['sermon'] for obj in sermon_list if obj['order'] == next_id), None)
-                                    if not nextone is None:
-                                        oSermo['sermon'].msitem.next = nextone.msitem
-                                        oSermo['sermon'].msitem.save()
+                    # Process the sermons
+                    sermon_list = []
+                    for oSermon in sermo_list:
+                        # Get the codico that should be used
+                        codi_order = str(oSermon.get("codico", 1))
+                        codico = dict_codico[codi_order]
+                        # Process this sermon
+                        order = oSermon['order']
+                        sermon = add_import_row(kwargs, lst_err, "{}, sermon {}".format(filename, order),
+                                                SermonDescr.custom_add, oSermon, manu, codico, order)
+                        if sermon is None:
+                            continue
+
+                        oResult['sermons'] += 1
+
+                        # Add to list
+                        sermon_list.append({'order': order, 'parent': oSermon['parent'], 'firstchild': oSermon['firstchild'],
+                                            'next': oSermon['next'], 'sermon': sermon})
+
+                    # Write the signatures and SSG links of the sermons
+                    kwargs['bulk'].write()
+
+                    # Now process the parent/firstchild/next items
+                    set_msitem_links(sermon_list)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("upload_one_excel")
             bResult = False
+            # The transaction has been rolled back: so must the objects it added to the lookup
+            if not lookup_mark is None:
+                kwargs['lookup'].rollback(lookup_mark)
         return bResult
 
 
+def add_import_row(kwargs, lst_err, sRow, add_func, *args):
+    """Call add_func(*args, **kwargs) for one row of an import, in a savepoint of its own
+
+    When the row fails, the savepoint is rolled back and so are the objects that the
+    row added to kwargs['lookup'] and kwargs['bulk']: the row is reported in [lst_err]
+    and skipped (returning None), and the rest of the import goes on.
+    NOTE: a database error that add_func() handles itself still ends the savepoint with
+          an error (the transaction has been aborted), so that it is rolled back as well.
+    """
+
+    oErr = ErrHandle()
+    obj = None
+    lookup = kwargs['lookup']
+    bulk = kwargs['bulk']
+    lookup_mark = lookup.savepoint()
+    bulk_mark = bulk.savepoint()
+    try:
+        with transaction.atomic():
+            obj = add_func(*args, **kwargs)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("add_import_row")
+        lookup.rollback(lookup_mark)
+        bulk.rollback(bulk_mark)
+        lst_err.append("Skipped {}: {}".format(sRow, msg))
+        obj = None
+    return obj
+
+
+def set_msitem_links(sermon_list):
+    """Set the parent, firstchild and next MsItem of the sermons in [sermon_list]
+
+    Each item in [sermon_list] has the sermon and the 'order' numbers of its parent,
+    firstchild and next sermon (or None).
+    """
+
+    # Order number => MsItem (the first sermon with that order)
+    dict_msitem = {}
+    for oSermo in sermon_list:
+        if not oSermo['sermon'] is None and not oSermo['order'] in dict_msitem:
+            dict_msitem[oSermo['order']] = oSermo['sermon'].msitem
+
+    lst_update = []
+    for oSermo in sermon_list:
+        if not oSermo['sermon'] is None:
+            msitem = oSermo['sermon'].msitem
+            bChanged = False
+            for field in ['parent', 'firstchild', 'next']:
+                order = oSermo[field]
+                if order != '' and order != None:
+                    target = dict_msitem.get(order)
+                    if not target is None:
+                        setattr(msitem, field, target)
+                        bChanged = True
+            if bChanged:
+                lst_update.append(msitem)
+    if len(lst_update) > 0:
+        MsItem.objects.bulk_update(lst_update, ['parent', 'firstchild', 'next'])
+    return len(lst_update)
+
 
 class ManuscriptUploadJson(ReaderImport):
     import_type = "json"
@@ -642,6 +676,8 @@ class ManuscriptUploadJson(ReaderImport):
             profile = Profile.get_user_profile(username)
             team_group = app_editor
             kwargs = {'profile': profile, 'username': username, 'team_group': team_group, 'keyfield': 'path', 'source': source}
+            # Names and codes of authors, keywords etc are looked up in memory, for all files together
+            kwargs['lookup'] = ImportLookup()
 
             # Get the contents of the imported file
             files = request.FILES.getlist('files_field')
@@ -696,6 +732,7 @@ class ManuscriptUploadJson(ReaderImport):
 
                             # Make sure we pass the sourcetype on to Manuscript.custom_add()
                             kwargs['sourcetype'] = sourcetype
+                            kwargs['bulk'] = ImportBulk()
 
                             # Walk through the manuscripts
                             for idx, oManu in enumerate(lst_manu):
@@ -777,58 +814,43 @@ class ManuscriptUploadJson(ReaderImport):
                                     oResult['obj'] = manu
                                     oResult['name'] = manu.idno
 
-                                    # Process all the MsItems into a list of sermons
-                                    sermon_list = []
-                                    for oMsItem in oManu['msitems']:
-                                        # Get the sermon object
-                                        oSermon = oMsItem['sermon']
-                                        order = oMsItem['order']
+                                    # The sermons of one manuscript are written in one transaction
+                                    with transaction.atomic():
+                                        # Process all the MsItems into a list of sermons
+                                        sermon_list = []
+                                        for oMsItem in oManu['msitems']:
+                                            # Get the sermon object
+                                            oSermon = oMsItem['sermon']
+                                            order = oMsItem['order']
 
-                                        # Make sure the stype is set to "imported"
-                                        oSermon['stype'] = "imp"
+                                            # Make sure the stype is set to "imported"
+                                            oSermon['stype'] = "imp"
 
-                                        sermon = SermonDescr.custom_add(oSermon, manu, codico, order, **kwargs)
+                                            sermon = add_import_row(kwargs, lst_msg, "{}, sermon {}".format(manu.idno, order),
+                                                                    SermonDescr.custom_add, oSermon, manu, codico, order)
+                                            if sermon is None:
+                                                continue
 
-                                        # Keep track of the number of sermons read
-                                        oResult['sermons'] += 1
+                                            # Keep track of the number of sermons read
+                                            oResult['sermons'] += 1
 
-                                        # Some sourcetype specific processing of SERMON
+                                            # Some sourcetype specific processing of SERMON
 
 
-                                        # Get parent, firstchild, next
-                                        parent = oMsItem['parent']
-                                        firstchild = oMsItem['firstchild']
-                                        nextone = oMsItem['next']
+                                            # Get parent, firstchild, next
+                                            parent = oMsItem['parent']
+                                            firstchild = oMsItem['firstchild']
+                                            nextone = oMsItem['next']
 
-                                        # Add to list
-                                        sermon_list.append({'order': order, 'parent': parent, 'firstchild': firstchild,
-                                                            'next': nextone, 'sermon': sermon})
+                                            # Add to list
+                                            sermon_list.append({'order': order, 'parent': parent, 'firstchild': firstchild,
+                                                                'next': nextone, 'sermon': sermon})
 
-                                    # Now process the parent/firstchild/next items
-                                    with transaction.atomic():
-                                        for oSermo in sermon_list:
-                                            # Get the p/f/n numbers
-                                            parent_id = oSermo['parent']
-                                            firstchild_id = oSermo['firstchild']
-                                            next_id = oSermo['next']
-                                            # Process parent
-                                            if parent_id != '' and parent_id != None:
-                                                # parent_id = str(parent_id)
-                                                parent = next((obj['sermon'] for obj in sermon_list if obj['order'] == parent_id), None)
-                                                oSermo['sermon'].msitem.parent = parent.msitem
-                                                oSermo['sermon'].msitem.save()
-                                            # Process firstchild
-                                            if firstchild_id != '' and firstchild_id != None:
-                                                # firstchild_id = str(firstchild_id)
-                                                firstchild = next((obj['sermon'] for obj in sermon_list if obj['order'] == firstchild_id), None)
-                                                oSermo['sermon'].msitem.firstchild = firstchild.msitem
-                                                oSermo['sermon'].msitem.save()
-                                            # Process next
-                                            if next_id != '' and next_id != None:
-                                                # next_id = str(next_id)
-                                                nextone = next((obj['sermon'] for obj in sermon_list if obj['order'] == next_id), None)
-                                                oSermo['sermon'].msitem.next = nextone.msitem
-                                                oSermo['sermon'].msitem.save()
+                                        # Write the signatures and SSG links of the sermons
+                                        kwargs['bulk'].write()
+
+                                        # Now process the parent/firstchild/next items
+                                        set_msitem_links(sermon_list)
 
                                     # Append this result
                                     lResults.append(oResult)
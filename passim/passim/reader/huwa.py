@@ -0,0 +1,215 @@
+"""
+Streaming access to the HUWA database.
+
+The HUWA database (a SQLite file in the media directory) is the source of the
+HUWA conversions (see EqualGoldHuwaToJson and the huwa adaptations). Instead of
+reading every table into memory, the HuwaReader gives access to the tables that
+are asked for:
+
+- iterating over a HuwaTable reads its rows one at a time from a cursor
+- looking up rows by the value of a field (e.g. all [clavis] rows of an opera)
+  runs an SQL query that uses the lookup index
+- iter_opera() yields each opera together with its rows in other tables
+
+The lookup index is a separate SQLite file in the writable directory, so that the
+HUWA database itself is only read. Per (table, field) it holds the value and the
+rowid of each row. It is made once, when a field is first looked up, and kept
+until the HUWA database changes, so that the next conversion can use it right away.
+"""
+
+import os
+import sqlite3
+
+from passim.settings import MEDIA_DIR, WRITABLE_DIR
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+
+
+HUWA_DB = os.path.abspath(os.path.join(MEDIA_DIR, "passim", "huwa_database_for_PASSIM.db"))
+HUWA_INDEX = os.path.abspath(os.path.join(WRITABLE_DIR, "huwa_lookup.idx"))
+
+
+class HuwaTable():
+    """One table of the HUWA database: its rows are read when they are needed"""
+
+    def __init__(self, reader, name):
+        self.reader = reader
+        self.name = name
+        self.fields = reader.get_fields(name)
+
+    def __iter__(self):
+        sql = 'SELECT * FROM main."{}" ORDER BY rowid'.format(self.name)
+        return self.reader.iter_rows(sql, self.fields)
+
+    def __len__(self):
+        sql = 'SELECT COUNT(*) FROM main."{}"'.format(self.name)
+        return self.reader.db.execute(sql).fetchone()[0]
+
+    def get_items(self, sField, value):
+        """Get all rows where [sField] equals [value], in table order"""
+
+        if self.reader.is_rowid(self.name, sField):
+            sql = 'SELECT * FROM main."{}" WHERE rowid = ?'.format(self.name)
+        else:
+            sIndex = self.reader.ensure_index(self.name, sField)
+            sql = 'SELECT t.* FROM main."{}" t WHERE t.rowid IN (SELECT rid FROM idx."{}" WHERE value = ?) ' \
+                  'ORDER BY t.rowid'.format(self.name, sIndex)
+        return list(self.reader.iter_rows(sql, self.fields, (value,)))
+
+    def get_item(self, sField, value):
+        """Get the first row where [sField] equals [value] (or None)"""
+
+        lst_item = self.get_items(sField, value)
+        return lst_item[0] if len(lst_item) > 0 else None
+
+
+class HuwaReader():
+    """Read-only connection to the HUWA database, with the lookup index attached"""
+
+    def __init__(self, huwa_db=HUWA_DB, index_db=HUWA_INDEX):
+        self.huwa_db = huwa_db
+        self.index_db = index_db
+        self.db = None
+        self.fields = {}
+        self.pks = {}
+        self.tables = []
+
+    def open(self):
+        oErr = ErrHandle()
+        try:
+            # The HUWA database is opened read-only; the lookup index is writable
+            # NOTE: wait for another process that is filling the index (see ensure_index)
+            self.db = sqlite3.connect("file:{}?mode=ro".format(self.huwa_db), uri=True, timeout=300)
+            self.db.execute("ATTACH DATABASE ? AS idx", (self.index_db,))
+            self.tables = [x[0] for x in self.db.execute(
+                "SELECT name FROM main.sqlite_master WHERE type='table';").fetchall()]
+            self.check_index()
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("HuwaReader/open")
+            self.close()
+        return self
+
+    def close(self):
+        if not self.db is None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def check_index(self):
+        """Make sure the lookup index belongs to the current HUWA database"""
+
+        stat = os.stat(self.huwa_db)
+        source = "{}:{}".format(stat.st_size, stat.st_mtime)
+        # NOTE: other processes may open the same index: check and renew it in one write transaction
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.execute("CREATE TABLE IF NOT EXISTS idx.huwa_source (source TEXT)")
+            row = self.db.execute("SELECT source FROM idx.huwa_source").fetchone()
+            if row is None or row[0] != source:
+                # The HUWA database has changed: start a new index
+                lst_old = [x[0] for x in self.db.execute(
+                    "SELECT name FROM idx.sqlite_master WHERE type='table' AND name <> 'huwa_source'").fetchall()]
+                for sName in lst_old:
+                    self.db.execute('DROP TABLE IF EXISTS idx."{}"'.format(sName))
+                self.db.execute("DELETE FROM idx.huwa_source")
+                self.db.execute("INSERT INTO idx.huwa_source (source) VALUES (?)", (source,))
+            self.db.commit()
+        except:
+            self.db.rollback()
+            raise
+
+    def get_fields(self, table_name):
+        """Get the names of the fields of [table_name]"""
+
+        lFields = self.fields.get(table_name)
+        if lFields is None:
+            db_results = self.db.execute("PRAGMA main.table_info('{}')".format(table_name)).fetchall()
+            lFields = [x[1] for x in db_results]
+            # An INTEGER PRIMARY KEY is the rowid itself
+            lPk = [x[1] for x in db_results if x[5] > 0]
+            if len(lPk) == 1 and [x[2].upper() for x in db_results if x[5] > 0][0] == "INTEGER":
+                self.pks[table_name] = lPk[0]
+            self.fields[table_name] = lFields
+        return lFields
+
+    def is_rowid(self, table_name, sField):
+        self.get_fields(table_name)
+        return self.pks.get(table_name) == sField
+
+    def ensure_index(self, table_name, sField):
+        """Make sure the lookup index has (table_name, sField), and return its name"""
+
+        sIndex = "{}__{}".format(table_name, sField)
+        exists = self.db.execute("SELECT 1 FROM idx.sqlite_master WHERE type='table' AND name = ?",
+                                 (sIndex,)).fetchone()
+        if exists is None:
+            # NOTE: another process may be creating the same index: create and fill it in one
+            #       write transaction, and only fill it when nobody did so before us
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                exists = self.db.execute("SELECT 1 FROM idx.sqlite_master WHERE type='table' AND name = ?",
+                                         (sIndex,)).fetchone()
+                if exists is None:
+                    # The index is filled by SQLite directly from the HUWA table
+                    self.db.execute('CREATE TABLE IF NOT EXISTS idx."{}" (value, rid INTEGER)'.format(sIndex))
+                    self.db.execute('INSERT INTO idx."{}" (value, rid) SELECT "{}", rowid FROM main."{}"'.format(
+                        sIndex, sField, table_name))
+                    self.db.execute('CREATE INDEX IF NOT EXISTS idx."{}_value" ON "{}" (value)'.format(sIndex, sIndex))
+                self.db.commit()
+            except:
+                self.db.rollback()
+                raise
+        return sIndex
+
+    def iter_rows(self, sql, lFields, params=()):
+        """Yield the rows of [sql] as dictionaries, one at a time"""
+
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                lst_row = cursor.fetchmany(1000)
+                if len(lst_row) == 0:
+                    break
+                for row in lst_row:
+                    yield dict(zip(lFields, row))
+        finally:
+            cursor.close()
+
+    def get_table(self, table_name):
+        return HuwaTable(self, table_name)
+
+    def get_tables(self, lst_names):
+        """Get the tables in [lst_names] by name"""
+
+        oErr = ErrHandle()
+        oTables = {}
+        for sName in lst_names:
+            if sName in self.tables:
+                oTables[sName] = self.get_table(sName)
+            else:
+                oErr.Status("HuwaReader: there is no table [{}]".format(sName))
+        return oTables
+
+    def iter_opera(self, lst_names, offset=0):
+        """Yield (opera, rows) for each opera, where rows has the rows of each table in [lst_names] for that opera
+
+        The opera are yielded in table order; with [offset] the first ones are skipped,
+        so that a conversion that was interrupted can be resumed.
+        """
+
+        opera = self.get_table("opera")
+        lst_table = [self.get_table(sName) for sName in lst_names]
+        sql = 'SELECT * FROM main."opera" ORDER BY rowid LIMIT -1 OFFSET ?'
+        for oOpera in self.iter_rows(sql, opera.fields, (offset,)):
+            oRows = {}
+            for table in lst_table:
+                oRows[table.name] = table.get_items("opera", oOpera['id'])
+            yield oOpera, oRows
@@ -0,0 +1,247 @@
+"""
+Lookup tables and bulk writing for importing manuscripts and sermons.
+
+Verifying or importing an Excel (or JSON) upload means looking up authors,
+keywords, feasts, signatures, datasets and SSGs by name or code for every
+sermon row. The ImportLookup reads each table that is needed with one query,
+and then answers all of these lookups from memory.
+
+The lookups behave like cls.objects.filter(**{field: value}).first() (with
+'iexact' unless exact=True): when more objects match, the first one in the
+default order of the model is returned.
+
+Both can be rolled back to a savepoint(), when the part of the import that
+added to them has been rolled back in the database (see add_import_row).
+
+The ImportBulk collects the signatures and SSG links of the imported sermons,
+and writes them with bulk_create at the end of the import. The siglist of each
+sermon is then calculated once, and the post_save signal is sent for every SSG
+link, so that its receivers (the scount of the SSG, the collection overlaps, the
+setlists) see all new links.
+"""
+
+from django.apps import apps
+from django.db.models.signals import post_save
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+
+
+class ImportLookup():
+    """In-memory lookup of seeker objects by name or code, one query per table"""
+
+    # Tables that are large: only read the fields that are needed for importing
+    only_fields = {
+        "Signature": dict(related=['gold'], fields=['id', 'code', 'editype', 'gold__id', 'gold__equal_id']),
+        "EqualGold": dict(related=[], fields=['id', 'code']),
+        }
+
+    def __init__(self):
+        # (model name, field, exact) => {value: object}
+        self.tables = {}
+        # Model name => list of objects
+        self.objects = {}
+        # The objects that have been created during the import (see add)
+        self.added = []
+
+    def get_model(self, cls):
+        if isinstance(cls, str):
+            cls = apps.get_model("seeker", cls)
+        return cls
+
+    def get_objects(self, cls):
+        """Get all objects of [cls] in their default order (one query)"""
+
+        sName = cls.__name__
+        lst_obj = self.objects.get(sName)
+        if lst_obj is None:
+            qs = cls.objects.all()
+            if not cls._meta.ordering:
+                qs = qs.order_by('pk')
+            oOnly = self.only_fields.get(sName)
+            if not oOnly is None:
+                qs = qs.select_related(*oOnly['related']).only(*oOnly['fields'])
+            lst_obj = list(qs)
+            self.objects[sName] = lst_obj
+        return lst_obj
+
+    def get_key(self, value, exact):
+        if value is None:
+            return None
+        sValue = str(value)
+        return sValue if exact else sValue.lower()
+
+    def get_table(self, cls, field, exact):
+        table_key = (cls.__name__, field, exact)
+        table = self.tables.get(table_key)
+        if table is None:
+            table = {}
+            for obj in self.get_objects(cls):
+                key = self.get_key(getattr(obj, field), exact)
+                if not key is None and not key in table:
+                    table[key] = obj
+            self.tables[table_key] = table
+        return table
+
+    def get(self, cls, value, field="name", exact=False):
+        """Get the first object of [cls] whose [field] matches [value] (case-insensitive, unless [exact])"""
+
+        obj = None
+        oErr = ErrHandle()
+        try:
+            if not value is None:
+                cls = self.get_model(cls)
+                obj = self.get_table(cls, field, exact).get(self.get_key(value, exact))
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("ImportLookup/get")
+        return obj
+
+    def get_signature(self, code, editype=None, exact=False):
+        """Get the first signature with [code] (and with [editype], if specified)"""
+
+        obj = None
+        oErr = ErrHandle()
+        try:
+            if editype is None:
+                obj = self.get("Signature", code, "code", exact)
+            elif not code is None:
+                cls = self.get_model("Signature")
+                table_key = (cls.__name__, "code+editype", exact)
+                table = self.tables.get(table_key)
+                if table is None:
+                    table = {}
+                    for sig in self.get_objects(cls):
+                        key = (self.get_key(sig.code, exact), sig.editype)
+                        if not key in table:
+                            table[key] = sig
+                    self.tables[table_key] = table
+                obj = table.get((self.get_key(code, exact), editype))
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("ImportLookup/get_signature")
+        return obj
+
+    def add(self, obj):
+        """Make a newly created object available for the lookups"""
+
+        sName = obj.__class__.__name__
+        if sName in self.objects:
+            self.objects[sName].append(obj)
+        for (sModel, field, exact), table in self.tables.items():
+            if sModel == sName:
+                if field == "code+editype":
+                    key = (self.get_key(obj.code, exact), obj.editype)
+                else:
+                    key = self.get_key(getattr(obj, field), exact)
+                if not key is None and not key in table:
+                    table[key] = obj
+        self.added.append(obj)
+
+    def savepoint(self):
+        return len(self.added)
+
+    def rollback(self, mark):
+        """Forget the objects added since [mark]: their creation has been rolled back"""
+
+        lst_drop = set(id(x) for x in self.added[mark:])
+        del self.added[mark:]
+        if len(lst_drop) > 0:
+            for sName, lst_obj in self.objects.items():
+                self.objects[sName] = [x for x in lst_obj if not id(x) in lst_drop]
+            for table in self.tables.values():
+                for key in [k for k, v in table.items() if id(v) in lst_drop]:
+                    table.pop(key)
+
+
+class ImportBulk():
+    """Signatures and SSG links of imported sermons, to be written with bulk_create"""
+
+    def __init__(self):
+        self.signatures = []
+        self.equals = []
+        # (sermon id, SSG id) of the links in [equals]
+        self.equal_keys = set()
+        # Sermons that have been created during this import
+        self.new_sermons = set()
+        # Sermon id => sermon
+        self.sermons = {}
+
+    def add_sermon(self, sermon):
+        """Note that [sermon] has just been created: it has no links in the database yet"""
+
+        self.new_sermons.add(sermon.id)
+
+    def add_signature(self, sermon, code, gsig, editype):
+        """Add a manual signature to [sermon]"""
+
+        SermonSignature = apps.get_model("seeker", "SermonSignature")
+        obj = SermonSignature(code=code, gsig=gsig, sermon=sermon, editype=editype)
+        obj.do_codesort(do_saving=False)
+        self.signatures.append(obj)
+        self.sermons[sermon.id] = sermon
+        return obj
+
+    def add_equal(self, sermon, ssg, linktype):
+        """Link [sermon] to [ssg], unless that link already exists"""
+
+        SermonDescrEqual = apps.get_model("seeker", "SermonDescrEqual")
+        key = (sermon.id, ssg.id)
+        if key in self.equal_keys:
+            return None
+        if not sermon.id in self.new_sermons and \
+           SermonDescrEqual.objects.filter(sermon=sermon, super=ssg).exists():
+            return None
+        obj = SermonDescrEqual(sermon=sermon, manu_id=sermon.msitem.manu_id, super=ssg, linktype=linktype)
+        self.equal_keys.add(key)
+        self.equals.append(obj)
+        self.sermons[sermon.id] = sermon
+        return obj
+
+    def savepoint(self):
+        return (len(self.signatures), len(self.equals))
+
+    def rollback(self, mark):
+        """Forget the objects collected since [mark]: their sermons have been rolled back"""
+
+        iSignatures, iEquals = mark
+        for obj in self.equals[iEquals:]:
+            self.equal_keys.discard((obj.sermon_id, obj.super_id))
+        del self.signatures[iSignatures:]
+        del self.equals[iEquals:]
+        lst_keep = set(x.sermon_id for x in self.signatures + self.equals)
+        self.sermons = {k: v for k, v in self.sermons.items() if k in lst_keep}
+
+    def write(self):
+        """Write all collected objects, and do what their save() would have done"""
+
+        oErr = ErrHandle()
+        try:
+            SermonSignature = apps.get_model("seeker", "SermonSignature")
+            SermonDescrEqual = apps.get_model("seeker", "SermonDescrEqual")
+            SermonDescr = apps.get_model("seeker", "SermonDescr")
+
+            if len(self.signatures) > 0:
+                SermonSignature.objects.bulk_create(self.signatures)
+            if len(self.equals) > 0:
+                SermonDescrEqual.objects.bulk_create(self.equals)
+
+                # bulk_create() sends no signals: the receivers (the scount of the SSG, the overlaps
+                #   of its collections, the setlists of the manuscript...) need every link
+                for obj in self.equals:
+                    post_save.send(sender=SermonDescrEqual, instance=obj, created=True, update_fields=None, raw=False)
+
+            # The siglist of each sermon with new signatures or links (see SermonDescr.do_signatures)
+            for sermon in self.sermons.values():
+                siglist = sermon.get_eqsetsignatures_markdown(type='combi', plain=True)
+                if siglist != sermon.siglist:
+                    sermon.siglist = siglist
+                    SermonDescr.objects.filter(id=sermon.id).update(siglist=siglist)
+
+            self.signatures = []
+            self.equals = []
+            self.equal_keys = set()
+            self.sermons = {}
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("ImportBulk/write")
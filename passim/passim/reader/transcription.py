@@ -0,0 +1,185 @@
+"""
+Parsing of sermon transcriptions (XML in TEI-P5 format) for the READER app.
+
+The functions here do not use the database, so that the scanner can have many
+transcription files parsed at the same time by a pool of worker processes.
+Finding the EqualGold for a transcription is done by the caller.
+"""
+
+import hashlib
+import os
+import lxml.etree as ET
+
+# ======= imports from my own application ======
+from passim.basic.utils import ErrHandle
+
+
+def process_para(item, html, info):
+    """Process (possibly recursively) a paragraph that may include elements like <w> and <quote>
+
+    Added: it may also have element <s>
+    """
+
+    oErr = ErrHandle()
+    bResult = True
+    local = []
+    try:
+        # Walk all elements
+        if not item is None:
+            for element in item.xpath("./child::*"):
+                tag = element.tag
+                attrib = element.attrib
+                if tag == "w":
+                    # This is a word 
+                    local.append(element.text)
+                    # Check if this is punctuation or not
+                    if attrib.get("pos", "").lower() == "punc":
+                        # It is punctuation - any action?
+                        pass
+                    else:
+                        # Keep track of wordcount
+                        info['wordcount'] += 1
+                elif tag == "quote":
+                    # This is a quote: get the @source attribute and the @n
+                    quote_n = attrib.get('n', '*')
+                    quote_source = attrib.get('source', '')
+                    quote = []
+                    for quote_el in element.xpath("./child::*"):
+                        if quote_el.tag == "w":
+                            quote.append(quote_el.text)
+                    sQuoteBody = " ".join(quote)
+                    sQuote = '<span class="fullquote" title="{}. {}: {}" >{}</span>'.format(
+                        quote_n, quote_source, sQuoteBody, quote_n )
+                    local.append(sQuote)
+                elif tag == "s":
+                    # This is a <s> sentence definition that may contain <w> and <quote> elements
+                    process_para(element, html, info)
+            sPara = " ".join(local)
+            html.append(sPara)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("process_para")
+        bResult = False
+    return bResult
+
+def get_titles(docroot):
+    sGr = ""
+    sCl = ""
+    sPassim = ""
+    biblerefs = ""
+    method = "bible_order"  # Following the Bible bk/ch/vs order
+    method = "given_order"  # Following the order made by the XML manuscript
+
+    # Get the PASSIM code
+    ítem_passim = docroot.xpath("//title[@type='passim']")
+    if len(ítem_passim) > 0:
+        sPassim = ítem_passim[0].text
+    # Get a possible GRYSON code
+    ítem_gr = docroot.xpath("//title[@type='gr']")
+    if len(ítem_gr) > 0:
+        sGr = ítem_gr[0].text
+    # Get a possible CLAVIS code
+    ítem_cl = docroot.xpath("//title[@type='cl']")
+    if len(ítem_cl) > 0:
+        sCl = ítem_cl[0].text
+    # Get list of bible references
+    bibitems = docroot.xpath("//keywords[@scheme='bible']/descendant::item")
+    if len(bibitems) > 0:
+        lst_ref = []
+        for bibitem in bibitems:
+            sText = bibitem.text
+            if not sText is None and sText != "":
+                lst_ref.append(sText.replace("_", " "))
+        if method == "bible_order":
+            # Return them in a sorted unique list that can readily be processed
+            biblerefs = "; ".join(sorted(set(lst_ref)))
+        else:
+            biblerefs = "; ".join(lst_ref)
+
+    return sPassim, sGr, sCl, biblerefs
+
+
+def get_file_hash(data_file):
+    """Get the SHA-1 hash of the contents of a file"""
+
+    oHash = hashlib.sha1()
+    with open(data_file, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b""):
+            oHash.update(chunk)
+    return oHash.hexdigest()
+
+def parse_transcription(data_file):
+    """Parse one transcription file into a dictionary
+    
+    This approach makes use of *lxml*. The dictionary contains the titles (code, gr, cl),
+    the biblerefs, the text in markdown and the wordcount.
+    """
+
+    oErr = ErrHandle()
+    oBack = {'status': 'ok', 'msg': "", 'filename': data_file, 'code': "", 'gr': "", 'cl': ""}
+    try:
+        # Read and parse the data into a DOM element
+        xmldoc = ET.parse(data_file)  
+        oBack['change_time'] = os.path.getmtime(data_file)
+
+        # Get the root
+        root = xmldoc.getroot()
+
+        # Clean up the namespace
+        for elem in root.iter():
+            if not (isinstance(elem, ET._Comment) or isinstance(elem, ET._ProcessingInstruction)):
+                elem.tag = ET.QName(elem).localname
+        ET.cleanup_namespaces(root)
+
+        # Get the titles: Passim, GR, CL
+        title_passim, title_gr, title_cl, biblerefs = get_titles(root)
+        oBack['code'] = title_passim
+        oBack['gr'] = title_gr
+        oBack['cl'] = title_cl
+        oBack['biblerefs'] = biblerefs
+        if title_passim != "" or title_gr != "" or title_cl != "":
+
+            # Get the list of sermon elements
+            html = []
+            info = dict(wordcount=0)
+            sermon_items = root.xpath("//div[@type='sermon']/child::*")
+            for sermon_item in sermon_items:
+                tag = sermon_item.tag
+                attrib = sermon_item.attrib
+                if tag == "head":
+                    # This is one head at this moment
+                    headtype = attrib.get('type', '')
+                    level = "##" if headtype == "title" else "###"
+                    html.append("{} {}".format(level, sermon_item.text))
+                elif tag == "div" and attrib.get("type", "") == "paragraph":
+                    # Paragraph: add a newline
+                    html.append("")
+                    # This is a paragraph, that contains <head> and <p>
+                    for subitem in sermon_item.xpath("./child::*"):
+                        if subitem.tag == "head":
+                            # This is another level head
+                            html.append("#### {}".format(subitem.text))
+                        elif subitem.tag == "p":
+                            # This is a paragraph containing words and quotes
+                            process_para(subitem, html, info)
+                elif tag == "div" and attrib.get("type", "") == "chapter":
+                    # This is a new chapter, which can contain <head> and <p>
+                    html.append("")
+                    # This is a paragraph, that contains <head> and <p>
+                    for subitem in sermon_item.xpath("./child::*"):
+                        if subitem.tag == "head":
+                            # This is another level head
+                            html.append("#### {}".format(subitem.text))
+                        elif subitem.tag == "p":
+                            # This is a paragraph containing words and quotes
+                            process_para(subitem, html, info)
+
+            # Okay, we found all the elements
+            oBack['text'] = "\n".join(html)
+            oBack['wordcount'] = info.get("wordcount", 0)
+    except:
+        oBack['status'] = 'error'
+        oBack['msg'] = oErr.get_error_message()
+
+    # Return the object that has been created
+    return oBack
@@ -9,6 +9,7 @@ from django.contrib.auth.models import Group, User
 from django.urls import reverse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import transaction
+from django.core.cache import cache
 from django.db.models import Q, Prefetch, Count, F
 from django.db.models.functions import Lower
 from django.db.models.query import QuerySet 
@@ -30,6 +31,8 @@ from operator import itemgetter
 from functools import reduce
 from time import sleep 
 import fnmatch, copy
+from concurrent.futures import ProcessPoolExecutor
+from threading import Thread
 import sys, os
 import base64
 import json
@@ -60,10 +63,20 @@ from passim.seeker.models import Manuscript, SermonDescr, Status, SourceInfo, Ma
     Script, Scribe, SermonGoldExternal, SermonGoldKeyword, SermonDescrExternal, Codico, SermonDescrEqual, \
     Report, Keyword, ManuscriptKeyword, ManuscriptExternal, City, Country, ManuscriptProject, STYPE_IMPORTED, get_current_datetime, EXTERNAL_HUWA_OPERA
 from passim.reader.models import Edition, Literatur
+from passim.reader.huwa import HuwaReader, HuwaTable
+from passim.seeker.counters import update_counters
+from passim.reader.transcription import parse_transcription, get_file_hash
 
 # ======= from RU-Basic ========================
 from passim.basic.views import BasicList, BasicDetails, BasicPart
 
+# Scanning of transcription files
+SCAN_MANIFEST = os.path.join(WRITABLE_DIR, "transcription_manifest.json")
+SCAN_BUSY_KEY = "passim_scan_transcriptions"
+SCAN_TIMEOUT = 6 * 3600     # Seconds after which a scan that did not finish is forgotten
+SCAN_POOL_MIN = 8           # Fewer changed files than this are parsed without a process pool
+                            #   (a pool is only used outside web requests: see transcriptions_scan)
+
 # =================== This is imported by seeker/views.py ===============
 # OLD METHODS
 #reader_uploads = [
@@ -2131,8 +2144,74 @@ def sync_transcriptions(oStatus):
         bResult = False
     return bResult, msg
 
-def scan_transcriptions(oStatus=None, oMsg=None):
-    """Scan the agreed-upon server location for (new) transcription files"""
+def load_scan_manifest():
+    """Load the manifest of transcription files: path => dict(mtime, size, hash, done)"""
+
+    oErr = ErrHandle()
+    oBack = {}
+    try:
+        if os.path.exists(SCAN_MANIFEST):
+            with open(SCAN_MANIFEST, "r", encoding="utf-8") as fp:
+                oBack = json.load(fp)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("load_scan_manifest")
+    return oBack
+
+def save_scan_manifest(oManifest):
+    """Write the manifest of transcription files (atomically)"""
+
+    oErr = ErrHandle()
+    try:
+        tmpname = "{}.{}.tmp".format(SCAN_MANIFEST, os.getpid())
+        with open(tmpname, "w", encoding="utf-8") as fp:
+            json.dump(oManifest, fp)
+        os.replace(tmpname, SCAN_MANIFEST)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("save_scan_manifest")
+
+def parse_transcriptions(lst_file, use_pool=False):
+    """Parse the transcription files in [lst_file], with [use_pool] using a pool of processes if there are many
+
+    A web request (or a thread started by one) must not start a process pool: it parses serially.
+    """
+
+    oErr = ErrHandle()
+    lBack = None
+    if use_pool and len(lst_file) >= SCAN_POOL_MIN:
+        try:
+            with ProcessPoolExecutor() as executor:
+                lBack = list(executor.map(parse_transcription, lst_file, chunksize=8))
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("parse_transcriptions")
+    if lBack is None:
+        lBack = [parse_transcription(x) for x in lst_file]
+    return lBack
+
+def start_scan_transcriptions():
+    """Start scan_transcriptions() in a thread, if it is time and no scan is running yet"""
+
+    oErr = ErrHandle()
+    try:
+        next_time = Information.get_kvalue("next_stemma")
+        now_time = str(get_current_datetime())
+        if (next_time is None or now_time > next_time) and cache.get(SCAN_BUSY_KEY) is None:
+            thread = Thread(target=scan_transcriptions)
+            thread.start()
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("start_scan_transcriptions")
+
+def scan_transcriptions(oStatus=None, oMsg=None, use_pool=False):
+    """Scan the agreed-upon server location for (new) transcription files
+
+    Only files that are new or whose contents changed since the last scan (see the manifest)
+    are parsed. At most one scan runs at a time (over all processes). An error in one file
+    does not stop the scan: that file is tried again next time.
+    With [use_pool] many files are parsed in a pool of processes (see transcriptions_scan).
+    """
 
     def info_differs(sCurrentInfo, oNewInfo):
         """Compare the current with the new information on particular fields"""
@@ -2155,6 +2234,7 @@ def scan_transcriptions(oStatus=None, oMsg=None):
     bResult = True
     SCAN_SUBDIR = "pasta/pasta/*.xml"
     SCAN_SUBDIR = "chocolate/pasta/xml_tei_src/*.xml"
+    bLocked = False
     try:
         # Check if this needs doing
         next_time = Information.get_kvalue("next_stemma")
@@ -2163,50 +2243,66 @@ def scan_transcriptions(oStatus=None, oMsg=None):
         rightnow = (not oStatus is None)
 
         if rightnow or next_time is None or now_time > next_time:
+            # Make sure no other scan is running
+            bLocked = cache.add(SCAN_BUSY_KEY, now_time, SCAN_TIMEOUT)
+            if not bLocked:
+                if not oMsg is None:
+                    oMsg['msg'] = "Another scan for transcriptions is running"
+                return False
+
             print("It is time to scan for new transcriptions...")
-            # (1) Now execute the scanning
+            # (1) Find the files that are new or have changed
             scan_dir = os.path.abspath(os.path.join(MEDIA_DIR, SCAN_SUBDIR))
             lst_xml = glob.glob(scan_dir)
             iTotal = len(lst_xml)
-            iCount = 0
-            for sFile in lst_xml:
-                iCount += 1
+            oManifest = load_scan_manifest()
+            lst_changed = []
+            for iCount, sFile in enumerate(lst_xml):
                 # If necessary, provide Status information
                 if not oStatus is None:
-                    oCount = dict(total=iTotal, current=iCount)
+                    oCount = dict(total=iTotal, current=iCount+1)
                     oStatus.set("verifying", oCount=oCount)
 
-                # print("Looking at: [{}]".format(sFile))
-
-                # ===== Debugging ===
-                if "cae_s_177" in sFile.lower():
-                    iStop = 1
-
-                # Treat this file
-                oTrans = read_transcription(sFile)
-                status = oTrans.get("status")
-                code = oTrans.get("code")
-                equal_id = oTrans.get('equal_id') 
-                obj = None
-                if status == "ok" and not code is None:
-                    # It has been read and needs to be added
-                    text_sermon = oTrans.get("text")
-                    bibleref = oTrans.get("biblerefs")
-                    full_info = {}
-                    for k,v in oTrans.items():
-                        if k != "text":
-                            full_info[k] = v
-                    # Turn the fullinfo into a string
-                    sFullInfo = json.dumps(full_info)
-                    if not equal_id is None:
-                        obj = EqualGold.objects.filter(id=equal_id).first()
-                    elif not code is None and code != "" and not "no passim" in code.lower():
-                        obj = EqualGold.objects.filter(code__iexact=code).first()
-                    else:
-                        # Okay, cannot process this one
-                        iStop = 1
+                oStat = os.stat(sFile)
+                oEntry = oManifest.get(sFile)
+                if not rightnow and not oEntry is None and oEntry.get('done') and \
+                   oEntry.get('mtime') == oStat.st_mtime and oEntry.get('size') == oStat.st_size:
+                    # The file has not been touched
+                    continue
+                sHash = get_file_hash(sFile)
+                if not rightnow and not oEntry is None and oEntry.get('done') and oEntry.get('hash') == sHash:
+                    # The file has been touched, but its contents are the same
+                    oEntry['mtime'] = oStat.st_mtime
+                    continue
+                oManifest[sFile] = dict(mtime=oStat.st_mtime, size=oStat.st_size, hash=sHash, done=False)
+                lst_changed.append(sFile)
+            # Forget about files that are no longer there
+            lst_seen = set(lst_xml)
+            for sFile in [x for x in oManifest if not x in lst_seen]:
+                oManifest.pop(sFile)
+
+            # (2) Parse the changed files and look up their EqualGold objects in bulk
+            print("Parsing {} new or changed transcriptions out of {}".format(len(lst_changed), iTotal))
+            lst_parsed = parse_transcriptions(lst_changed, use_pool)
+            lst_equal = find_transcription_equal(lst_parsed)
+            for idx, sFile in enumerate(lst_changed):
+                # Treat this file: an error only affects this file, which is tried again next time
+                try:
+                    obj, title_passim = lst_equal[idx]
+                    oTrans = finish_transcription(lst_parsed[idx], obj, title_passim)
+                    status = oTrans.get("status")
+                    code = oTrans.get("code")
+                    if status == "ok" and not code is None and not obj is None:
+                        # It has been read and needs to be added
+                        text_sermon = oTrans.get("text")
+                        bibleref = oTrans.get("biblerefs")
+                        full_info = {}
+                        for k,v in oTrans.items():
+                            if k != "text":
+                                full_info[k] = v
+                        # Turn the fullinfo into a string
+                        sFullInfo = json.dumps(full_info)
 
-                    if not obj is None:
                         bNeedSaving = False
                         if obj.transcription is None or obj.transcription == "" or obj.transcription.name is None:
                             obj.transcription = sFile
@@ -2228,42 +2324,20 @@ def scan_transcriptions(oStatus=None, oMsg=None):
                             oErr.Status("Saving transcriptions: {} - {} [{}]".format(sXmlName, code, bibleref))
                             # Actually perform the update
                             obj.save()
+                    # Files without a (known) EqualGold are tried again next time
+                    oManifest[sFile]['done'] = (status != "ok" or not obj is None)
+                except:
+                    msg = oErr.get_error_message()
+                    oErr.DoError("scan_transcriptions file {}".format(sFile))
+                    oManifest[sFile]['done'] = False
+            save_scan_manifest(oManifest)
 
             if not oStatus is None:
                 oStatus.set("ended_xml_sync")
-            # (2) Next task: scan the sgcount
-            iCount = 0
-            iTotal = EqualGold.objects.count()
-            idx = 0
+            # (2) Next task: fix the sgcount of all AFs with one UPDATE
             print("Checking SG count for AF...")
-            # (3) Check which ones need adaptation
-            oAdaptCount = {}
-            for ssg in EqualGold.objects.all():
-                sgcount = ssg.sgcount
-                iSize = ssg.equal_goldsermons.all().count()
-                if iSize != sgcount:
-                    # Add to the dict of changes
-                    oAdaptCount[ssg.id] = iSize
-            # (4) implement the changes
-            bDoStatus = False
-            with transaction.atomic():
-                for ssg in EqualGold.objects.all():
-                    idx += 1
-                    if ssg.id in oAdaptCount:
-                        iSize = oAdaptCount[ssg.id]
-                        ssg.sgcount = iSize
-                        ssg.save()
-                        iCount += 1
-
-                    ## If necessary, provide Status information
-                    #if bDoStatus and not oStatus is None:
-                    #    oCount = dict(total=iTotal, current=idx)
-                    #    oStatus.set("SG-count", oCount=oCount)
-
-                    #iChanges = ssg.set_sgcount()
-                    #if iChanges > 0:
-                    #    iCount += iChanges
-                    #    print("# {} - sgcount: {}".format(idx, iCount))
+            iTotal = EqualGold.objects.count()
+            iCount = update_counters("EqualGold", fields=['sgcount'])
 
             # If necessary, provide Status information
             if not oStatus is None:
@@ -2285,204 +2359,129 @@ def scan_transcriptions(oStatus=None, oMsg=None):
         bResult = False
         if not oMsg is None:
             oMsg['msg'] = msg
+    finally:
+        if bLocked:
+            cache.delete(SCAN_BUSY_KEY)
     return bResult
 
-def read_transcription(data_file):
-    """Read a sermon transcription part of an XML in TEI-P5 format
-        
-    This approach makes use of *lxml*
+def find_transcription_equal(lst_parsed):
+    """Find the EqualGold for each parsed transcription, with one query per kind of title
+
+    Returns a list of (EqualGold or None, passim code) in the order of [lst_parsed].
+    A transcription that cannot be looked up gets (None, "")
     """
 
-    def process_para(item, html, info):
-        """Process (possibly recursively) a paragraph that may include elements like <w> and <quote>
-        
-        Added: it may also have element <s>
-        """
+    def get_titles(oParsed):
+        """Get the passim code, the gr and the cl signature of [oParsed] (any of them may be missing)"""
+        return [(oParsed.get(x) or "") for x in ['code', 'gr', 'cl']]
 
-        oErr = ErrHandle()
-        bResult = True
-        local = []
+    oErr = ErrHandle()
+    # Collect the titles that need to be looked up
+    lst_code = set()
+    lst_sig = set()
+    for oParsed in lst_parsed:
+        title_passim, sGr, sCl = get_titles(oParsed)
+        if title_passim != "" and not "no passim" in title_passim.lower():
+            lst_code.add(title_passim.lower())
+        elif sGr != "":
+            lst_sig.add(sGr.lower())
+        elif sCl != "":
+            lst_sig.add(sCl.lower())
+
+    # Get the EqualGold objects by code and by signature
+    oCode = {}
+    if len(lst_code) > 0:
+        for obj in EqualGold.objects.annotate(lcode=Lower('code')).filter(lcode__in=lst_code).order_by('id'):
+            oCode.setdefault(obj.lcode, obj)
+    oSig = {}
+    if len(lst_sig) > 0:
+        qs = Signature.objects.annotate(lcode=Lower('code')).filter(lcode__in=lst_sig, editype__in=['gr', 'cl']).select_related(
+            'gold__equal').order_by('id')
+        for sig in qs:
+            oSig.setdefault((sig.editype, sig.lcode), sig)
+
+    lBack = []
+    for oParsed in lst_parsed:
+        obj = None
+        title_passim = ""
         try:
-            # Walk all elements
-            if not item is None:
-                for element in item.xpath("./child::*"):
-                    tag = element.tag
-                    attrib = element.attrib
-                    if tag == "w":
-                        # This is a word 
-                        local.append(element.text)
-                        # Check if this is punctuation or not
-                        if attrib.get("pos", "").lower() == "punc":
-                            # It is punctuation - any action?
-                            pass
-                        else:
-                            # Keep track of wordcount
-                            info['wordcount'] += 1
-                    elif tag == "quote":
-                        # This is a quote: get the @source attribute and the @n
-                        quote_n = attrib.get('n', '*')
-                        quote_source = attrib.get('source', '')
-                        quote = []
-                        for quote_el in element.xpath("./child::*"):
-                            if quote_el.tag == "w":
-                                quote.append(quote_el.text)
-                        sQuoteBody = " ".join(quote)
-                        sQuote = '<span class="fullquote" title="{}. {}: {}" >{}</span>'.format(
-                            quote_n, quote_source, sQuoteBody, quote_n )
-                        local.append(sQuote)
-                    elif tag == "s":
-                        # This is a <s> sentence definition that may contain <w> and <quote> elements
-                        process_para(element, html, info)
-                sPara = " ".join(local)
-                html.append(sPara)
+            title_passim, sGr, sCl = get_titles(oParsed)
+            if title_passim != "" and not "no passim" in title_passim.lower():
+                obj = oCode.get(title_passim.lower())
+            else:
+                for editype, sSig in [('gr', sGr), ('cl', sCl)]:
+                    if sSig != "":
+                        sig = oSig.get((editype, sSig.lower()))
+                        if not sig is None and not sig.gold.equal is None:
+                            obj = sig.gold.equal
+                            title_passim = obj.get_code()
+                        break
         except:
             msg = oErr.get_error_message()
-            oErr.DoError("process_para")
-            bResult = False
-        return bResult
+            oErr.DoError("find_transcription_equal {}".format(oParsed.get("filename")))
+            obj = None
+        lBack.append((obj, title_passim))
+    return lBack
 
-    def get_titles(docroot):
-        sGr = ""
-        sCl = ""
-        sPassim = ""
-        biblerefs = ""
-        method = "bible_order"  # Following the Bible bk/ch/vs order
-        method = "given_order"  # Following the order made by the XML manuscript
-
-        # Get the PASSIM code
-        ítem_passim = docroot.xpath("//title[@type='passim']")
-        if len(ítem_passim) > 0:
-            sPassim = ítem_passim[0].text
-        # Get a possible GRYSON code
-        ítem_gr = docroot.xpath("//title[@type='gr']")
-        if len(ítem_gr) > 0:
-            sGr = ítem_gr[0].text
-        # Get a possible CLAVIS code
-        ítem_cl = docroot.xpath("//title[@type='cl']")
-        if len(ítem_cl) > 0:
-            sCl = ítem_cl[0].text
-        # Get list of bible references
-        bibitems = docroot.xpath("//keywords[@scheme='bible']/descendant::item")
-        if len(bibitems) > 0:
-            lst_ref = []
-            for bibitem in bibitems:
-                sText = bibitem.text
-                if not sText is None and sText != "":
-                    lst_ref.append(sText.replace("_", " "))
-            if method == "bible_order":
-                # Return them in a sorted unique list that can readily be processed
-                biblerefs = "; ".join(sorted(set(lst_ref)))
-            else:
-                biblerefs = "; ".join(lst_ref)
+def finish_transcription(oParsed, obj, title_passim):
+    """Combine a parsed transcription and its EqualGold [obj] into the result of read_transcription()"""
 
-        return sPassim, sGr, sCl, biblerefs
+    oBack = {'status': 'ok', 'count': 0, 'msg': "", 'lst_obj': []}
+    if oParsed.get("status") != "ok":
+        oBack['filename'] = oParsed.get("filename")
+        oBack['status'] = 'error'
+        oBack['msg'] = oParsed.get("msg")
+    elif (oParsed.get('code') or "") != "" or (oParsed.get('gr') or "") != "" or (oParsed.get('cl') or "") != "":
+        # Initially: assume this needs to be read again
+        bReadFile = True
+        change_time = oParsed['change_time']
+        biblerefs = oParsed['biblerefs']
+
+        # If there is a EqualGold that has been located...
+        if not obj is None:
+            # Get the information stored with this file
+            sFullInfo = obj.fullinfo
+            if sFullInfo is None or sFullInfo == "":
+                sFullInfo = "{}"
+            oFullInfo = json.loads(sFullInfo)
+            last_time = oFullInfo.get("change_time")
+
+            bHasChanged = (not last_time is None and change_time <= last_time)
+            bBibChanged = (biblerefs != "" and biblerefs != obj.bibleref)
+
+            if not bHasChanged and not bBibChanged:
+                # The file has not changed
+                bReadFile = False
+
+        # Need to read it?
+        if bReadFile:
+            text_sermon = oParsed['text']
+            oBack['text'] = text_sermon
+            oBack['count'] = oBack['count'] + 1
+            oBack['tsize'] = len(text_sermon)
+            oBack['code'] = title_passim
+            oBack['gr'] = oParsed['gr']
+            oBack['cl'] = oParsed['cl']
+            oBack['wordcount'] = oParsed['wordcount']
+            oBack['change_time'] = change_time
+            oBack['biblerefs'] = biblerefs
+            oBack['equal_id'] = None if obj is None else obj.id
+        else:
+            oBack['status'] = "skip"
+    return oBack
+
+def read_transcription(data_file):
+    """Read a sermon transcription part of an XML in TEI-P5 format
+        
+    This approach makes use of *lxml* (see parse_transcription)
+    """
 
     oErr = ErrHandle()
     oBack = {'status': 'ok', 'count': 0, 'msg': "", 'lst_obj': []}
     try:
-        # Read and parse the data into a DOM element
-        xmldoc = ET.parse(data_file)  
-        change_time = os.path.getmtime(data_file)
-
-        # Get the root
-        root = xmldoc.getroot()
-
-        # Clean up the namespace
-        for elem in root.getiterator():
-            if not (isinstance(elem, ET._Comment) or isinstance(elem, ET._ProcessingInstruction)):
-                elem.tag = ET.QName(elem).localname
-        ET.cleanup_namespaces(root)
-
-        # Get the titles: Passim, GR, CL
-        title_passim, title_gr, title_cl, biblerefs = get_titles(root)
-        if title_passim != "" or title_gr != "" or title_cl != "":
-
-            # Initially: assume this needs to be read again
-            bReadFile = True
-
-            # Get the passim item, based on the title
-            if title_passim != "" and not "no passim" in title_passim.lower():
-                obj = EqualGold.objects.filter(code__iexact=title_passim).first()
-            elif title_gr != "":
-                sig = Signature.objects.filter(code__iexact=title_gr, editype="gr").first()
-                if not sig is None:
-                    obj = sig.gold.equal
-                    title_passim = obj.get_code()
-            elif title_cl != "":
-                sig = Signature.objects.filter(code__iexact=title_cl, editype="cl").first()
-                if not sig is None:
-                    obj = sig.gold.equal
-                    title_passim = obj.get_code()
-            # If there is a EqualGold that has been located...
-            if not obj is None:
-                # Get the information stored with this file
-                sFullInfo = obj.fullinfo
-                if sFullInfo is None or sFullInfo == "":
-                    sFullInfo = "{}"
-                oFullInfo = json.loads(sFullInfo)
-                last_time = oFullInfo.get("change_time")
-
-                bHasChanged = (not last_time is None and change_time <= last_time)
-                bBibChanged = (biblerefs != "" and biblerefs != obj.bibleref)
-
-                if not bHasChanged and not bBibChanged:
-                    # The file has not changed
-                    bReadFile = False
-
-            # Need to read it?
-            if bReadFile:
-
-                # Get the list of sermon elements
-                html = []
-                info = dict(wordcount=0)
-                sermon_items = root.xpath("//div[@type='sermon']/child::*")
-                for sermon_item in sermon_items:
-                    tag = sermon_item.tag
-                    attrib = sermon_item.attrib
-                    if tag == "head":
-                        # This is one head at this moment
-                        headtype = attrib.get('type', '')
-                        level = "##" if headtype == "title" else "###"
-                        html.append("{} {}".format(level, sermon_item.text))
-                    elif tag == "div" and attrib.get("type", "") == "paragraph":
-                        # Paragraph: add a newline
-                        html.append("")
-                        # This is a paragraph, that contains <head> and <p>
-                        for subitem in sermon_item.xpath("./child::*"):
-                            if subitem.tag == "head":
-                                # This is another level head
-                                html.append("#### {}".format(subitem.text))
-                            elif subitem.tag == "p":
-                                # This is a paragraph containing words and quotes
-                                process_para(subitem, html, info)
-                    elif tag == "div" and attrib.get("type", "") == "chapter":
-                        # This is a new chapter, which can contain <head> and <p>
-                        html.append("")
-                        # This is a paragraph, that contains <head> and <p>
-                        for subitem in sermon_item.xpath("./child::*"):
-                            if subitem.tag == "head":
-                                # This is another level head
-                                html.append("#### {}".format(subitem.text))
-                            elif subitem.tag == "p":
-                                # This is a paragraph containing words and quotes
-                                process_para(subitem, html, info)
-
-                # Okay, we found all the elements, now store them.
-                text_sermon = "\n".join(html)
-
-                oBack['text'] = text_sermon
-                oBack['count'] = oBack['count'] + 1
-                oBack['tsize'] = len(text_sermon)
-                oBack['code'] = title_passim
-                oBack['gr'] = title_gr
-                oBack['cl'] = title_cl
-                oBack['wordcount'] = info.get("wordcount", 0)
-                oBack['change_time'] = change_time
-                oBack['biblerefs'] = biblerefs
-                oBack['equal_id'] = None if obj is None else obj.id
-            else:
-                oBack['status'] = "skip"
-       
+        oParsed = parse_transcription(data_file)
+        obj, title_passim = find_transcription_equal([oParsed])[0]
+        oBack = finish_transcription(oParsed, obj, title_passim)
     except:
         sError = oErr.get_error_message()
         oBack['filename'] = data_file
@@ -3108,6 +3107,7 @@ class EqualGoldHuwaToJson(BasicPart):
     prefix_type = "simple"
     import_type = "ssg"     # Options: 'ssg', 'manu'
     downloadname = "huwa_ssg"
+    offset = 0              # Number of opera to skip (to resume an interrupted conversion)
 
     # Specify the relationships (see issue #526)
     relationships = [
@@ -3143,6 +3143,9 @@ class EqualGoldHuwaToJson(BasicPart):
                 self.import_type = "manu"
             else:
                 self.dtype = dt
+        offset = self.qd.get('offset', "")
+        if not offset is None and offset.isdigit():
+            self.offset = int(offset)
 
     def get_edition(self):
         """Get one edition"""
@@ -3231,48 +3234,47 @@ class EqualGoldHuwaToJson(BasicPart):
     def get_data(self, prefix, dtype, response=None):
         """Gather the data as CSV, including a header line and comma-separated"""
 
+        def get_matching(lTable, id, sIdField):
+            # HUWA tables are looked up through the index; other lists are searched
+            if isinstance(lTable, HuwaTable):
+                return lTable.get_items(sIdField, id)
+            return [oItem for oItem in lTable if oItem[sIdField] == id]
+
         def get_table_list(lTable, opera_id, sField):
             lBack = []
-            for oItem in lTable:
-                if oItem['opera'] == opera_id:
-                    lBack.append( oItem[sField])
+            for oItem in get_matching(lTable, opera_id, 'opera'):
+                lBack.append( oItem[sField])
             return lBack
 
         def get_table_field(lTable, id, sField, sIdField="id"):
             sBack = ""
             if id != 0:
-                for oItem in lTable:
-                    if oItem[sIdField] == id:
-                        sBack = oItem[sField]
-                        break
+                for oItem in get_matching(lTable, id, sIdField):
+                    sBack = oItem[sField]
+                    break
             return sBack
 
         def get_table_item(lTable, id, sIdField="id"):
             oBack = None
             if isinstance(id, str): id = int(id)
             if id != 0:
-                for oItem in lTable:
-                    if oItem[sIdField] == id:
-                        oBack = oItem
-                        break
+                for oItem in get_matching(lTable, id, sIdField):
+                    oBack = oItem
+                    break
             return oBack
 
         def get_table_items(lTable, id, sIdField="id"):
             lBack = []
             if isinstance(id, str): id = int(id)
             if id != 0:
-                for oItem in lTable:
-                    if oItem[sIdField] == id:
-                        lBack.append(copy.copy(oItem))
-                        #break
+                for oItem in get_matching(lTable, id, sIdField):
+                    lBack.append(copy.copy(oItem))
             return lBack
 
         def get_table_fk_count(lTable, id, sIdField):
             iCount = 0
             if id != 0:
-                for oItem in lTable:
-                    if oItem[sIdField] == id:
-                        iCount += 1
+                iCount = len(get_matching(lTable, id, sIdField))
             if iCount < 0:
                 iStop = 1
             return iCount
@@ -3940,7 +3942,7 @@ class EqualGoldHuwaToJson(BasicPart):
                 'autor', 'autor_opera', 'datum_opera']
 
         oErr = ErrHandle()
-        table_info = {}
+        table_info = None
         author_info = {}
         existing_dict = {}
         sig_matching = {}
@@ -4681,7 +4683,7 @@ class EqualGoldHuwaToJson(BasicPart):
                                         oEdition['author']['firstname'] = vorname
                         # Check if this 'edition' has any items in 'loci'
                         lst_loci = []
-                        for oItem in tables['loci']:
+                        for oItem in tables['loci'].get_items("editionen", edition_id):
                             if oItem.get("editionen") == edition_id:
                                 # Need to add a LOCI item
                                 oLoci = dict(page=oItem.get('seite_col'), line=oItem.get("zeile"))
@@ -4751,7 +4753,7 @@ class EqualGoldHuwaToJson(BasicPart):
                             title = oSpecific.get("title")
                             location = oSpecific.get("location")
                             year = oSpecific.get("year")
-                            for oItem in tables[table_name]:
+                            for oItem in tables[table_name].get_items("opera", opera_id):
                                 if oItem.get('opera') == opera_id:
                                     # Add this one
                                     oEdition = dict(opera=opera_id)
@@ -4780,14 +4782,16 @@ class EqualGoldHuwaToJson(BasicPart):
                 signature_dict = {}     # Each entry contains a list of OPERA ids that have this signature
                 lst_opera = []
                 count_opera = len(tables['opera'])
-                for idx, oOpera in enumerate(tables['opera']):
+                lst_opera_tables = ['clavis', 'frede', 'cppm', 'datum_opera', 'autor_opera', 'inhalt']
+                offset = self.offset
+                for idx, (oOpera, oOperaRows) in enumerate(table_info.iter_opera(lst_opera_tables, offset)):
                     opera_id = oOpera['id']
-                    # Take over any information that should
-                    oSsg = dict(id=idx+1, opera=opera_id)
+                    # Take over any information that should (the id continues after the skipped opera)
+                    oSsg = dict(id=idx+offset+1, opera=opera_id)
 
                     # Show where we are
                     if idx % 100 == 0:
-                        oErr.Status("EqualGoldHuwaToJson opera's: {}/{}".format(idx+1, count_opera))
+                        oErr.Status("EqualGoldHuwaToJson opera's: {}/{}".format(idx+offset+1, count_opera))
 
                     # Get the signature(s)
                     signaturesA = []
@@ -4847,13 +4851,13 @@ class EqualGoldHuwaToJson(BasicPart):
                         other = oOpera.get("abk", "")
                         if not other is None and other != "":
                             signaturesA.append(dict(editype="ot", code=other))
-                        clavis = get_table_list(tables['clavis'], opera_id, "name")
+                        clavis = get_table_list(oOperaRows['clavis'], opera_id, "name")
                         add_sig_to_list(signaturesA, clavis, "cl", "CPL {}")
 
-                        frede = get_table_list(tables['frede'], opera_id, "name")
+                        frede = get_table_list(oOperaRows['frede'], opera_id, "name")
                         add_sig_to_list(signaturesA, frede, "gr", "{}")
 
-                        cppm = get_table_list(tables['cppm'], opera_id, "name")
+                        cppm = get_table_list(oOperaRows['cppm'], opera_id, "name")
                         add_sig_to_list(signaturesA, cppm, "cl", "CPPM {}")
 
                     oSsg['signaturesA'] = signaturesA
@@ -4871,11 +4875,11 @@ class EqualGoldHuwaToJson(BasicPart):
                     oSsg['notes'] = "\n".join(lst_notes)
 
                     # Get to the [datum_opera]
-                    oSsg['date_estimate'] = get_table_field(tables['datum_opera'], opera_id, "datum", "opera")
+                    oSsg['date_estimate'] = get_table_field(oOperaRows['datum_opera'], opera_id, "datum", "opera")
 
                     # Get the *AUTHOR* (obligatory) for this entry
                     passim_author = undecided
-                    huwa_autor_id = get_table_field(tables['autor_opera'], opera_id, "autor", "opera")
+                    huwa_autor_id = get_table_field(oOperaRows['autor_opera'], opera_id, "autor", "opera")
                     if huwa_autor_id != "": 
                         passim_author = self.get_passim_author(lst_authors, huwa_autor_id, tables['autor'])
                         if passim_author is None:
@@ -4889,7 +4893,7 @@ class EqualGoldHuwaToJson(BasicPart):
                         if rHasNumber.match(other): bAbqHasNumber = True
 
                         # Get the number of manuscripts linked to this particular opera entry
-                        oSsg['manuscripts'] = get_table_fk_count(tables['inhalt'], opera_id, "opera")
+                        oSsg['manuscripts'] = get_table_fk_count(oOperaRows['inhalt'], opera_id, "opera")
                         manu_type = "-"
                         if oSsg['manuscripts'] == 0:
                             count_manu_zero += 1
@@ -5644,53 +5648,24 @@ class EqualGoldHuwaToJson(BasicPart):
         except:
             msg = oErr.get_error_message()
             oErr.DoError("HuwaEqualGoldToJson/get_data")
+        finally:
+            # Close the HUWA database again
+            if not table_info is None:
+                table_info.close()
 
         return sData
 
     def read_huwa(self):
+        """Open the HUWA database: tables are read from it when they are needed"""
+
         oErr = ErrHandle()
-        table_info = {}
+        table_info = None
         try:
-            # Get the location of the HUWA database
-            huwa_db = os.path.abspath(os.path.join(MEDIA_DIR, "passim", "huwa_database_for_PASSIM.db"))
-            with sqlite3.connect(huwa_db) as db:
-                standard_fields = ['erstdatum', 'aenddatum', 'aenderer', 'bemerkungen', 'ersteller']
-
-                cursor = db.cursor()
-                db_results = cursor.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
-                tables = [x[0] for x in db_results]
-
-                count_tbl = len(tables)
-
-                # Walk all tables
-                for table_name in tables:
-                    oInfo = {}
-                    # Find out what fields this table has
-                    db_results = cursor.execute("PRAGMA table_info('{}')".format(table_name)).fetchall()
-                    fields = []
-                    for field in db_results:
-                        field_name = field[1]
-                        fields.append(field_name)
-
-                        field_info = dict(type=field[2],
-                                          not_null=(field[3] == 1),
-                                          default=field[4])
-                        oInfo[field_name] = field_info
-                    oInfo['fields'] = fields
-                    oInfo['links'] = []
-
-                    # Read the table
-                    table_contents = cursor.execute("SELECT * FROM {}".format(table_name)).fetchall()
-                    oInfo['contents'] = table_contents
-
-                    table_info[table_name] = oInfo
-
-                # Close the database again
-                cursor.close()
+            table_info = HuwaReader().open()
         except:
             msg = oErr.get_error_message()
             oErr.DoError("HuwaEqualGoldToJson/read_huwa")
-        # Return the table that we found
+        # Return the reader
         return table_info
 
     def read_authors(self):
@@ -5863,7 +5838,7 @@ class EqualGoldHuwaToJson(BasicPart):
             if passim_id is None:
                 # Did not find it: 
                 sName = ""
-                for item in tbl_autor:
+                for item in (tbl_autor.get_items('id', huwa_id) if isinstance(tbl_autor, HuwaTable) else tbl_autor):
                     if item['id'] == huwa_id:
                         sName = item['name']
                         break
@@ -5884,22 +5859,12 @@ class EqualGoldHuwaToJson(BasicPart):
         return passim
 
     def get_tables(self, table_info, lst_names):
-        """Read all tables in [lst_names] from [table_info]"""
+        """Get all tables in [lst_names] from [table_info]"""
 
         oErr = ErrHandle()
         oTables = {}
         try:
-            for sName in lst_names:
-                oTable = table_info[sName]
-                lFields = oTable['fields']
-                lContent = oTable['contents']
-                lTable = []
-                for lRow in lContent:
-                    oNew = {}
-                    for idx, oPart in enumerate(lRow):
-                        oNew[lFields[idx]] = oPart
-                    lTable.append(oNew)
-                oTables[sName] = lTable
+            oTables = table_info.get_tables(lst_names)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("HuwaEqualGoldToJson/get_table")
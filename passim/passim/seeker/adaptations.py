@@ -35,6 +35,8 @@ from passim.seeker.models import ManuscriptSimilar, get_crpp_date, get_current_d
     EXTERNAL_HUWA_OPERA, excel_to_list
 from passim.reader.models import Edition, Literatur, OperaLit
 from passim.reader.views import read_kwcategories
+from passim.reader.huwa import HuwaReader
+from passim.seeker.counters import update_counters
 
 
 adaptation_list = {
@@ -43,7 +45,7 @@ adaptation_list = {
         'feastupdate', 'codicocopy', 'passim_project_name_manu', 'doublecodico',
         'codico_origin', 'import_onlinesources', 'dateranges', 'huwaeditions',
         'supplyname', 'usersearch_params', 'huwamanudate', 'baddateranges', 'correctdateranges',
-        'collectiontype', 'huwadoubles', 'manu_setlists', 'similars'], # 'sermonesdates',
+        'collectiontype', 'huwadoubles', 'manu_setlists', 'similars', 'colloverlaps'], # 'sermonesdates',
     'sermon_list': ['nicknames', 'biblerefs', 'passim_project_name_sermo', 'huwainhalt',  'huwafolionumbers',
                     'projectorphans', 'codesort', 'siglists'],
     'sermongold_list': ['sermon_gsig', 'huwa_opera_import'],
@@ -967,68 +969,25 @@ def adapt_huwaeditions():
     return bResult, msg
 
 def read_huwa():
+    """Open the HUWA database: tables are read from it when they are needed"""
+
     oErr = ErrHandle()
-    table_info = {}
+    table_info = None
     try:
-        # Get the location of the HUWA database
-        huwa_db = os.path.abspath(os.path.join(MEDIA_DIR, "passim", "huwa_database_for_PASSIM.db"))
-        with sqlite3.connect(huwa_db) as db:
-            standard_fields = ['erstdatum', 'aenddatum', 'aenderer', 'bemerkungen', 'ersteller']
-
-            cursor = db.cursor()
-            db_results = cursor.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
-            tables = [x[0] for x in db_results]
-
-            count_tbl = len(tables)
-
-            # Walk all tables
-            for table_name in tables:
-                oInfo = {}
-                # Find out what fields this table has
-                db_results = cursor.execute("PRAGMA table_info('{}')".format(table_name)).fetchall()
-                fields = []
-                for field in db_results:
-                    field_name = field[1]
-                    fields.append(field_name)
-
-                    field_info = dict(type=field[2],
-                                        not_null=(field[3] == 1),
-                                        default=field[4])
-                    oInfo[field_name] = field_info
-                oInfo['fields'] = fields
-                oInfo['links'] = []
-
-                # Read the table
-                table_contents = cursor.execute("SELECT * FROM {}".format(table_name)).fetchall()
-                oInfo['contents'] = table_contents
-
-                table_info[table_name] = oInfo
-
-            # Close the database again
-            cursor.close()
+        table_info = HuwaReader().open()
     except:
         msg = oErr.get_error_message()
         oErr.DoError("read_huwa")
-    # Return the table that we found
+    # Return the reader
     return table_info
 
 def get_huwa_tables(table_info, lst_names):
-    """Read all tables in [lst_names] from [table_info]"""
+    """Get all tables in [lst_names] from [table_info]"""
 
     oErr = ErrHandle()
     oTables = {}
     try:
-        for sName in lst_names:
-            oTable = table_info[sName]
-            lFields = oTable['fields']
-            lContent = oTable['contents']
-            lTable = []
-            for lRow in lContent:
-                oNew = {}
-                for idx, oPart in enumerate(lRow):
-                    oNew[lFields[idx]] = oPart
-                lTable.append(oNew)
-            oTables[sName] = lTable
+        oTables = table_info.get_tables(lst_names)
     except:
         msg = oErr.get_error_message()
         oErr.DoError("get_huwa_tables")
@@ -1043,6 +1002,7 @@ def adapt_huwamanudate():
     bDebug = False
     msg = ""
     huwa_tables = ['handschrift']
+    table_info = None
     try:
         # Read the HUWA database
         table_info = read_huwa()
@@ -1107,6 +1067,9 @@ def adapt_huwamanudate():
     except:
         bResult = False
         msg = oErr.get_error_message()
+    finally:
+        if not table_info is None:
+            table_info.close()
     return bResult, msg
 
 def adapt_huwadoubles():
@@ -1117,6 +1080,7 @@ def adapt_huwadoubles():
     bDebug = False
     msg = ""
     huwa_tables = ['handschrift']
+    table_info = None
     try:
 
         # Now try to calculate via the Passim way
@@ -1299,6 +1263,9 @@ def adapt_huwadoubles():
         bResult = False
         msg = oErr.get_error_message()
         oErr.DoError("adaptations/adapt_huwadoubles")
+    finally:
+        if not table_info is None:
+            table_info.close()
     # Return the table that we found
     return bResult, msg
 
@@ -1416,6 +1383,20 @@ def adapt_similars():
         msg = oErr.get_error_message()
     return bResult, msg
 
+def adapt_colloverlaps():
+    """Remove the stored collection overlaps: they are recalculated when needed"""
+
+    oErr = ErrHandle()
+    bResult = True
+    msg = ""
+    try:
+        # Overlaps stored before CollOverlap.set_stale existed may be out of date
+        CollOverlap.objects.all().delete()
+    except:
+        bResult = False
+        msg = oErr.get_error_message()
+    return bResult, msg
+
 
 # =========== Part of sermon_list ==================
 def adapt_nicknames():
@@ -1629,6 +1610,7 @@ def adapt_huwainhalt():
     msg = ""
     ext_inhalt = "huwin" 
     huwa_tables = ['inhalt']
+    table_info = None
     try:
         # Read the HUWA database
         table_info = read_huwa()
@@ -1668,6 +1650,9 @@ def adapt_huwainhalt():
     except:
         bResult = False
         msg = oErr.get_error_message()
+    finally:
+        if not table_info is None:
+            table_info.close()
     return bResult, msg
 
 def adapt_huwafolionumbers():
@@ -1766,6 +1751,7 @@ def adapt_huwafolionumbers():
     msg = ""
     huwa_tables = ['inhalt']
     lst_result = []
+    table_info = None
     try:
         # Read the HUWA database
         table_info = read_huwa()
@@ -1844,6 +1830,9 @@ def adapt_huwafolionumbers():
     except:
         bResult = False
         msg = oErr.get_error_message()
+    finally:
+        if not table_info is None:
+            table_info.close()
     return bResult, msg
 
 def adapt_projectorphans():
@@ -2109,13 +2098,8 @@ def adapt_hccount():
     msg = ""
     
     try:
-        # Walk all SSGs
-        with transaction.atomic():
-            for ssg in EqualGold.objects.all():
-                hccount = ssg.collections.filter(settype="hc").count()
-                if hccount != ssg.hccount:
-                    ssg.hccount = hccount
-                    ssg.save()
+        # Recalculate the hccount of all SSGs at once (see counters.py)
+        update_counters("EqualGold", fields=['hccount'])
     except:
         bResult = False
         msg = oErr.get_error_message()
@@ -2127,13 +2111,8 @@ def adapt_scount():
     msg = ""
     
     try:
-        # Walk all SSGs
-        with transaction.atomic():
-            for ssg in EqualGold.objects.all():
-                scount = ssg.equalgold_sermons.count()
-                if scount != ssg.scount:
-                    ssg.scount = scount
-                    ssg.save()
+        # Recalculate the scount of all SSGs at once (see counters.py)
+        update_counters("EqualGold", fields=['scount'])
     except:
         bResult = False
         msg = oErr.get_error_message()
@@ -2145,10 +2124,8 @@ def adapt_sgcount():
     msg = ""
     
     try:
-        # Walk all SSGs
-        with transaction.atomic():
-            for ssg in EqualGold.objects.all():
-                ssg.set_sgcount()
+        # Recalculate the sgcount of all SSGs at once (see counters.py)
+        update_counters("EqualGold", fields=['sgcount'])
     except:
         bResult = False
         msg = oErr.get_error_message()
@@ -2160,13 +2137,8 @@ def adapt_ssgcount():
     msg = ""
     
     try:
-        # Walk all SSGs
-        with transaction.atomic():
-            for ssg in EqualGold.objects.all():
-                ssgcount = ssg.relations.count()
-                if ssgcount != ssg.ssgcount:
-                    ssg.ssgcount = ssgcount
-                    ssg.save()
+        # Recalculate the ssgcount of all SSGs at once (see counters.py)
+        update_counters("EqualGold", fields=['ssgcount'])
     except:
         bResult = False
         msg = oErr.get_error_message()
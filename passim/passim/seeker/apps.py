@@ -1,6 +1,70 @@
+import atexit
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.models.signals import post_save, post_delete
 
 
 class seekerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'passim.seeker'
+
+    def ready(self):
+        from passim.seeker.counters import COUNTER_SOURCES, counters_changed
+        from passim.seeker.fulltext import FTS_MODELS, fts_post_save, fts_post_delete
+        from passim.seeker.linkgraph import link_graph_changed
+        from passim.seeker.similarity import similarity_post_delete, similarity_flush
+        from passim.seeker.models import choice_registry_changed, signatures_changed, CollOverlap, SearchResult, Statistic
+
+        # Keep the full-text shadow indexes in sync
+        for model_name in FTS_MODELS:
+            model = self.get_model(model_name)
+            post_save.connect(fts_post_save, sender=model, dispatch_uid="fts_save_{}".format(model_name))
+            post_delete.connect(fts_post_delete, sender=model, dispatch_uid="fts_delete_{}".format(model_name))
+
+        # Let the choice registry of every process know that it is out of date
+        for model_name in ['FieldChoice', 'HelpChoice']:
+            model = self.get_model(model_name)
+            post_save.connect(choice_registry_changed, sender=model, dispatch_uid="choice_save_{}".format(model_name))
+            post_delete.connect(choice_registry_changed, sender=model, dispatch_uid="choice_delete_{}".format(model_name))
+
+        # Changes in sermons, manuscripts and SSGs make the home page statistics stale
+        for model_name in ['SermonDescr', 'Manuscript', 'EqualGold']:
+            model = self.get_model(model_name)
+            post_save.connect(Statistic.set_stale, sender=model, dispatch_uid="statistic_save_{}".format(model_name))
+            post_delete.connect(Statistic.set_stale, sender=model, dispatch_uid="statistic_delete_{}".format(model_name))
+
+        # Links between SSGs (and the labels of the SSGs) are kept in the link graph of every process
+        for model_name in ['EqualGoldLink', 'EqualGold', 'Signature', 'SermonGold', 'Collection', 'CollectionSuper']:
+            model = self.get_model(model_name)
+            post_save.connect(link_graph_changed, sender=model, dispatch_uid="linkgraph_save_{}".format(model_name))
+            post_delete.connect(link_graph_changed, sender=model, dispatch_uid="linkgraph_delete_{}".format(model_name))
+
+        # The cached signatures of the SSGs depend on the signatures and on the gold sermons they belong to
+        for model_name in ['Signature', 'SermonGold']:
+            model = self.get_model(model_name)
+            post_save.connect(signatures_changed, sender=model, dispatch_uid="signature_save_{}".format(model_name))
+            post_delete.connect(signatures_changed, sender=model, dispatch_uid="signature_delete_{}".format(model_name))
+
+        # The counters of SSGs, sermons and manuscripts are recalculated when their links change
+        for model_name in COUNTER_SOURCES:
+            model = self.get_model(model_name)
+            post_save.connect(counters_changed, sender=model, dispatch_uid="counters_save_{}".format(model_name))
+            post_delete.connect(counters_changed, sender=model, dispatch_uid="counters_delete_{}".format(model_name))
+
+        # The stored overlaps between collections and manuscripts depend on the SSGs in both
+        for model_name in ['CollectionSuper', 'SermonDescrEqual']:
+            model = self.get_model(model_name)
+            post_save.connect(CollOverlap.set_stale, sender=model, dispatch_uid="colloverlap_save_{}".format(model_name))
+            post_delete.connect(CollOverlap.set_stale, sender=model, dispatch_uid="colloverlap_delete_{}".format(model_name))
+
+        # A deleted SSG is no longer a candidate in the similarity index
+        post_delete.connect(similarity_post_delete, sender=self.get_model('EqualGold'), dispatch_uid="similarity_delete_EqualGold")
+        # Its changes are written once per request (and once for a script or management command)
+        request_finished.connect(similarity_flush, dispatch_uid="similarity_flush")
+        atexit.register(similarity_flush)
+
+        # Stored search results are only re-used as long as nothing has changed
+        for model in self.get_models():
+            if not model.__name__ in SearchResult.skip_models:
+                post_save.connect(SearchResult.set_changed, sender=model, dispatch_uid="searchresult_save_{}".format(model.__name__))
+                post_delete.connect(SearchResult.set_changed, sender=model, dispatch_uid="searchresult_delete_{}".format(model.__name__))
@@ -0,0 +1,74 @@
+"""
+Co-occurrence of SSGs in manuscripts for the SEEKER app.
+
+The transmission networks (EqualGoldTrans, EqualGoldGraph) link two SSGs by the
+number of manuscripts in which both occur. The (manuscript, SSG) incidence is
+read with one query into a sparse matrix X; the co-occurrence counts are then
+the upper triangle of the sparse product X'X. Only the links with at least the
+requested value are kept, and of those only the strongest [max_links].
+"""
+
+import numpy as np
+from scipy import sparse
+from django.apps import apps
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+
+
+# No network shows more links than this: the weakest ones are left out
+MAX_LINKS = 2000
+
+
+def get_incidence(manu_list):
+    """Get the sparse (manuscript x SSG) incidence matrix of the manuscripts in [manu_list]
+
+    [manu_list] can be a queryset (values('manu_id')) or a list of ids.
+    Returns the matrix and the SSG id of each column.
+    """
+
+    SermonDescrEqual = apps.get_model("seeker", "SermonDescrEqual")
+    qs = SermonDescrEqual.objects.filter(manu__id__in=manu_list).order_by().values_list('manu_id', 'super_id').distinct()
+    arPair = np.array(list(qs), dtype=np.int64).reshape(-1, 2)
+    manu_ids, rows = np.unique(arPair[:, 0], return_inverse=True)
+    ssg_ids, cols = np.unique(arPair[:, 1], return_inverse=True)
+    data = np.ones(len(arPair), dtype=np.int32)
+    incidence = sparse.csr_matrix((data, (rows.ravel(), cols.ravel())), shape=(len(manu_ids), len(ssg_ids)))
+    return incidence, ssg_ids
+
+def get_cooccurrence(manu_list, min_value=1, max_links=MAX_LINKS):
+    """Get the links between SSGs that occur together in the manuscripts of [manu_list]
+
+    Returns a list of (source_id, target_id, value) with source_id < target_id,
+    strongest first, and the highest value of all links (before thresholding).
+    """
+
+    lst_link = []
+    max_value = 0
+    oErr = ErrHandle()
+    try:
+        incidence, ssg_ids = get_incidence(manu_list)
+        if len(ssg_ids) < 2:
+            return lst_link, max_value
+
+        # Number of manuscripts per pair of SSGs: only the pairs above the diagonal
+        counts = sparse.triu(incidence.T.dot(incidence), k=1).tocoo()
+        if counts.nnz == 0:
+            return lst_link, max_value
+        max_value = int(counts.data.max())
+
+        # Thresholding
+        keep = np.flatnonzero(counts.data >= min_value)
+        # Top-k pruning
+        if not max_links is None and len(keep) > max_links:
+            keep = keep[np.argpartition(-counts.data[keep], max_links - 1)[:max_links]]
+        # Strongest first, ties by SSG
+        order = np.lexsort((counts.col[keep], counts.row[keep], -counts.data[keep]))
+        keep = keep[order]
+
+        lst_link = list(zip(ssg_ids[counts.row[keep]].tolist(), ssg_ids[counts.col[keep]].tolist(),
+                            counts.data[keep].tolist()))
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("get_cooccurrence")
+    return lst_link, max_value
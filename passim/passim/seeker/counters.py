@@ -0,0 +1,120 @@
+"""
+Denormalized counters of the SEEKER app.
+
+A number of models keep a count (or the first value) of related objects in a field
+of their own, so that the list views can sort and filter on it:
+
+- EqualGold.sgcount     the number of gold sermons in the equality set
+- EqualGold.scount      the number of sermons linked to the SSG
+- EqualGold.hccount     the number of public historical collections the SSG is in
+- EqualGold.ssgcount    the number of links from the SSG to other SSGs
+- EqualGold.firstsig    the code of the first signature of its gold sermons
+- SermonDescr.sermocount    the number of links from the sermon to other sermons
+- Manuscript.manucount      the number of links from the manuscript to other manuscripts
+
+Each counter is recalculated for a set of ids with one UPDATE, whose new value is
+a correlated subquery. Only the rows whose value changes are written. Saving or
+deleting a row of a link table recalculates the counters it affects (see the
+signals in apps.py); the management command 'counters_rebuild' recalculates all.
+"""
+
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+
+
+def get_count(model_name, fk, **kwargs):
+    """Get the number of [model_name] rows whose [fk] points to the outer row (and that match [kwargs])"""
+
+    cls = apps.get_model("seeker", model_name)
+    qs = cls.objects.filter(**{fk: OuterRef('pk')}, **kwargs).order_by().values(fk).annotate(num=Count('id'))
+    return Coalesce(Subquery(qs.values('num')), 0)
+
+def get_firstsig():
+    """Get the code of the first signature of the gold sermons (NULL if there is none)"""
+
+    Signature = apps.get_model("seeker", "Signature")
+    qs = Signature.objects.filter(gold__equal=OuterRef('pk')).order_by('-editype', 'code').values('code')[:1]
+    return Subquery(qs)
+
+
+# Per model and field: the expression of its (new) value
+COUNTERS = {
+    'EqualGold': {
+        'sgcount':  lambda: get_count("SermonGold", "equal"),
+        'scount':   lambda: get_count("SermonDescrEqual", "super", sermon__isnull=False),
+        'hccount':  lambda: get_count("CollectionSuper", "super", collection__settype="hc", collection__scope="publ"),
+        'ssgcount': lambda: get_count("EqualGoldLink", "src", dst__isnull=False),
+        'firstsig': get_firstsig,
+        },
+    'SermonDescr': {
+        'sermocount': lambda: get_count("SermonDescrLink", "src", dst__isnull=False),
+        },
+    'Manuscript': {
+        'manucount': lambda: get_count("ManuscriptLink", "src", dst__isnull=False),
+        },
+    }
+
+# Per (sender) model: which counters change when one of its rows is saved or deleted,
+#   and how to get the ids of the objects whose counters change
+COUNTER_SOURCES = {
+    'SermonGold':       [('EqualGold', ['sgcount', 'firstsig'], lambda x: [x.equal_id])],
+    'Signature':        [('EqualGold', ['firstsig'], lambda x: [x.gold.equal_id])],
+    'SermonDescrEqual': [('EqualGold', ['scount'], lambda x: [x.super_id])],
+    'CollectionSuper':  [('EqualGold', ['hccount'], lambda x: [x.super_id])],
+    'Collection':       [('EqualGold', ['hccount'], lambda x: list(x.super_col.values_list('super_id', flat=True)))],
+    'EqualGoldLink':    [('EqualGold', ['ssgcount'], lambda x: [x.src_id, x.dst_id])],
+    'SermonDescrLink':  [('SermonDescr', ['sermocount'], lambda x: [x.src_id, x.dst_id])],
+    'ManuscriptLink':   [('Manuscript', ['manucount'], lambda x: [x.src_id, x.dst_id])],
+    }
+
+
+def update_counters(model_name, ids=None, fields=None):
+    """Recalculate the [fields] (default: all counters) of the [model_name] objects with [ids] (default: all)
+
+    Objects whose new value is NULL (e.g. an SSG without signatures for its firstsig)
+    keep their current value. Returns the number of values that have changed.
+    """
+
+    iChanged = 0
+    oErr = ErrHandle()
+    try:
+        cls = apps.get_model("seeker", model_name)
+        oCounters = COUNTERS[model_name]
+        if ids is not None:
+            ids = [x for x in set(ids) if x is not None]
+            if len(ids) == 0:
+                return iChanged
+        for field in (fields or list(oCounters.keys())):
+            value = oCounters[field]()
+            qs = cls.objects.all() if ids is None else cls.objects.filter(id__in=ids)
+            qs = qs.annotate(new_value=value).exclude(new_value__isnull=True).exclude(**{field: F('new_value')})
+            iChanged += qs.update(**{field: value})
+
+        # The node table of the link graph has the scount of every SSG
+        if iChanged > 0 and model_name == "EqualGold":
+            from passim.seeker.linkgraph import LINK_GRAPH
+            LINK_GRAPH.invalidate()
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("update_counters")
+    return iChanged
+
+def counters_changed(sender, instance, **kwargs):
+    """Recalculate the counters that depend on the [instance] that has been saved or deleted"""
+
+    oErr = ErrHandle()
+    try:
+        for model_name, fields, get_ids in COUNTER_SOURCES.get(sender.__name__, []):
+            try:
+                ids = get_ids(instance)
+            except:
+                # E.g. the object pointed to has been deleted along with [instance]
+                continue
+            update_counters(model_name, ids, fields)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("counters_changed")
@@ -0,0 +1,229 @@
+"""
+Full-text (FTS5 trigram) shadow index for the SEEKER app.
+
+SQLite has no index support for the __iregex filters that the list views use
+for wildcard searches on incipit, explicit and full text. This module keeps a
+shadow FTS5 table (trigram tokenizer) per model, so that a wildcard pattern can
+first be narrowed down to candidate rows with a MATCH query. The regular
+expression is then only evaluated for those candidates.
+
+The shadow tables are created and filled by the management command 'fts_rebuild',
+and kept in sync through the post_save and post_delete signals (see apps.py).
+Code that writes the searchable fields without save() (bulk_create, bulk_update or
+queryset.update() of srchincipit, srchexplicit or srchfulltext) sends no signals:
+it must call fts_reindex() for the rows it has written.
+"""
+
+import re
+import time
+from django.apps import apps
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+
+
+# The models (of the seeker app) and the searchable fields that get a shadow index
+FTS_MODELS = {
+    'SermonDescr':  ['srchincipit', 'srchexplicit', 'srchfulltext'],
+    'SermonGold':   ['srchincipit', 'srchexplicit'],
+    'EqualGold':    ['srchincipit', 'srchexplicit', 'srchfulltext']
+    }
+
+# The trigram tokenizer cannot match anything shorter than this
+FTS_MIN_LENGTH = 3
+
+# Spelling variants that adapt_regex_incexp() treats as equal
+FTS_FOLD = str.maketrans(dict(j="i", v="u", k="c"))
+
+
+def fold_text(sText):
+    """Reduce a (searchable) text to the normalized form stored in the shadow index"""
+
+    if sText == None:
+        return ""
+    sText = sText.lower().translate(FTS_FOLD)
+    # The 'ae' and 'e' variants are treated as equal
+    sText = re.sub(r"a+e", "e", sText)
+    return sText
+
+def fts_match_query(sPattern, column):
+    """Compile a user wildcard pattern into an FTS5 MATCH query for [column]
+
+    The wildcards '*', '?' and bracketed character classes split the pattern
+    into literal parts. Every literal part that is long enough for the trigram
+    tokenizer becomes a quoted string that must occur in [column].
+    Returns None if the pattern cannot be expressed (e.g. '*a*b*'), and for a
+    pattern with '#': that is a regular expression (see adapt_search), which is
+    left to the regex filter alone.
+    """
+
+    sBack = None
+    if sPattern == None or "#" in sPattern:
+        return sBack
+    lst_literal = []
+    for part in re.split(r"\[[^\]]*\]|[\*\?\[\]]", sPattern.strip()):
+        # A trailing 'a' may be folded together with an 'e' in the stored text
+        part = fold_text(part).rstrip("a")
+        if len(part.strip()) >= FTS_MIN_LENGTH:
+            lst_literal.append('"{}"'.format(part.replace('"', '""')))
+    if len(lst_literal) > 0:
+        sBack = "{} : ({})".format(column, " AND ".join(lst_literal))
+    return sBack
+
+
+class FullTextIndex():
+    """Shadow FTS5 index for one model"""
+
+    # Re-check a missing table at most this often (seconds)
+    recheck_interval = 60
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.fields = FTS_MODELS[model_name]
+        self.table = "seeker_fts_{}".format(model_name.lower())
+        self.available = None
+        self.checked = 0
+
+    def get_model(self):
+        return apps.get_model("seeker", self.model_name)
+
+    def is_available(self):
+        """Check whether the shadow table exists on this database"""
+
+        if self.available:
+            return True
+        if connection.vendor != "sqlite":
+            return False
+        if time.time() - self.checked > self.recheck_interval:
+            self.checked = time.time()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=%s", [self.table])
+                self.available = (cursor.fetchone() != None)
+        return self.available
+
+    def get_row(self, item):
+        """Get the folded values for one (id, field1, field2...) tuple"""
+
+        return [item[0]] + [fold_text(x) for x in item[1:]]
+
+    def rebuild(self, chunk_size = 2000):
+        """Create the shadow table from scratch and fill it from the model's table"""
+
+        oErr = ErrHandle()
+        count = 0
+        try:
+            sColumns = ", ".join(self.fields)
+            sParams = ", ".join(["%s"] * (len(self.fields) + 1))
+            sInsert = "INSERT INTO {} (rowid, {}) VALUES ({})".format(self.table, sColumns, sParams)
+            with connection.cursor() as cursor:
+                cursor.execute("DROP TABLE IF EXISTS {}".format(self.table))
+                cursor.execute("CREATE VIRTUAL TABLE {} USING fts5({}, tokenize='trigram')".format(self.table, sColumns))
+                lst_row = []
+                for item in self.get_model().objects.values_list('id', *self.fields).iterator(chunk_size=chunk_size):
+                    lst_row.append(self.get_row(item))
+                    if len(lst_row) >= chunk_size:
+                        cursor.executemany(sInsert, lst_row)
+                        count += len(lst_row)
+                        lst_row = []
+                if len(lst_row) > 0:
+                    cursor.executemany(sInsert, lst_row)
+                    count += len(lst_row)
+                cursor.execute("INSERT INTO {}({}) VALUES ('optimize')".format(self.table, self.table))
+            self.available = True
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("FullTextIndex/rebuild")
+        return count
+
+    def update_obj(self, instance):
+        """Replace the shadow row of one model instance"""
+
+        if not self.is_available() or instance.id == None:
+            return
+        item = [instance.id] + [getattr(instance, x) for x in self.fields]
+        sColumns = ", ".join(self.fields)
+        sParams = ", ".join(["%s"] * (len(self.fields) + 1))
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM {} WHERE rowid = %s".format(self.table), [instance.id])
+            cursor.execute("INSERT INTO {} (rowid, {}) VALUES ({})".format(self.table, sColumns, sParams),
+                           self.get_row(item))
+
+    def reindex(self, ids):
+        """Replace the shadow rows of the model instances with [ids]"""
+
+        if not self.is_available():
+            return 0
+        ids = list(ids)
+        sColumns = ", ".join(self.fields)
+        sParams = ", ".join(["%s"] * (len(self.fields) + 1))
+        sInsert = "INSERT INTO {} (rowid, {}) VALUES ({})".format(self.table, sColumns, sParams)
+        lst_row = [self.get_row(item) for item in self.get_model().objects.filter(id__in=ids).values_list('id', *self.fields)]
+        with connection.cursor() as cursor:
+            # Rows of objects that no longer exist are removed too
+            cursor.executemany("DELETE FROM {} WHERE rowid = %s".format(self.table), [[x] for x in ids])
+            if len(lst_row) > 0:
+                cursor.executemany(sInsert, lst_row)
+        return len(lst_row)
+
+    def delete_id(self, obj_id):
+        """Remove the shadow row of one model instance"""
+
+        if self.is_available() and obj_id != None:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM {} WHERE rowid = %s".format(self.table), [obj_id])
+
+    def get_q(self, dbfield, sPattern):
+        """Get a Q-expression that restricts [dbfield] to rows matching the wildcard [sPattern]
+
+        Returns None if the index cannot help, so that the caller falls back to regex only.
+        """
+
+        qBack = None
+        if dbfield in self.fields and self.is_available():
+            sMatch = fts_match_query(sPattern, dbfield)
+            if sMatch != None:
+                sSql = "SELECT rowid FROM {} WHERE {} MATCH %s".format(self.table, self.table)
+                qBack = Q(id__in=RawSQL(sSql, (sMatch,)))
+        return qBack
+
+
+# One index object per model
+FTS_INDEXES = {k: FullTextIndex(k) for k in FTS_MODELS}
+
+
+def fts_filter(model_name):
+    """Get the 'fts' function to be used in a [searches] filterlist item of a list view"""
+
+    oIndex = FTS_INDEXES[model_name]
+    return oIndex.get_q
+
+def fts_reindex(model_name, ids):
+    """Bring the shadow rows of the [model_name] objects with [ids] up to date (after a write without save())"""
+
+    count = 0
+    oErr = ErrHandle()
+    try:
+        count = FTS_INDEXES[model_name].reindex(ids)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("fts_reindex")
+    return count
+
+def fts_post_save(sender, instance, **kwargs):
+    oErr = ErrHandle()
+    try:
+        FTS_INDEXES[sender.__name__].update_obj(instance)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("fts_post_save")
+
+def fts_post_delete(sender, instance, **kwargs):
+    oErr = ErrHandle()
+    try:
+        FTS_INDEXES[sender.__name__].delete_id(instance.id)
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("fts_post_delete")
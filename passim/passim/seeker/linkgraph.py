@@ -0,0 +1,234 @@
+"""
+In-memory graph of the links between SSGs for the SEEKER app.
+
+The overlap network (EqualGoldOverlap) follows EqualGoldLink rows from one SSG
+up to a number of degrees, and labels every node it reaches with its signature,
+its Passim code, its size and its historical collections. Instead of asking the
+database for that on every request, the LinkGraph keeps, per process:
+
+- a node table: SSG id => signature, Passim code, scount and HC ids
+- the links in compressed sparse row (CSR) form: for node i the outgoing links
+  are the entries indptr[i] .. indptr[i+1] of the edge arrays (destination node,
+  link type, specification, alternatives, note)
+
+A version number in the cache is bumped when an EqualGoldLink (or anything that
+shows up in the node table) is saved or deleted (see apps.py), after which every
+process loads the graph again.
+"""
+
+import numpy as np
+from django.apps import apps
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle, CacheVersion
+from passim.seeker.models import SignatureResolver
+
+
+def get_passim_code(ssg_id, code):
+    """Get the short Passim code of an SSG (see get_ssg_passim)"""
+
+    if code == None:
+        return "eqg_{}".format(ssg_id)
+    elif " " in code:
+        return code.split(" ")[1]
+    return code
+
+
+class LinkGraph():
+    """Process-local CSR graph of all EqualGoldLink rows, with a node table"""
+
+    version_key = "passim_linkgraph_version"
+    recheck_interval = 10   # Seconds between two looks at the version in the cache
+
+    def __init__(self):
+        # SSG id => node index
+        self.index = None
+        # Per node: SSG id, signature, Passim code, scount, list of HC ids
+        self.ids = None
+        self.sigs = []
+        self.passims = []
+        self.scounts = None
+        self.hcs = []
+        # HC id => name
+        self.hc_names = {}
+        # Per node: start of its links in the edge arrays
+        self.indptr = None
+        # Per link: destination node, and indexes into [strings] (-1 for None)
+        self.dst = None
+        self.linktype = None
+        self.spectype = None
+        self.alternatives = None
+        self.notes = []
+        # The distinct values of linktype, spectype and alternatives
+        self.strings = []
+        self.cache_version = CacheVersion(self.version_key, self.recheck_interval)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def ensure(self):
+        """Make sure the graph is loaded and not out of date"""
+
+        self.cache_version.ensure(self.load)
+
+    def load(self, version):
+        EqualGold = apps.get_model("seeker", "EqualGold")
+        EqualGoldLink = apps.get_model("seeker", "EqualGoldLink")
+        CollectionSuper = apps.get_model("seeker", "CollectionSuper")
+
+        # The node table: one node per SSG
+        lst_ssg = list(EqualGold.objects.order_by('id').values_list('id', 'code', 'scount'))
+        index = {ssg_id: idx for idx, (ssg_id, code, scount) in enumerate(lst_ssg)}
+        ids = np.array([x[0] for x in lst_ssg], dtype=np.int64)
+        passims = [get_passim_code(ssg_id, code) for ssg_id, code, scount in lst_ssg]
+        scounts = np.array([x[2] for x in lst_ssg], dtype=np.int64)
+
+        # The most appropriate signature of each node
+        resolver = SignatureResolver()
+        resolver.fetch(list(index))
+        sigs = [resolver.get_best(ssg_id) for ssg_id in index]
+
+        # The historical collections per node
+        hcs = [[] for x in lst_ssg]
+        hc_names = {}
+        for ssg_id, hc_id, name in CollectionSuper.objects.filter(collection__settype="hc").order_by('id').values_list(
+                'super_id', 'collection_id', 'collection__name'):
+            idx = index.get(ssg_id)
+            if idx != None:
+                hcs[idx].append(hc_id)
+                hc_names[hc_id] = name
+
+        # The links, ordered by source: that makes them CSR right away
+        strings = []
+        dict_string = {}
+        def get_string_idx(sValue):
+            if sValue == None:
+                return -1
+            if not sValue in dict_string:
+                dict_string[sValue] = len(strings)
+                strings.append(sValue)
+            return dict_string[sValue]
+
+        lst_src = []
+        lst_dst = []
+        lst_linktype = []
+        lst_spectype = []
+        lst_alternatives = []
+        notes = []
+        for src, dst, linktype, spectype, alternatives, note in EqualGoldLink.objects.order_by('src', 'dst', 'id').values_list(
+                'src', 'dst', 'linktype', 'spectype', 'alternatives', 'note'):
+            if src in index and dst in index:
+                lst_src.append(index[src])
+                lst_dst.append(index[dst])
+                lst_linktype.append(get_string_idx(linktype))
+                lst_spectype.append(get_string_idx(spectype))
+                lst_alternatives.append(get_string_idx(alternatives))
+                notes.append(note)
+        counts = np.bincount(np.array(lst_src, dtype=np.int64), minlength=len(lst_ssg))
+        indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        self.ids = ids
+        self.sigs = sigs
+        self.passims = passims
+        self.scounts = scounts
+        self.hcs = hcs
+        self.hc_names = hc_names
+        self.indptr = indptr
+        self.dst = np.array(lst_dst, dtype=np.int32)
+        self.linktype = np.array(lst_linktype, dtype=np.int16)
+        self.spectype = np.array(lst_spectype, dtype=np.int16)
+        self.alternatives = np.array(lst_alternatives, dtype=np.int16)
+        self.notes = notes
+        self.strings = strings
+        self.index = index
+
+    def invalidate(self):
+        """Tell all processes that the links or the node table have changed"""
+
+        self.cache_version.invalidate()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def get_string(self, idx):
+        return None if idx < 0 else self.strings[idx]
+
+    def get_node(self, idx, group):
+        """Get the JSON node for node [idx] in [group]"""
+
+        return dict(label=self.sigs[idx], id=int(self.ids[idx]), group=group,
+                    passim=self.passims[idx], scount=int(self.scounts[idx]), hcs=list(self.hcs[idx]))
+
+    def get_link(self, e, src, link_dict, spec_dict):
+        """Get the JSON link for edge [e] from node [src]"""
+
+        spectype = self.get_string(self.spectype[e])
+        linktype = self.get_string(self.linktype[e])
+        alternatives = self.get_string(self.alternatives[e])
+        return dict(source=int(self.ids[src]),
+                    target=int(self.ids[self.dst[e]]),
+                    spectype="" if spectype == None else spectype,
+                    linktype=linktype,
+                    spec="" if spectype == None else spec_dict.get(spectype, ""),
+                    link=link_dict.get(linktype, ""),
+                    alternatives=False if alternatives == None else alternatives,
+                    note=self.notes[e],
+                    value=0)
+
+    def get_overlap(self, ssg_id, degree, link_dict, spec_dict):
+        """Get the overlap network of [ssg_id] up until [degree]
+
+        This gives the same nodes, links (with the number of times they are followed
+        as value) and order as the breadth-first search over the database did, but a
+        node that is reached more than once in one degree is only expanded once,
+        with its number of arrivals as weight.
+        """
+
+        node_set = {}
+        link_set = {}
+        hist_set = {}
+        oErr = ErrHandle()
+        try:
+            self.ensure()
+            idx = self.index.get(ssg_id)
+            if idx == None:
+                return [], [], hist_set
+
+            def add_nodeset(idx, group):
+                if not idx in node_set:
+                    node_set[idx] = self.get_node(idx, group)
+                    for hc_id in self.hcs[idx]:
+                        if not hc_id in hist_set:
+                            hist_set[hc_id] = self.hc_names[hc_id]
+
+            # Node index => number of arrivals, in the order of first arrival
+            dict_level = {idx: 1}
+            group = 1
+            while len(dict_level) > 0 and degree > 0:
+                dict_next = {}
+                for src, weight in dict_level.items():
+                    add_nodeset(src, group)
+                    for e in range(self.indptr[src], self.indptr[src + 1]):
+                        dst = int(self.dst[e])
+                        dict_next[dst] = dict_next.get(dst, 0) + weight
+                        link_key = (src, dst)
+                        if not link_key in link_set:
+                            link_set[link_key] = self.get_link(e, src, link_dict, spec_dict)
+                            add_nodeset(dst, group + 1)
+                        link_set[link_key]['value'] += weight
+                dict_level = dict_next
+                degree -= 1
+                group += 1
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("LinkGraph/get_overlap")
+        return list(node_set.values()), list(link_set.values()), hist_set
+
+
+# The link graph of this process
+LINK_GRAPH = LinkGraph()
+
+def link_graph_changed(sender, instance, **kwargs):
+    LINK_GRAPH.invalidate()
@@ -0,0 +1,34 @@
+"""
+Recalculate the denormalized counters of SSGs, sermons and manuscripts.
+
+Usage: python manage.py counters_rebuild [--model EqualGold] [--field scount]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+# ======= imports from my own application ======
+from passim.seeker.counters import COUNTERS, update_counters
+
+
+class Command(BaseCommand):
+    help = "Recalculate the counters (sgcount, scount, hccount, ssgcount, firstsig, sermocount, manucount) of all objects"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", choices=list(COUNTERS.keys()),
+                            help="Only recalculate the counters of this model (may be repeated)")
+        parser.add_argument("--field", action="append",
+                            help="Only recalculate this counter (may be repeated)")
+
+    def handle(self, *args, **options):
+        lst_model = options['model'] or list(COUNTERS.keys())
+        lst_field = options['field']
+        if lst_field:
+            lst_unknown = [x for x in lst_field if not any(x in COUNTERS[m] for m in lst_model)]
+            if len(lst_unknown) > 0:
+                raise CommandError("Unknown counter(s): {}".format(", ".join(lst_unknown)))
+        for model_name in lst_model:
+            for field in COUNTERS[model_name]:
+                if lst_field and not field in lst_field:
+                    continue
+                iChanged = update_counters(model_name, fields=[field])
+                self.stdout.write("{}.{}: {} changed".format(model_name, field, iChanged))
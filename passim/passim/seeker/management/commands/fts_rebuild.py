@@ -0,0 +1,28 @@
+"""
+Rebuild the FTS5 shadow indexes used for wildcard searching.
+
+Usage: python manage.py fts_rebuild [model ...]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# ======= imports from my own application ======
+from passim.seeker.fulltext import FTS_INDEXES
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text (FTS5 trigram) shadow indexes of SermonDescr, SermonGold and EqualGold"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help="Model names (default: all)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The full-text shadow index is only available for SQLite")
+        lst_model = options['models'] or list(FTS_INDEXES.keys())
+        for model_name in lst_model:
+            if not model_name in FTS_INDEXES:
+                raise CommandError("Unknown model: {}".format(model_name))
+            count = FTS_INDEXES[model_name].rebuild()
+            self.stdout.write("{}: {} rows indexed".format(model_name, count))
@@ -0,0 +1,19 @@
+"""
+Refresh the snapshot of the statistics shown on the home page.
+
+Usage: python manage.py statistics_refresh
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+# ======= imports from my own application ======
+from passim.seeker.models import Statistic
+
+
+class Command(BaseCommand):
+    help = "Recalculate the home page statistics (sermons, manuscripts and SSGs per stype)"
+
+    def handle(self, *args, **options):
+        if not Statistic.refresh():
+            raise CommandError("The statistics could not be refreshed")
+        self.stdout.write("{} statistics stored".format(Statistic.objects.count()))
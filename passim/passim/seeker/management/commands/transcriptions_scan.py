@@ -0,0 +1,23 @@
+"""
+Scan the server location for new or changed transcription files, parsing them in a pool of processes.
+
+The web pages only scan in a thread of their own, without a process pool: run this
+command (e.g. daily from cron) to have many changed files parsed in parallel.
+
+Usage: python manage.py transcriptions_scan
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+# ======= imports from my own application ======
+from passim.reader.views import scan_transcriptions
+
+
+class Command(BaseCommand):
+    help = "Scan for new or changed transcriptions (if it is time to do so) and read them into their AFs"
+
+    def handle(self, *args, **options):
+        oMsg = {}
+        if not scan_transcriptions(oMsg=oMsg, use_pool=True):
+            raise CommandError(oMsg.get('msg') or "The scan for transcriptions failed")
+        self.stdout.write("Scan for transcriptions finished")
@@ -0,0 +1,18 @@
+"""
+Trim the Visit rows of all users (run it regularly, e.g. from cron: requests do not trim the visits).
+
+Usage: python manage.py visit_maintenance
+"""
+
+from django.core.management.base import BaseCommand
+
+# ======= imports from my own application ======
+from passim.seeker.visits import VISIT_RECORDER
+
+
+class Command(BaseCommand):
+    help = "Trim the Visit rows of all users to at most VISIT_REDUCE"
+
+    def handle(self, *args, **options):
+        count = VISIT_RECORDER.maintain(force=True)
+        self.stdout.write("{} visits removed".format(count))
@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import passim.seeker.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seeker', '0218_sermondescrexternal_externaltextid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('colltype', models.CharField(max_length=100, verbose_name='Collection type')),
+                ('key', models.CharField(max_length=100, verbose_name='Filter key')),
+                ('count', models.IntegerField(default=0, verbose_name='Count')),
+                ('typecode', models.CharField(default='I', max_length=5, verbose_name='Type code')),
+                ('ids', models.BinaryField(default=b'', verbose_name='Packed ids')),
+                ('saved', models.DateTimeField(default=passim.seeker.models.get_current_datetime)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profile_searchresults', to='seeker.profile')),
+            ],
+        ),
+    ]
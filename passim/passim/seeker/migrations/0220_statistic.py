@@ -0,0 +1,24 @@
+# Generated by Django 4.1 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import passim.seeker.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seeker', '0219_searchresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stattype', models.CharField(max_length=100, verbose_name='Statistic type')),
+                ('key', models.CharField(max_length=100, verbose_name='Key')),
+                ('value', models.IntegerField(default=0, verbose_name='Value')),
+                ('saved', models.DateTimeField(default=passim.seeker.models.get_current_datetime)),
+            ],
+        ),
+    ]
@@ -3,11 +3,12 @@
 """
 from django.apps.config import AppConfig
 from django.apps import apps
-from django.db import models, transaction
+from django.db import models, transaction, connection
 from django.contrib.auth.models import User, Group
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.db.models.functions import Lower
 from django.db.models.query import QuerySet 
+from django.core.cache import cache
 from django.utils.html import mark_safe
 from django.utils import timezone
 from django.forms.models import model_to_dict
@@ -20,6 +21,10 @@ import sys, os, io, re
 import copy
 import json
 import time
+import threading
+from collections.abc import Sequence
+import hashlib
+from array import array
 import fnmatch
 import csv
 import math
@@ -38,8 +43,11 @@ from xml.dom import minidom
 
 # From this own application
 from passim.utils import *
-from passim.settings import APP_PREFIX, WRITABLE_DIR, TIME_ZONE, MEDIA_ROOT
+from passim.settings import APP_PREFIX, WRITABLE_DIR, TIME_ZONE, MEDIA_ROOT, USE_REDIS
+from passim.seeker.counters import update_counters
 from passim.seeker.excel import excel_to_list
+from passim.seeker.similarity import SimilarityIndex
+from passim.seeker.visits import VISIT_RECORDER, adapt_stack
 from passim.bible.models import Reference, Book, BKCHVS_LENGTH
 from passim.basic.models import Custom
 
@@ -52,6 +60,8 @@ ABBR_LENGTH = 5
 PASSIM_CODE_LENGTH = 20
 VISIT_MAX = 1400
 VISIT_REDUCE = 1000
+SEARCHRESULT_TTL = 3600         # Seconds during which a stored search result may be re-used
+STATISTIC_TTL = 900             # Seconds after which the home page statistics are refreshed anyway
 
 COLLECTION_SCOPE = "seeker.colscope"
 COLLECTION_TYPE = "seeker.coltype" 
@@ -137,9 +147,10 @@ class FieldChoice(models.Model):
         """Get the english name of the abbr"""
 
         sBack = "-"
-        obj = FieldChoice.objects.filter(field=field, abbr=abbr).first()
-        if obj != None:
-            sBack = obj.english_name
+        for oChoice in CHOICE_REGISTRY.get_choices(field):
+            if oChoice['field'] == field and oChoice['abbr'] == abbr:
+                sBack = oChoice['english_name']
+                break
         return sBack
         
 
@@ -181,7 +192,7 @@ class HelpChoice(models.Model):
         oErr = ErrHandle()
         sBack = ""
         try:
-            obj = HelpChoice.objects.filter(field__iexact=sField).first()
+            obj = CHOICE_REGISTRY.get_help(sField)
             if obj != None:
                 sBack = obj.get_text()
                 # Convert markdown to html
@@ -192,6 +203,111 @@ class HelpChoice(models.Model):
         return sBack
 
 
+class ChoiceRegistry():
+    """Process-local copy of all FieldChoice and HelpChoice objects
+
+    The whole table is read with one query per model, the first time it is needed.
+    A version number in the cache tells when a FieldChoice or HelpChoice has been
+    changed (in any process), after which the registry is read again.
+    """
+
+    version_key = "passim_choice_version"
+    recheck_interval = 10   # Seconds between two looks at the version in the cache
+
+    def __init__(self):
+        # Lower-case field name => list of dict(id, field, english_name, abbr, machine_value)
+        self.choices = None
+        # Lower-case field name => first HelpChoice object
+        self.helps = None
+        self.cache_version = CacheVersion(self.version_key, self.recheck_interval)
+
+    def ensure(self):
+        """Make sure the registry is loaded and not out of date"""
+
+        self.cache_version.ensure(self.load)
+
+    def load(self, version):
+        choices = {}
+        for oChoice in FieldChoice.objects.all().order_by('field', 'machine_value', 'id').values(
+                'id', 'field', 'english_name', 'abbr', 'machine_value'):
+            choices.setdefault(oChoice['field'].lower(), []).append(oChoice)
+        helps = {}
+        for obj in HelpChoice.objects.all().order_by('id'):
+            helps.setdefault(obj.field.lower(), obj)
+        self.choices = choices
+        self.helps = helps
+
+    def invalidate(self):
+        """Tell all processes that the choices or helps have changed"""
+
+        self.cache_version.invalidate()
+
+    def get_version(self):
+        self.ensure()
+        return self.cache_version.version
+
+    def get_choices(self, field):
+        """Get the FieldChoice dicts for [field] (case-insensitive), ordered by machine_value"""
+
+        self.ensure()
+        return self.choices.get(field.lower(), [])
+
+    def get_choice(self, field, num):
+        """Get the FieldChoice dict of [field] with machine_value [num], or None"""
+
+        num = int(num)
+        for oChoice in self.get_choices(field):
+            if oChoice['machine_value'] == num:
+                return oChoice
+        return None
+
+    def get_help(self, field):
+        """Get the first HelpChoice object for [field] (case-insensitive), or None"""
+
+        self.ensure()
+        return self.helps.get(field.lower())
+
+
+CHOICE_REGISTRY = ChoiceRegistry()
+
+def choice_registry_changed(sender, instance, **kwargs):
+    CHOICE_REGISTRY.invalidate()
+
+
+class LazyChoices(Sequence):
+    """Choices for a model field that are only read from the registry when used
+
+    The list is built again whenever the registry has been reloaded.
+    """
+
+    def __init__(self, builder, field, **kwargs):
+        self.builder = builder
+        self.field = field
+        self.kwargs = kwargs
+        self.version = None
+        self.choice_list = None
+
+    def get_list(self):
+        try:
+            version = CHOICE_REGISTRY.get_version()
+        except:
+            # E.g. the table does not exist yet: do not keep the fallback list
+            version = None
+        if self.choice_list == None or version == None or version != self.version:
+            self.choice_list = self.builder(self.field, **self.kwargs)
+            self.version = version
+        return self.choice_list
+
+    def __getitem__(self, idx):
+        return self.get_list()[idx]
+
+    def __len__(self):
+        return len(self.get_list())
+
+    def __repr__(self):
+        return repr(self.get_list())
+
+
 def get_reverse_spec(sSpec):
     """Given a SPECTYPE, provide the reverse one"""
 
@@ -206,6 +322,24 @@ def get_current_datetime():
     """Get the current time"""
     return timezone.now()
 
+def get_ordered(manager, *fields):
+    """Get the objects of the related [manager] like manager.all().order_by(*fields), but ordered in Python
+
+    The objects come from manager.all(), so that a prefetch_related() is used when there is one
+    (see the [download_prefetch] of the listviews). A '-' reverses the order of a field;
+    as in SQLite, None comes first.
+    """
+
+    lst_obj = list(manager.all())
+    for field in reversed(fields):
+        lst_path = field.lstrip("-").split("__")
+        def get_key(obj):
+            for name in lst_path:
+                obj = None if obj is None else getattr(obj, name)
+            return (not obj is None, obj)
+        lst_obj.sort(key=get_key, reverse=field.startswith("-"))
+    return lst_obj
+
 def get_default_loctype():
     """Get a default value for the loctype"""
 
@@ -293,9 +427,8 @@ def get_help(field):
     # find the correct instance in the database
     help_text = ""
     try:
-        entry_list = HelpChoice.objects.filter(field__iexact=field)
-        entry = entry_list[0]
         # Note: only take the first actual instance!!
+        entry = CHOICE_REGISTRY.get_help(field)
         help_text = entry.get_text()
     except:
         help_text = "Sorry, no help available for " + field
@@ -555,37 +688,31 @@ def build_choice_list(field, position=None, subcat=None, maybe_empty=False):
     unique_list = [];   # Check for uniqueness
 
     try:
-        # check if there are any options at all
-        if FieldChoice.objects == None:
-            # Take a default list
-            choice_list = [('0','-'),('1','N/A')]
-            unique_list = [('0','-'),('1','N/A')]
-        else:
-            if maybe_empty:
-                choice_list = [('0','-')]
-            for choice in FieldChoice.objects.filter(field__iexact=field):
-                # Default
-                sEngName = ""
-                # Any special position??
-                if position==None:
-                    sEngName = choice.english_name
-                elif position=='before':
-                    # We only need to take into account anything before a ":" sign
-                    sEngName = choice.english_name.split(':',1)[0]
-                elif position=='after':
-                    if subcat!=None:
-                        arName = choice.english_name.partition(':')
-                        if len(arName)>1 and arName[0]==subcat:
-                            sEngName = arName[2]
-
-                # Sanity check
-                if sEngName != "" and not sEngName in unique_list:
-                    # Add it to the REAL list
-                    choice_list.append((str(choice.machine_value),sEngName));
-                    # Add it to the list that checks for uniqueness
-                    unique_list.append(sEngName)
-
-            choice_list = sorted(choice_list,key=lambda x: x[1]);
+        if maybe_empty:
+            choice_list = [('0','-')]
+        for choice in CHOICE_REGISTRY.get_choices(field):
+            # Default
+            sEngName = ""
+            # Any special position??
+            if position==None:
+                sEngName = choice['english_name']
+            elif position=='before':
+                # We only need to take into account anything before a ":" sign
+                sEngName = choice['english_name'].split(':',1)[0]
+            elif position=='after':
+                if subcat!=None:
+                    arName = choice['english_name'].partition(':')
+                    if len(arName)>1 and arName[0]==subcat:
+                        sEngName = arName[2]
+
+            # Sanity check
+            if sEngName != "" and not sEngName in unique_list:
+                # Add it to the REAL list
+                choice_list.append((str(choice['machine_value']),sEngName));
+                # Add it to the list that checks for uniqueness
+                unique_list.append(sEngName)
+
+        choice_list = sorted(choice_list,key=lambda x: x[1]);
     except:
         print("Unexpected error:", sys.exc_info()[0])
         choice_list = [('0','-'),('1','N/A')];
@@ -603,37 +730,31 @@ def build_abbr_list(field, position=None, subcat=None, maybe_empty=False, exclud
     try:
         if exclude ==None:
             exclude = []
-        # check if there are any options at all
-        if FieldChoice.objects == None:
-            # Take a default list
-            choice_list = [('0','-'),('1','N/A')]
-            unique_list = [('0','-'),('1','N/A')]
-        else:
-            if maybe_empty:
-                choice_list = [('0','-')]
-            for choice in FieldChoice.objects.filter(field__iexact=field):
-                # Default
-                sEngName = ""
-                # Any special position??
-                if position==None:
-                    sEngName = choice.english_name
-                elif position=='before':
-                    # We only need to take into account anything before a ":" sign
-                    sEngName = choice.english_name.split(':',1)[0]
-                elif position=='after':
-                    if subcat!=None:
-                        arName = choice.english_name.partition(':')
-                        if len(arName)>1 and arName[0]==subcat:
-                            sEngName = arName[2]
-
-                # Sanity check
-                if sEngName != "" and not sEngName in unique_list and not (str(choice.abbr) in exclude):
-                    # Add it to the REAL list
-                    choice_list.append((str(choice.abbr),sEngName));
-                    # Add it to the list that checks for uniqueness
-                    unique_list.append(sEngName)
-
-            choice_list = sorted(choice_list,key=lambda x: x[1]);
+        if maybe_empty:
+            choice_list = [('0','-')]
+        for choice in CHOICE_REGISTRY.get_choices(field):
+            # Default
+            sEngName = ""
+            # Any special position??
+            if position==None:
+                sEngName = choice['english_name']
+            elif position=='before':
+                # We only need to take into account anything before a ":" sign
+                sEngName = choice['english_name'].split(':',1)[0]
+            elif position=='after':
+                if subcat!=None:
+                    arName = choice['english_name'].partition(':')
+                    if len(arName)>1 and arName[0]==subcat:
+                        sEngName = arName[2]
+
+            # Sanity check
+            if sEngName != "" and not sEngName in unique_list and not (str(choice['abbr']) in exclude):
+                # Add it to the REAL list
+                choice_list.append((str(choice['abbr']),sEngName));
+                # Add it to the list that checks for uniqueness
+                unique_list.append(sEngName)
+
+        choice_list = sorted(choice_list,key=lambda x: x[1]);
     except:
         print("Unexpected error:", sys.exc_info()[0])
         choice_list = [('0','-'),('1','N/A')];
@@ -642,14 +763,24 @@ def build_abbr_list(field, position=None, subcat=None, maybe_empty=False, exclud
     # We do not use defaults
     return choice_list;
 
+def lazy_choice_list(field, position=None, subcat=None, maybe_empty=False):
+    """Model field choices that call build_choice_list() only when they are used"""
+
+    return LazyChoices(build_choice_list, field, position=position, subcat=subcat, maybe_empty=maybe_empty)
+
+def lazy_abbr_list(field, position=None, subcat=None, maybe_empty=False, exclude=None):
+    """Model field choices that call build_abbr_list() only when they are used"""
+
+    return LazyChoices(build_abbr_list, field, position=position, subcat=subcat, maybe_empty=maybe_empty, exclude=exclude)
+
 def choice_english(field, num):
     """Get the english name of the field with the indicated machine_number"""
 
     try:
-        result_list = FieldChoice.objects.filter(field__iexact=field).filter(machine_value=num)
-        if (result_list == None):
-            return "(No results for "+field+" with number="+num
-        return result_list[0].english_name
+        oChoice = CHOICE_REGISTRY.get_choice(field, num)
+        if oChoice == None:
+            return "(empty)"
+        return oChoice['english_name']
     except:
         return "(empty)"
 
@@ -657,14 +788,16 @@ def choice_value(field, term):
     """Get the numerical value of the field with the indicated English name"""
 
     try:
-        result_list = FieldChoice.objects.filter(field__iexact=field).filter(english_name__iexact=term)
-        if result_list == None or result_list.count() == 0:
+        term = term.lower()
+        lst_choice = CHOICE_REGISTRY.get_choices(field)
+        result_list = [x for x in lst_choice if x['english_name'].lower() == term]
+        if len(result_list) == 0:
             # Try looking at abbreviation
-            result_list = FieldChoice.objects.filter(field__iexact=field).filter(abbr__iexact=term)
-        if result_list == None:
+            result_list = [x for x in lst_choice if x['abbr'].lower() == term]
+        if len(result_list) == 0:
             return -1
         else:
-            return result_list[0].machine_value
+            return result_list[0]['machine_value']
     except:
         return -1
 
@@ -672,10 +805,10 @@ def choice_abbreviation(field, num):
     """Get the abbreviation of the field with the indicated machine_number"""
 
     try:
-        result_list = FieldChoice.objects.filter(field__iexact=field).filter(machine_value=num)
-        if (result_list == None):
-            return "{}_{}".format(field, num)
-        return result_list[0].abbr
+        oChoice = CHOICE_REGISTRY.get_choice(field, num)
+        if oChoice == None:
+            return "-"
+        return oChoice['abbr']
     except:
         return "-"
 
@@ -1473,7 +1606,7 @@ class Report(models.Model):
     # [1] And a date: the date of saving this report
     created = models.DateTimeField(default=get_current_datetime)
     # [1] A report should have a type to know what we are reporting about
-    reptype = models.CharField("Report type", choices=build_abbr_list(REPORT_TYPE), max_length=6)
+    reptype = models.CharField("Report type", choices=lazy_abbr_list(REPORT_TYPE), max_length=6)
     # [0-1] A report should have some contents: stringified JSON
     contents = models.TextField("Contents", default="{}")
 
@@ -1543,16 +1676,16 @@ class Profile(models.Model):
     # [1] Every profile is linked to a user
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_profiles")
     # [1] Every user has a profile-status
-    ptype = models.CharField("Profile status", choices=build_abbr_list(PROFILE_TYPE), max_length=5, default="unk")
+    ptype = models.CharField("Profile status", choices=lazy_abbr_list(PROFILE_TYPE), max_length=5, default="unk")
     # [1] Every user has a stack: a list of visit objects
     stack = models.TextField("Stack", default = "[]")
 
     ## [1] Every Profile has a status to keep track of who edited it
-    #stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    #stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     ## [0-1] Status note
     #snote = models.TextField("Status note(s)", default="[]")
 
-    # [1] Stringified JSON lists for M/S/SG/SSG search results, to facilitate basket operations
+    # [1] Stringified JSON lists for M/S/SG/SSG search results (obsolete: see SearchResult)
     search_manu = models.TextField("Search results Manu", default = "[]")
     search_sermo = models.TextField("Search results Sermo", default = "[]")
     search_gold = models.TextField("Search results Gold", default = "[]")
@@ -1601,53 +1734,11 @@ class Profile(models.Model):
         """Process one visit in an adaptation of the stack"""
 
         oErr = ErrHandle()
-        bNeedSaving = False
         try:
-            # Check if this is a menu choice
-            if is_menu:
-                # Rebuild the stack
-                path_home = reverse("home")
-                oStack = []
-                oStack.append({'name': "Home", 'url': path_home })
-                if path != path_home:
-                    oStack.append({'name': name, 'url': path })
-                sStack = json.dumps(oStack)
-                if self.stack != sStack:
-                    self.stack = json.dumps(oStack)
-                    bNeedSaving = True
-            else:
-                # Unpack the current stack
-                lst_stack = json.loads(self.stack)
-                # Check if this path is already on the stack
-                bNew = True
-                for idx, item in enumerate(lst_stack):
-                    # Check if this item is on it already
-                    if item['url'] == path:
-                        # The url is on the stack, so cut off the stack from here
-                        lst_stack = lst_stack[0:idx+1]
-                        # But make sure to add any kwargs
-                        if kwargs != None:
-                            item['kwargs'] = kwargs
-                        bNew = False
-                        break
-                    elif item['name'] == name:
-                        # Replace the url
-                        item['url'] = path
-                        # But make sure to add any kwargs
-                        if kwargs != None:
-                            item['kwargs'] = kwargs
-                        bNew = False
-                        break
-                if bNew:
-                    # Add item to the stack
-                    lst_stack.append({'name': name, 'url': path })
-                sStack = json.dumps(lst_stack)
-                # Add changes
-                if self.stack != sStack:
-                    self.stack = json.dumps(lst_stack)
-                    bNeedSaving = True
+            sStack = json.dumps(adapt_stack(json.loads(self.stack), name, path, is_menu, **kwargs))
             # All should have been done by now...
-            if bNeedSaving:
+            if self.stack != sStack:
+                self.stack = sStack
                 self.save()
         except:
             msg = oErr.get_error_message()
@@ -1839,15 +1930,15 @@ class Profile(models.Model):
             oStack.append({'name': "Home", 'url': path_home })
             return oStack
         # Get the user
-        user = User.objects.filter(username=username).first()
-        # Get to the profile of this user
-        profile = Profile.objects.filter(user=user).first()
-        if profile == None:
+        user_id = VISIT_RECORDER.get_user_id(username)
+        # Get to the (cached) stack of this user
+        sStack = None if user_id == None else VISIT_RECORDER.get_stack(user_id)
+        if sStack == None:
             # Return an empty list
             return []
         else:
             # Return the stack as object (list)
-            return json.loads(profile.stack)
+            return json.loads(sStack)
 
     def get_user_profile(username):
         # Sanity check
@@ -2013,41 +2104,22 @@ class Visit(models.Model):
         return msg
 
     def add(username, name, path, is_menu = False, **kwargs):
-        """Add a visit from user [username]"""
+        """Add a visit from user [username]
+
+        The breadcrumb stack is kept in the cache and the Visit row (if any) is buffered:
+        both are written to the database by VISIT_RECORDER in batches.
+        """
 
         oErr = ErrHandle()
         try:
             # Sanity check
             if username == "": return True
             # Get the user
-            user = User.objects.filter(username=username).first()
-            # Adapt the path if there are kwargs
+            user_id = VISIT_RECORDER.get_user_id(username)
+            if user_id == None: return True
 
-            if Visit.bDebug:
-                # Add an item
-                obj = Visit(user=user, name=name, path=path)
-                obj.save()
-
-
-            # Get to the stack of this user
-            profile = Profile.objects.filter(user=user).first()
-            if profile == None:
-                # There is no profile yet, so make it
-                profile = Profile(user=user)
-                profile.save()
-
-            # Process this visit in the profile
-            profile.add_visit(name, path, is_menu, **kwargs)
-            # Possibly throw away an overflow of visit logs?
-            user_visit_count = Visit.objects.filter(user=user).count()
-            if user_visit_count > VISIT_MAX:
-                # Check how many to remove
-                removing = user_visit_count - VISIT_REDUCE
-                # Find the ID of the first one to remove
-                id_list = Visit.objects.filter(user=user).order_by('id').values('id')
-                below_id = id_list[removing]['id']
-                # Remove them
-                Visit.objects.filter(user=user, id__lte=below_id).delete()
+            # Process this visit in the stack and possibly log it
+            VISIT_RECORDER.add(user_id, name, path, is_menu, Visit.bDebug, **kwargs)
             # Return success
             result = True
         except:
@@ -2057,6 +2129,262 @@ class Visit(models.Model):
         # Return the result
         return result
 
+    def trim():
+        """Throw away the overflow of visit logs of all users"""
+
+        oErr = ErrHandle()
+        iCount = 0
+        try:
+            qs = Visit.objects.values('user').annotate(num=Count('id')).filter(num__gt=VISIT_MAX)
+            for oUser in qs:
+                # Check how many to remove
+                removing = oUser['num'] - VISIT_REDUCE
+                # Find the ID of the first one to remove
+                id_list = Visit.objects.filter(user=oUser['user']).order_by('id').values('id')
+                below_id = id_list[removing]['id']
+                # Remove them
+                iCount += Visit.objects.filter(user=oUser['user'], id__lte=below_id).delete()[0]
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("visit/trim")
+        return iCount
+
+
+class SearchResult(models.Model):
+    """The packed list of ids resulting from the latest M/S/SG/SSG listview search of a user
+    
+    When Redis is used, the object is only kept in the cache; otherwise it is kept in this table.
+    There is at most one SearchResult per profile and colltype. A stored result is only
+    re-used as long as no object of the seeker app has been saved or deleted since it
+    was calculated (see set_changed).
+    """
+
+    # [1] The profile (user) that did the search
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="profile_searchresults")
+    # [1] The type of list: manu, sermo, gold, super
+    colltype = models.CharField("Collection type", max_length=STANDARD_LENGTH)
+    # [1] Hash of the normalized filter that produced this result
+    key = models.CharField("Filter key", max_length=STANDARD_LENGTH)
+    # [1] Number of ids in the result
+    count = models.IntegerField("Count", default=0)
+    # [1] The typecode of the packed array ('I' or 'q')
+    typecode = models.CharField("Type code", max_length=5, default="I")
+    # [1] The ids, packed as a binary array
+    ids = models.BinaryField("Packed ids", default=b"")
+    # [1] When this result was calculated
+    saved = models.DateTimeField(default=get_current_datetime)
+
+    # Query parameters that do not influence the result set
+    skip_params = ['csrfmiddlewaretoken', 'page', 'paginate_by', 'w', 's']
+    # Models whose changes do not influence any result set
+    skip_models = ['SearchResult', 'Visit', 'Statistic', 'Profile', 'CollOverlap']
+    # The time of the latest change in the data
+    data_version = CacheVersion("passim_searchresult_version")
+
+    def __str__(self):
+        return "{}: {} ({})".format(self.colltype, self.count, self.key)
+
+    def get_cache_key(profile_id, colltype):
+        return "searchresult_{}_{}".format(profile_id, colltype)
+
+    def get_key(colltype, qd, username=""):
+        """Calculate a hash over the normalized filter in [qd]"""
+
+        lst_param = [colltype, username]
+        if qd != None:
+            for k in sorted(qd.keys()):
+                if k in SearchResult.skip_params: continue
+                lst_value = qd.getlist(k) if hasattr(qd, "getlist") else [qd[k]]
+                lst_value = [str(x) for x in lst_value if x != None and x != ""]
+                if len(lst_value) > 0:
+                    lst_param.append("{}={}".format(k, "|".join(lst_value)))
+        return hashlib.sha1("&".join(lst_param).encode("utf-8")).hexdigest()
+
+    def get_current(profile, colltype):
+        """Get the latest search result of [profile] for [colltype], if any"""
+
+        obj = None
+        if profile != None:
+            if USE_REDIS:
+                obj = cache.get(SearchResult.get_cache_key(profile.id, colltype))
+            else:
+                obj = SearchResult.objects.filter(profile=profile, colltype=colltype).first()
+        return obj
+
+    def get_data_version():
+        """Get the time of the latest change in the data (see set_changed)"""
+
+        return SearchResult.data_version.get()
+
+    def set_changed(sender, instance, **kwargs):
+        """Signal handler: an object has been saved or deleted, so stored results may be out of date"""
+
+        SearchResult.data_version.invalidate()
+
+    def store(profile, colltype, key, qs):
+        """Store the ids of [qs] as the current search result, unless it is still valid"""
+
+        oErr = ErrHandle()
+        obj = None
+        try:
+            if profile == None:
+                return obj
+            obj = SearchResult.get_current(profile, colltype)
+            if obj != None and obj.key == key and not obj.is_expired() and \
+               obj.saved.timestamp() > SearchResult.get_data_version():
+                # The stored result may be re-used: nothing has changed since it was calculated
+                return obj
+
+            # Get and pack the ids (a change while reading them makes the result out of date)
+            saved = get_current_datetime()
+            lst_id = list(qs.values_list('id', flat=True))
+            typecode = "I" if len(lst_id) == 0 or max(lst_id) < 2**32 else "q"
+            packed = array(typecode, lst_id).tobytes()
+
+            if obj == None:
+                obj = SearchResult(profile=profile, colltype=colltype)
+            obj.key = key
+            obj.count = len(lst_id)
+            obj.typecode = typecode
+            obj.ids = packed
+            obj.saved = saved
+            if USE_REDIS:
+                cache.set(SearchResult.get_cache_key(profile.id, colltype), obj, SEARCHRESULT_TTL)
+            else:
+                obj.save()
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SearchResult/store")
+        return obj
+
+    def is_expired(self):
+        return (get_current_datetime() - self.saved).total_seconds() > SEARCHRESULT_TTL
+
+    def get_ids(self, start=0, end=None):
+        """Get the ids from position [start] up to (not including) [end]"""
+
+        itemsize = array(self.typecode).itemsize
+        if end == None or end > self.count: end = self.count
+        if start < 0: start = 0
+        arIds = array(self.typecode)
+        if start < end:
+            arIds.frombytes(bytes(self.ids[start * itemsize:end * itemsize]))
+        return arIds.tolist()
+
+
+class Statistic(models.Model):
+    """Snapshot of one of the counts that are shown on the home page
+
+    The snapshot is filled with one GROUP BY query per model (see refresh()).
+    Saving or deleting a sermon, manuscript or SSG marks it as stale, and the
+    home page then has it refreshed in the background.
+    """
+
+    # [1] The kind of statistic: 'count' (totals), 'sermo', 'super', 'manu' (per stype)
+    stattype = models.CharField("Statistic type", max_length=STANDARD_LENGTH)
+    # [1] The key within the type: the name of a total or an stype abbreviation
+    key = models.CharField("Key", max_length=STANDARD_LENGTH)
+    # [1] The number of items
+    value = models.IntegerField("Value", default=0)
+    # [1] When this value was calculated
+    saved = models.DateTimeField(default=get_current_datetime)
+
+    stale_key = "passim_statistic_stale"
+    busy_key = "passim_statistic_busy"
+    min_age = 60            # Seconds a snapshot is used, even when stale
+
+    def __str__(self):
+        sBack = "{}/{}: {}".format(self.stattype, self.key, self.value)
+        return sBack
+
+    def refresh():
+        """Calculate all statistics anew and replace the snapshot"""
+
+        oErr = ErrHandle()
+        bResult = True
+        try:
+            cache.delete(Statistic.stale_key)
+            oCount = dict(sermon=0, manu=0, ssg=0)
+            oStat = dict(sermo={}, super={}, manu={})
+
+            # Sermons: templates without msitem are not counted in the chart, all templates not in the total
+            qs = SermonDescr.objects.order_by().values('mtype', 'stype').annotate(
+                num=Count('id'), nomsitem=Count('id', filter=Q(msitem__isnull=True)))
+            for oItem in qs:
+                if oItem['mtype'] == "tem":
+                    num = oItem['num'] - oItem['nomsitem']
+                else:
+                    num = oItem['num']
+                    oCount['sermon'] += num
+                oStat['sermo'][oItem['stype']] = oStat['sermo'].get(oItem['stype'], 0) + num
+
+            # Manuscripts: templates are not counted
+            qs = Manuscript.objects.exclude(mtype="tem").order_by().values('stype').annotate(num=Count('id'))
+            for oItem in qs:
+                oCount['manu'] += oItem['num']
+                oStat['manu'][oItem['stype']] = oItem['num']
+
+            # SSGs: the total includes all, the chart only the accepted ones that have not been moved
+            qs = EqualGold.objects.order_by().values('stype').annotate(
+                num=Count('id'), current=Count('id', filter=Q(moved__isnull=True, atype='acc')))
+            for oItem in qs:
+                oCount['ssg'] += oItem['num']
+                oStat['super'][oItem['stype']] = oItem['current']
+
+            oStat['count'] = oCount
+            lst_stat = []
+            for stattype, oValue in oStat.items():
+                for key, value in oValue.items():
+                    lst_stat.append(Statistic(stattype=stattype, key=key, value=value))
+            with transaction.atomic():
+                Statistic.objects.all().delete()
+                Statistic.objects.bulk_create(lst_stat)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("Statistic/refresh")
+            bResult = False
+        return bResult
+
+    def get_snapshot():
+        """Get the statistics as dictionary: stattype => (key => value)"""
+
+        lst_stat = list(Statistic.objects.all())
+        if len(lst_stat) == 0:
+            # There is no snapshot at all yet
+            Statistic.refresh()
+            lst_stat = list(Statistic.objects.all())
+        oBack = dict(count={}, sermo={}, super={}, manu={})
+        dtOldest = None
+        for obj in lst_stat:
+            oBack.setdefault(obj.stattype, {})[obj.key] = obj.value
+            if dtOldest == None or obj.saved < dtOldest:
+                dtOldest = obj.saved
+        # Possibly let the snapshot be refreshed
+        if dtOldest != None:
+            age = (get_current_datetime() - dtOldest).total_seconds()
+            if age > STATISTIC_TTL or (age > Statistic.min_age and cache.get(Statistic.stale_key) != None):
+                Statistic.refresh_background()
+        return oBack
+
+    def refresh_background():
+        """Refresh the snapshot in a thread, unless some process is already doing so"""
+
+        def do_refresh():
+            try:
+                Statistic.refresh()
+            finally:
+                cache.delete(Statistic.busy_key)
+                connection.close()
+
+        if cache.add(Statistic.busy_key, get_current_datetime(), STATISTIC_TTL):
+            thread = threading.Thread(target=do_refresh, daemon=True)
+            thread.start()
+
+    def set_stale(sender, instance, **kwargs):
+        """Signal handler: a sermon, manuscript or SSG has been changed"""
+
+        cache.set(Statistic.stale_key, True, None)
+
 
 class Stype(models.Model):
     """Status of M/S/SG/SSG"""
@@ -2099,7 +2427,7 @@ class Location(models.Model):
     loctype = models.ForeignKey(LocationType, on_delete=models.SET_DEFAULT, default=get_default_loctype, related_name="loctypelocations")
 
     # [1] Every Library has a status to keep track of who edited it
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
@@ -2401,7 +2729,7 @@ class Library(models.Model):
     # [1] Name of the library
     name = models.CharField("Library", max_length=LONG_STRING)
     # [1] Has this library been bracketed?
-    libtype = models.CharField("Library type", choices=build_abbr_list(LIBRARY_TYPE), max_length=5)
+    libtype = models.CharField("Library type", choices=lazy_abbr_list(LIBRARY_TYPE), max_length=5)
 
     # ============= These fields should be removed sooner or later ===================
     # [1] Name of the city this is in
@@ -2412,7 +2740,7 @@ class Library(models.Model):
     # ================================================================================
 
     # [1] Every Library has a status to keep track of who edited it
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
@@ -3495,9 +3823,9 @@ class Keyword(models.Model):
     # [1] Obligatory text of a keyword
     name = models.CharField("Name", max_length=LONG_STRING)
     # [1] Every keyword has a visibility - default is 'all'
-    visibility = models.CharField("Visibility", choices=build_abbr_list(VISIBILITY_TYPE), max_length=5, default="all")
+    visibility = models.CharField("Visibility", choices=lazy_abbr_list(VISIBILITY_TYPE), max_length=5, default="all")
     # [1] Every keyword has a visibility - default is 'all'
-    category = models.CharField("Category", choices=build_abbr_list(KEYWORD_CATEGORY), max_length=5, default="con")
+    category = models.CharField("Category", choices=lazy_abbr_list(KEYWORD_CATEGORY), max_length=5, default="con")
     # [0-1] Further details are perhaps required too
     description = models.TextField("Description", blank=True, null=True)
 
@@ -3899,7 +4227,7 @@ class Manuscript(models.Model):
     raw = models.TextField("Raw", null=True, blank=True)
 
     # [1] Every manuscript has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
     # [1] And a date: the date of saving this manuscript
@@ -3917,7 +4245,7 @@ class Manuscript(models.Model):
     # [1] Every manuscript may be a manifestation (default) or a template (optional)
     #     The third alternative is: a reconstruction
     #     So the options: 'man', 'tem', 'rec'
-    mtype = models.CharField("Manifestation type", choices=build_abbr_list(MANIFESTATION_TYPE), max_length=5, default="man")
+    mtype = models.CharField("Manifestation type", choices=lazy_abbr_list(MANIFESTATION_TYPE), max_length=5, default="man")
     # [1] Imported manuscripts need to have a codico check
     itype = models.CharField("Import codico status", max_length=MAX_TEXT_LEN, default="no")
 
@@ -4512,13 +4840,15 @@ class Manuscript(models.Model):
             profile = kwargs.get("profile")
             username = kwargs.get("username")
             team_group = kwargs.get("team_group")
+            # The download context, as passed on via custom_getkv(): the same for all objects of a download
+            context = kwargs.get("kwargs", {}).get("kwargs")
 
             if path == "keywords":
                 sBack = self.get_keywords_markdown(plain=True)
             elif path == "keywordsU":
                 sBack =  self.get_keywords_user_markdown(profile, plain=True)
             elif path == "datasets":
-                sBack = self.get_collections_markdown(username, team_group, settype="pd", plain=True)
+                sBack = self.get_collections_markdown(username, team_group, settype="pd", plain=True, cache=context)
             elif path == "literature":
                 sBack = self.get_litrefs_markdown(plain=True)
             elif path == "external_links":
@@ -4823,12 +5153,12 @@ class Manuscript(models.Model):
             oErr.DoError("get_city")
         return city
 
-    def get_collections_markdown(self, username, team_group, settype = None, plain=False):
+    def get_collections_markdown(self, username, team_group, settype = None, plain=False, cache=None):
 
         lHtml = []
         # Visit all collections that I have access to
-        mycoll__id = Collection.get_scoped_queryset('manu', username, team_group, settype = settype).values('id')
-        for col in self.collections.filter(id__in=mycoll__id).order_by('name'):
+        mycoll__id = Collection.get_scoped_ids('manu', username, team_group, settype, cache)
+        for col in [x for x in get_ordered(self.collections, 'name') if x.id in mycoll__id]:
             if plain:
                 lHtml.append(col.name)
             else:
@@ -4903,6 +5233,34 @@ class Manuscript(models.Model):
 
         return ", ".join(lhtml)
 
+    def get_dates_overall(manu_ids):
+        """Get a dictionary manu_id: overall date range (as get_dates(True)) for a list of manuscripts"""
+
+        oBack = {}
+        oRange = {}
+        for item in Daterange.objects.filter(codico__manuscript_id__in=manu_ids).values(
+                'codico__manuscript_id', 'yearstart', 'yearfinish'):
+            min_date, max_date = oRange.get(item['codico__manuscript_id'], (3000, 0))
+            if not item['yearstart'] is None and item['yearstart'] < min_date: min_date = item['yearstart']
+            if not item['yearfinish'] is None and item['yearfinish'] > max_date: max_date = item['yearfinish']
+            oRange[item['codico__manuscript_id']] = (min_date, max_date)
+        for manu_id in manu_ids:
+            min_date, max_date = oRange.get(manu_id, (3000, 0))
+            if min_date < 3000:
+                if max_date > 0:
+                    if min_date == max_date:
+                        sDate = "{}".format(min_date)
+                    else:
+                        sDate = "{}-{}".format(min_date, max_date)
+                else:
+                    sDate = "{}".format(min_date)
+            elif max_date > 0:
+                sDate = "{}".format(max_date)
+            else:
+                sDate = "-"
+            oBack[manu_id] = sDate
+        return oBack
+
     def get_date_markdown(self, plain=False):
         """Get the date ranges as a HTML string"""
 
@@ -4911,7 +5269,8 @@ class Manuscript(models.Model):
         oErr = ErrHandle()
         try:
             # Get all the date ranges in the correct order
-            qs = Daterange.objects.filter(codico__manuscript=self).order_by('yearstart')
+            qs = [x for codico in self.manuscriptcodicounits.all() for x in codico.codico_dateranges.all()]
+            qs.sort(key=lambda x: x.yearstart)
             # Walk the date range objects
             for obj in qs:
                 ref = ""
@@ -4943,7 +5302,7 @@ class Manuscript(models.Model):
 
     def get_external_markdown(self, plain=False):
         lHtml = []
-        for obj in self.manuscriptexternals.all().order_by('url'):
+        for obj in get_ordered(self.manuscriptexternals, 'url'):
             url = obj.url
             if plain:
                 lHtml.append(obj.url)
@@ -5000,7 +5359,7 @@ class Manuscript(models.Model):
     def get_keywords_markdown(self, plain=False): 
         lHtml = []
         # Visit all keywords
-        for keyword in self.keywords.all().order_by('name'): # zo bij get_project_markdown
+        for keyword in get_ordered(self.keywords, 'name'): # zo bij get_project_markdown
             if plain:
                 lHtml.append(keyword.name)
             else:
@@ -5018,7 +5377,8 @@ class Manuscript(models.Model):
     def get_keywords_user_markdown(self, profile, plain=False):
         lHtml = []
         # Visit all keywords
-        for kwlink in self.manu_userkeywords.filter(profile=profile).order_by('keyword__name'):
+        profile_id = None if profile is None else profile.id
+        for kwlink in [x for x in get_ordered(self.manu_userkeywords, 'keyword__name') if x.profile_id == profile_id]:
             keyword = kwlink.keyword
             if plain:
                 lHtml.append(keyword.name)
@@ -5069,7 +5429,7 @@ class Manuscript(models.Model):
             #    'sermon__msitem__codico__order', 'sermon__msitem__order').values(
             #    'super__code')
 
-            qs = self.sermondescr_super.all().order_by('sermon__msitem__codico__order', 'sermon__msitem__order')
+            qs = get_ordered(self.sermondescr_super, 'sermon__msitem__codico__order', 'sermon__msitem__order')
             # Try to get the AF of each SermonDescr
             for obj in qs:
                 lHtml.append(obj.super.get_code())
@@ -5090,7 +5450,7 @@ class Manuscript(models.Model):
         sBack = ""
         try:
             # Visit all literature references
-            for litref in self.manuscript_litrefs.all().order_by('reference__short'):
+            for litref in get_ordered(self.manuscript_litrefs, 'reference__short'):
                 if plain:
                     lHtml.append(litref.get_short_markdown(plain))
                 else:
@@ -5202,9 +5562,10 @@ class Manuscript(models.Model):
 
     def get_projects(self, plain=False):
         sBack = "-" 
-        if self.projects.count() > 0:
+        lst_project = get_ordered(self.projects, "name")
+        if len(lst_project) > 0:
             html = []
-            for obj in self.projects.all().order_by("name"):
+            for obj in lst_project:
                 html.append(obj.name)
             if plain:
                 sBack = json.dumps(html)
@@ -6223,12 +6584,9 @@ class Manuscript(models.Model):
         return oBack
 
     def set_manucount(self):
-        # Calculate and set the manucount
-        manucount = self.manucount
-        iSize = self.relations.count()
-        if iSize != manucount:
-            self.manucount = iSize
-            self.save()
+        # Calculate and set the manucount (see counters.py)
+        if update_counters("Manuscript", [self.id], ['manucount']) > 0:
+            self.refresh_from_db(fields=['manucount'])
         return True
 
     def set_projects(self, projects):
@@ -6281,7 +6639,7 @@ class Codico(models.Model):
     # =============================================================================================
 
     # [1] Every codicological unit has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
     # [1] And a date: the date of saving this manuscript
@@ -6766,7 +7124,7 @@ class Codico(models.Model):
     def get_keywords_markdown(self, plain=False):
         lHtml = []
         # Visit all keywords
-        for keyword in self.keywords.all().order_by('name'):
+        for keyword in get_ordered(self.keywords, 'name'):
             if plain:
                 lHtml.append(keyword.name)
             else:
@@ -7396,9 +7754,9 @@ class EqualGold(models.Model, Custom):
     edinote = models.TextField("Edition note", null=True, blank=True)
 
     # [1] Every SSG has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="-")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="-")
     # [1] Every SSG has an approval type
-    atype = models.CharField("Approval", choices=build_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
+    atype = models.CharField("Approval", choices=lazy_abbr_list(APPROVAL_TYPE), max_length=5, default="def")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
         
@@ -7515,15 +7873,14 @@ class EqualGold(models.Model, Custom):
                         # Now save myself with the new code
                         self.code = passim_code
 
-            # (Re) calculate the number of associated historical collections (for *all* users!!)
-            if self.id != None:
-                hccount = self.collections.filter(settype="hc", scope='publ').count()
-                if hccount != self.hccount:
-                    self.hccount = hccount
+            # NOTE: the hccount is recalculated through a signal when collections change (see seeker/apps.py)
 
             # Do the saving initially
             response = super(EqualGold, self).save(force_insert, force_update, using, update_fields)
 
+            # Keep the incipit/explicit similarity index up to date (it is written at the end of the request)
+            SimilarityIndex.get_index().update_item(self.id, self.srchincipit, self.srchexplicit)
+
             # Are we in save_lock?
             if not self.save_lock:
                 self.save_lock = True
@@ -7674,6 +8031,8 @@ class EqualGold(models.Model, Custom):
             profile = kwargs.get("profile")
             username = kwargs.get("username")
             team_group = kwargs.get("team_group")
+            # The download context, as passed on via custom_getkv(): the same for all objects of a download
+            context = kwargs.get("kwargs", {}).get("kwargs")
 
             # Use if - elif - else to check the *path* defined in *specification*
             if path == "signatures":
@@ -7683,7 +8042,7 @@ class EqualGold(models.Model, Custom):
             elif path == "keywords":
                 sBack = self.get_keywords_markdown(plain=True)
             elif path == "collections":
-                sBack = self.get_collections_markdown(username=username, team_group=team_group, plain=True)
+                sBack = self.get_collections_markdown(username=username, team_group=team_group, plain=True, cache=context)
             elif path == "projects":
                 sBack = self.get_project_markdown2(plain=True)
             elif path == "comments":
@@ -7841,12 +8200,12 @@ class EqualGold(models.Model, Custom):
         sBack = self.code
       return sBack
 
-    def get_collections_markdown(self, username, team_group, settype = None, plain=False):
+    def get_collections_markdown(self, username, team_group, settype = None, plain=False, cache=None):
 
         lHtml = []
         # Visit all collections that I have access to
-        mycoll__id = Collection.get_scoped_queryset('super', username, team_group, settype = settype).values('id')
-        for col in self.collections.filter(id__in=mycoll__id).order_by('name'):
+        mycoll__id = Collection.get_scoped_ids('super', username, team_group, settype, cache)
+        for col in [x for x in get_ordered(self.collections, 'name') if x.id in mycoll__id]:
             # Previous code: this provides a section of the SSG *list* view
             # url = "{}?ssg-collist_ssg={}".format(reverse('equalgold_list'), col.id)
             # EK: what the user expects is a link to the Collection *details* view
@@ -7966,7 +8325,7 @@ class EqualGold(models.Model, Custom):
     def get_keywords_markdown(self, plain=False):
         lHtml = []
         # Visit all keywords
-        for keyword in self.keywords.all().order_by('name'):
+        for keyword in get_ordered(self.keywords, 'name'):
             if plain:
                 lHtml.append(keyword.name)
             else:
@@ -8094,7 +8453,7 @@ class EqualGold(models.Model, Custom):
     def get_project_markdown2(self, plain=False): 
         lHtml = []
         # Visit all project items
-        for project2 in self.projects.all().order_by('name'):
+        for project2 in get_ordered(self.projects, 'name'):
             if plain:
                 lHtml.append(project2.name)
             else:
@@ -8116,18 +8475,12 @@ class EqualGold(models.Model, Custom):
             sBack = "<span class='badge signature {}'>{}</span>".format(first.editype, first.short())
         return sBack
 
-    def get_goldsig_dct(self):
+    def get_goldsig_dct(self, resolver=None):
         """Get the best signature according to DCT rules"""
 
-        sBack = ""
-        first = None
-        editype_preferences = ['gr', 'cl', 'ot']
-        for editype in editype_preferences:
-            siglist = Signature.objects.filter(gold__equal=self, editype=editype).order_by('code').values('code')
-            if len(siglist) > 0:
-                code = siglist[0]['code']
-                sBack = "{}: {}".format(editype, code)
-                break
+        if resolver == None:
+            resolver = SIGNATURE_RESOLVER
+        sBack = resolver.get_best_dct(self.id, ellipsis=False)
         return sBack
     
     def get_passimcode(self):
@@ -8179,12 +8532,15 @@ class EqualGold(models.Model, Custom):
 
     def get_signatures_markdown_equal(self, plain=False):
         lHtml = []
+        # The signatures of all my gold sermons, ordered by code
+        lst_sig = [sig for gold in self.equal_goldsermons.all() for sig in gold.goldsignatures.all()]
+        lst_sig.sort(key=lambda x: x.code)
         # The prefered sequence of codes (Gryson, Clavis, Other)
         editype_pref_seq = ['gr', 'cl', 'ot']
         # Use the prefered sequence of codes 
         for editype in editype_pref_seq:        
             # Visit all signatures 
-            sublist = Signature.objects.filter(gold__equal=self, editype=editype).order_by('code')
+            sublist = [x for x in lst_sig if x.editype == editype]
             for sig in sublist:
                 if plain:
                     lHtml.append(sig.code)
@@ -8417,39 +8773,22 @@ class EqualGold(models.Model, Custom):
         return iNumber
 
     def set_firstsig(self):
-        # Calculate the first signature
-        first = Signature.objects.filter(gold__equal=self).order_by('-editype', 'code').first()
-        if first != None:
-            firstsig = first.code
-            if self.firstsig != firstsig:
-                self.firstsig = firstsig
-                # Save changes
-                self.save()
+        # Calculate the first signature (see counters.py)
+        if update_counters("EqualGold", [self.id], ['firstsig']) > 0:
+            self.refresh_from_db(fields=['firstsig'])
         return True
 
     def set_sgcount(self):
-        iChanges = 0
-        oErr = ErrHandle()
-        try:
-            # Calculate and set the sgcount
-            sgcount = self.sgcount
-            iSize = self.equal_goldsermons.all().count()
-            if iSize != sgcount:
-                self.sgcount = iSize
-                self.save()
-                iChanges += 1
-        except:
-            msg = oErr.get_error_message()
-            oErr.DoError("set_sgcount")
+        # Calculate and set the sgcount (see counters.py)
+        iChanges = update_counters("EqualGold", [self.id], ['sgcount'])
+        if iChanges > 0:
+            self.refresh_from_db(fields=['sgcount'])
         return iChanges
 
     def set_ssgcount(self):
-        # Calculate and set the ssgcount
-        ssgcount = self.ssgcount
-        iSize = self.relations.count()
-        if iSize != ssgcount:
-            self.ssgcount = iSize
-            self.save()
+        # Calculate and set the ssgcount (see counters.py)
+        if update_counters("EqualGold", [self.id], ['ssgcount']) > 0:
+            self.refresh_from_db(fields=['ssgcount'])
         return True
 
 
@@ -8480,7 +8819,7 @@ class SermonGold(models.Model):
     retractationes = models.TextField("Retractationes", null=True, blank=True)
 
     # [1] Every gold sermon has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default=STYPE_MANUAL)
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default=STYPE_MANUAL)
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
 
@@ -8521,12 +8860,9 @@ class SermonGold(models.Model):
         return self.collections_gold.all().order_by("name")
 
     def delete(self, using = None, keep_parents = False):
-        # Remember the equal set
-        equal = self.equal
         # DO the removing
         response = super(SermonGold, self).delete(using, keep_parents)
-        # Adjust the SGcount
-        equal.set_sgcount()
+        # NOTE: the sgcount of the equal set is adjusted through a signal (see seeker/apps.py)
         # REturn our response
         return response
 
@@ -8972,8 +9308,11 @@ class SermonGold(models.Model):
                 obj.save()
         return True
 
-    def link_oview(self):
-        """provide an overview of links from this gold sermon to others"""
+    def link_oview(self, counts=None):
+        """provide an overview of links from this gold sermon to others
+        
+        The optional [counts] dictionary (linktype: count) comes from SermonGold.get_link_counts()
+        """
 
         link_list = [
             {'abbr': 'eqs', 'class': 'eqs-link', 'count': 0, 'title': 'Is equal to' },
@@ -8985,10 +9324,22 @@ class SermonGold(models.Model):
         lHtml = []
         for link_def in link_list:
             lt = link_def['abbr']
-            links = SermonGoldSame.objects.filter(src=self, linktype=lt).count()
+            if counts is None:
+                links = SermonGoldSame.objects.filter(src=self, linktype=lt).count()
+            else:
+                links = counts.get(lt, 0)
             link_def['count'] = links
         return link_list
 
+    def get_link_counts(gold_ids):
+        """Get a dictionary gold_id: {linktype: count} for a list of gold sermons"""
+
+        oBack = {}
+        qs = SermonGoldSame.objects.filter(src_id__in=gold_ids).values('src_id', 'linktype').annotate(count=models.Count('id'))
+        for item in qs:
+            oBack.setdefault(item['src_id'], {})[item['linktype']] = item['count']
+        return oBack
+
     def read_gold(username, data_file, filename, arErr, objStat=None, xmldoc=None, sName = None):
         """Import an Excel file with golden sermon data and add it to the DB
         
@@ -9301,11 +9652,11 @@ class EqualGoldLink(models.Model):
     # [1] It equals equalgoldgroup [dst]
     dst = models.ForeignKey(EqualGold, related_name="equalgold_dst", on_delete=models.CASCADE)
     # [1] Each gold-to-gold link must have a linktype, with default "equal"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE), max_length=5, default=LINK_EQUAL)
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE), max_length=5, default=LINK_EQUAL)
     # [0-1] Specification of directionality and source
-    spectype = models.CharField("Specification", null=True,blank=True, choices=build_abbr_list(SPEC_TYPE), max_length=5)
+    spectype = models.CharField("Specification", null=True,blank=True, choices=lazy_abbr_list(SPEC_TYPE), max_length=5)
     # [0-1] Alternatives
-    alternatives = models.CharField("Alternatives", null=True,blank=True, choices=build_abbr_list(YESNO_TYPE), max_length=5)
+    alternatives = models.CharField("Alternatives", null=True,blank=True, choices=lazy_abbr_list(YESNO_TYPE), max_length=5)
     # [0-1] Notes
     note = models.TextField("Notes on this link", blank=True, null=True)
 
@@ -9325,19 +9676,10 @@ class EqualGoldLink(models.Model):
         else:
             # Perform the actual save() method on [self]
             response = super(EqualGoldLink, self).save(force_insert, force_update, using, update_fields)
-            # Adapt the ssgcount
-            self.src.set_ssgcount()
-            self.dst.set_ssgcount()
+            # NOTE: the ssgcount is adapted through a signal (see seeker/apps.py)
         # Return the actual save() method response
         return response
 
-    def delete(self, using = None, keep_parents = False):
-        eqg_list = [self.src, self.dst]
-        response = super(EqualGoldLink, self).delete(using, keep_parents)
-        for obj in eqg_list:
-            obj.set_ssgcount()
-        return response
-
     def get_alternatives(self):
         sBack = ""
         if self.alternatives == "yes":
@@ -9398,7 +9740,7 @@ class EqualGoldExternal(models.Model):
     # [0-1] The identifier of the external project (text)
     externaltextid = models.CharField("External identifier (text)", null=True, blank=True, max_length=LONG_STRING)
     # [1] The type of external project
-    externaltype = models.CharField("External type", choices=build_abbr_list(EXTERNAL_TYPE), 
+    externaltype = models.CharField("External type", choices=lazy_abbr_list(EXTERNAL_TYPE), 
                             max_length=5, default=EXTERNAL_HUWA_OPERA)
     # [0-1] Possible subset
     subset = models.CharField("Subset", max_length=MAX_TEXT_LEN, blank=True, null=True)
@@ -9420,7 +9762,7 @@ class SermonGoldSame(models.Model):
     # [1] It equals sermon [dst]
     dst = models.ForeignKey(SermonGold, related_name="sermongold_dst", on_delete=models.CASCADE)
     # [1] Each gold-to-gold link must have a linktype, with default "equal"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE), 
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE), 
                             max_length=5, default=LINK_EQUAL)
 
     def __str__(self):
@@ -9456,7 +9798,7 @@ class SermonGoldExternal(models.Model):
     # [0-1] The identifier of the external project (text)
     externaltextid = models.CharField("External identifier (text)", null=True, blank=True, max_length=LONG_STRING)
     # [1] The type of external project
-    externaltype = models.CharField("External type", choices=build_abbr_list(EXTERNAL_TYPE), 
+    externaltype = models.CharField("External type", choices=lazy_abbr_list(EXTERNAL_TYPE), 
                             max_length=5, default=EXTERNAL_HUWA_OPERA)
 
     # [1] And a date: the date of saving this relation
@@ -9520,12 +9862,12 @@ class Collection(models.Model):
     # [0-1] Each collection can be marked a "read only" by Passim-team  ERUIT
     readonly = models.BooleanField(default=False)
     # [1] Each "Collection" has only 1 type    
-    type = models.CharField("Type of collection", choices=build_abbr_list(COLLECTION_TYPE), 
+    type = models.CharField("Type of collection", choices=lazy_abbr_list(COLLECTION_TYPE), 
                             max_length=5)
     # [0-1]  Each collection should receive a type name, once it has been determined
     typename = models.ForeignKey(CollectionType, null=True, blank=True, related_name="typename_collections", on_delete=models.SET_NULL)
     # [1] Each "collection" has a settype: pd (personal dataset) versus hc (historical collection)
-    settype = models.CharField("Set type", choices=build_abbr_list(SET_TYPE), max_length=5, default="pd")
+    settype = models.CharField("Set type", choices=lazy_abbr_list(SET_TYPE), max_length=5, default="pd")
     # [0-1] Each collection can have one description
     descrip = models.CharField("Description", null=True, blank=True, max_length=LONG_STRING)
     # [0-1] Link to a description or bibliography (url) 
@@ -9534,7 +9876,7 @@ class Collection(models.Model):
     path = models.TextField("History path", default="[]")
     # [1] The scope of this collection: who can view it?
     #     E.g: private, team, global - default is 'private'
-    scope = models.CharField("Scope", choices=build_abbr_list(COLLECTION_SCOPE), default="priv",
+    scope = models.CharField("Scope", choices=lazy_abbr_list(COLLECTION_SCOPE), default="priv",
                             max_length=5)
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
@@ -9839,6 +10181,19 @@ class Collection(models.Model):
         # REturn the result
         return qs
 
+    @staticmethod
+    def get_scoped_ids(type, username, team_group, settype="pd", cache=None):
+        """Get the ids of get_scoped_queryset() as a set, remembered in the dictionary [cache] if given"""
+
+        key = ("scoped_ids", type, username, team_group, settype)
+        scoped_ids = None if cache is None else cache.get(key)
+        if scoped_ids is None:
+            qs = Collection.get_scoped_queryset(type, username, team_group, settype=settype)
+            scoped_ids = set(qs.values_list('id', flat=True))
+            if not cache is None:
+                cache[key] = scoped_ids
+        return scoped_ids
+
     def get_sitems(self, profile):
         """Get all collection items (M/S/SSG) that are also SavedItems (for me)"""
 
@@ -10256,7 +10611,7 @@ class SermonDescr(models.Model):
     # [0-1] We would very much like to know the *REAL* author
     author = models.ForeignKey(Author, null=True, blank=True, on_delete = models.SET_NULL, related_name="author_sermons")
     # [1] Every SermonDescr has a status - this is *NOT* related to model 'Status'
-    autype = models.CharField("Author certainty", choices=build_abbr_list(CERTAINTY_TYPE), max_length=5, default="ave")
+    autype = models.CharField("Author certainty", choices=lazy_abbr_list(CERTAINTY_TYPE), max_length=5, default="ave")
     # [0-1] But most often we only start out with having just a nickname of the author
     # NOTE: THE NICKNAME IS NO LONGER IN USE (oct/2019)
     nickname = models.ForeignKey(Nickname, null=True, blank=True, on_delete = models.SET_NULL, related_name="nickname_sermons")
@@ -10292,14 +10647,14 @@ class SermonDescr(models.Model):
     verses = models.TextField("List of verses", null=True, blank=True)
 
     # [1] Every SermonDescr has a status - this is *NOT* related to model 'Status'
-    stype = models.CharField("Status", choices=build_abbr_list(STATUS_TYPE), max_length=5, default="man")
+    stype = models.CharField("Status", choices=lazy_abbr_list(STATUS_TYPE), max_length=5, default="man")
     # [0-1] Status note
     snote = models.TextField("Status note(s)", default="[]")
     # [1] And a date: the date of saving this sermon
     created = models.DateTimeField(default=get_current_datetime)
 
     # [1] Every SermonDescr may be a manifestation (default) or a template (optional)
-    mtype = models.CharField("Manifestation type", choices=build_abbr_list(MANIFESTATION_TYPE), max_length=5, default="man")
+    mtype = models.CharField("Manifestation type", choices=lazy_abbr_list(MANIFESTATION_TYPE), max_length=5, default="man")
 
     ## [0-1] A manuscript may have an ID from the database from which it was read
     #external = models.IntegerField("ID in external DB", null=True)
@@ -10532,6 +10887,8 @@ class SermonDescr(models.Model):
             profile = kwargs.get("profile")
             sourcetype = kwargs.get("sourcetype")
             projects = kwargs.get("projects")
+            lookup = kwargs.get("lookup")
+            bulk = kwargs.get("bulk")
 
             # Figure out whether this sermon item already exists or not
             locus = oSermo['locus']
@@ -10556,6 +10913,8 @@ class SermonDescr(models.Model):
                 else:
                     # Create a new SermonDescr with default values, tied to the msitem
                     obj = SermonDescr.objects.create(msitem=msitem, stype="imp", mtype="man")
+                    if not bulk is None:
+                        bulk.add_sermon(obj)
                         
             if type.lower() == "structural":
                 # Possibly add the title
@@ -10602,7 +10961,10 @@ class SermonDescr(models.Model):
 
                                 # Find an item with the name for the particular model
                                 cls = apps.app_configs['seeker'].get_model(model)
-                                instance = cls.objects.filter(**{"{}".format(fkfield): value}).first()
+                                if lookup is None:
+                                    instance = cls.objects.filter(**{"{}".format(fkfield): value}).first()
+                                else:
+                                    instance = lookup.get(cls, value, fkfield, exact=True)
                                 if instance != None:
                                     setattr(obj, path, instance)
                         elif type == "func":
@@ -10631,6 +10993,8 @@ class SermonDescr(models.Model):
             profile = kwargs.get("profile")
             username = kwargs.get("username")
             team_group = kwargs.get("team_group")
+            # The download context, as passed on via custom_getkv(): the same for all objects of a download
+            context = kwargs.get("kwargs", {}).get("kwargs")
             if path == "dateranges":
                 # WAS: qs = self.manuscript_dateranges.all().order_by('yearstart')
                 qs = Daterange.objects.filter(msitem__codico__manuscript=self).order_by('yearstart')
@@ -10646,7 +11010,7 @@ class SermonDescr(models.Model):
             elif path == "keywordsU":
                 sBack =  self.get_keywords_user_markdown(profile, plain=True)
             elif path == "datasets":
-                sBack = self.get_collections_markdown(username, team_group, settype="pd", plain=True)
+                sBack = self.get_collections_markdown(username, team_group, settype="pd", plain=True, cache=context)
             elif path == "literature":
                 sBack = self.get_litrefs_markdown(plain=True)
             elif path == "origin":
@@ -10727,6 +11091,10 @@ class SermonDescr(models.Model):
             username = kwargs.get("username")
             team_group = kwargs.get("team_group")
             sourcetype = kwargs.get("sourcetype")
+            # Optional in-memory lookup tables (see reader/lookup.py)
+            lookup = kwargs.get("lookup")
+            # Optional collector of links that are written in bulk (see reader/lookup.py)
+            bulk = kwargs.get("bulk")
             value_lst = []
             if isinstance(value, str):
                 if value[0] == '[':
@@ -10756,7 +11124,10 @@ class SermonDescr(models.Model):
                 # Get the (attributed) author either from author_id or from author (as name)
                 if self.author is None:
                     # Set it according to the id
-                    self.author = Author.objects.filter(name__iexact=value).first()
+                    if lookup is None:
+                        self.author = Author.objects.filter(name__iexact=value).first()
+                    else:
+                        self.author = lookup.get(Author, value)
             elif path == "author_id":
                 # Get the (attributed) author either from author_id or from author (as name)
                 if self.author is None:
@@ -10784,7 +11155,10 @@ class SermonDescr(models.Model):
                 user_keywords = value_lst #  get_json_list(value)
                 for kw in user_keywords:
                     # Find the keyword
-                    keyword = Keyword.objects.filter(name__iexact=kw).first()
+                    if lookup is None:
+                        keyword = Keyword.objects.filter(name__iexact=kw).first()
+                    else:
+                        keyword = lookup.get(Keyword, kw)
                     if keyword != None:
                         # Add this keyword to the sermon for this user
                         UserKeyword.objects.create(keyword=keyword, profile=profile, sermo=self)
@@ -10793,10 +11167,15 @@ class SermonDescr(models.Model):
                 real_keywords = value_lst #  json.loads(value)
                 for kw in real_keywords:
                     # Find the keyword
-                    keyword = Keyword.objects.filter(name__iexact=kw).first()
+                    if lookup is None:
+                        keyword = Keyword.objects.filter(name__iexact=kw).first()
+                    else:
+                        keyword = lookup.get(Keyword, kw)
                     # Since this is HUWA< the keyword must be created if needed
                     if keyword is None:
                         keyword = Keyword.objects.create(name=kw)
+                        if not lookup is None:
+                            lookup.add(keyword)
                     if not keyword is None:
                         # Add this keyword to the sermondescr for this user
                         obj = SermonDescrKeyword.objects.filter(keyword=keyword, sermon=self).first()
@@ -10812,7 +11191,10 @@ class SermonDescr(models.Model):
                 for ssg_code in ssglink_names:
                     # Get this SSG - depending on whether we have a string code or a SSG id
                     if isinstance(ssg_code,str):
-                        ssg = EqualGold.objects.filter(code__iexact=ssg_code).first()
+                        if lookup is None:
+                            ssg = EqualGold.objects.filter(code__iexact=ssg_code).first()
+                        else:
+                            ssg = lookup.get(EqualGold, ssg_code, "code")
                     else:
                         ssg = EqualGold.objects.filter(id=ssg_code).first()
 
@@ -10822,6 +11204,9 @@ class SermonDescr(models.Model):
                         if self.note != "": intro = "{}. ".format(self.note)
                         self.note = "{}Please set manually the SSG link [{}]".format(intro, ssg_code)
                         self.save()
+                    elif not bulk is None:
+                        # Make link between SSG and SermonDescr at the end of the import
+                        bulk.add_equal(self, ssg, LINK_UNSPECIFIED)
                     else:
                         # Make link between SSG and SermonDescr
                         obj = SermonDescrEqual.objects.filter(sermon=self, manu = self.msitem.codico.manuscript, super=ssg).first()
@@ -10833,7 +11218,10 @@ class SermonDescr(models.Model):
                 for code in signatureM_names:
                     # Find the SIgnature
                     # Issue #533: changed to exact matching
-                    signature = Signature.objects.filter(code=code).first()
+                    if lookup is None:
+                        signature = Signature.objects.filter(code=code).first()
+                    else:
+                        signature = lookup.get_signature(code, exact=True)
                     # Find the editype
                     if signature == None:
                         editype = "gr"
@@ -10842,7 +11230,10 @@ class SermonDescr(models.Model):
                     else:
                         editype = signature.editype
                     # Create a manual signature
-                    sig_m = SermonSignature.objects.create(code=code, gsig=signature, sermon=self, editype=editype)
+                    if bulk is None:
+                        sig_m = SermonSignature.objects.create(code=code, gsig=signature, sermon=self, editype=editype)
+                    else:
+                        sig_m = bulk.add_signature(self, code, signature, editype)
                 # Ready
             elif path == "signaturesA":
                 signatureA_names = value_lst
@@ -10852,11 +11243,17 @@ class SermonDescr(models.Model):
                     if isinstance(oCode, dict):
                         code = oCode.get("code")
                         editype = oCode.get("editype")
-                        signature = Signature.objects.filter(code__iexact=code, editype=editype).first()
+                        if lookup is None:
+                            signature = Signature.objects.filter(code__iexact=code, editype=editype).first()
+                        else:
+                            signature = lookup.get_signature(code, editype)
                     else:
                         # Issue #533: changed to exact matching
                         code = oCode
-                        signature = Signature.objects.filter(code__iexact=code).first()
+                        if lookup is None:
+                            signature = Signature.objects.filter(code__iexact=code).first()
+                        else:
+                            signature = lookup.get_signature(code)
                     if signature is None:
                         # Show what is happening
                         if bDebug: oErr.Status("Reading signaturesA: Could not find signature: [{}]".format(code))
@@ -10870,11 +11267,17 @@ class SermonDescr(models.Model):
                             add_note(self, "[B] Link this sermon to: [{}]".format(code))
                         else:
                             # Find the accompanying SSG
-                            ssg = sg.equal
+                            if lookup is None:
+                                ssg = sg.equal
+                            else:
+                                ssg = lookup.get(EqualGold, sg.equal_id, "id", exact=True)
                             if ssg is None:
                                 # Show what is happening
                                 if bDebug: oErr.Status("Reading signaturesA: empty SSG for signature [{}]".format(code))
                                 add_note(self, "[C] Link this sermon to: [{}]".format(code))
+                            elif not bulk is None:
+                                # Make the connection from the Sermon to the SSG at the end of the import
+                                bulk.add_equal(self, ssg, LINK_UNSPECIFIED)
                             else:
                                 obj = SermonDescrEqual.objects.filter(sermon = self,manu = self.msitem.codico.manuscript,super = ssg).first()
                                 if obj is None:
@@ -10923,13 +11326,14 @@ class SermonDescr(models.Model):
                 setlist.adapt_rset(rset_type = "sermo delete")
         return response
 
-    def do_distance(self, bForceUpdate = False):
-        """Calculate the distance from myself (sermon) to all currently available EqualGold SSGs"""
+    def do_distance(self, bForceUpdate = False, topk = 100):
+        """Calculate the distance from myself (sermon) to the best matching EqualGold SSGs
+
+        Candidate SSGs come from the n-gram similarity index (see seeker/similarity.py),
+        so that only the [topk] most likely SSGs need an exact distance calculation.
+        """
 
         def get_dist(inc_s, exp_s, inc_eqg, exp_eqg):
-            # Get the inc and exp for the SSG
-            #inc_eqg = super.srchincipit
-            #exp_eqg = super.srchexplicit
             # Calculate distances
             similarity = similar(inc_s, inc_eqg) + similar(exp_s, exp_eqg)
             if similarity == 0.0:
@@ -10944,28 +11348,43 @@ class SermonDescr(models.Model):
             inc_s = "" if self.srchincipit == None else self.srchincipit
             exp_s = "" if self.srchexplicit == None else self.srchexplicit
 
+            # Get the existing distance objects in one go
+            dist_dict = {x.super_id: x for x in self.sermonsuperdist.all()}
+
             # Make sure we only start doing something if it is really needed
-            count = self.distances.count()
-            if inc_s != "" or exp_s != "" or count > 0:
-                # Get a list of the current EqualGold elements in terms of id, srchinc/srchexpl
-                eqg_list = EqualGold.objects.all().values('id', 'srchincipit', 'srchexplicit')
+            if inc_s != "" or exp_s != "" or len(dist_dict) > 0:
+                # Get the candidate SSGs from the similarity index
+                oIndex = SimilarityIndex.get_index()
+                if not oIndex.synced:
+                    # The index still needs to be built (it may only contain SSGs saved so far)
+                    oIndex.sync(EqualGold.objects.all().values_list('id', 'srchincipit', 'srchexplicit'))
+                lst_cand = oIndex.get_candidates(inc_s, exp_s, topk)
+
+                lst_create = []
+                lst_update = []
+                for item in EqualGold.objects.filter(id__in=lst_cand).values('id', 'srchincipit', 'srchexplicit'):
+                    super_id = item['id']
+                    obj = dist_dict.get(super_id)
+                    if obj == None:
+                        # Create object and Set this distance
+                        dist = get_dist(inc_s, exp_s, item['srchincipit'], item['srchexplicit'])
+                        lst_create.append(SermonEqualDist(sermon=self, super_id=super_id, distance=dist))
+                    elif bForceUpdate:
+                        # Calculate and change the distance
+                        obj.distance = get_dist(inc_s, exp_s, item['srchincipit'], item['srchexplicit'])
+                        lst_update.append(obj)
 
-                # Walk all EqualGold objects
                 with transaction.atomic():
-                    # for super in EqualGold.objects.all():
-                    for item in eqg_list:
-                        # Get an object
-                        super_id = item['id']
-                        obj = SermonEqualDist.objects.filter(sermon=self, super=super_id).first()
-                        if obj == None:
-                            # Get the distance
-                            dist = get_dist(inc_s, exp_s, item['srchincipit'], item['srchexplicit'])
-                            # Create object and Set this distance
-                            obj = SermonEqualDist.objects.create(sermon=self, super_id=super_id, distance=dist)
-                        elif bForceUpdate:
-                            # Calculate and change the distance
-                            obj.distance = get_dist(inc_s, exp_s, item['srchincipit'], item['srchexplicit'])
-                            obj.save()
+                    if len(lst_create) > 0:
+                        SermonEqualDist.objects.bulk_create(lst_create)
+                    if len(lst_update) > 0:
+                        SermonEqualDist.objects.bulk_update(lst_update, ['distance'])
+                    if bForceUpdate:
+                        # Distances to SSGs that are no longer candidates are outdated
+                        set_cand = set(lst_cand)
+                        lst_stale = [k for k in dist_dict if not k in set_cand]
+                        if len(lst_stale) > 0:
+                            self.sermonsuperdist.filter(super_id__in=lst_stale).delete()
         except:
             msg = oErr.get_error_message()
             oErr.DoError("do_distance")
@@ -11120,9 +11539,10 @@ class SermonDescr(models.Model):
         # First attempt: just show .bibleref
         sBack = self.bibleref
         # Or do we have BibRange objects?
-        if self.sermonbibranges.count() > 0:
+        lst_bibrange = get_ordered(self.sermonbibranges, 'book__idno', 'chvslist')
+        if len(lst_bibrange) > 0:
             html = []
-            for obj in self.sermonbibranges.all().order_by('book__idno', 'chvslist'):
+            for obj in lst_bibrange:
                 # Find out the URL of this range
                 url = reverse("bibrange_details", kwargs={'pk': obj.id})
                 # Add this range
@@ -11184,11 +11604,11 @@ class SermonDescr(models.Model):
             oErr.DoError("get_collection_link")
         return sBack
     
-    def get_collections_markdown(self, username, team_group, settype = None, plain=False):
+    def get_collections_markdown(self, username, team_group, settype = None, plain=False, cache=None):
         lHtml = []
         # Visit all collections that I have access to
-        mycoll__id = Collection.get_scoped_queryset('sermo', username, team_group, settype = settype).values('id')
-        for col in self.collections.filter(id__in=mycoll__id).order_by('name'):
+        mycoll__id = Collection.get_scoped_ids('sermo', username, team_group, settype, cache)
+        for col in [x for x in get_ordered(self.collections, 'name') if x.id in mycoll__id]:
             if plain:
                 lHtml.append(col.name)
             else:
@@ -11252,8 +11672,7 @@ class SermonDescr(models.Model):
         oErr = ErrHandle()
         sBack = ""
         try:
-            ssg_list = self.equalgolds.all().values('code')
-            code_list = [x['code'] for x in ssg_list if x['code'] != None]
+            code_list = [x.code for x in self.equalgolds.all() if x.code != None]
             if plain:
                 sBack = json.dumps(code_list)
             else:
@@ -11301,9 +11720,15 @@ class SermonDescr(models.Model):
         # Get a list of all the SG that are in these equality sets
         gold_list = SermonGold.objects.filter(equal__in=ssg_list).order_by('id').distinct().values("id")
 
+        if type != "combi":
+            # The signatures of these SG, ordered by code (each SG only once)
+            oGold = {gold.id: gold for ssg in self.equalgolds.all() for gold in ssg.equal_goldsermons.all()}
+            lst_eqsig = [sig for gold in oGold.values() for sig in gold.goldsignatures.all()]
+            lst_eqsig.sort(key=lambda x: x.code)
+
         # The prefered sequence of codes (Gryson, Clavis, Other)
-        editype_pref_seq = ['gr', 'cl', 'ot'] 
-        
+        editype_pref_seq = ['gr', 'cl', 'ot']
+
         # Use the prefered sequence of codes 
         for editype in editype_pref_seq:    
 
@@ -11360,7 +11785,7 @@ class SermonDescr(models.Model):
                         lHtml.append("<span class='badge signature {}'>{}</span>".format(sig.editype,sig.code))
             else:
                 # Get an ordered set of signatures - automatically linked
-                for sig in Signature.objects.filter(gold__in=gold_list, editype = editype).order_by('code'):
+                for sig in [x for x in lst_eqsig if x.editype == editype]:
                     # Create a display for this topic
                     if plain:
                         lHtml.append(sig.code)
@@ -11381,6 +11806,69 @@ class SermonDescr(models.Model):
             sBack = "<span class='view-mode'>,</span> ".join(lHtml)
         return sBack
 
+    def get_eqsetsignatures_combi(sermon_ids):
+        """Get a dictionary sermon_id: get_eqsetsignatures_markdown('combi') for a list of sermons
+        
+        This takes a fixed number of queries, independent of the number of sermons
+        """
+
+        oBack = {}
+        editype_pref_seq = ['gr', 'cl', 'ot'] 
+
+        # (1) The SSGs linked to each sermon and the SG in their equality sets
+        ssg_dict = {}
+        for sermon_id, super_id in SermonDescrEqual.objects.filter(sermon_id__in=sermon_ids).values_list('sermon_id', 'super_id'):
+            ssg_dict.setdefault(sermon_id, set()).add(super_id)
+        gold_dict = {}
+        lst_ssg = set().union(*ssg_dict.values()) if len(ssg_dict) > 0 else set()
+        for gold_id, equal_id in SermonGold.objects.filter(equal_id__in=lst_ssg).values_list('id', 'equal_id'):
+            gold_dict.setdefault(equal_id, []).append(gold_id)
+
+        # (2) The sermon's own signatures
+        sermosig_dict = {}
+        for sig in SermonSignature.objects.filter(sermon_id__in=sermon_ids).values('id', 'sermon_id', 'editype', 'code', 'codesort', 'gsig__gold_id'):
+            sermosig_dict.setdefault(sig['sermon_id'], []).append(sig)
+
+        # (3) The signatures of all the SG involved
+        lst_gold = set()
+        for lst in gold_dict.values(): lst_gold.update(lst)
+        for lst in sermosig_dict.values(): lst_gold.update([x['gsig__gold_id'] for x in lst if x['gsig__gold_id']])
+        goldsig_dict = {}
+        for sig in Signature.objects.filter(gold_id__in=lst_gold).values('id', 'gold_id', 'editype', 'code', 'codesort'):
+            goldsig_dict.setdefault(sig['gold_id'], []).append(sig)
+
+        def sort_key(sig):
+            return ((sig['codesort'] or "").lower(), sig['id'])
+
+        url_gold = reverse('gold_list')
+        for sermon_id in sermon_ids:
+            lHtml = []
+            auto_list = set()
+            for ssg_id in ssg_dict.get(sermon_id, []):
+                auto_list.update(gold_dict.get(ssg_id, []))
+            for editype in editype_pref_seq:
+                gold_id_list = set(auto_list)
+                manual_list = []
+                for sig in sermosig_dict.get(sermon_id, []):
+                    if sig['editype'] != editype: continue
+                    if sig['gsig__gold_id']:
+                        gold_id_list.add(sig['gsig__gold_id'])
+                    else:
+                        manual_list.append(sig)
+                # (a) Show the gold signatures
+                lst_sig = []
+                for gold_id in gold_id_list:
+                    lst_sig.extend([x for x in goldsig_dict.get(gold_id, []) if x['editype'] == editype])
+                for sig in sorted(lst_sig, key=sort_key):
+                    url = "{}?gold-siglist={}".format(url_gold, sig['id'])
+                    auto = "" if sig['gold_id'] in auto_list else "view-mode"
+                    lHtml.append("<span class='badge signature {} {}'><a href='{}'>{}</a></span>".format(sig['editype'], auto, url, sig['code']))
+                # (c) Show the manual ones
+                for sig in sorted(manual_list, key=sort_key):
+                    lHtml.append("<span class='badge signature {}'>{}</span>".format(sig['editype'], sig['code']))
+            oBack[sermon_id] = "<span class='view-mode'>,</span> ".join(lHtml)
+        return oBack
+
     def get_feast(self):
         sBack = ""
         if self.feast != None:
@@ -11501,7 +11989,7 @@ class SermonDescr(models.Model):
     def get_keywords_markdown(self, plain=False):
         lHtml = []
         # Visit all keywords
-        for keyword in self.keywords.all().order_by('name'):
+        for keyword in get_ordered(self.keywords, 'name'):
             if plain:
                 lHtml.append(keyword.name)
             else:
@@ -11519,7 +12007,8 @@ class SermonDescr(models.Model):
     def get_keywords_user_markdown(self, profile, plain=False):
         lHtml = []
         # Visit all keywords
-        for kwlink in self.sermo_userkeywords.filter(profile=profile).order_by('keyword__name'):
+        profile_id = None if profile is None else profile.id
+        for kwlink in [x for x in get_ordered(self.sermo_userkeywords, 'keyword__name') if x.profile_id == profile_id]:
             keyword = kwlink.keyword
             if plain:
                 lHtml.append(keyword.name)
@@ -11578,7 +12067,9 @@ class SermonDescr(models.Model):
         # (1) First the litrefs from the manuscript: 
         # manu = self.manu
         # lref_list = []
-        for item in LitrefMan.objects.filter(manuscript=self.get_manuscript()).order_by('reference__short', 'pages'):
+        manu = self.get_manuscript()
+        lst_litref = [] if manu is None else get_ordered(manu.manuscript_litrefs, 'reference__short', 'pages')
+        for item in lst_litref:
             if plain:
                 lHtml.append(item.get_short_markdown())
             else:
@@ -11589,12 +12080,13 @@ class SermonDescr(models.Model):
                     url,item.get_short_markdown()))
        
         # (2) The literature references available in all the SGs that are part of the SSG
-        ssg_id = self.equalgolds.all().values('id')
         #     Note: the *linktype* for SSG-S doesn't matter anymore
-        # ssg_id = [x.super.id for x in SermonDescrEqual.objects.filter(sermon=self)]
-        gold_id = SermonGold.objects.filter(equal__id__in=ssg_id).values('id')
+        oGold = {gold.id: gold for ssg in self.equalgolds.all() for gold in ssg.equal_goldsermons.all()}
+        lst_litref = [x for gold in oGold.values() for x in gold.sermon_gold_litrefs.all()]
+        lst_litref.sort(key=lambda x: (not x.pages is None, x.pages))
+        lst_litref.sort(key=lambda x: x.reference.short)
         # Visit all the litrefSGs
-        for item in LitrefSG.objects.filter(sermon_gold__id__in = gold_id).order_by('reference__short', 'pages'):
+        for item in lst_litref:
             if plain:
                 lHtml.append(item.get_short_markdown())
             else:
@@ -11768,7 +12260,7 @@ class SermonDescr(models.Model):
     def get_sermonsignatures_markdown(self, plain=False):
         lHtml = []
         # Visit all signatures
-        for sig in self.sermonsignatures.all().order_by('-editype', 'code'):
+        for sig in get_ordered(self.sermonsignatures, '-editype', 'code'):
             if plain:
                 lHtml.append(sig.code)
             else:
@@ -11985,12 +12477,9 @@ class SermonDescr(models.Model):
         return bBack
 
     def set_sermocount(self):
-        # Calculate and set the sermocount
-        sermocount = self.sermocount
-        iSize = self.relations.count()
-        if iSize != sermocount:
-            self.sermocount = iSize
-            self.save()
+        # Calculate and set the sermocount (see counters.py)
+        if update_counters("SermonDescr", [self.id], ['sermocount']) > 0:
+            self.refresh_from_db(fields=['sermocount'])
         return True
          
     def signature_string(self, include_auto = False, do_plain=True):
@@ -12568,7 +13057,7 @@ class SermonDescrExternal(models.Model):
     # [1] The identifier of the external project
     externalid = models.IntegerField("External identifier", default=0)
     # [1] The type of external project
-    externaltype = models.CharField("External type", choices=build_abbr_list(EXTERNAL_TYPE), 
+    externaltype = models.CharField("External type", choices=lazy_abbr_list(EXTERNAL_TYPE), 
                             max_length=5, default=EXTERNAL_HUWA_OPERA)
     # [0-1] The identifier of the external project (text)
     externaltextid = models.TextField("External identifier (text)", null=True, blank=True)
@@ -12590,7 +13079,7 @@ class SermonDescrLink(models.Model):
     # [1] It relates to manuscript [dst]
     dst = models.ForeignKey(SermonDescr, related_name="sermondescr_dst", on_delete=models.CASCADE)
     # [1] Each sermo-to-sermo link must have a linktype, with default "related"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE), max_length=5, default=LINK_REL)
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE), max_length=5, default=LINK_REL)
     # [0-1] Notes
     note = models.TextField("Notes on this link", blank=True, null=True)
 
@@ -12611,22 +13100,13 @@ class SermonDescrLink(models.Model):
             else:
                 # Perform the actual save() method on [self]
                 response = super(SermonDescrLink, self).save(force_insert, force_update, using, update_fields)
-                # Adapt the ssgcount
-                self.src.set_sermocount()
-                self.dst.set_sermocount()
+                # NOTE: the sermocount is adapted through a signal (see seeker/apps.py)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("SermonDescrLink/save")
         # Return the actual save() method response
         return response
 
-    def delete(self, using = None, keep_parents = False):
-        sermo_list = [self.src, self.dst]
-        response = super(SermonDescrLink, self).delete(using, keep_parents)
-        for obj in sermo_list:
-            obj.set_sermocount()
-        return response
-
     def get_label(self):
         sBack = "related to: {}".format(self.dst.get_full_name())
         return sBack
@@ -12677,7 +13157,7 @@ class ManuscriptExternal(models.Model):
     # [1] The identifier of the external project
     externalid = models.IntegerField("External identifier", default=0)
     # [1] The type of external project
-    externaltype = models.CharField("External type", choices=build_abbr_list(EXTERNAL_TYPE), 
+    externaltype = models.CharField("External type", choices=lazy_abbr_list(EXTERNAL_TYPE), 
                             max_length=5, default=EXTERNAL_HUWA_OPERA)
     # [0-1] The identifier of the external project (text)
     externaltextid = models.CharField("External identifier (text)", null=True, blank=True, max_length=LONG_STRING)
@@ -12699,7 +13179,7 @@ class ManuscriptLink(models.Model):
     # [1] It relates to manuscript [dst]
     dst = models.ForeignKey(Manuscript, related_name="manuscript_dst", on_delete=models.CASCADE)
     # [1] Each manu-to-manu link must have a linktype, with default "related"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE), max_length=5, default=LINK_REL)
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE), max_length=5, default=LINK_REL)
     # [0-1] Notes
     note = models.TextField("Notes on this link", blank=True, null=True)
 
@@ -12717,19 +13197,10 @@ class ManuscriptLink(models.Model):
         else:
             # Perform the actual save() method on [self]
             response = super(ManuscriptLink, self).save(force_insert, force_update, using, update_fields)
-            # Adapt the ssgcount
-            self.src.set_manucount()
-            self.dst.set_manucount()
+            # NOTE: the manucount is adapted through a signal (see seeker/apps.py)
         # Return the actual save() method response
         return response
 
-    def delete(self, using = None, keep_parents = False):
-        manu_list = [self.src, self.dst]
-        response = super(ManuscriptLink, self).delete(using, keep_parents)
-        for obj in manu_list:
-            obj.set_manucount()
-        return response
-
     def get_label(self):
         sBack = "related to: {}".format(self.dst.get_full_name())
         return sBack
@@ -12880,7 +13351,7 @@ class UserKeyword(models.Model):
     # [1] It is part of a user profile
     profile = models.ForeignKey(Profile, related_name="profile_userkeywords", on_delete=models.CASCADE)
     # [1] Each "UserKeyword" has only 1 type, one of M/S/SG/SSG
-    type = models.CharField("Type of user keyword", choices=build_abbr_list(COLLECTION_TYPE), max_length=5)
+    type = models.CharField("Type of user keyword", choices=lazy_abbr_list(COLLECTION_TYPE), max_length=5)
     # [1] And a date: the date of saving this relation
     created = models.DateTimeField(default=get_current_datetime)
 
@@ -12965,7 +13436,7 @@ class SermonDescrEqual(models.Model):
     # [1] The gold sermon
     super = models.ForeignKey(EqualGold, related_name="sermondescr_super", on_delete=models.CASCADE)
     # [1] Each sermon-to-gold link must have a linktype, with default "equal"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE_SRMEQ), max_length=5, default="uns")
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE_SRMEQ), max_length=5, default="uns")
 
     def __str__(self):
         # Temporary fix: sermon.id
@@ -12975,32 +13446,19 @@ class SermonDescrEqual(models.Model):
         return combi
     
     def do_scount(self, super):
-        # Now calculate the adapted scount for the SSG
-        scount = super.equalgold_sermons.count()
-        # Check if adaptation is needed
-        if scount != super.scount:
-            # Adapt the scount in the SSG
-            super.scount = scount
-            super.save()
+        # Now calculate the adapted scount for the SSG (see counters.py)
+        if update_counters("EqualGold", [super.id], ['scount']) > 0:
+            super.refresh_from_db(fields=['scount'])
         return None
 
     def delete(self, using = None, keep_parents = False):
         response = None
         oErr = ErrHandle()
         try:
-            # Remember the current SSG for a moment
-            obj_ssg = self.super
             # Remove the connection
             response = super(SermonDescrEqual, self).delete(using, keep_parents)
-            # Perform the scount
-            self.do_scount(obj_ssg)
-
-            # Get the MANUSCRIPT this sermon is part of
-            manu = self.manu
-            # Update relevant SetLists
-            if not manu is None:
-                for setlist in manu.manuscript_setlists.all():
-                    setlist.adapt_rset(rset_type = "S-SSG link delete")
+            # NOTE: the scount of the SSG is adapted through a signal (see seeker/apps.py)
+            # NOTE: the SetLists of the manuscript are marked through a signal (see dct/apps.py)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("SermonDescrEqual/delete")
@@ -13011,23 +13469,14 @@ class SermonDescrEqual(models.Model):
         response = None
         oErr = ErrHandle()
         try:
-            is_new = self._state.adding
             # Automatically provide the value for the manuscript through the sermon
             manu = self.sermon.msitem.manu
             if self.manu != manu:
                 self.manu = manu
             # First do the saving
             response = super(SermonDescrEqual, self).save(force_insert, force_update, using, update_fields)
-            # Perform the scount
-            self.do_scount(self.super)
-            # What if this is a new S-SSG link?
-            if is_new:
-                # Get the MANUSCRIPT this sermon is part of
-                manu = self.manu
-                # Update relevant SetLists
-                if not manu is None:
-                    for setlist in manu.manuscript_setlists.all():
-                        setlist.adapt_rset(rset_type = "S-SSG link add")
+            # NOTE: the scount of the SSG is adapted through a signal (see seeker/apps.py)
+            # NOTE: the SetLists of the manuscript are marked through a signal (see dct/apps.py)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("SermonDescrEqual/save")
@@ -13072,7 +13521,7 @@ class SermonDescrGold(models.Model):
     # [1] The gold sermon
     gold = models.ForeignKey(SermonGold, related_name="sermondescr_gold", on_delete=models.CASCADE)
     # [1] Each sermon-to-gold link must have a linktype, with default "equal"
-    linktype = models.CharField("Link type", choices=build_abbr_list(LINK_TYPE_SRMGLD), 
+    linktype = models.CharField("Link type", choices=lazy_abbr_list(LINK_TYPE_SRMGLD), 
                             max_length=5, default="eq")
 
     def __str__(self):
@@ -13113,7 +13562,7 @@ class Signature(models.Model):
     # [0-1] each code must have a sortable field codesort
     codesort = models.CharField("Code (sortable)", null=True, blank=True, max_length=LONG_STRING)
     # [1] Every signature must be of a limited number of types
-    editype = models.CharField("Edition type", choices=build_abbr_list(EDI_TYPE), 
+    editype = models.CharField("Edition type", choices=lazy_abbr_list(EDI_TYPE), 
                             max_length=5, default="gr")
     # [1] Every signature belongs to exactly one gold-sermon
     #     Note: when a SermonGold is removed, then its associated Signature gets removed too
@@ -13169,6 +13618,123 @@ class Signature(models.Model):
         # Then return the super-response
         return response
 
+
+class SignatureResolver():
+    """Preferred signatures of SSGs, looked up for many SSGs at once
+
+    The signatures of all requested SSGs are read with one grouped query (per chunk
+    of ids), ordered by edition type preference (Gryson, Clavis, other) and code.
+    They are memoized in the resolver and in the shared cache, under a version that is
+    bumped when a Signature or SermonGold is saved or deleted (see apps.py). Callers
+    without a resolver of their own use SIGNATURE_RESOLVER.
+    """
+
+    version_key = "passim_signature_version"
+    editype_preferences = ['gr', 'cl', 'ot']
+    cache_timeout = 24 * 3600   # Seconds the signatures of an SSG stay in the cache
+    chunk_size = 2000           # Maximum number of SSG ids in one query
+
+    def __init__(self):
+        # SSG id => list of [editype, code], preferred first
+        self.sigs = {}
+        self.cache_version = CacheVersion(self.version_key)
+
+    def reset(self, version):
+        """Forget the signatures of an older version"""
+
+        self.sigs = {}
+
+    def get_key(self, ssg_id):
+        return "passim_ssgsig_{}_{}".format(self.cache_version.version, ssg_id)
+
+    def fetch(self, ssg_ids):
+        """Make sure the signatures of all SSGs in [ssg_ids] are known"""
+
+        oErr = ErrHandle()
+        try:
+            self.cache_version.ensure(self.reset)
+            lst_missing = list(set(x for x in ssg_ids if not x is None and not x in self.sigs))
+            if len(lst_missing) == 0:
+                return
+
+            # First look in the shared cache
+            dict_cached = cache.get_many([self.get_key(x) for x in lst_missing])
+            lst_query = []
+            for ssg_id in lst_missing:
+                siglist = dict_cached.get(self.get_key(ssg_id))
+                if siglist == None:
+                    lst_query.append(ssg_id)
+                else:
+                    self.sigs[ssg_id] = siglist
+
+            # Then query the rest
+            dict_new = {}
+            for idx in range(0, len(lst_query), self.chunk_size):
+                lst_chunk = lst_query[idx:idx + self.chunk_size]
+                dict_editype = {x: {} for x in lst_chunk}
+                qs = Signature.objects.filter(gold__equal_id__in=lst_chunk, editype__in=self.editype_preferences)
+                for ssg_id, editype, code in qs.order_by('code').values_list('gold__equal_id', 'editype', 'code'):
+                    dict_editype[ssg_id].setdefault(editype, []).append(code)
+                for ssg_id, dict_code in dict_editype.items():
+                    siglist = [[editype, code] for editype in self.editype_preferences for code in dict_code.get(editype, [])]
+                    self.sigs[ssg_id] = siglist
+                    dict_new[self.get_key(ssg_id)] = siglist
+            if len(dict_new) > 0:
+                cache.set_many(dict_new, self.cache_timeout)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SignatureResolver/fetch")
+
+    def get_siglist(self, ssg_id):
+        """Get the signatures of [ssg_id] as list of [editype, code], preferred first"""
+
+        self.cache_version.ensure(self.reset)
+        if not ssg_id in self.sigs:
+            self.fetch([ssg_id])
+        return self.sigs.get(ssg_id, [])
+
+    def get_best(self, ssg_id):
+        """Get the code of the preferred signature of [ssg_id], or an empty string"""
+
+        siglist = self.get_siglist(ssg_id)
+        return "" if len(siglist) == 0 else siglist[0][1]
+
+    def get_best_dict(self, ssg_ids):
+        """Get a dictionary SSG id => preferred signature code, for the SSGs that have one"""
+
+        self.fetch(ssg_ids)
+        return {x: self.get_best(x) for x in ssg_ids if len(self.get_siglist(x)) > 0}
+
+    def get_best_dct(self, ssg_id, ellipsis=True):
+        """Get the preferred signature of [ssg_id] according to DCT rules ('gr: code...')"""
+
+        sBack = ""
+        siglist = self.get_siglist(ssg_id)
+        if len(siglist) > 0:
+            editype, code = siglist[0]
+            sEllipsis = ""
+            if ellipsis and len([x for x in siglist if x[0] == editype]) > 1:
+                sEllipsis = "..."
+            sBack = "{}: {}{}".format(editype, code, sEllipsis)
+        return sBack
+
+    def get_list_dct(self, ssg_id):
+        """Get the list of signatures of [ssg_id] according to DCT rules"""
+
+        return ["{}: {}".format(editype, code) for editype, code in self.get_siglist(ssg_id)]
+
+    def invalidate(self):
+        """Tell all processes that the signatures have changed"""
+
+        self.cache_version.invalidate()
+
+
+# The resolver of this process, for callers that do not have one of their own
+SIGNATURE_RESOLVER = SignatureResolver()
+
+def signatures_changed(sender, instance, **kwargs):
+    SIGNATURE_RESOLVER.invalidate()
+
     
 class SermonSignature(models.Model):
     """One Gryson, Clavis or other code as taken up in an edition"""
@@ -13178,7 +13744,7 @@ class SermonSignature(models.Model):
     # [0-1] each code must have a sortable field codesort
     codesort = models.CharField("Code (sortable)", null=True, blank=True, max_length=LONG_STRING)
     # [1] Every edition must be of a limited number of types
-    editype = models.CharField("Edition type", choices=build_abbr_list(EDI_TYPE), 
+    editype = models.CharField("Edition type", choices=lazy_abbr_list(EDI_TYPE), 
                             max_length=5, default="gr")
     # [0-1] Optional link to the (gold) Signature from which this derives
     gsig = models.ForeignKey(Signature, blank=True, null=True, related_name="sermongoldsignatures", on_delete=models.SET_NULL)
@@ -13556,7 +14122,7 @@ class NewsItem(models.Model):
     # [1] the message that needs to be shown (in html)
     msg = models.TextField("Message")
     # [1] the status of this message (can e.g. be 'archived')
-    status = models.CharField("Status", choices=build_abbr_list(VIEW_STATUS), 
+    status = models.CharField("Status", choices=lazy_abbr_list(VIEW_STATUS), 
                               max_length=5, help_text=get_help(VIEW_STATUS))
 
     def __str__(self):
@@ -13646,15 +14212,9 @@ class CollectionSuper(models.Model):
     def save(self, force_insert = False, force_update = False, using = None, update_fields = None):
         oErr = ErrHandle()
         try:
-            is_new = self._state.adding
             # Perform the saving
             response = super(CollectionSuper, self).save(force_insert, force_update, using, update_fields)
-            # What if this is a new one?
-            if is_new:
-                collection = self.collection
-                if not collection is None:
-                    for setlist in collection.collection_setlists.all():
-                        setlist.adapt_rset(rset_type = "coll SSG add")
+            # NOTE: the SetLists of the collection are marked through a signal (see dct/apps.py)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("CollectionSuper/save")
@@ -13665,13 +14225,7 @@ class CollectionSuper(models.Model):
     def delete(self, using=None, keep_parents=False):
         oErr = ErrHandle()
         try:
-            collection = self.collection
-            # Post deleting stuff:
-            # - update 
-            if not collection is None:
-                for setlist in collection.collection_setlists.all():
-                    setlist.adapt_rset(rset_type = "coll SSG delete")
-
+            # NOTE: the SetLists of the collection are marked through a signal (see dct/apps.py)
             # We are allowed to delete: continue
             response = super(CollectionSuper, self).delete(using, keep_parents)
         except:
@@ -13714,10 +14268,10 @@ class ProjectApprover(models.Model):
     project = models.ForeignKey(Project2, related_name="project_approver", on_delete=models.CASCADE)
 
     # [1] The rights for this person. Right now that is by default "edi" = editing
-    rights = models.CharField("Rights", choices=build_abbr_list(RIGHTS_TYPE), max_length=5, default="edi")
+    rights = models.CharField("Rights", choices=lazy_abbr_list(RIGHTS_TYPE), max_length=5, default="edi")
 
     # [1] Whether this project is to be included ('incl') or not ('excl') by default project assignment
-    status = models.CharField("Default assignment", choices=build_abbr_list(PROJ_DEFAULT), max_length=5, default="incl")
+    status = models.CharField("Default assignment", choices=lazy_abbr_list(PROJ_DEFAULT), max_length=5, default="incl")
 
     # [1] And a date: the date of saving this relation
     created = models.DateTimeField(default=get_current_datetime)
@@ -13757,7 +14311,7 @@ class ProjectEditor(models.Model):
 
     # [1] Whether this project is to be included ('incl') or not ('excl') 
     #     NOTE: this is for default project assignment 
-    status = models.CharField("Default assignment", choices=build_abbr_list(PROJ_DEFAULT), max_length=5, default="incl")
+    status = models.CharField("Default assignment", choices=lazy_abbr_list(PROJ_DEFAULT), max_length=5, default="incl")
 
     # [1] And a date: the date of saving this relation
     created = models.DateTimeField(default=get_current_datetime)
@@ -13850,35 +14404,76 @@ class CollOverlap(models.Model):
     def get_overlap(profile, collection, manuscript):
         """Calculate and set the overlap between collection and manuscript"""
 
-        ptc = 0
+        oOverlap = CollOverlap.get_overlaps(profile, [collection], [manuscript])
+        return oOverlap.get((collection.id, manuscript.id), 0)
+
+    def get_overlaps(profile, coll_list, manu_list):
+        """Make sure the overlap between each collection and each manuscript is stored
+
+        Only the pairs that have not been stored yet (or that have been cleared by set_stale)
+        are calculated: the SSGs of all collections and all manuscripts are read with one
+        query each, and the percentages are calculated from sets of SSG ids.
+        Returns a dictionary (collection id, manuscript id) => percentage.
+        """
+
+        oOverlap = {}
         oErr = ErrHandle()
         try:
-            obj = CollOverlap.objects.filter(profile=profile,collection=collection, manuscript=manuscript).first()
-            if obj == None:
-                obj = CollOverlap.objects.create(profile=profile,collection=collection, manuscript=manuscript)
-            # Get the ids of the SSGs in the collection
-            coll_list = [ collection ]
-            ssg_coll = [x['id'] for x in EqualGold.objects.filter(collections__in=coll_list).values('id')]
-            if len(ssg_coll) == 0:
-                ptc = 0
-            else:
-                # Get the id's of the SSGs in the manuscript: Manu >> MsItem >> SermonDescr >> SSG
-                # Old; ssg_manu = EqualGold.objects.filter(sermondescr_super__sermon__msitem__manu=manuscript).values('id')
-                ssg_manu = [x['super__id'] for x in  manuscript.sermondescr_super.all().values('super__id') ]
-                # Now calculate the overlap
-                count = 0
-                for item in ssg_coll:
-                    if item in ssg_manu: count += 1
-                ptc = 100 * count // len(ssg_coll)
-            # Check if there is a change in percentage
-            if ptc != obj.overlap:
-                # Set the percentage
-                obj.overlap = ptc
-                obj.save()
+            coll_ids = list(set(x if isinstance(x, int) else x.id for x in coll_list))
+            manu_ids = list(set(x if isinstance(x, int) else x.id for x in manu_list))
+
+            # What is already known
+            for obj in CollOverlap.objects.filter(profile=profile, collection__id__in=coll_ids, 
+                                                  manuscript__id__in=manu_ids).order_by('-id'):
+                oOverlap[(obj.collection_id, obj.manuscript_id)] = obj.overlap
+            lst_todo = [(c, m) for c in coll_ids for m in manu_ids if not (c, m) in oOverlap]
+
+            if len(lst_todo) > 0:
+                # Get the SSGs of the collections (one for each time an SSG is in a collection)
+                coll_ssgs = {}
+                todo_coll = set(c for c, m in lst_todo)
+                for coll_id, super_id in CollectionSuper.objects.filter(collection__id__in=todo_coll).values_list('collection_id', 'super_id'):
+                    coll_ssgs.setdefault(coll_id, []).append(super_id)
+                ssg_ids = set(x for lst_ssg in coll_ssgs.values() for x in lst_ssg)
+
+                # Get the SSGs of the manuscripts: only those that are in one of the collections count
+                manu_ssgs = {}
+                todo_manu = set(m for c, m in lst_todo)
+                for manu_id, super_id in SermonDescrEqual.objects.filter(manu__id__in=todo_manu, super__id__in=ssg_ids).values_list('manu_id', 'super_id').distinct():
+                    manu_ssgs.setdefault(manu_id, set()).add(super_id)
+
+                # Calculate and store the percentages
+                lst_create = []
+                for coll_id, manu_id in lst_todo:
+                    ptc = 0
+                    lst_ssg = coll_ssgs.get(coll_id, [])
+                    if len(lst_ssg) > 0:
+                        set_manu = manu_ssgs.get(manu_id, set())
+                        count = sum(1 for x in lst_ssg if x in set_manu)
+                        ptc = 100 * count // len(lst_ssg)
+                    oOverlap[(coll_id, manu_id)] = ptc
+                    lst_create.append(CollOverlap(profile=profile, collection_id=coll_id, manuscript_id=manu_id, 
+                                                  overlap=ptc, saved=get_current_datetime()))
+                with transaction.atomic():
+                    CollOverlap.objects.bulk_create(lst_create)
         except:
             msg = oErr.get_error_message()
-            oErr.DoError("CollOverlap/get_overlap")
-        return ptc
+            oErr.DoError("CollOverlap/get_overlaps")
+        return oOverlap
+
+    def set_stale(sender, instance, **kwargs):
+        """Signal handler: an SSG has been added to or removed from a collection or a manuscript"""
+
+        if sender.__name__ == "CollectionSuper":
+            CollOverlap.objects.filter(collection__id=instance.collection_id).delete()
+        else:
+            CollOverlap.clear_ssgs([instance.super_id])
+
+    def clear_ssgs(ssg_ids):
+        """Clear the overlaps of the collections that contain one of the SSGs [ssg_ids]"""
+
+        coll_ids = CollectionSuper.objects.filter(super__id__in=ssg_ids).values('collection_id')
+        CollOverlap.objects.filter(collection__id__in=coll_ids).delete()
 
     def save(self, force_insert = False, force_update = False, using = None, update_fields = None):
         # Adapt the save date
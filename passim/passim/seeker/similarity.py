@@ -0,0 +1,306 @@
+"""
+Similarity index for the SEEKER app.
+
+Keeps a character n-gram MinHash index with LSH banding over the searchable
+incipit and explicit of all EqualGold (SSG) items. The index lives on disk
+(in the writable directory) and is updated incrementally, so that finding
+the SSG candidates closest to a sermon no longer requires visiting every SSG.
+
+The index only counts as complete once it has been synchronized with all SSGs;
+a process that changes the index remembers its own changes, so that it can apply
+them again on top of what another process has written in the meantime.
+
+Changes are kept in memory, and written to disk once at the end of a request
+(or when the process exits): see similarity_flush.
+"""
+
+import os
+import pickle
+import threading
+import zlib
+import numpy as np
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: the index file is written without a lock there
+    fcntl = None
+
+# ======= imports from my own application ======
+from passim.settings import WRITABLE_DIR
+from passim.utils import ErrHandle
+
+
+class SimilarityIndex():
+    """MinHash-LSH index over the srchincipit/srchexplicit of EqualGold items"""
+
+    ngram = 3               # Size of the character n-grams (shingles)
+    num_perm = 64           # Number of MinHash permutations
+    bands = 32              # Number of LSH bands (num_perm must be a multiple)
+    prime = (1 << 61) - 1   # Mersenne prime used for the universal hashing
+    version = 2             # Bump this when the on-disk format changes
+    filename = os.path.join(WRITABLE_DIR, "ssg_similarity.idx")
+
+    # The one instance per process
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        # Permutation coefficients are fixed, so that signatures are stable across processes
+        rng = np.random.RandomState(1959)
+        self.coef_a = rng.randint(1, 1 << 30, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        self.coef_b = rng.randint(0, 1 << 30, size=self.num_perm, dtype=np.int64).astype(np.uint64)
+        # Item information: ssg_id => (text checksum, signature)
+        self.items = {}
+        # LSH buckets: (band, band-hash) => set of ssg_id
+        self.buckets = {}
+        # Has the index been synchronized with all SSGs?
+        self.synced = False
+        # Changes since loading: ssg_id => (incipit, explicit), or None when removed
+        self.pending = {}
+        self.dirty = False
+        self.mtime = None
+
+    # ------------------------------------------------------------------
+    # Access to the process-wide index
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_index(cls):
+        """Get the index for this process, (re)loading it from disk when needed"""
+
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.load()
+            elif cls._instance.get_mtime() != cls._instance.mtime:
+                # Another process has written a newer version
+                cls._instance.reload()
+        return cls._instance
+
+    def get_mtime(self):
+        return os.path.getmtime(self.filename) if os.path.exists(self.filename) else None
+
+    def load(self):
+        """Load the index from disk, if it is there and has the right version"""
+
+        oErr = ErrHandle()
+        try:
+            self.items = {}
+            self.buckets = {}
+            self.synced = False
+            self.mtime = None
+            if os.path.exists(self.filename):
+                with open(self.filename, "rb") as fp:
+                    oData = pickle.load(fp)
+                if oData.get('version') == self.version and oData.get('num_perm') == self.num_perm:
+                    self.items = oData['items']
+                    self.buckets = oData['buckets']
+                    self.synced = oData.get('synced', False)
+                self.mtime = self.get_mtime()
+            self.pending = {}
+            self.dirty = False
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SimilarityIndex/load")
+
+    def reload(self):
+        """Load the index from disk, and apply the changes of this process again"""
+
+        pending = self.pending
+        self.load()
+        for ssg_id, oText in pending.items():
+            if oText is None:
+                self.remove_item(ssg_id)
+            else:
+                self.update_item(ssg_id, oText[0], oText[1])
+
+    @contextmanager
+    def file_lock(self):
+        """Only one process at a time may merge its changes into the index on disk"""
+
+        if fcntl is None:
+            yield
+        else:
+            with open("{}.lock".format(self.filename), "a") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def save(self, replace=False):
+        """Write the index to disk (atomically) if it has changed
+
+        Unless [replace] is set, the changes of other processes that have been written
+        since we loaded the index are kept.
+        """
+
+        oErr = ErrHandle()
+        try:
+            if self.dirty:
+                with self.file_lock():
+                    if not replace and self.get_mtime() != self.mtime:
+                        # Another process has written the index since we loaded it: do not overwrite its changes
+                        self.reload()
+                    oData = dict(version=self.version, num_perm=self.num_perm, synced=self.synced,
+                                 items=self.items, buckets=self.buckets)
+                    tmpname = "{}.{}.tmp".format(self.filename, os.getpid())
+                    with open(tmpname, "wb") as fp:
+                        pickle.dump(oData, fp, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmpname, self.filename)
+                    self.mtime = self.get_mtime()
+                    self.pending = {}
+                    self.dirty = False
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SimilarityIndex/save")
+
+    # ------------------------------------------------------------------
+    # Signatures
+    # ------------------------------------------------------------------
+
+    def get_shingles(self, incipit, explicit):
+        """Get the set of hashed character n-grams for an incipit/explicit pair"""
+
+        lst_hash = set()
+        for prefix, text in (("i", incipit), ("e", explicit)):
+            text = "" if text is None else " {} ".format(text.strip())
+            if len(text) <= self.ngram:
+                continue
+            for idx in range(len(text) - self.ngram + 1):
+                shingle = "{}:{}".format(prefix, text[idx:idx + self.ngram])
+                lst_hash.add(zlib.crc32(shingle.encode("utf-8")))
+        return lst_hash
+
+    def get_signature(self, incipit, explicit):
+        """Calculate the MinHash signature (tuple of ints), or None for empty texts"""
+
+        shingles = self.get_shingles(incipit, explicit)
+        if len(shingles) == 0:
+            return None
+        arHash = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        # Universal hashing: (a*x + b) mod p, vectorized over all permutations
+        arPerm = (np.outer(self.coef_a, arHash) + self.coef_b[:, None]) % np.uint64(self.prime)
+        return tuple(int(x) for x in arPerm.min(axis=1))
+
+    def get_checksum(self, incipit, explicit):
+        sText = "{}\t{}".format(incipit or "", explicit or "")
+        return zlib.crc32(sText.encode("utf-8"))
+
+    def get_bands(self, signature):
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            yield (band, hash(signature[band * rows:(band + 1) * rows]))
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def remove_item(self, ssg_id):
+        """Remove one SSG from the index"""
+
+        self.pending[ssg_id] = None
+        self.drop_item(ssg_id)
+
+    def drop_item(self, ssg_id):
+        oItem = self.items.pop(ssg_id, None)
+        if not oItem is None:
+            signature = oItem[1]
+            if not signature is None:
+                for key in self.get_bands(signature):
+                    bucket = self.buckets.get(key)
+                    if not bucket is None:
+                        bucket.discard(ssg_id)
+                        if len(bucket) == 0:
+                            del self.buckets[key]
+            self.dirty = True
+
+    def update_item(self, ssg_id, incipit, explicit):
+        """Add or update one SSG; returns True if the index changed"""
+
+        checksum = self.get_checksum(incipit, explicit)
+        oItem = self.items.get(ssg_id)
+        if not oItem is None and oItem[0] == checksum:
+            return False
+        self.pending[ssg_id] = (incipit, explicit)
+        self.drop_item(ssg_id)
+        signature = self.get_signature(incipit, explicit)
+        self.items[ssg_id] = (checksum, signature)
+        if not signature is None:
+            for key in self.get_bands(signature):
+                self.buckets.setdefault(key, set()).add(ssg_id)
+        self.dirty = True
+        return True
+
+    def sync(self, lst_value):
+        """Synchronize with a list of (id, srchincipit, srchexplicit) tuples
+
+        Only items that are new or whose text has changed get a new signature;
+        items that are no longer in [lst_value] are removed.
+        """
+
+        oErr = ErrHandle()
+        iChanged = 0
+        try:
+            lst_seen = set()
+            for ssg_id, incipit, explicit in lst_value:
+                lst_seen.add(ssg_id)
+                if self.update_item(ssg_id, incipit, explicit):
+                    iChanged += 1
+            for ssg_id in [x for x in self.items if not x in lst_seen]:
+                self.remove_item(ssg_id)
+                iChanged += 1
+            if not self.synced:
+                self.synced = True
+                self.dirty = True
+            # What has been read from the database now replaces what is on disk
+            self.save(replace=True)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("SimilarityIndex/sync")
+        return iChanged
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+
+    def get_candidates(self, incipit, explicit, topk=100):
+        """Get up to [topk] SSG ids ordered by estimated similarity (best first)"""
+
+        lBack = []
+        signature = self.get_signature(incipit, explicit)
+        if signature is None:
+            return lBack
+        # Collect all SSGs sharing at least one LSH band
+        lst_cand = set()
+        for key in self.get_bands(signature):
+            bucket = self.buckets.get(key)
+            if not bucket is None:
+                lst_cand.update(bucket)
+        if len(lst_cand) == 0:
+            return lBack
+        # Rank the candidates by the estimated Jaccard similarity
+        arSig = np.array(signature, dtype=np.uint64)
+        lst_id = list(lst_cand)
+        arCand = np.array([self.items[x][1] for x in lst_id], dtype=np.uint64)
+        arScore = (arCand == arSig).mean(axis=1)
+        for idx in np.argsort(-arScore, kind="stable")[:topk]:
+            lBack.append(lst_id[idx])
+        return lBack
+
+
+def similarity_post_delete(sender, instance, **kwargs):
+    """Signal handler: a deleted SSG may no longer be a candidate"""
+
+    oIndex = SimilarityIndex.get_index()
+    oIndex.remove_item(instance.id)
+
+def similarity_flush(**kwargs):
+    """Signal handler (request_finished) and exit handler: write the changes of this process to disk"""
+
+    oIndex = SimilarityIndex._instance
+    if not oIndex is None and oIndex.dirty:
+        with SimilarityIndex._lock:
+            oIndex.save()
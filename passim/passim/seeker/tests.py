@@ -7,9 +7,21 @@ Replace this with more appropriate tests for your application.
 
 import django
 django.setup()                      # This is needed apparently
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from passim.seeker.models import City, Country
+from passim.basic.export import iter_spec_rows
+from passim.seeker.models import City, Country, SermonGold, Manuscript, Codico, MsItem, SermonDescr, \
+    SermonDescrKeyword, SermonDescrEqual, SermonSignature, EqualGold, Signature, Keyword, Collection, CollectionSerm, \
+    Litref, LitrefMan, LitrefSG
+from passim.seeker.views import SermonListView
+from passim.utils import CacheVersion
+from passim.seeker.fulltext import FTS_INDEXES, fts_match_query, fts_reindex
+from passim.seeker.similarity import SimilarityIndex, similarity_flush
 
 
 # TODO: Configure your database in settings.py and sync before running tests.
@@ -91,3 +103,137 @@ class HomePageTests(TestCase):
             self.assertTemplateUsed(response, 'index.html')
             self.assertTemplateUsed(response, 'layout.html')
             self.assertTemplateUsed(response, 'topnav.html')
+
+
+class FullTextTest(TransactionTestCase):
+    """Test the FTS5 shadow index of the wildcard searches"""
+
+    def tearDown(self):
+        # The shadow table is not part of a transaction that can be rolled back
+        oIndex = FTS_INDEXES['SermonGold']
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS {}".format(oIndex.table))
+        oIndex.available = None
+
+    def get_ids(self, sPattern):
+        qFts = FTS_INDEXES['SermonGold'].get_q("srchincipit", sPattern)
+        return sorted(SermonGold.objects.filter(qFts).values_list('id', flat=True))
+
+    def test_bulk_writers(self):
+        """Writers without save() must call fts_reindex()"""
+
+        lst_gold = SermonGold.objects.bulk_create([
+            SermonGold(srchincipit="in principio erat uerbum"), SermonGold(srchincipit="fratres carissimi")])
+        FTS_INDEXES['SermonGold'].rebuild()
+        id_1, id_2 = sorted(x.id for x in SermonGold.objects.all())
+        self.assertEqual(self.get_ids("*principio*"), [id_1])
+
+        # A queryset.update() sends no signal: the shadow row is only changed by fts_reindex()
+        SermonGold.objects.filter(id=id_2).update(srchincipit="in principio creauit deus")
+        self.assertEqual(self.get_ids("*principio*"), [id_1])
+        fts_reindex("SermonGold", [id_2])
+        self.assertEqual(self.get_ids("*principio*"), [id_1, id_2])
+
+        # Removed objects lose their shadow row
+        SermonGold.objects.filter(id=id_1).delete()
+        fts_reindex("SermonGold", [id_1])
+        self.assertEqual(self.get_ids("*principio*"), [id_2])
+
+    def test_match_query(self):
+        """Wildcards split the pattern; '#' patterns are regular expressions and are not translated"""
+
+        self.assertEqual(fts_match_query("*principio*erat*", "srchincipit"), 'srchincipit : ("principio" AND "erat")')
+        self.assertIsNone(fts_match_query("*a*b*", "srchincipit"))
+        self.assertIsNone(fts_match_query("#princ.*pio#", "srchincipit"))
+
+
+class SimilarityIndexTest(TestCase):
+    """Test the writing of the SSG similarity index"""
+
+    def test_flush(self):
+        """Changes are written once, and the changes of another process are kept"""
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             mock.patch.object(SimilarityIndex, "filename", os.path.join(tmpdir, "ssg.idx")), \
+             mock.patch.object(SimilarityIndex, "_instance", None):
+            # Two processes with their own copy of the index
+            oIndex = SimilarityIndex.get_index()
+            oOther = SimilarityIndex()
+            oOther.load()
+
+            # Updating items does not write the index
+            oIndex.update_item(1, "in principio erat uerbum", "et uerbum erat apud deum")
+            oIndex.update_item(2, "fratres carissimi", "in saecula saeculorum")
+            self.assertFalse(os.path.exists(SimilarityIndex.filename))
+            similarity_flush()
+            self.assertTrue(os.path.exists(SimilarityIndex.filename))
+            self.assertFalse(oIndex.dirty)
+
+            # The other process merges its change with what has been written
+            oOther.update_item(3, "in principio creauit deus", "caelum et terram")
+            oOther.save()
+            self.assertEqual(sorted(oOther.items), [1, 2, 3])
+            self.assertEqual(sorted(SimilarityIndex.get_index().items), [1, 2, 3])
+            self.assertEqual(oIndex.get_candidates("in principio erat uerbum", "et uerbum erat apud deum")[0], 1)
+
+
+class CacheVersionTest(TestCase):
+    """Test the version of the data that every process keeps a copy of"""
+
+    def test_processes(self):
+        """Without Redis a change is seen by the other processes too"""
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             mock.patch("passim.utils.settings.USE_REDIS", False), \
+             mock.patch("passim.utils.settings.WRITABLE_DIR", tmpdir):
+            # Two processes with their own copy of the version
+            oVersion = CacheVersion("passim_test_version")
+            oOther = CacheVersion("passim_test_version")
+            version = oOther.get()
+            self.assertEqual(oVersion.get(), version)
+
+            oVersion.invalidate()
+            self.assertGreater(oOther.get(), version)
+            self.assertEqual(oOther.get(), oVersion.get())
+
+
+class ExportTest(TestCase):
+    """Test the specification-based download of the listviews"""
+
+    def add_sermon(self, manu, codico, n):
+        """Add a sermon with its keyword, dataset, signature, AF and literature"""
+
+        msitem = MsItem.objects.create(manu=manu, codico=codico, order=n)
+        sermon = SermonDescr.objects.create(msitem=msitem, manu=manu, locus="f.{}".format(n), stype="app")
+        keyword = Keyword.objects.create(name="keyword {}".format(n))
+        SermonDescrKeyword.objects.create(sermon=sermon, keyword=keyword)
+        collection = Collection.objects.create(name="dataset {}".format(n), type="sermo", settype="pd")
+        CollectionSerm.objects.create(collection=collection, sermon=sermon)
+        SermonSignature.objects.create(sermon=sermon, code="CPL {}".format(n), editype="cl")
+        ssg = EqualGold.objects.create(code="PASSIM {}.{}".format(n, n), stype="app")
+        gold = SermonGold.objects.create(equal=ssg)
+        Signature.objects.create(gold=gold, code="AU s {}".format(n), editype="gr")
+        LitrefSG.objects.create(reference=Litref.objects.create(short="Gold {}".format(n)), sermon_gold=gold, pages="1")
+        SermonDescrEqual.objects.create(sermon=sermon, manu=manu, super=ssg, linktype="eqs")
+        return sermon
+
+    def get_query_count(self, qs):
+        kwargs = {'profile': None, 'username': "", 'team_group': ""}
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(iter_spec_rows(qs, SermonDescr.specification, kwargs, SermonListView.download_prefetch))
+        self.assertEqual(len(rows), qs.count() + 1)
+        return len(ctx.captured_queries)
+
+    def test_query_count(self):
+        """The number of queries of a download does not depend on the number of objects"""
+
+        manu = Manuscript.objects.create(idno="shelfmark", stype="app")
+        codico = Codico.objects.filter(manuscript=manu).first()
+        if codico is None:
+            codico = Codico.objects.create(manuscript=manu, name="codico")
+        LitrefMan.objects.create(reference=Litref.objects.create(short="Manuscript"), manuscript=manu, pages="2")
+        lst_id = [self.add_sermon(manu, codico, n).id for n in range(4)]
+
+        count_one = self.get_query_count(SermonDescr.objects.filter(id=lst_id[0]))
+        count_all = self.get_query_count(SermonDescr.objects.filter(id__in=lst_id))
+        self.assertEqual(count_one, count_all)
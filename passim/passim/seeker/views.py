@@ -79,13 +79,13 @@ from passim.seeker.forms import SearchCollectionForm, SearchManuForm, LibrarySea
     UserForm, SermonDescrLinkForm, CommentResponseForm, DaterangeHistCollForm
 from passim.seeker.models import get_crpp_date, get_current_datetime, process_lib_entries, get_searchable, get_now_time, \
     add_gold2equal, add_equal2equal, add_ssg_equal2equal, get_helptext, get_spec_col_num, \
-    FieldChoice, Information, Country, City, Author, Manuscript, \
+    FieldChoice, CHOICE_REGISTRY, Statistic, Information, Country, City, Author, Manuscript, \
     User, Group, Origin, SermonDescr, MsItem, SermonHead, SermonGold, SermonDescrKeyword, SermonDescrEqual, Nickname, NewsItem, \
     SourceInfo, SermonGoldSame, SermonGoldKeyword, EqualGoldKeyword, Signature, Ftextlink, ManuscriptExt, \
     ManuscriptKeyword, Action, EqualGold, EqualGoldLink, Location, LocationName, LocationIdentifier, LocationRelation, LocationType, \
     ProvenanceMan, Provenance, Daterange, CollOverlap, BibRange, Feast, Comment, CommentRead, CommentResponse, SermonEqualDist, \
     Basket, BasketMan, BasketGold, BasketSuper, Litref, LitrefMan, LitrefCol, LitrefSG, EdirefSG, Report, SermonDescrGold, \
-    Visit, Profile, Keyword, SermonSignature, Status, Library, Collection, CollectionSerm, \
+    Visit, Profile, SearchResult, Keyword, SermonSignature, Status, Library, Collection, CollectionSerm, \
     CollectionMan, CollectionSuper, CollectionGold, UserKeyword, Template, ManuscriptLink, \
     EqualGoldExternal, SermonGoldExternal, SermonDescrExternal, ManuscriptExternal, \
     ManuscriptCorpus, ManuscriptCorpusLock, EqualGoldCorpus, ProjectApprover, ProjectEditor, \
@@ -93,15 +93,17 @@ from passim.seeker.models import get_crpp_date, get_current_datetime, process_li
     Project2, ManuscriptProject, CollectionProject, EqualGoldProject, SermonDescrProject, OnlineSources, DaterangeHistColl, AltPages, \
     choice_value, get_reverse_spec, LINK_EQUAL, LINK_PRT, LINK_REL, LINK_BIDIR, LINK_BIDIR_MANU, \
     LINK_PARTIAL, STYPE_IMPORTED, STYPE_EDITED, STYPE_MANUAL, LINK_UNSPECIFIED
-from passim.reader.views import reader_uploads, get_huwa_opera_literature, read_transcription, scan_transcriptions, sync_transcriptions
+from passim.reader.views import reader_uploads, get_huwa_opera_literature, read_transcription, scan_transcriptions, start_scan_transcriptions, sync_transcriptions
 from passim.bible.models import Reference
 from passim.dct.models import ResearchSet, SetList, SavedItem, SavedSearch, SelectItem
 from passim.approve.views import approval_parse_changes, approval_parse_formset, approval_pending, approval_pending_list, \
     approval_parse_adding, approval_parse_removing, approval_parse_deleting, addapproval_pending
 from passim.seeker.adaptations import listview_adaptations, adapt_codicocopy, add_codico_to_manuscript
+from passim.seeker.fulltext import fts_filter
 
 # ======= from RU-Basic ========================
 from passim.basic.views import BasicPart, BasicList, BasicDetails, make_search_list, add_rel_item, adapt_search, is_ajax
+from passim.basic.export import iter_chunks, get_bold_cells
 
 # ======= from RU-cms ==========================
 from passim.seeker.views_utils import passim_action_add, passim_get_history
@@ -658,14 +660,20 @@ def adapt_regex_incexp(value):
 
     return value
 
-def get_saveditem_html(request, instance, profile, htmltype="button", sitemtype=None):
-    """Get an indication whether this is a saved item, or allow to add it"""
+def get_saveditem_html(request, instance, profile, htmltype="button", sitemtype=None, preloaded=None):
+    """Get an indication whether this is a saved item, or allow to add it
+    
+    The optional [preloaded] dictionary comes from SavedItem.get_saveditems()
+    """
 
     oErr = ErrHandle()
     sBack = ""
     try:
         if not sitemtype is None:
-            obj = SavedItem.get_saveditem(instance, profile, sitemtype)
+            if preloaded is None:
+                obj = SavedItem.get_saveditem(instance, profile, sitemtype)
+            else:
+                obj = preloaded.get(instance.id)
             context = {}
             context['profile'] = profile
             context['saveditem'] = obj
@@ -683,8 +691,11 @@ def get_saveditem_html(request, instance, profile, htmltype="button", sitemtype=
         oErr.DoError("get_saveditem_html")
     return sBack
 
-def get_selectitem_info(request, instance, profile, selitemtype=None, context={}):
-    """Get an indication whether this is a select item, or allow to add it"""
+def get_selectitem_info(request, instance, profile, selitemtype=None, context={}, preloaded=None):
+    """Get an indication whether this is a select item, or allow to add it
+    
+    The optional [preloaded] dictionary comes from SelectItem.get_selectitems()
+    """
 
     oErr = ErrHandle()
     sBack = ""
@@ -703,7 +714,10 @@ def get_selectitem_info(request, instance, profile, selitemtype=None, context={}
 
             else:
 
-                obj = SelectItem.get_selectitem(instance, profile, selitemtype)
+                if preloaded is None:
+                    obj = SelectItem.get_selectitem(instance, profile, selitemtype)
+                else:
+                    obj = preloaded.get(instance.id)
                 context['selitem'] = obj
                 context['item'] = instance
                 context['selitemaction'] = "add" if obj is None else "remove"
@@ -772,23 +786,23 @@ def home(request, errortype=None):
         if bDebug: 
             # ========== DEBUG ============
             print("counting for statistics")
-        context['count_sermon'] = SermonDescr.objects.exclude(mtype="tem").count()
-        context['count_manu'] = Manuscript.objects.exclude(mtype="tem").count()
-        context['count_ssg'] = EqualGold.objects.count()
+        oSnapshot = Statistic.get_snapshot()
+        context['count_sermon'] = oSnapshot['count'].get('sermon', 0)
+        context['count_manu'] = oSnapshot['count'].get('manu', 0)
+        context['count_ssg'] = oSnapshot['count'].get('ssg', 0)
 
         # Gather pie-chart data
         if bDebug: 
             # ========== DEBUG ============
             print("Fetching pie chart data")
-        context['pie_data'] = get_pie_data()
-        context['hbar_data'] = get_hbar_data()
+        context['pie_data'] = get_pie_data(oSnapshot)
+        context['hbar_data'] = get_hbar_data(oSnapshot)
 
         # Possibly start getting new Stemmatology results
         if bOverrideSync and user_is_superuser(request):
             scan_transcriptions()
         else:
-            thread = Thread(target=scan_transcriptions)
-            thread.start()
+            start_scan_transcriptions()
 
         # Add links to projects on the homepage
         prj_links = []
@@ -804,16 +818,19 @@ def home(request, errortype=None):
         context['prj_images'] = prj_images 
         
         # use the name of the project and get the id of the project
+        oProject = {}
+        for obj in Project2.objects.annotate(lname=Lower('name')).filter(lname__in=[x.lower() for x in prj_names]).order_by('id'):
+            oProject.setdefault(obj.lname, obj)
         for idx, sName in enumerate(prj_names):
             # Find the project fitting the name
-            obj = Project2.objects.filter(name__iexact = sName).first()
+            obj = oProject.get(sName.lower())
             if not obj is None:
                 url = reverse('project2_details', kwargs={'pk': obj.id})
                 oItem = dict(url=url, name=sName)
                 oItem["picture"] = prj_images[idx]
                 oItem["nameclean"] = prj_namesclean[idx]
                 oItem["title"]= prj_namesclean[idx]
-            prj_links.append(oItem)           
+                prj_links.append(oItem)           
         context['prj_links'] = prj_links
         
         # Check if the user's / profile's information is up-to-date
@@ -4178,7 +4195,7 @@ def import_authors(request):
     # Return the information
     return JsonResponse(data)
 
-def get_pie_data():
+def get_pie_data(oSnapshot=None):
     """Fetch data for a particular type of pie-chart for the home page
     
     Current types: 'sermo', 'super', 'manu'
@@ -4192,37 +4209,36 @@ def get_pie_data():
     ptypes = ['sermo', 'super', 'manu']
     try:
         # Get the values for app, edi, imp, man
-        stype_list = FieldChoice.objects.filter(field="seeker.stype").values('id', 'abbr')
         oStype = {}
-        for oItem in stype_list:
+        for oItem in CHOICE_REGISTRY.get_choices("seeker.stype"):
             oStype[oItem['abbr']] = oItem['id']
+        # The counts per stype come from the statistics snapshot
+        if oSnapshot == None:
+            oSnapshot = Statistic.get_snapshot()
         for ptype in ptypes:
-            qs = None
+            oCount = oSnapshot.get(ptype)
             url_red = ""
             url_ora = ""
             url_gre = ""
             if ptype == "sermo":
-                qs = SermonDescr.objects.exclude(Q(mtype='tem') & Q(msitem__isnull=True)).order_by('stype').values('stype')
                 url_red = "{}?sermo-stypelist={}&sermo-stypelist={}".format(reverse('sermon_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?sermo-stypelist={}".format(reverse('sermon_list'), oStype['edi'])
                 url_gre = "{}?sermo-stypelist={}".format(reverse('sermon_list'), oStype['app'])
             elif ptype == "super":
-                qs = EqualGold.objects.filter(moved__isnull=True,atype='acc').order_by('stype').values('stype')
                 url_red = "{}?ssg-stypelist={}&ssg-stypelist={}".format(reverse('equalgold_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?ssg-stypelist={}".format(reverse('equalgold_list'), oStype['edi'])
                 url_gre = "{}?ssg-stypelist={}".format(reverse('equalgold_list'), oStype['app'])
             elif ptype == "manu":
-                qs = Manuscript.objects.exclude(Q(mtype='tem')).order_by('stype').values('stype')
                 url_red = "{}?manu-stypelist={}&manu-stypelist={}".format(reverse('manuscript_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?manu-stypelist={}".format(reverse('manuscript_list'), oStype['edi'])
                 url_gre = "{}?manu-stypelist={}".format(reverse('manuscript_list'), oStype['app'])
             # Calculate the different stype values
-            if qs != None:
-                app = sum(x['stype'] == "app" for x in qs)  # Approved
-                edi = sum(x['stype'] == "edi" for x in qs)  # Edited
-                imp = sum(x['stype'] == "imp" for x in qs)  # Imported
-                man = sum(x['stype'] == "man" for x in qs)  # Manually created
-                und = sum(x['stype'] == "-" for x in qs)    # Undefined
+            if oCount != None:
+                app = oCount.get("app", 0)  # Approved
+                edi = oCount.get("edi", 0)  # Edited
+                imp = oCount.get("imp", 0)  # Imported
+                man = oCount.get("man", 0)  # Manually created
+                und = oCount.get("-", 0)    # Undefined
                 red = imp + und + man
                 orange = edi
                 green = app
@@ -4240,7 +4256,7 @@ def get_pie_data():
     return combidata 
 
 
-def get_hbar_data():
+def get_hbar_data(oSnapshot=None):
     """Fetch data for a particular type of horizontal bar chart for the home page
     
     Result: list of objects, where each object has at least the following features:
@@ -4265,38 +4281,37 @@ def get_hbar_data():
     ptypename = ['Authority file', 'Manifestation', 'Manuscript']
     try:
         # Get the values for app, edi, imp, man
-        stype_list = FieldChoice.objects.filter(field="seeker.stype").values('id', 'abbr')
         oStype = {}
-        for oItem in stype_list:
+        for oItem in CHOICE_REGISTRY.get_choices("seeker.stype"):
             oStype[oItem['abbr']] = oItem['id']
+        # The counts per stype come from the statistics snapshot
+        if oSnapshot == None:
+            oSnapshot = Statistic.get_snapshot()
         for idx, ptype in enumerate(ptypes):
             group = ptypename[idx]
-            qs = None
+            oCount = oSnapshot.get(ptype)
             url_red = ""
             url_ora = ""
             url_gre = ""
             if ptype == "sermo":
-                qs = SermonDescr.objects.exclude(Q(mtype='tem') & Q(msitem__isnull=True)).order_by('stype').values('stype')
                 url_red = "{}?sermo-stypelist={}&sermo-stypelist={}".format(reverse('sermon_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?sermo-stypelist={}".format(reverse('sermon_list'), oStype['edi'])
                 url_gre = "{}?sermo-stypelist={}".format(reverse('sermon_list'), oStype['app'])
             elif ptype == "super":
-                qs = EqualGold.objects.filter(moved__isnull=True,atype='acc').order_by('stype').values('stype')
                 url_red = "{}?ssg-stypelist={}&ssg-stypelist={}".format(reverse('equalgold_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?ssg-stypelist={}".format(reverse('equalgold_list'), oStype['edi'])
                 url_gre = "{}?ssg-stypelist={}".format(reverse('equalgold_list'), oStype['app'])
             elif ptype == "manu":
-                qs = Manuscript.objects.exclude(Q(mtype='tem')).order_by('stype').values('stype')
                 url_red = "{}?manu-stypelist={}&manu-stypelist={}".format(reverse('manuscript_list'), oStype['imp'], oStype['man'])
                 url_ora = "{}?manu-stypelist={}".format(reverse('manuscript_list'), oStype['edi'])
                 url_gre = "{}?manu-stypelist={}".format(reverse('manuscript_list'), oStype['app'])
             # Calculate the different stype values
-            if qs != None:
-                app = sum(x['stype'] == "app" for x in qs)  # Approved
-                edi = sum(x['stype'] == "edi" for x in qs)  # Edited
-                imp = sum(x['stype'] == "imp" for x in qs)  # Imported
-                man = sum(x['stype'] == "man" for x in qs)  # Manually created
-                und = sum(x['stype'] == "-" for x in qs)    # Undefined
+            if oCount != None:
+                app = oCount.get("app", 0)  # Approved
+                edi = oCount.get("edi", 0)  # Edited
+                imp = oCount.get("imp", 0)  # Imported
+                man = oCount.get("man", 0)  # Manually created
+                und = oCount.get("-", 0)    # Undefined
                 red = imp + und + man
                 orange = edi
                 green = app
@@ -5645,6 +5660,16 @@ class SermonListView(BasicList):
         {'name': '',            'order': '',    'type': 'str',  'custom':  'saved' },
         {'name': 'Links',       'order': '',    'type': 'str',  'custom': 'links'},
         {'name': 'Status',      'order': 'o=11', 'type': 'str', 'custom': 'status'}]
+    prefetch_plan = {
+        'author':       {'select_related': ['author', 'nickname']},
+        'manuscript':   {'select_related': ['msitem__codico__manuscript__library__lcity', 'msitem__codico__manuscript__lcity']},
+        'msdate':       {'select_related': ['msitem__codico__manuscript']},
+        'links':        {'prefetch_related': ['goldsermons']},
+        }
+    download_prefetch = ['author', 'sermonbibranges__book', 'keywords', 'sermo_userkeywords__keyword', 'collections',
+                         'sermonsignatures', 'msitem__codico__manuscript__manuscript_litrefs__reference',
+                         'equalgolds__equal_goldsermons__sermon_gold_litrefs__reference',
+                         'equalgolds__equal_goldsermons__goldsignatures']
 
     filters = [ {"name": "Gryson/Clavis/Other code",    "id": "filter_signature",      "enabled": False},
                 {"name": "Attr. author",     "id": "filter_author",         "enabled": False},
@@ -5683,8 +5708,10 @@ class SermonListView(BasicList):
     
     searches = [
         {'section': '', 'filterlist': [
-            {'filter': 'incipit',       'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp},
-            {'filter': 'explicit',      'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp},
+            {'filter': 'incipit',       'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp,
+             'fts': fts_filter("SermonDescr")},
+            {'filter': 'explicit',      'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp,
+             'fts': fts_filter("SermonDescr")},
             {'filter': 'title',         'dbfield': 'srchtitle',         'keyS': 'srch_title'},
             {'filter': 'sectiontitle',  'dbfield': 'srchsectiontitle',  'keyS': 'srch_sectiontitle'},
             {'filter': 'feast',         'fkfield': 'feast',             'keyFk': 'feast', 'keyList': 'feastlist', 'infield': 'id'},
@@ -5804,7 +5831,11 @@ class SermonListView(BasicList):
             else:
                 html.append("<span><i>(unknown)</i></span>")
         elif custom == "signature":
-            html.append(instance.get_eqsetsignatures_markdown('combi'))
+            oSignature = self.page_data.get('signature')
+            if oSignature is None:
+                html.append(instance.get_eqsetsignatures_markdown('combi'))
+            else:
+                html.append(oSignature.get(instance.id, ""))
         elif custom == "incexpl":
             html.append("<span>{}</span>".format(instance.get_incipit_markdown()))
             dots = "..." if instance.incipit else ""
@@ -5827,14 +5858,21 @@ class SermonListView(BasicList):
                 sTitle = manu.idno
         elif custom == "saved":
             # Prepare saveditem handling
-            saveditem_button = get_saveditem_html(self.request, instance, self.profile, sitemtype="serm")
-            saveditem_form = get_saveditem_html(self.request, instance, self.profile, "form", sitemtype="serm")
+            saved = self.page_data.get('saved')
+            saveditem_button = get_saveditem_html(self.request, instance, self.profile, sitemtype="serm", preloaded=saved)
+            saveditem_form = get_saveditem_html(self.request, instance, self.profile, "form", sitemtype="serm", preloaded=saved)
             html.append(saveditem_button)
             html.append(saveditem_form)
         elif custom == "msdate":
             manu = instance.get_manuscript()
             # Get the yearstart-yearfinish
-            html.append(manu.get_dates(True))
+            oMsdate = self.page_data.get('msdate')
+            if manu is None:
+                html.append("-")
+            elif oMsdate is None:
+                html.append(manu.get_dates(True))
+            else:
+                html.append(oMsdate.get(manu.id, "-"))
         elif custom == "title":
             sTitle = ""
             if instance.title != None and instance.title != "":
@@ -5846,8 +5884,9 @@ class SermonListView(BasicList):
                 sSection = instance.sectiontitle
             html.append(sSection)
         elif custom == "links":
+            oLinks = self.page_data.get('links')
             for gold in instance.goldsermons.all():
-                for link_def in gold.link_oview():
+                for link_def in gold.link_oview(None if oLinks is None else oLinks.get(gold.id, {})):
                     if link_def['count'] > 0:
                         html.append("<span class='badge {}' title='{}'>{}</span>".format(link_def['class'], link_def['title'], link_def['count']))
         elif custom == "status":
@@ -6059,19 +6098,41 @@ class SermonListView(BasicList):
         return fields, lstExclude, qAlternative
     
     def view_queryset(self, qs):
-        search_id = [x['id'] for x in qs.values('id')]
-        profile = Profile.get_user_profile(self.request.user.username)
-        profile.search_sermo = json.dumps(search_id)
-        profile.save()
+        # Keep the ids of this search result for basket operations
+        username = self.request.user.username
+        profile = Profile.get_user_profile(username)
+        key = SearchResult.get_key("sermo", self.qd, username)
+        SearchResult.store(profile, "sermo", key, qs)
         return None
 
     def get_helptext(self, name):
         """Use the get_helptext function defined in models.py"""
         return get_helptext(name)
 
+    def get_page_data(self, obj_list):
+        """Pre-load the information needed by get_field_value() for one page"""
+
+        sermon_ids = [x.id for x in obj_list]
+        oBack = {}
+        # NOTE: 'colwrap' columns are rendered too, so they are pre-loaded as well
+        columns = [x.get('custom') for x in self.order_heads]
+        if 'signature' in columns:
+            oBack['signature'] = SermonDescr.get_eqsetsignatures_combi(sermon_ids)
+        if 'msdate' in columns:
+            manu_ids = [x.msitem.codico.manuscript_id for x in obj_list if x.msitem and x.msitem.codico]
+            oBack['msdate'] = Manuscript.get_dates_overall(manu_ids)
+        if 'links' in columns:
+            gold_ids = [gold.id for x in obj_list for gold in x.goldsermons.all()]
+            oBack['links'] = SermonGold.get_link_counts(gold_ids)
+        if 'saved' in columns:
+            oBack['saved'] = SavedItem.get_saveditems(sermon_ids, self.profile, "serm")
+        if not self.sel_button is None and self.sel_button != "":
+            oBack['selected'] = SelectItem.get_selectitems(sermon_ids, self.profile, self.sel_button)
+        return oBack
+
     def get_selectitem_info(self, instance, context):
         """Use the get_selectitem_info() defined earlier in this views.py"""
-        return get_selectitem_info(self.request, instance, self.profile, self.sel_button, context)
+        return get_selectitem_info(self.request, instance, self.profile, self.sel_button, context, self.page_data.get('selected'))
 
 
 # ============= ONLINESOURCE ==============================
@@ -12315,6 +12376,9 @@ class ManuscriptListView(BasicList):
     plural_name = "Manuscripts"
     basketview = False
     spec_download = False       # No automatic, specification-based, downloading yet
+    download_prefetch = ['projects', 'manuscriptcodicounits__codico_dateranges', 'keywords', 'manu_userkeywords__keyword',
+                         'collections', 'manuscript_litrefs__reference', 'manuscriptexternals',
+                         'sermondescr_super__super', 'sermondescr_super__sermon__msitem__codico']
     
     order_cols = ['library__location__name;library__lcity__name', 'library__name', 'idno;name', 
                   '', '', '', 'yearstart','yearfinish', 'stype','']
@@ -12661,13 +12725,10 @@ class ManuscriptListView(BasicList):
 
     def adapt_search(self, fields):                      
 
-        def get_overlap_ptc(base_ssgs, comp_ssgs):
-            """Calculate the overlap percentage between base and comp"""
+        def get_overlap_ptc(base_ssgs, comp_ssgs, total):
+            """Calculate the overlap percentage between base (a set) and comp"""
 
-            total = len(base_ssgs)
-            count = 0
-            for ssg_id in comp_ssgs:
-                if ssg_id in base_ssgs: count += 1
+            count = sum(1 for ssg_id in comp_ssgs if ssg_id in base_ssgs)
             result = 100 * count / total
             return result
 
@@ -12739,11 +12800,8 @@ class ManuscriptListView(BasicList):
                         lstQ.append(Q(manuitems__itemsermons__equalgolds__collections__in=coll_list))
                         manu_list = Manuscript.objects.filter(*lstQ)
 
-                        # Now calculate the overlap for all
-                        with transaction.atomic():
-                            for coll in coll_list:
-                                for manu in manu_list:
-                                    ptc = CollOverlap.get_overlap(profile, coll, manu)
+                        # Now calculate the overlap for all (only where it is not known yet)
+                        CollOverlap.get_overlaps(profile, coll_list, manu_list.values_list('id', flat=True).distinct())
 
                 if len(base_manu_list) > 0:
                     # if 'cmpmanuidlist' in fields and fields['cmpmanuidlist'] != None:
@@ -12772,16 +12830,19 @@ class ManuscriptListView(BasicList):
 
                             # We also need to have the profile
                             profile = Profile.get_user_profile(self.request.user.username)
+                            # Get the SSG id's of all these manuscripts in one go
+                            manu_ssgs = {}
+                            for manu_id, super_id in SermonDescrEqual.objects.filter(sermon__msitem__manu__in=manu_list).values_list(
+                                    'sermon__msitem__manu_id', 'super_id'):
+                                manu_ssgs.setdefault(manu_id, []).append(super_id)
+
                             # Now calculate the overlap for all
                             manu_include = []
-                            with transaction.atomic():
-                                for manu in manu_list:
-                                    # Get a list of SSG id's associated with this particular manuscript
-                                    manu_ssg_list = [x['id'] for x in EqualGold.objects.filter(sermondescr_super__sermon__msitem__manu__id=manu.id).values('id')]
-                                    if get_overlap_ptc(base_ssg_list, manu_ssg_list) >= overlap:
-                                        # Add this manuscript to the list 
-                                        if not manu.id in manu_include:
-                                            manu_include.append(manu.id)
+                            base_ssg_set = set(base_ssg_list)
+                            for manu_id, manu_ssg_list in manu_ssgs.items():
+                                if get_overlap_ptc(base_ssg_set, manu_ssg_list, base_count) >= overlap:
+                                    # Add this manuscript to the list 
+                                    manu_include.append(manu_id)
                             fields['cmpmanuidlist'] = None
                             fields['cmpmanu'] = Q(id__in=manu_include)
 
@@ -12878,10 +12939,11 @@ class ManuscriptListView(BasicList):
         return fields, lstExclude, qAlternative
 
     def view_queryset(self, qs):
-        search_id = [x['id'] for x in qs.values('id')]
-        profile = Profile.get_user_profile(self.request.user.username)
-        profile.search_manu = json.dumps(search_id)
-        profile.save()
+        # Keep the ids of this search result for basket operations
+        username = self.request.user.username
+        profile = Profile.get_user_profile(username)
+        key = SearchResult.get_key("manu", self.qd, username)
+        SearchResult.store(profile, "manu", key, qs)
         return None
 
     def get_helptext(self, name):
@@ -12939,6 +13001,18 @@ class ManuscriptDownload(BasicPart):
             sBack = instance.get_eqset()
         return sBack
 
+    def iter_msitems(self):
+        """Yield (msitem, sermonhead, sermon) for the msitems of this manuscript, read in chunks"""
+
+        qs = self.obj.manuitems.all().order_by('order').select_related('parent', 'firstchild', 'next', 'codico')
+        for chunk in iter_chunks(qs, ['itemheads', 'itemsermons__feast']):
+            for msitem in chunk:
+                lst_head = sorted(msitem.itemheads.all(), key=lambda x: x.id)
+                lst_sermon = sorted(msitem.itemsermons.all(), key=lambda x: x.id)
+                sermonhead = lst_head[0] if len(lst_head) > 0 else None
+                sermon = lst_sermon[0] if len(lst_sermon) > 0 else None
+                yield msitem, sermonhead, sermon
+
     def get_data(self, prefix, dtype, response=None):
         """Gather the data as CSV, including a header line and comma-separated"""
 
@@ -12959,32 +13033,25 @@ class ManuscriptDownload(BasicPart):
 
             # Is this Excel?
             if dtype == "excel" or dtype == "xlsx":
-                # Start workbook
-                wb = openpyxl.Workbook()
+                # Start a write-only workbook: its rows are kept in a temporary file
+                wb = openpyxl.Workbook(write_only=True)
 
                 # First worksheet: MANUSCRIPT itself
-                # ws = wb.get_active_sheet()
-                ws = wb.active
-                ws.title="Manuscript"
+                ws = wb.create_sheet("Manuscript")
 
                 # Read the header cells and make a header row in the MANUSCRIPT worksheet
                 headers = ["Field", "Value"]
                 for col_num in range(len(headers)):
-                    c = ws.cell(row=1, column=col_num+1)
-                    c.value = headers[col_num]
-                    c.font = openpyxl.styles.Font(bold=True)
                     # Set width to a fixed size
                     ws.column_dimensions[get_column_letter(col_num+1)].width = 5.0        
+                ws.append(get_bold_cells(ws, headers))
 
                 # Walk the mainitems
-                row_num = 2
                 kwargs = {'profile': profile, 'username': username, 'team_group': team_group}
                 for item in Manuscript.specification:
                     key, value = self.obj.custom_getkv(item, kwargs=kwargs)
                     # Add the K/V row
-                    ws.cell(row=row_num, column = 1).value = key
-                    ws.cell(row=row_num, column = 2).value = value
-                    row_num += 1
+                    ws.append([key, value])
 
                 # Second worksheet: ALL CODICOLOGICAL units in this manuscript
                 ws = wb.create_sheet("Codicos")
@@ -12992,33 +13059,19 @@ class ManuscriptDownload(BasicPart):
                 # Read the header cells and make a header row in the CODICO worksheet
                 headers = [x['name'] for x in Codico.specification ]
                 for col_num in range(len(headers)):
-                    c = ws.cell(row=1, column=col_num+1)
-                    c.value = headers[col_num]
-                    c.font = openpyxl.styles.Font(bold=True)
                     # Set width to a fixed size
                     ws.column_dimensions[get_column_letter(col_num+1)].width = 5.0        
+                ws.append(get_bold_cells(ws, headers))
 
-                row_num = 1
                 # Walk all codico's of this manuscript
                 for codico in self.obj.manuscriptcodicounits.all().order_by('order'):
-                    row_num += 1
-                    col_num = 1
-                    # Show the order number of this Codico
-                    # ws.cell(row=row_num, column=col_num).value = msitem.order
-
-                    #for item in Codico.specification:
-                    #    key, value = codico.custom_getkv(item, kwargs=kwargs)
-                    #    # Add the K/V row
-                    #    ws.cell(row=row_num, column = 1).value = key
-                    #    ws.cell(row=row_num, column = 2).value = value
-                    #    row_num += 1
+                    row = []
                     # Walk the items
                     for item in Codico.specification:
                         if item['type'] != "":
                             key, value = codico.custom_getkv(item, kwargs=kwargs)
-                            ws.cell(row=row_num, column=col_num).value = value
-                            col_num += 1
-
+                            row.append(value)
+                    ws.append(row)
 
                 # Third worksheet: ALL SERMONS in the manuscript
                 ws = wb.create_sheet("Sermons")
@@ -13026,58 +13079,41 @@ class ManuscriptDownload(BasicPart):
                 # Read the header cells and make a header row in the SERMON worksheet
                 headers = [x['name'] for x in SermonDescr.specification ]
                 for col_num in range(len(headers)):
-                    c = ws.cell(row=1, column=col_num+1)
-                    c.value = headers[col_num]
-                    c.font = openpyxl.styles.Font(bold=True)
                     # Set width to a fixed size
                     ws.column_dimensions[get_column_letter(col_num+1)].width = 5.0        
+                ws.append(get_bold_cells(ws, headers))
 
-                row_num = 1
                 # Walk all msitems of this manuscript
-                for msitem in self.obj.manuitems.all().order_by('order'):
-                    row_num += 1
-                    col_num = 1
+                for msitem, sermonhead, sermon in self.iter_msitems():
+                    # Column number => value
+                    oRow = {}
                     # Show the order number of this MsItem
-                    ws.cell(row=row_num, column=col_num).value = msitem.order
-                    # Get other stuff
-                    parent = "" if msitem.parent == None else msitem.parent.order
-                    firstchild = "" if msitem.firstchild == None else msitem.firstchild.order
-                    next = "" if msitem.next == None else msitem.next.order
-                    codico = "" if msitem.codico is None else msitem.codico.order
-
+                    oRow[1] = msitem.order
                     # Process the structural elements
-                    col_num += 1
-                    ws.cell(row=row_num, column=col_num).value = parent
-                    col_num += 1
-                    ws.cell(row=row_num, column=col_num).value = firstchild
-                    col_num += 1
-                    ws.cell(row=row_num, column=col_num).value = next
-                    col_num += 1
-                    ws.cell(row=row_num, column=col_num).value = codico
+                    oRow[2] = "" if msitem.parent == None else msitem.parent.order
+                    oRow[3] = "" if msitem.firstchild == None else msitem.firstchild.order
+                    oRow[4] = "" if msitem.next == None else msitem.next.order
+                    oRow[5] = "" if msitem.codico is None else msitem.codico.order
 
                     # What kind of item is this?
-                    col_num += 1
-                    if msitem.itemheads.count() > 0:
-                        sermonhead = msitem.itemheads.first()
+                    col_num = 6
+                    if not sermonhead is None:
                         # This is a SermonHead
-                        ws.cell(row=row_num, column=col_num).value = "Structural"
+                        oRow[col_num] = "Structural"
                         # issue #609: needs adjustment
-                        col_num = get_spec_col_num(SermonDescr, 'locus')
-                        ws.cell(row=row_num, column=col_num).value = sermonhead.locus
-                        col_num = get_spec_col_num(SermonDescr, 'title')
-                        ws.cell(row=row_num, column=col_num).value = sermonhead.title.strip()
+                        oRow[get_spec_col_num(SermonDescr, 'locus')] = sermonhead.locus
+                        oRow[get_spec_col_num(SermonDescr, 'title')] = sermonhead.title.strip()
                     else:
                         # This is a SermonDescr
-                        ws.cell(row=row_num, column=col_num).value = "Plain"
+                        oRow[col_num] = "Plain"
                         col_num += 1
-                        sermon = msitem.itemsermons.first()
                         # Walk the items
                         for item in SermonDescr.specification:
                             if item['type'] != "":
                                 key, value = sermon.custom_getkv(item, kwargs=kwargs)
-                                ws.cell(row=row_num, column=col_num).value = value
+                                oRow[col_num] = value
                                 col_num += 1
-                
+                    ws.append([oRow.get(col_num) for col_num in range(1, max(oRow) + 1)])
 
                 # Save it
                 wb.save(response)
@@ -13100,7 +13136,7 @@ class ManuscriptDownload(BasicPart):
                         oManu[key] = value
 
                 # Walk all msitems of this manuscript
-                for msitem in self.obj.manuitems.all().order_by('order'):
+                for msitem, sermonhead, sermon in self.iter_msitems():
                     # Create an object for this sermon
                     oMsItem = {}
 
@@ -13114,8 +13150,7 @@ class ManuscriptDownload(BasicPart):
                     oSermon = {}
 
                     # What kind of item is this?
-                    if msitem.itemheads.count() > 0:
-                        sermonhead = msitem.itemheads.first()
+                    if not sermonhead is None:
                         # This is a SermonHead
                         oSermon['type'] = "Structural"
                         oSermon['locus'] = sermonhead.locus
@@ -13124,8 +13159,6 @@ class ManuscriptDownload(BasicPart):
                         # This is a SermonDescr
                         oSermon['type'] = "Plain"
 
-                        # Get the actual sermon
-                        sermon = msitem.itemsermons.first()
                         # Walk the items of this sermon (defined in specification)
                         for item in SermonDescr.specification:
                             if item['type'] != "" and item['type'] != "fk_id":
@@ -13648,8 +13681,10 @@ class SermonGoldListView(BasicList):
         ]       
     searches = [
         {'section': '', 'filterlist': [
-            {'filter': 'incipit',   'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp},
-            {'filter': 'explicit',  'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp},
+            {'filter': 'incipit',   'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp,
+             'fts': fts_filter("SermonGold")},
+            {'filter': 'explicit',  'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp,
+             'fts': fts_filter("SermonGold")},
             {'filter': 'author',    'fkfield': 'author',            'keyS': 'authorname', 
              'keyFk': 'name',       'keyList': 'authorlist', 'infield': 'id', 'external': 'gold-authorname' },
             {'filter': 'signature', 'fkfield': 'goldsignatures',    'keyS': 'signature',    'help': 'signature',
@@ -13794,10 +13829,11 @@ class SermonGoldListView(BasicList):
         return fields, lstExclude, qAlternative
 
     def view_queryset(self, qs):
-        search_id = [x['id'] for x in qs.values('id')]
-        profile = Profile.get_user_profile(self.request.user.username)
-        profile.search_gold = json.dumps(search_id)
-        profile.save()
+        # Keep the ids of this search result for basket operations
+        username = self.request.user.username
+        profile = Profile.get_user_profile(username)
+        key = SearchResult.get_key("gold", self.qd, username)
+        SearchResult.store(profile, "gold", key, qs)
         return None
 
     def get_helptext(self, name):
@@ -15588,6 +15624,10 @@ class EqualGoldListView(BasicList):
          'title': "Number of historical collections associated with this Authority file"},
         {'name': 'Status',                  'order': 'o=10',   'type': 'str', 'custom': 'status'}        
         ]
+    prefetch_plan = {
+        'author':   {'select_related': ['author']},
+        }
+    download_prefetch = ['equal_goldsermons__goldsignatures', 'keywords', 'collections', 'projects', 'comments']
     filters = [
         {"name": "Author",          "id": "filter_author",            "enabled": False},
         {"name": "Incipit",         "id": "filter_incipit",           "enabled": False},
@@ -15612,8 +15652,10 @@ class EqualGoldListView(BasicList):
                ]
     searches = [
         {'section': '', 'filterlist': [
-            {'filter': 'incipit',   'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp},
-            {'filter': 'explicit',  'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp},
+            {'filter': 'incipit',   'dbfield': 'srchincipit',       'keyS': 'incipit',  'regex': adapt_regex_incexp,
+             'fts': fts_filter("EqualGold")},
+            {'filter': 'explicit',  'dbfield': 'srchexplicit',      'keyS': 'explicit', 'regex': adapt_regex_incexp,
+             'fts': fts_filter("EqualGold")},
             
             {'filter': 'code',      'dbfield': 'code',              'keyS': 'code',     'help': 'passimcode',
              'keyList': 'passimlist', 'infield': 'id'},
@@ -15624,7 +15666,8 @@ class EqualGoldListView(BasicList):
             {'filter': 'scount',    'dbfield': 'scount',            'keyS': 'scount',
              'title': 'The number of sermons (manifestations) belonging to this Authority file' },
             {'filter': 'transcr',   'dbfield': 'foperator',         'keyS': 'foperator'         },
-            {'filter': 'transcr',   'dbfield': 'srchfulltext',      'keyS': 'srchfulltext'      },
+            {'filter': 'transcr',   'dbfield': 'srchfulltext',      'keyS': 'srchfulltext',
+             'fts': fts_filter("EqualGold")},
             {'filter': 'ssgcount',  'dbfield': 'ssgoperator',       'keyS': 'ssgoperator'       },
             {'filter': 'ssgcount',  'dbfield': 'ssgcount',          'keyS': 'ssgcount',
              'title': 'The number of links an Authority file has to other Authority files'      },
@@ -15825,22 +15868,20 @@ class EqualGoldListView(BasicList):
             html.append("<span style='color: blue;'>{}</span>".format(dots))
             html.append("<span>{}</span>".format(instance.get_explicit_markdown()))
         elif custom == "sig":           
-            # The prefered sequence of codes (Gryson, Clavis, Other)
-            editype_pref_seq = ['gr', 'cl', 'ot'] 
-            # Use the prefered sequence of codes 
-            for editype in editype_pref_seq: 
-            # Visit all signatures for each Authority File               
-                qs = Signature.objects.filter(gold__equal=instance, editype=editype).order_by('code')
-                # Iterate over all signatures (for each editype)
-                for sig in qs:
-                    editype = sig.editype
-                    url = "{}?gold-siglist={}".format(reverse("gold_list"), sig.id)
-                    short = sig.short()
-                    html.append("<span class='badge signature {}' title='{}'><a class='nostyle' href='{}'>{}</a></span>".format(editype, short, url, short[:20]))           
+            # The signatures have been pre-loaded in the prefered sequence of codes (Gryson, Clavis, Other)
+            url_gold = reverse("gold_list")
+            oSig = self.page_data.get('sig')
+            if oSig is None:
+                oSig = self.get_signatures([instance.id])
+            for sig in oSig.get(instance.id, []):
+                url = "{}?gold-siglist={}".format(url_gold, sig['id'])
+                short = sig['code']
+                html.append("<span class='badge signature {}' title='{}'><a class='nostyle' href='{}'>{}</a></span>".format(sig['editype'], short, url, short[:20]))           
         elif custom == "saved":
             # Prepare saveditem handling
-            saveditem_button = get_saveditem_html(self.request, instance, self.profile, sitemtype="ssg")
-            saveditem_form = get_saveditem_html(self.request, instance, self.profile, "form", sitemtype="ssg")
+            saved = self.page_data.get('saved')
+            saveditem_button = get_saveditem_html(self.request, instance, self.profile, sitemtype="ssg", preloaded=saved)
+            saveditem_form = get_saveditem_html(self.request, instance, self.profile, "form", sitemtype="ssg", preloaded=saved)
             html.append(saveditem_button)
             html.append(saveditem_form)
         elif custom == "status":
@@ -15913,19 +15954,46 @@ class EqualGoldListView(BasicList):
         return fields, lstExclude, qAlternative        
 
     def view_queryset(self, qs):
-        search_id = [x['id'] for x in qs.values('id')]
-        profile = Profile.get_user_profile(self.request.user.username)
-        profile.search_super = json.dumps(search_id)
-        profile.save()
+        # Keep the ids of this search result for basket operations
+        username = self.request.user.username
+        profile = Profile.get_user_profile(username)
+        key = SearchResult.get_key("super", self.qd, username)
+        SearchResult.store(profile, "super", key, qs)
         return None
 
     def get_helptext(self, name):
         """Use the get_helptext function defined in models.py"""
         return get_helptext(name)
 
+    def get_page_data(self, obj_list):
+        """Pre-load the information needed by get_field_value() for one page"""
+
+        ssg_ids = [x.id for x in obj_list]
+        oBack = {}
+        # NOTE: 'colwrap' columns are rendered too, so they are pre-loaded as well
+        columns = [x.get('custom') for x in self.order_heads]
+        if 'sig' in columns:
+            oBack['sig'] = self.get_signatures(ssg_ids)
+        if 'saved' in columns:
+            oBack['saved'] = SavedItem.get_saveditems(ssg_ids, self.profile, "ssg")
+        if not self.sel_button is None and self.sel_button != "":
+            oBack['selected'] = SelectItem.get_selectitems(ssg_ids, self.profile, self.sel_button)
+        return oBack
+
+    def get_signatures(self, ssg_ids):
+        """Get the signatures of the SSGs in [ssg_ids], in the prefered sequence of codes (Gryson, Clavis, Other)"""
+
+        oBack = {}
+        editype_pref_seq = ['gr', 'cl', 'ot'] 
+        qs = Signature.objects.filter(gold__equal_id__in=ssg_ids, editype__in=editype_pref_seq).values(
+            'id', 'code', 'editype', 'gold__equal_id')
+        for sig in sorted(qs, key=lambda x: (editype_pref_seq.index(x['editype']), x['code'], x['id'])):
+            oBack.setdefault(sig['gold__equal_id'], []).append(sig)
+        return oBack
+
     def get_selectitem_info(self, instance, context):
         """Use the get_selectitem_info() defined earlier in this views.py"""
-        return get_selectitem_info(self.request, instance, self.profile, self.sel_button, context)
+        return get_selectitem_info(self.request, instance, self.profile, self.sel_button, context, self.page_data.get('selected'))
         
 
 class EqualGoldScountDownload(BasicPart):
@@ -17535,10 +17603,8 @@ class BasketUpdate(BasicPart):
                 if operation in lst_basket_target:
                     if method == "use_profile_search_id_list":
                         # Get the latest search results
-                        search_s = getattr(profile, "search_{}".format(self.colltype))
-                        search_id = []
-                        if search_s != None and search_s != "" and search_s[0] == "[":
-                            search_id = json.loads(search_s)
+                        search_result = SearchResult.get_current(profile, self.colltype)
+                        search_id = [] if search_result == None else search_result.get_ids()
                         search_count = len(search_id)
 
                         kwargs = {'profile': profile}
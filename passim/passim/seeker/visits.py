@@ -0,0 +1,183 @@
+"""
+Write-behind recording of visits for the SEEKER app.
+
+Every page view of a logged-in user changes the breadcrumb stack of that user
+(and may add a Visit row). Doing that synchronously means several writes per
+GET request. The VisitRecorder instead keeps the breadcrumb stacks in the cache
+and buffers Visit rows in memory. The buffer is written with one bulk_create
+(and the changed stacks with one update per user) when it is full or old enough.
+
+Trimming the number of Visit rows per user is never done in a request: it is
+done by the management command 'visit_maintenance' (e.g. from cron), and when a
+process that recorded visits ends, at most once per VISIT_TRIM_INTERVAL.
+"""
+
+import atexit
+import json
+import threading
+import time
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models import Count
+from django.urls import reverse
+
+# ======= imports from my own application ======
+from passim.settings import VISIT_FLUSH_INTERVAL, VISIT_FLUSH_SIZE, VISIT_TRIM_INTERVAL
+from passim.utils import ErrHandle
+
+
+def adapt_stack(lst_stack, name, path, is_menu, **kwargs):
+    """Process one visit in the breadcrumb stack [lst_stack] and return the new stack"""
+
+    # Check if this is a menu choice
+    if is_menu:
+        # Rebuild the stack
+        path_home = reverse("home")
+        lst_stack = []
+        lst_stack.append({'name': "Home", 'url': path_home })
+        if path != path_home:
+            lst_stack.append({'name': name, 'url': path })
+    else:
+        # Check if this path is already on the stack
+        bNew = True
+        for idx, item in enumerate(lst_stack):
+            # Check if this item is on it already
+            if item['url'] == path:
+                # The url is on the stack, so cut off the stack from here
+                lst_stack = lst_stack[0:idx+1]
+                # But make sure to add any kwargs
+                if kwargs != None:
+                    item['kwargs'] = kwargs
+                bNew = False
+                break
+            elif item['name'] == name:
+                # Replace the url
+                item['url'] = path
+                # But make sure to add any kwargs
+                if kwargs != None:
+                    item['kwargs'] = kwargs
+                bNew = False
+                break
+        if bNew:
+            # Add item to the stack
+            lst_stack.append({'name': name, 'url': path })
+    return lst_stack
+
+
+class VisitRecorder():
+    """Buffer for Visit rows and cache for the breadcrumb stacks of the users"""
+
+    stack_timeout = 24 * 3600       # Seconds a stack stays in the cache
+    trim_key = "passim_visit_trim"
+
+    def __init__(self):
+        # Pending Visit rows: list of dict(user_id, name, path, when)
+        self.visits = []
+        # The ids of the users whose stack has not been written to their Profile yet
+        self.dirty = set()
+        # Username => user id
+        self.user_ids = {}
+        self.last_flush = time.time()
+        # The number of Visit rows written by this process
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def get_stack_key(self, user_id):
+        return "passim_stack_{}".format(user_id)
+
+    def get_user_id(self, username):
+        """Get the id of the user with [username], or None"""
+
+        user_id = self.user_ids.get(username)
+        if user_id == None:
+            user = apps.get_model("auth", "User").objects.filter(username=username).values('id').first()
+            if user != None:
+                user_id = user['id']
+                self.user_ids[username] = user_id
+        return user_id
+
+    def get_stack(self, user_id, create=False):
+        """Get the breadcrumb stack of a user as a string, or None if the user has no profile"""
+
+        sStack = cache.get(self.get_stack_key(user_id))
+        if sStack == None:
+            Profile = apps.get_model("seeker", "Profile")
+            profile = Profile.objects.filter(user_id=user_id).values('stack').first()
+            if profile == None:
+                if not create:
+                    return None
+                # There is no profile yet, so make it
+                profile = Profile.objects.create(user_id=user_id)
+                sStack = profile.stack
+            else:
+                sStack = profile['stack']
+            cache.set(self.get_stack_key(user_id), sStack, self.stack_timeout)
+        return sStack
+
+    def add(self, user_id, name, path, is_menu, bLog, **kwargs):
+        """Process one visit: adapt the stack and (if [bLog]) buffer a Visit row"""
+
+        sStack = self.get_stack(user_id, create=True)
+        sNewStack = json.dumps(adapt_stack(json.loads(sStack), name, path, is_menu, **kwargs))
+        with self.lock:
+            if sNewStack != sStack:
+                cache.set(self.get_stack_key(user_id), sNewStack, self.stack_timeout)
+                self.dirty.add(user_id)
+            if bLog:
+                Visit = apps.get_model("seeker", "Visit")
+                self.visits.append(Visit(user_id=user_id, name=name, path=path))
+            bFlush = (len(self.visits) >= VISIT_FLUSH_SIZE or time.time() - self.last_flush > VISIT_FLUSH_INTERVAL)
+        if bFlush:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered Visit rows and the changed stacks to the database"""
+
+        oErr = ErrHandle()
+        iCount = 0
+        try:
+            with self.lock:
+                lst_visit = self.visits
+                lst_dirty = self.dirty
+                self.visits = []
+                self.dirty = set()
+                self.last_flush = time.time()
+            if len(lst_visit) > 0:
+                Visit = apps.get_model("seeker", "Visit")
+                Visit.objects.bulk_create(lst_visit)
+                iCount = len(lst_visit)
+                self.written += iCount
+            if len(lst_dirty) > 0:
+                Profile = apps.get_model("seeker", "Profile")
+                for user_id in lst_dirty:
+                    # Take the stack from the cache: another process may have changed it since
+                    sStack = cache.get(self.get_stack_key(user_id))
+                    if sStack != None:
+                        Profile.objects.filter(user_id=user_id).update(stack=sStack)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("VisitRecorder/flush")
+        return iCount
+
+    def maintain(self, force=False):
+        """Trim the Visit rows of all users, if no process has done so recently"""
+
+        iCount = 0
+        if force or cache.add(self.trim_key, time.time(), VISIT_TRIM_INTERVAL):
+            Visit = apps.get_model("seeker", "Visit")
+            iCount = Visit.trim()
+        return iCount
+
+    def close(self):
+        """Write the buffer when the process ends, and trim the visits if this process recorded any"""
+
+        self.flush()
+        if self.written > 0:
+            self.maintain()
+
+
+# The one recorder of this process
+VISIT_RECORDER = VisitRecorder()
+
+# Do not lose the buffer when the process ends (and trim the visits then, outside of any request)
+atexit.register(VISIT_RECORDER.close)
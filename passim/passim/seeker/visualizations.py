@@ -17,10 +17,12 @@ import itertools
 # ======= imports from my own application ======
 from passim.utils import ErrHandle
 from passim.basic.views import BasicPart, user_is_ingroup
+from passim.seeker.cooccurrence import get_cooccurrence, MAX_LINKS
+from passim.seeker.linkgraph import LINK_GRAPH
 from passim.seeker.models import get_crpp_date, get_current_datetime, process_lib_entries, adapt_search, get_searchable, get_now_time, \
     add_gold2equal, add_equal2equal, add_ssg_equal2equal, get_helptext, Information, Country, City, Author, Manuscript, \
     User, Group, Origin, SermonDescr, MsItem, SermonHead, SermonGold, SermonDescrKeyword, SermonDescrEqual, Nickname, NewsItem, \
-    FieldChoice, SourceInfo, SermonGoldSame, SermonGoldKeyword, EqualGoldKeyword, Signature, Ftextlink, ManuscriptExt, \
+    FieldChoice, CHOICE_REGISTRY, SignatureResolver, SIGNATURE_RESOLVER, SourceInfo, SermonGoldSame, SermonGoldKeyword, EqualGoldKeyword, Signature, Ftextlink, ManuscriptExt, \
     ManuscriptKeyword, Action, EqualGold, EqualGoldLink, Location, LocationName, LocationIdentifier, LocationRelation, LocationType, \
     ProvenanceMan, Provenance, Daterange, CollOverlap, BibRange, Feast, Comment, SermonEqualDist, \
     Project2, Basket, BasketMan, BasketGold, BasketSuper, Litref, LitrefMan, LitrefCol, LitrefSG, EdirefSG, Report, SermonDescrGold, \
@@ -87,25 +89,12 @@ def get_ssg_corpus(profile, instance):
         oErr.DoError("get_ssg_corpus")       
     return ssg_corpus, lock_status
 
-def get_ssg_sig(ssg_id):
+def get_ssg_sig(ssg_id, resolver=None):
+    """Get the most appropriate signature of an SSG (see SignatureResolver)"""
 
-    oErr = ErrHandle()
-    sig = ""
-    editype_preferences = ['gr', 'cl', 'ot']
-    issue_375 = True
-    try:
-        for editype in editype_preferences:
-            siglist = Signature.objects.filter(gold__equal__id=ssg_id, editype=editype).order_by('code').values('code')
-            if len(siglist) > 0:
-                sig = siglist[0]['code']
-                break
-        # We now have the most appropriate signature, or the empty string, if there is none
-        # The folloing is old code, not quite clear why it was necessary
-        if not issue_375 and ',' in sig:
-            sig = sig.split(",")[0].strip()
-    except:
-        msg = oErr.get_error_message()
-        oErr.DoError("get_ssg_sig")
+    if resolver == None:
+        resolver = SIGNATURE_RESOLVER
+    sig = resolver.get_best(ssg_id)
     return sig
 
 def get_ssg_passim(ssg_id, obj=None):
@@ -177,55 +166,18 @@ class EqualGoldOverlap(BasicPart):
             instance = self.obj
 
             # Define the linktype and spectype
-            for obj in FieldChoice.objects.filter(field="seeker.spectype"):
-                spec_dict[obj.abbr]= obj.english_name
-            for obj in FieldChoice.objects.filter(field="seeker.linktype"):
-                link_dict[obj.abbr]= obj.english_name
+            for oItem in CHOICE_REGISTRY.get_choices("seeker.spectype"):
+                spec_dict[oItem['abbr']]= oItem['english_name']
+            for oItem in CHOICE_REGISTRY.get_choices("seeker.linktype"):
+                link_dict[oItem['abbr']]= oItem['english_name']
 
             # The networkslider determines whether we are looking for 1st degree, 2nd degree or more
             networkslider = self.qd.get("network_overlap_slider", "1")            
             if isinstance(networkslider, str):
                 networkslider = int(networkslider)
 
-            # Initializations
-            ssg_link = {}
-            bUseDirectionality = True
-
-            # Read the table with links from SSG to SSG
-            eqg_link = EqualGoldLink.objects.all().order_by('src', 'dst').values(
-                'src', 'dst', 'spectype', 'linktype', 'alternatives', 'note')
-            # Transform into a dictionary with src as key and list-of-dst as value
-            for item in eqg_link:
-                src = item['src']
-                dst = item['dst']
-                if bUseDirectionality:
-                    spectype = item['spectype']
-                    linktype = item['linktype']
-                    note = item['note']
-                    alternatives = item['alternatives']
-                    if alternatives == None: alternatives = False
-                    # Make room for the SRC if needed
-                    if not src in ssg_link: ssg_link[src] = []
-                    # Add this link to the list
-                    oLink = {   'dst': dst, 
-                                'note': note,
-                                'spectype': "", 
-                                'linktype': linktype,
-                                'spec': "",
-                                'link': link_dict[linktype],
-                                'alternatives': alternatives}
-                    if spectype != None:
-                        oLink['spectype'] = spectype
-                        oLink['spec'] = spec_dict[spectype]
-                    ssg_link[src].append(oLink)
-                else:
-                    # Make room for the SRC if needed
-                    if not src in ssg_link: ssg_link[src] = []
-                    # Add this link to the list
-                    ssg_link[src].append(dst)
-
-            # Create the overlap network
-            node_list, link_list, hist_set, max_value, max_group = self.do_overlap(ssg_link, networkslider)
+            # Create the overlap network from the in-memory graph of SSG links
+            node_list, link_list, hist_set, max_value, max_group = self.do_overlap(link_dict, spec_dict, networkslider)
 
             # Create the buttons for the historical collections
             hist_list=[{'id': k, 'name': v} for k,v in hist_set.items()]
@@ -279,101 +231,19 @@ class EqualGoldOverlap(BasicPart):
 
         return context
 
-    def do_overlap(self, ssg_link, degree, include_to_me=False):
+    def do_overlap(self, link_dict, spec_dict, degree):
         """Calculate the overlap network up until 'degree'"""
 
-        def add_nodeset(ssg_id, group):
-            node_key = ssg_id
-
-            # ---------- DEBUG --------------
-            if node_key == 4968:
-                iStop = 1
-            # -------------------------------
-
-            # Possibly add the node to the set
-            if not node_key in node_set:
-                code_sig = get_ssg_sig(ssg_id)
-                ssg = EqualGold.objects.filter(id=ssg_id).first()
-                code_pas = get_ssg_passim(ssg_id, ssg)
-                scount = ssg.scount
-
-                # Get a list of the HCs that this SSG is part of
-                hc_list = ssg.collections.filter(settype="hc").values("id", "name")
-                hcs = []
-                for oItem in hc_list:
-                    id = oItem['id']
-                    if not id in hist_set:
-                        hist_set[id] = oItem['name']
-                    hcs.append(id)
-
-                node_value = dict(label=code_sig, id=ssg_id, group=group, 
-                                  passim=code_pas, scount=scount, hcs=hcs)
-                node_set[node_key] = node_value
-                
         node_list = []
         link_list = []
-        node_set = {}
-        link_set = {}
         hist_set = {}
         max_value = 0
         max_group = 1
         oErr = ErrHandle()
 
         try:
-            # Degree 0: direct contacts
-            ssg_id = self.obj.id
-
-            ssg_queue = [ ssg_id ]
-            ssg_add = []
-            group = 1
-            degree -= 1
-            while len(ssg_queue) > 0 and degree >= 0:
-                # Get the next available node
-                node_key = ssg_queue.pop()
-
-                # Possibly add the node to the set
-                add_nodeset(node_key, group)
-
-                # Add links from this SSG to others
-                if node_key in ssg_link:
-                    dst_list = ssg_link[node_key]
-                    for oDst in dst_list:
-                        dst = oDst['dst']
-                        # Add this one to the add list
-                        ssg_add.append(dst)
-                        link_key = "{}_{}".format(node_key, dst)
-                        if not link_key in link_set:
-                            oLink = dict(source=node_key,
-                                         target=dst,
-                                         spectype=oDst['spectype'],
-                                         linktype=oDst['linktype'],
-                                         spec=oDst['spec'],
-                                         link=oDst['link'],
-                                         alternatives = oDst['alternatives'],
-                                         note=oDst['note'],
-                                         value=0)
-                            # Add the link to the set
-                            link_set[link_key] = oLink
-                            # Add the destination node to nodeset
-                            add_nodeset(dst, group + 1)
-
-                        # Increment the link value
-                        link_set[link_key]['value'] += 1
-
-                # Go to the next degree
-                if len(ssg_queue) == 0 and degree >= 0:
-                    # Decrement the degree
-                    degree -= 1
-
-                    group += 1
-                    # Add the items from ssg_add into the queue
-                    while len(ssg_add) > 0:
-                        ssg_queue.append(ssg_add.pop())
-
-
-            # Turn the sets into lists
-            node_list = [v for k,v in node_set.items()]
-            link_list = [v for k,v in link_set.items()]
+            # Walk the links of the SSG graph, starting from this SSG
+            node_list, link_list, hist_set = LINK_GRAPH.get_overlap(self.obj.id, degree, link_dict, spec_dict)
 
             # Calculate max_value
             for oItem in link_list:
@@ -395,6 +265,7 @@ class EqualGoldTrans(BasicPart):
 
     MainModel = EqualGold
     template_name = "dct/vis_details.html"
+    max_links = MAX_LINKS   # Maximum number of links shown
 
     def add_to_context(self, context):
 
@@ -533,9 +404,6 @@ class EqualGoldTrans(BasicPart):
                     title = "eqg{}".format(ssg_id)
                 else:
                     title = code.split(" ")[1]
-                # Get the Signature that is most appropriate
-                sig = get_ssg_sig(ssg_id)
-
                 # Add author to dictionary
                 if not category in author_dict: author_dict[category] = 0
                 author_dict[category] += 1
@@ -547,7 +415,7 @@ class EqualGoldTrans(BasicPart):
                     max_scount = scount
 
                 node_key = ssg_id
-                node_value = dict(label=title, category=category, scount=scount, sig=sig, rating=0)
+                node_value = dict(label=title, category=category, scount=scount, sig="", rating=0)
                 if node_key in node_set:
                     oErr.Status("EqualGoldGraph/do_manu_method: attempt to add same title '{}' for {} and {}".format(
                         title, ssg_id, title_set[title]))
@@ -559,63 +427,28 @@ class EqualGoldTrans(BasicPart):
             author_list = [dict(category=k, count=v) for k,v in author_dict.items()]
             author_list = sorted(author_list, key=lambda x: (-1 * x['count'], x['category'].lower()))
 
-            # Create a dictionary of manuscripts, each having a list of SSG ids
-            manu_set = {}
-            for manu_item in manu_list:
-                manu_id = manu_item["manu_id"]
-                # Get a list of all SSGs in this manuscript
-                ssg_list = SermonDescrEqual.objects.filter(manu__id=manu_id).order_by(
-                    'super_id').distinct()
-                # Add the SSG id list to the manuset
-                manu_set[manu_id] = [x.super for x in ssg_list]
-
-            # Create a list of edges based on the above
-            link_dict = {}
-            for manu_id, ssg_list in manu_set.items():
-                # Only treat ssg_lists that are larger than 1
-                if len(ssg_list) > 1:
-                    # itertool.combinations creates all combinations of SSG to SSG in one manuscript
-                    for subset in itertools.combinations(ssg_list, 2):
-                        source = subset[0]
-                        target = subset[1]
-                        source_id = source.id
-                        target_id = target.id
-                        link_code = "{}_{}".format(source_id, target_id)
-                        if link_code in link_dict:
-                            oLink = link_dict[link_code]
-                        else:
-                            oLink = dict(source=source_id,
-                                         target=target_id,
-                                         value=0)
-                            link_dict[link_code] = oLink
-                        # Add 1
-                        oLink['value'] += 1
-                        if oLink['value'] > max_value:
-                            max_value = oLink['value']
-            # Turn the link_dict into a list
-            # link_list = [v for k,v in link_dict.items()]
-            
-            # Only accept the links that have a value >= min_value
+            # Get the most appropriate Signature of all nodes at once
+            for ssg_id, sig in SignatureResolver().get_best_dict(list(node_set.keys())).items():
+                node_set[ssg_id]['sig'] = sig
+
+            # Links between the SSGs that occur together in the manuscripts, with a value >= min_value
+            lst_cooccur, max_value = get_cooccurrence(manu_list, min_value, self.max_links)
             node_dict = {}
             link_list = []
-            for k, oItem in link_dict.items():
-                if oItem['value'] >= min_value:
-                    link_list.append(copy.copy(oItem))
-                    # Take note of the nodes
-                    src = oItem['source']
-                    dst = oItem['target']
-
-                    # Double check to see if both are in the node_set (they should be)
-                    if not src in node_set:
-                        # Issue a warning
-                        oErr.DoError("EqualGoldTrans/do_manu_method WARNING: cannot find src ssg {} in [node_set]".format(src))
-                    elif not dst in node_set:
-                        # Issue a warning
-                        oErr.DoError("EqualGoldTrans/do_manu_method WARNING: cannot find dst ssg {} in [node_set]".format(dst))
-                    else:
-                        # Now adapt the [node_dict]
-                        if not src in node_dict: node_dict[src] = node_set[src]
-                        if not dst in node_dict: node_dict[dst] = node_set[dst]
+            for src, dst, value in lst_cooccur:
+                link_list.append(dict(source=src, target=dst, value=value))
+
+                # Double check to see if both are in the node_set (they should be)
+                if not src in node_set:
+                    # Issue a warning
+                    oErr.DoError("EqualGoldTrans/do_manu_method WARNING: cannot find src ssg {} in [node_set]".format(src))
+                elif not dst in node_set:
+                    # Issue a warning
+                    oErr.DoError("EqualGoldTrans/do_manu_method WARNING: cannot find dst ssg {} in [node_set]".format(dst))
+                else:
+                    # Now adapt the [node_dict]
+                    if not src in node_dict: node_dict[src] = node_set[src]
+                    if not dst in node_dict: node_dict[dst] = node_set[dst]
             # Walk the nodes
             node_list = []
             for ssg_id, oItem in node_dict.items():
@@ -636,6 +469,7 @@ class EqualGoldGraph(BasicPart):
 
     MainModel = EqualGold
     isRelevant = False      # See issue #549
+    max_links = MAX_LINKS   # Maximum number of links shown
 
     def add_to_context(self, context):
         def get_author(code):
@@ -832,50 +666,25 @@ class EqualGoldGraph(BasicPart):
             # Get a list of nodes
             node_listT = get_nodes(sty_corpus)
 
-            # Walk the manuscripts
-            for manu_item in manu_list:
-                manu_id = manu_item["manu_id"]
-                # Get a list of all SSGs in this manuscript
-                ssg_list = SermonDescrEqual.objects.filter(manu__id=manu_id).order_by(
-                    'super_id').distinct().values('super_id')
-                ssg_list_id = [x['super_id'] for x in ssg_list]
-                # evaluate links between a source and target SSG
-                for idx_s, source_id in enumerate(ssg_list_id):
-                    # sanity check
-                    if source_id in ssg_dict:
-                        # Get the title of the source
-                        source = ssg_dict[source_id]
-                        for idx_t in range(idx_s+1, len(ssg_list_id)-1):
-                            target_id = ssg_list_id[idx_t]
-                            # Double check
-                            if target_id in ssg_dict:
-                                # Get the title of the target
-                                target = ssg_dict[target_id]
-                                # Retrieve or create a link from the link_listT
-                                link_code = "{}_{}".format(source_id, target_id)
-                                if link_code in link_dict:
-                                    oLink = link_listT[link_dict[link_code]]
-                                else:
-                                    oLink = dict(source=source, source_id=source_id,
-                                                 target=target, target_id=target_id,
-                                                 value=0)
-                                    link_listT.append(oLink)
-                                    link_dict[link_code] = len(link_listT) - 1
-                                # Now add to the value
-                                oLink['value'] += 1
-                                if oLink['value'] > max_value:
-                                    max_value = oLink['value']
-            
+            # Links between the SSGs that occur together in the manuscripts, with a value >= min_value
+            lst_cooccur, max_value = get_cooccurrence(manu_list, min_value, self.max_links)
+            for source_id, target_id, value in lst_cooccur:
+                # Double check
+                if source_id in ssg_dict and target_id in ssg_dict:
+                    # Get the titles of the source and the target
+                    oLink = dict(source=ssg_dict[source_id], source_id=source_id,
+                                 target=ssg_dict[target_id], target_id=target_id,
+                                 value=value)
+                    link_listT.append(oLink)
+
             # Only accept the links that have a value >= min_value
-            node_dict = []
+            node_dict = set()
             for oItem in link_listT:
                 if oItem['value'] >= min_value:
                     link_list.append(copy.copy(oItem))
                     # Take note of the nodes
-                    src = oItem['source']
-                    dst = oItem['target']
-                    if not src in node_dict: node_dict.append(src)
-                    if not dst in node_dict: node_dict.append(dst)
+                    node_dict.add(oItem['source'])
+                    node_dict.add(oItem['target'])
             # Walk the nodes
             for oItem in node_listT:
                 if oItem['id'] in node_dict:
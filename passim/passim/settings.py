@@ -79,6 +79,13 @@ else:
 DATA_UPLOAD_MAX_NUMBER_FIELDS = None
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
 
+# Visits are buffered: the buffer is written every VISIT_FLUSH_INTERVAL seconds or when it holds VISIT_FLUSH_SIZE visits
+VISIT_FLUSH_INTERVAL = 30
+VISIT_FLUSH_SIZE = 100
+# Old visits are trimmed by the 'visit_maintenance' command (run it from cron), never in a request;
+#   a process that recorded visits also trims them when it ends, at most once per VISIT_TRIM_INTERVAL seconds
+VISIT_TRIM_INTERVAL = 3600
+
 BLOCKED_IPS = ['40.77.167.57',      '161.35.188.242',
                '46.229.168.133',    '54.202.172.244',
                '88.198.17.136',     '34.222.29.95',
@@ -118,6 +125,12 @@ if USE_REDIS:
         }
     # Set the cache backend to select2
     SELECT2_CACHE_BACKEND = 'select2'
+
+# Stemma jobs: without a 'stemma_worker' (see stemma/jobs.py) they are calculated in a thread of the web process.
+#   NOTE: the web process only sees the heartbeat of the worker in a shared cache (Redis).
+#         Without Redis every job is calculated in the web process, even when a worker runs:
+#         set this to False there when the worker should do all calculations.
+STEMMA_THREAD_FALLBACK = True
 # TESTING PURPOSES: SELECT2_JS = "basic/scripts/select2.js"
 
 # Application definition
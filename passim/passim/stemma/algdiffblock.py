@@ -2,7 +2,9 @@
 This is the Python equivalent of large part of perl [Algorithm-Diff-1.15]
 
 """
+import bisect
 import copy
+import numpy as np
 from passim.utils import ErrHandle
 
 def default_keyGen(value):
@@ -354,7 +356,9 @@ def traverse_balanced(a, b, match=None, discard_a=None, discard_b=None,
 
     return 1
 
-def diff(a, b, *args):
+def diff_reference(a, b, *args):
+    """The original pure-Python diff (kept to compare the faster diff() with)"""
+
     retval = []
     hunk = []
     
@@ -383,6 +387,199 @@ def diff(a, b, *args):
         match(1, 2)
 
         response = retval if isinstance(retval, list) else [retval]
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("diff_reference")
+
+    return response
+
+
+# ======================================================================
+# Fast diff
+#
+# The same Hunt-Szymanski longest common subsequence as Algorithm::Diff, but on
+# tokens that have been interned into integers, with bisect for the binary search
+# and numpy for the linear parts of long texts.
+#
+# Note: the port above differs from Algorithm::Diff in two places, so that its
+#       subsequence is not always the longest: the binary search in
+#       _replaceNextLargerWith() uses a floating point index, and for k == 0 the
+#       link is appended instead of stored at position 0.
+# ======================================================================
+
+# From this number of tokens onwards, numpy is used for the linear parts
+LONG_TEXT = 2000
+
+def intern_tokens(a, b):
+    """Turn the tokens of [a] and [b] into integers: equal tokens get the same number"""
+
+    codes = {}
+    arA = [codes.setdefault(x, len(codes)) for x in a]
+    arB = [codes.setdefault(x, len(codes)) for x in b]
+    return arA, arB
+
+def common_ends(arA, arB):
+    """Get the length of the common prefix and of the common suffix (after the prefix)"""
+
+    n = min(len(arA), len(arB))
+    if n >= LONG_TEXT:
+        npA = np.asarray(arA)
+        npB = np.asarray(arB)
+        lst_diff = np.flatnonzero(npA[:n] != npB[:n])
+        prefix = n if len(lst_diff) == 0 else int(lst_diff[0])
+        m = n - prefix
+        lst_diff = np.flatnonzero(npA[len(arA) - m:][::-1] != npB[len(arB) - m:][::-1])
+        suffix = m if len(lst_diff) == 0 else int(lst_diff[0])
+    else:
+        prefix = 0
+        while prefix < n and arA[prefix] == arB[prefix]:
+            prefix += 1
+        m = n - prefix
+        suffix = 0
+        while suffix < m and arA[-1 - suffix] == arB[-1 - suffix]:
+            suffix += 1
+    return prefix, suffix
+
+def get_positions(arB, bStart, bFinish):
+    """Map each token of arB[bStart..bFinish] to its positions, in decreasing order"""
+
+    if bFinish - bStart + 1 >= LONG_TEXT:
+        npB = np.asarray(arB[bStart:bFinish + 1])
+        # Decreasing token, and within a token decreasing position
+        order = np.argsort(npB, kind="stable")[::-1]
+        codes = npB[order]
+        lst_start = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+        lst_group = np.split(order + bStart, lst_start[1:])
+        return dict(zip(codes[lst_start].tolist(), [x.tolist() for x in lst_group]))
+    bMatches = {}
+    for j in range(bFinish, bStart - 1, -1):
+        lst_j = bMatches.get(arB[j])
+        if lst_j is None:
+            bMatches[arB[j]] = [j]
+        else:
+            lst_j.append(j)
+    return bMatches
+
+def replace_next_larger(thresh, aValue, high):
+    """Put [aValue] in its place in the sorted list [thresh], looking no further than [high]
+
+    Returns the index, or None if the value is already there
+    """
+
+    high = high or len(thresh) - 1
+    # off the end?
+    if high == -1 or aValue > thresh[-1]:
+        thresh.append(aValue)
+        return high + 1
+    low = bisect.bisect_left(thresh, aValue, 0, high + 1)
+    if low <= high and thresh[low] == aValue:
+        return None
+    thresh[low] = aValue
+    return low
+
+def lcs_vector(arA, arB):
+    """Get the longest common subsequence of two lists of integers
+
+    Returns a list that has, for each position i in arA, the position j in arB
+    with which it matches, or None. The list ends at the last match.
+    """
+
+    nA = len(arA)
+    nB = len(arB)
+    matchVector = [None] * nA
+
+    # The common beginning and end match right away
+    prefix, suffix = common_ends(arA, arB)
+    for i in range(prefix):
+        matchVector[i] = i
+    for idx in range(1, suffix + 1):
+        matchVector[nA - idx] = nB - idx
+    aStart, aFinish = prefix, nA - 1 - suffix
+    bStart, bFinish = prefix, nB - 1 - suffix
+
+    if aStart <= aFinish and bStart <= bFinish:
+        bMatches = get_positions(arB, bStart, bFinish)
+        thresh = []
+        links = []
+        for i in range(aStart, aFinish + 1):
+            lst_j = bMatches.get(arA[i])
+            if lst_j is None:
+                continue
+            k = 0
+            for j in lst_j:
+                # optimization: most of the time this will be true
+                if k and thresh[k] > j and thresh[k - 1] < j:
+                    thresh[k] = j
+                else:
+                    k = replace_next_larger(thresh, j, k)
+                if k is not None:
+                    link = (links[k - 1] if k > 0 else None, i, j)
+                    if k < len(links):
+                        links[k] = link
+                    else:
+                        links.append(link)
+        if thresh:
+            link = links[len(thresh) - 1]
+            while link is not None:
+                matchVector[link[1]] = link[2]
+                link = link[0]
+
+    while len(matchVector) > 0 and matchVector[-1] is None:
+        matchVector.pop()
+    return matchVector
+
+def diff(a, b, *args):
+    """Get the hunks needed to turn [a] into [b]
+
+    Each hunk is a list of ['-', position in a, token] and ['+', position in b, token]
+    """
+
+    retval = []
+    hunk = []
+    oErr = ErrHandle()
+    response = None
+    try:
+        arA, arB = intern_tokens(a, b)
+        matchVector = lcs_vector(arA, arB)
+
+        lastA = len(a) - 1
+        lastB = len(b) - 1
+        ai = 0
+        bi = 0
+        for bLine in matchVector:
+            if bLine is None:
+                hunk.append(['-', ai, a[ai]])
+            else:
+                while bi < bLine:
+                    hunk.append(['+', bi, b[bi]])
+                    bi += 1
+                # A match closes the current hunk
+                if len(hunk) > 0:
+                    retval.append(hunk)
+                    hunk = []
+                bi += 1
+            ai += 1
+
+        # After the last match, the remaining tokens alternate
+        while ai <= lastA or bi <= lastB:
+            if ai == lastA + 1:
+                while bi <= lastB:
+                    hunk.append(['+', bi, b[bi]])
+                    bi += 1
+            if bi == lastB + 1:
+                while ai <= lastA:
+                    hunk.append(['-', ai, a[ai]])
+                    ai += 1
+            if ai <= lastA:
+                hunk.append(['-', ai, a[ai]])
+                ai += 1
+            if bi <= lastB:
+                hunk.append(['+', bi, b[bi]])
+                bi += 1
+        if len(hunk) > 0:
+            retval.append(hunk)
+
+        response = retval
     except:
         msg = oErr.get_error_message()
         oErr.DoError("diff")
@@ -8,7 +8,10 @@ import sys
 import re
 import os
 import json
+import time
 import difflib          # For perf
+import numpy as np
+from scipy import sparse
 
 from passim.utils import ErrHandle
 from passim.settings import MEDIA_DIR
@@ -19,21 +22,16 @@ from passim.stemma.algdiffblock import diff
 # 0 : only matrix
 # 1 : .. and a list of pot. leitfehler (lf) and their score
 # 2 : ..... and a list of pot. lf and the ms. the occur in
-# 3 : ....... and a list of matches of pot. lf
 debug = 1
 
-cut = 0  # threshold for globalLeit, currently not used
+cut_base = 0  # threshold for globalLeit, currently not used
 weight = 10  # weight. lf are counted .-times more for the best of them, the others proportionally down to 1
 
-scoremax = 1
-ur = {}
-score = {}
-
 
 
 # standardisation
 
-def dodiff(a1, a2):
+def dodiff(a1, a2, score, scoremax):
     # Copy the two arrays passed to this function into the variables wordArrMs1 and wordArrMs2
     wordArrMs1 = a1[:]
     wordArrMs2 = a2[:]
@@ -103,31 +101,6 @@ def dodiff(a1, a2):
 
     return response
 
-def outdiff():
-    a = "Zz"
-    b = "Br"
-
-    arr1 = list(mssHash[a])
-    arr2 = list(mssHash[b])
-
-    diffArray = list(difflib.ndiff(arr1, arr2))
-
-    for i in diffArray:
-        len_i = len(i)
-        print("({}): ".format(len_i), end="")
-        for j in i:
-            for k in j[2:]:
-                print(k, end=",")
-        print()
-
-def rating(a1, a2, a3):
-    r = min(a1, a2, a3)
-    return r
-
-def ratings(len_msLabelArray, a1, a2, a3, min_a):
-    max_a = max(a1, a2, a3)
-    s = len_msLabelArray - max_a - min_a
-    return s
 
 def rating_rs(len_msLabelArray, a1, a2, a3):
     r = min(a1, a2, a3)
@@ -135,359 +108,235 @@ def rating_rs(len_msLabelArray, a1, a2, a3):
     s = len_msLabelArray - max_a - r
     return r, s
 
-def vierer(word, otherWord, a1, a2, a3, t0, t1, t2, t3):
-    if debug == 3:
-        if t0 != 1 and t1 != 1 and t2 != 1 and t3 != 1:
-            print(word + "/" + otherWord + " " + str(t0) + " " + str(t1) + " " + str(t2) + " " + str(t3) + " \n")
-
-def wlist(numOfMss, mssHash, msLabelArray, oStatus = None):
-    global cut, mssWordCountHash, globalWordCountHash, leit, globalLeit, ur, score, scoremax
-
-    oErr = ErrHandle()
-    bResult = False
-    try:    
-        cut = cut * numOfMss * numOfMss / 2500
-        cut = int(cut)
-
-        mssWordCountHash = {}
-        globalWordCountHash = {}
-        leit = []
-        globalLeit = {}
-
-        # Possibly set status
-        if not oStatus is None:
-            if oStatus.set_status("lf_new4", "wlist: preparations") == "interrupt": return False
-
-        for msIndex in mssHash.keys():
-            msContent = mssHash[msIndex]
-            msContent = re.sub(r'[\s\|]+', ' ', msContent)
-            while re.search(r'^\s*([^\s]+)', msContent):
-                word = re.search(r'^\s*([^\s]+)', msContent).group(1)
-                msContent = re.sub(r'^\s*[^\s]+', '', msContent)
-
-                if msIndex not in mssWordCountHash:
-                    mssWordCountHash[msIndex] = {}
-                if word not in mssWordCountHash[msIndex]:
-                    mssWordCountHash[msIndex][word] = 0
-                mssWordCountHash[msIndex][word] += 1
-
-                if word not in globalWordCountHash:
-                    globalWordCountHash[word] = 0
-                globalWordCountHash[word] += 1
-
-        for msIndex in range(1, len(msLabelArray)):
-            currMsLabel = msLabelArray[msIndex]
-
-            for otherMsIndex in range(0, msIndex):
-                otherMsLabel = msLabelArray[otherMsIndex]
-
-                for word in globalWordCountHash.keys():
-                    #if word == "christus": 
-                    #    iStop = 1
-                    xcurr = mssWordCountHash[currMsLabel].get(word, 0)
-                    xother = mssWordCountHash[otherMsLabel].get(word, 0)
-                    # WAS: if re.search(r'...', word) and abs(mssWordCountHash[currMsLabel].get(word, 0) - mssWordCountHash[otherMsLabel].get(word, 0)) > 0 and mssWordCountHash[currMsLabel].get(word, 0) + mssWordCountHash[otherMsLabel].get(word, 0) < 2:
-                    if re.search(r'...', word) and abs(xcurr - xother) > 0 and (xcurr + xother) < 2:
-                        if msIndex >= len(leit):
-                            leit.append([])
-                        if otherMsIndex >= len(leit[msIndex-1]):
-                            leit[msIndex-1].append({})
-                        leit[msIndex-1][otherMsIndex][word] = 1
-                        if word not in globalLeit:
-                            globalLeit[word] = 0
-                        globalLeit[word] += 1
-
-        if debug == 2:
-            with open('log2', 'w') as LOG2:
-                for word in globalLeit.keys():
-                    if globalLeit[word] > cut:
-                        LOG2.write(word + " (" + str(globalLeit[word]) + ") : ")
-                        for msIndex in range(1, len(msLabelArray)):
-                            currMsLabel = msLabelArray[msIndex]
-                            if word in mssWordCountHash[currMsLabel]:
-                                match = re.match(r'^[^ ]{1,4}', currMsLabel)
-                                if match:
-                                    LOG2.write(match.group(0) + ":" + str(mssWordCountHash[currMsLabel][word]) + " ")
-                        LOG2.write("\n")
-
-        # ========== DEBUG ==================
-        #y = json.dumps(globalLeit, indent=2)
-        #x = json.dumps(mssWordCountHash, indent=2)
-        # ===================================
-
-
-        numwords = len(globalLeit.keys())
-        chunksize = numwords // 20
-        len_msLabelArray = len(msLabelArray)
-
-        # Preparation for speeding up
-        lst_wcHash = []
-        for msIndex in range(1, len_msLabelArray):
-            currMsLabel = msLabelArray[msIndex]
-            wcHash = mssWordCountHash[currMsLabel]
-            lst_wcHash.append(wcHash)
-
-        chunk = chunksize
-        for idx1, word in enumerate(globalLeit.keys()):
-            # ========= DEbug ================
-            if debug > 0: 
-                # oErr.Status("wlist #1: {}/{} word = {}".format(idx1,numwords, word))
-                if idx1 >= chunk:
-                    chunk += chunksize
-                    oErr.Status("wlist #1: {:.2f}%".format(idx1 * 100 / numwords))
-            # ================================
-            # Possibly set status
-            if not oStatus is None:
-                if oStatus.set_status("lf_new4", "wlist: word {} of {}".format(idx1, numwords)) == "interrupt": return False
-
-
-            # Consider only leitfehler, if its global leitfehler counter is heigher than cut
-            if globalLeit[word] > cut:
-                for idx2, otherWord in enumerate(globalLeit.keys()):
-
-                    # Consider only leitfehler, if its global leitfehler counter is heigher than cut
-                    if globalLeit[otherWord] > cut and word < otherWord:
-                        # Use four separate variables 
-                        t0, t1, t2, t3 = 0, 0, 0, 0
-
-                        # - Iterate over all mss 
-                        # - count the "relations" between the counter of word and otherWord in each ms
-                        #for msIndex in range(1, len_msLabelArray):
-                        #    currMsLabel = msLabelArray[msIndex]
-                        #    wcHash = mssWordCountHash[currMsLabel]
-                        #    x_curr = (wcHash.get(word,0) > 0)
-                        #    x_other = (wcHash.get(otherWord,0) > 0)
-
-                        #    if x_curr and x_other:
-                        #        # Both, word and otherWord are in the current ms
-                        #        t0 += 1
-                        #    elif x_curr and not x_other:
-                        #        # Only word is in the the current ms
-                        #        t1 += 1
-                        #    elif not x_curr and x_other:
-                        #        # Only otherWord is in the the current ms
-                        #        t2 += 1
-                        #    else:
-                        #        # Neither word nor otherWord are in the the current ms
-                        #        t3 += 1
-                        for wcHash in lst_wcHash:
-                            x_curr = (wcHash.get(word,0) > 0)
-                            x_other = (wcHash.get(otherWord,0) > 0)
-
-                            if x_curr and x_other:
-                                # Both, word and otherWord are in the current ms
-                                t0 += 1
-                            elif x_curr and not x_other:
-                                # Only word is in the the current ms
-                                t1 += 1
-                            elif not x_curr and x_other:
-                                # Only otherWord is in the the current ms
-                                t2 += 1
-                            else:
-                                # Neither word nor otherWord are in the the current ms
-                                t3 += 1
-
-
-                        # Both words occur together in no ms
-                        if t0 == 0 and t1 > 0 and t2 > 0 and t3 > 0:
-                            if debug == 3:
-                                vierer(word, otherWord, t1, t2, t3, *tab)
-                            r, s = rating_rs(len_msLabelArray, t1, t2, t3)
-
-                            if r > 1:
-                                ur[word] = ur.get(word, 0) + (r - 1) ** 2 * s
-                                ur[otherWord] = ur.get(otherWord, 0) + (r - 1) ** 2 * s
-                        # Absence of word and presence of otherWord in no ms
-                        elif t1 == 0 and t0 > 0 and t2 > 0 and t3 > 0:
-                            if debug == 3:
-                                vierer(word, otherWord, t0, t2, t3, *tab)
-                            r, s = rating_rs(len_msLabelArray, t0, t2, t3)
-
-                            if r > 1:
-                                ur[word] = ur.get(word, 0) + (r - 1) ** 2 * s
-                                ur[otherWord] = ur.get(otherWord, 0) + (r - 1) ** 2 * s
-                        # Presence of word and absence of otherWord in no ms
-                        elif t2 == 0 and t0 > 0 and t1 > 0 and t3 > 0:
-                            if debug == 3:
-                                vierer(word, otherWord, t0, t1, t3, *tab)
-                            r, s = rating_rs(len_msLabelArray, t0, t1, t3)
-
-                            if r > 1:
-                                ur[word] = ur.get(word, 0) + (r - 1) ** 2 * s
-                                ur[otherWord] = ur.get(otherWord, 0) + (r - 1) ** 2 * s
-                        # Absence of word and otherWord in no ms
-                        elif t3 == 0 and t0 > 0 and t1 > 0 and t2 > 0:
-                            if debug == 3:
-                                vierer(word, otherWord, t0, t1, t2, *tab)
-                            r, s = rating_rs(len_msLabelArray, t0, t1, t2)
-
-                            if r > 1:
-                                ur[word] = ur.get(word, 0) + (r - 1) ** 2 * s
-                                ur[otherWord] = ur.get(otherWord, 0) + (r - 1) ** 2 * s
-                    # if ($globalLeit{$otherWord} > $cut && $word lt $otherWord)
-                # foreach my $otherWord (keys %globalLeit)
-            # if ($globalLeit{$word} > $cut)
-        # foreach my $word (keys %globalLeit)
-
-        # %ur counts and weights cases with only 3 combinations; %scoremax is its maximum
-
-        # Possibly set status
-        if not oStatus is None:
-            if oStatus.set_status("lf_new4", "wlist: wrapping up") == "interrupt": return False
-
-        # ADDED calculate counter: number of occurences of word 
-        for word in globalLeit.keys():
-            counter = 0
-
-            # Iterate over all mss and 
-            # count the number of mss that contain word
-            for msIndex in range(1, len(msLabelArray)):
-                currMsLabel = msLabelArray[msIndex]
-
-                if mssWordCountHash[currMsLabel].get(word):
-                    counter += 1
-
-            if counter > numOfMss / 2:
-                counter = numOfMss - counter
-
-            # if (globalLeit counter for this word * counter) not 0
-            if globalLeit[word] * counter:
-                score[word] = ur.get(word,0) / counter
-            else:
-                score[word] = ur.get(word,0)
-
-        # calculate scoremax   
-        for word in ur.keys():
-            scoremax = score[word] if scoremax < score[word] else scoremax
-        
-        # Print score if debug=1
-        if debug > 0:
-            logfilename = os.path.abspath(os.path.join(MEDIA_DIR, "stemma", "wlist.log"))
-            with open(logfilename, "w") as logfile:
-                sorted_keys = sorted(score, key=lambda k: score[k], reverse=True)
-                for k in sorted_keys:
-                    ur_val = ur.get(word,0)
-                    if ur_val > 0 and score[k] > scoremax / 100:
-                        logfile.write("{}  --  {} - {} {}% \n")
-                        logfile.write("".format(
-                            k, int(score[k]), ur_val, int(score[k] / scoremax * 100) ))
-
-        # we are okay
-        bResult = True
-    except:
-        msg = oErr.get_error_message()
-        oErr.DoError("lf_new4")
-        bResult = False
-        # Communicate this to the status
-        if not oStatus is None:
-            oStatus.set_status("error", msg)
-    return bResult
-
-def lf_new4(sTexts, oStatus=None):
-    """Perform the LeitFehler algorithm on a list of lines"""
 
-    oErr = ErrHandle()
-    numOfMss = 0
-    mssHash = {}
-    msLabelArray = []
-    lst_result = []
-    lst_matrix = []     # Matrix result for further processing
+class LeitfehlerEngine():
+    """Calculate the Leitfehler distance matrix for a set of witnesses
 
-    try:    
+    All state lives in the instance, so that several calculations can run side by side.
+    The leitfehler pair statistics are calculated with matrix products on a (sparse)
+    presence matrix of witnesses x word types, in blocks of words.
+    """
 
-        # ========== DEBUGGING =========
-        #with open("arrayms1", "r") as fp:  wordArrayMs1 = json.load(fp)
-        #with open("arrayms2", "r") as fp:  wordArrayMs2 = json.load(fp)
+    status_interval = 2     # Minimum number of seconds between two status updates
+    block_cells = 1000000   # Maximum number of cells in one block of the pair statistics
 
-        #el = dodiff(wordArrayMs1, wordArrayMs2)
-        #wordArrayMs1[100]
-        # ==============================
+    def __init__(self, oStatus=None):
+        self.oStatus = oStatus
+        self.last_status = 0
+        self.interrupted = False
+        self.mssHash = {}
+        self.msLabelArray = []
+        # Leitfehler words and their weights
+        self.ur = {}
+        self.score = {}
+        self.scoremax = 1
 
+    def set_status(self, message, force=False):
+        """Pass on a status message, at most once per [status_interval] seconds unless forced
 
-        # Possibly set status
-        if not oStatus is None:
-            if oStatus.set_status("lf_new4", "Preparing lines") == "interrupt": return lst_result
+        Returns True if the calculation has been interrupted
+        """
 
-        lst_line = sTexts.split("\n")
+        if not self.oStatus is None and not self.interrupted:
+            if force or time.time() - self.last_status >= self.status_interval:
+                self.last_status = time.time()
+                if self.oStatus.set_status("lf_new4", message) == "interrupt":
+                    self.interrupted = True
+        return self.interrupted
 
-        ## ========== DEBUGGING =========
-        #lst_line = lst_line[:3]
-        #lst_line[0] = "{}".format(2)
-        ## ==============================
+    def read_lines(self, sTexts):
+        """Get the labels and texts of the witnesses from the combined text"""
 
-        for line in lst_line:
+        for line in sTexts.split("\n"):
             line = line.rstrip("\n")
             line = re.sub(r"[\,!\?\"]", "", line)  # remove punctuation
-            # line = re.sub(r"\.", "", line)  # remove . ?
             line = re.sub(r"\s[^\s]*\*[^\s]*", " €", line)  # convert word with a *-wildcard to €
             line = line.rstrip()
 
             # label manuscripts (3 chars), or n chars make (n-1) dots in next line
             match = re.match(r"^(\w..)[\w\s]{7}(.+)$", line)
             if match:
-                mssHash[match.group(1)] = match.group(2)  # hash of all mss.
-                msLabelArray.append(match.group(1))  # all mss. label, n: index
-
-                mssHash[msLabelArray[numOfMss]] = re.sub(r"\([^\)]+\)", "", mssHash[msLabelArray[numOfMss]])  # remove ()
-                mssHash[msLabelArray[numOfMss]] = re.sub(r"\[[^\]]+\]", "", mssHash[msLabelArray[numOfMss]])  # remove []
-
-                numOfMss += 1
-
-        # Possibly set status
-        if not oStatus is None:
-            if oStatus.set_status("lf_new4", "Starting wlist") == "interrupt": return lst_result
-
-        bResult = wlist(numOfMss, mssHash, msLabelArray, oStatus)
-
-        # remove to get a fast result without calculating the lff
-
-        ##########
-
-        # Possibly set status
-        if not oStatus is None:
-            if oStatus.set_status("lf_new4", "Starting dodiff") == "interrupt": return lst_result
-
-        print(len(msLabelArray))  # print length of array
-        print("\n" + msLabelArray[0])
-        lst_result.append( [ msLabelArray[0] ] )
-        lst_matrix.append( [ 0 ] )
-
-        for msIndex in range(1, len(msLabelArray)):
-            # Start a new line
-            lst_row = []
-            lst_matrix_row = []
-            # Add the row label to this
-            lst_row.append(msLabelArray[msIndex])
-            # print(msLabelArray[msIndex], end=" ")
-
-            for otherMsIndex in range(msIndex):
-                # split content of these manuscripts into words
-                wordArrayMs1 = re.split(r'\s+', mssHash[msLabelArray[msIndex]])  
-                wordArrayMs2 = re.split(r'\s+', mssHash[msLabelArray[otherMsIndex]])
-                
-                # Possibly set status
-                if not oStatus is None:
-                    if oStatus.set_status("lf_new4", "dodiff: {}, {} (len={})".format(
-                        msIndex, otherMsIndex, len(msLabelArray))) == "interrupt": return lst_result
-
-                # diff
-                el = dodiff(wordArrayMs1, wordArrayMs2)
-                # Add to this row
-                lst_row.append("{}".format(el))
-                # print(" {} ".format(el), end=" ")
-                # THe distance matrix should have it as a number
-                lst_matrix_row.append(el)
-
-            # print()
-            # Add the row to the overall result
-            lst_result.append(lst_row)
-            lst_matrix_row.append(0)
-            lst_matrix.append(lst_matrix_row)
-    except:
-        msg = oErr.get_error_message()
-        oErr.DoError("lf_new4")
+                label = match.group(1)
+                sText = re.sub(r"\([^\)]+\)", "", match.group(2))  # remove ()
+                sText = re.sub(r"\[[^\]]+\]", "", sText)  # remove []
+                self.mssHash[label] = sText  # hash of all mss.
+                self.msLabelArray.append(label)  # all mss. label, n: index
+
+    def get_counts(self):
+        """Get the word types and the sparse matrix of word counts (witnesses x word types)"""
+
+        oWord = {}
+        oRow = {}
+        for label, msContent in self.mssHash.items():
+            oCount = {}
+            for word in re.findall(r'[^\s\|]+', msContent):
+                idx = oWord.setdefault(word, len(oWord))
+                oCount[idx] = oCount.get(idx, 0) + 1
+            oRow[label] = oCount
+        lst_row, lst_col, lst_value = [], [], []
+        for row, label in enumerate(self.msLabelArray):
+            for col, value in oRow[label].items():
+                lst_row.append(row)
+                lst_col.append(col)
+                lst_value.append(value)
+        counts = sparse.csc_matrix((lst_value, (lst_row, lst_col)), shape=(len(self.msLabelArray), len(oWord)), dtype=np.int64)
+        return list(oWord.keys()), counts
+
+    def wlist(self):
+        """Find the leitfehler words and calculate their score"""
+
+        oErr = ErrHandle()
+        bResult = False
+        try:
+            numOfMss = len(self.msLabelArray)
+            cut = int(cut_base * numOfMss * numOfMss / 2500)
+            if self.set_status("wlist: preparations", True): return False
+
+            lst_word, counts = self.get_counts()
+
+            # A potential leitfehler occurs exactly once in one ms and not at all in another:
+            #   globalLeit = (number of mss with it once) x (number of mss without it)
+            once = np.asarray((counts == 1).sum(axis=0)).ravel()
+            absent = numOfMss - np.diff(counts.indptr)
+            globalLeit = once * absent
+            lst_leit = [idx for idx, word in enumerate(lst_word) if globalLeit[idx] > cut and len(word) >= 3]
+            leit_words = [lst_word[idx] for idx in lst_leit]
+            numwords = len(lst_leit)
+
+            if debug == 2:
+                with open('log2', 'w') as LOG2:
+                    for idx, word in zip(lst_leit, leit_words):
+                        LOG2.write(word + " (" + str(globalLeit[idx]) + ") : ")
+                        column = counts[:, idx].toarray().ravel()
+                        for msIndex in range(1, numOfMss):
+                            if column[msIndex] > 0:
+                                LOG2.write(self.msLabelArray[msIndex][:4] + ":" + str(column[msIndex]) + " ")
+                        LOG2.write("\n")
+
+            # Presence of the leitfehler in all mss except the first one
+            presence = (counts[1:, lst_leit] > 0).astype(np.int64).tocsc()
+            num_ms = presence.shape[0]
+            ms_count = np.asarray(presence.sum(axis=0)).ravel()
+            ur = np.zeros(numwords, dtype=np.int64)
+
+            # Walk the word pairs in blocks: t0 (both), t1 (only word), t2 (only other), t3 (neither)
+            block = max(1, self.block_cells // max(1, numwords))
+            presence_t = presence.T.tocsr()
+            for start in range(0, numwords, block):
+                if self.set_status("wlist: word {} of {}".format(start, numwords)): return False
+                end = min(start + block, numwords)
+                t0 = (presence_t[start:end] @ presence).toarray()
+                n_word = ms_count[start:end, None]
+                n_other = ms_count[None, :]
+                t1 = n_word - t0
+                t2 = n_other - t0
+                t3 = num_ms - n_word - n_other + t0
+                # Only pairs where exactly one of the four combinations does not occur
+                stack = np.stack([t0, t1, t2, t3])
+                zeros = (stack == 0).sum(axis=0)
+                r = np.where(stack == 0, num_ms + 1, stack).min(axis=0)
+                s = numOfMss - stack.max(axis=0) - r
+                # Each pair once
+                upper = np.arange(numwords)[None, :] > np.arange(start, end)[:, None]
+                value = np.where((zeros == 1) & (r > 1) & upper, (r - 1) ** 2 * s, 0)
+                ur[start:end] += value.sum(axis=1)
+                ur += value.sum(axis=0)
+
+            if self.set_status("wlist: wrapping up", True): return False
+
+            # Counter: number of mss that contain the word
+            for idx, word in enumerate(leit_words):
+                counter = int(ms_count[idx])
+                if counter > numOfMss / 2:
+                    counter = numOfMss - counter
+                ur_val = int(ur[idx])
+                if ur_val > 0:
+                    self.ur[word] = ur_val
+                self.score[word] = ur_val / counter if counter else ur_val
+
+            # calculate scoremax
+            for word in self.ur.keys():
+                self.scoremax = self.score[word] if self.scoremax < self.score[word] else self.scoremax
+
+            # Print score if debug=1
+            if debug > 0:
+                logfilename = os.path.abspath(os.path.join(MEDIA_DIR, "stemma", "wlist.log"))
+                with open(logfilename, "w") as logfile:
+                    sorted_keys = sorted(self.score, key=lambda k: self.score[k], reverse=True)
+                    for k in sorted_keys:
+                        ur_val = self.ur.get(k, 0)
+                        if ur_val > 0 and self.score[k] > self.scoremax / 100:
+                            logfile.write("{}  --  {} - {} {}% \n".format(
+                                k, int(self.score[k]), ur_val, int(self.score[k] / self.scoremax * 100) ))
+
+            # we are okay
+            bResult = True
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("LeitfehlerEngine/wlist")
+            bResult = False
+            # Communicate this to the status
+            if not self.oStatus is None:
+                self.oStatus.set_status("error", msg)
+        return bResult
+
+    def run(self, sTexts):
+        """Perform the LeitFehler algorithm on a list of lines"""
+
+        oErr = ErrHandle()
+        lst_result = []
+        lst_matrix = []     # Matrix result for further processing
+        try:
+            if self.set_status("Preparing lines", True): return lst_result, lst_matrix, self.msLabelArray
+            self.read_lines(sTexts)
+
+            if self.set_status("Starting wlist", True): return lst_result, lst_matrix, self.msLabelArray
+            bResult = self.wlist()
+            if self.interrupted: return lst_result, lst_matrix, self.msLabelArray
+
+            if self.set_status("Starting dodiff", True): return lst_result, lst_matrix, self.msLabelArray
+            msLabelArray = self.msLabelArray
+            len_ms = len(msLabelArray)
+            lst_result.append( [ msLabelArray[0] ] )
+            lst_matrix.append( [ 0 ] )
+
+            # split content of the manuscripts into words
+            lst_words = [re.split(r'\s+', self.mssHash[x]) for x in msLabelArray]
+
+            for msIndex in range(1, len_ms):
+                # Start a new line
+                lst_row = []
+                lst_matrix_row = []
+                # Add the row label to this
+                lst_row.append(msLabelArray[msIndex])
+
+                for otherMsIndex in range(msIndex):
+                    if self.set_status("dodiff: {}, {} (len={})".format(msIndex, otherMsIndex, len_ms)):
+                        return lst_result, lst_matrix, msLabelArray
+
+                    # diff
+                    el = dodiff(lst_words[msIndex], lst_words[otherMsIndex], self.score, self.scoremax)
+                    # Add to this row
+                    lst_row.append("{}".format(el))
+                    # THe distance matrix should have it as a number
+                    lst_matrix_row.append(el)
+
+                # Add the row to the overall result
+                lst_result.append(lst_row)
+                lst_matrix_row.append(0)
+                lst_matrix.append(lst_matrix_row)
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("LeitfehlerEngine/run")
+
+        # Return the result
+        return lst_result, lst_matrix, self.msLabelArray
+
+
+def lf_new4(sTexts, oStatus=None):
+    """Perform the LeitFehler algorithm on a list of lines"""
 
-    # Return the result
-    return lst_result, lst_matrix, msLabelArray
+    oEngine = LeitfehlerEngine(oStatus)
+    return oEngine.run(sTexts)
 
-# End of code
\ No newline at end of file
+# End of code
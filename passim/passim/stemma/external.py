@@ -1,31 +1,65 @@
 """
 External C-code to be called from python
+
+The FITCH and DRAWTREE libraries are built from the stemmac sources (see stemmac/Makefile).
+They are loaded once per process, and the distance matrix, the tree and the SVG
+are passed to and from them through memory buffers.
 """
 
 import platform
-import tempfile
+import threading
 import os
 from ctypes import *
 
 from passim.settings import MEDIA_ROOT
 from passim.utils import ErrHandle
-from passim.stemma.convert import ps2svg_string, ps2svg_simple
 
 
-def garbage_remove(sFile):
-    """Check if this file (still) exists, and if so, remove it"""
-
-    bResult = True
-    oErr = ErrHandle()
-    try:
-        if not sFile is None:
-            if os.path.exists(sFile):
-                os.remove(sFile)
-    except:
-        msg = oErr.get_error_message()
-        oErr.DoError("garbage_remove")
-        bResult = False
-    return bResult
+# Initial size of the buffers for the tree and the SVG (they grow when needed)
+BUFFER_SIZE = 256 * 1024
+
+# Library name => loaded library (per process)
+LIBRARIES = {}
+LIBRARY_LOCK = threading.Lock()
+# NOTE: the C code keeps its state in globals, and ctypes releases the GIL during a call:
+#       only one thread of a process may calculate at a time (see STEMMA_THREAD_FALLBACK)
+CALC_LOCK = threading.Lock()
+
+
+def get_library(sName):
+    """Get the C library [sName] ('fitch' or 'drawtree'), loading it only once"""
+
+    with LIBRARY_LOCK:
+        oLibrary = LIBRARIES.get(sName)
+        if oLibrary is None:
+            # Identify the library, depending on the platform
+            if platform.system() == "Windows":
+                sLibrary = "d:/data files/vs2010/projects/RU-passim/stemmac/{}.dll".format(sName)
+            else:
+                sLibrary = "/var/www/passim/live/repo/stemmac/bin/{}.so".format(sName)
+            oLibrary = cdll.LoadLibrary(sLibrary)
+            if sName == "fitch":
+                oLibrary.do_fitch_mem.restype = c_long
+                oLibrary.do_fitch_mem.argtypes = [c_char_p, c_char_p, c_long]
+            elif sName == "drawtree":
+                oLibrary.svgdrawtree.restype = c_long
+                oLibrary.svgdrawtree.argtypes = [c_char_p, c_char_p, c_char_p, c_long]
+            LIBRARIES[sName] = oLibrary
+    return oLibrary
+
+def call_buffered(func, *args):
+    """Call a C function that puts its output into a buffer, making the buffer larger if needed"""
+
+    size = BUFFER_SIZE
+    while True:
+        buffer = create_string_buffer(size)
+        length = func(*args, buffer, size)
+        if length < 0:
+            return None
+        if length < size:
+            return buffer.value.decode("utf-8")
+        # The output did not fit: try again with the size that is needed
+        size = length + 1
 
 def myfitch(distNames, distMatrix):
     """
@@ -35,7 +69,7 @@ def myfitch(distNames, distMatrix):
 
     def get_dist_string(lNames, lMatrix):
         """Combine names and matrix into string
-        
+
         Example of what we get:
         - lNames = ['aaa', 'aab', 'aac', 'aad']
         - lMatrix = [ [0],
@@ -71,50 +105,23 @@ def myfitch(distNames, distMatrix):
         return sBack
 
     sBack = ""
-    inputfile = None
-    outputfile = None
-    outtreefile = None
     oErr = ErrHandle()
     try:
         # Convert the names + matrix into a string for C-fitch
         sInput = get_dist_string(distNames, distMatrix)
-        # Think of a name where to save this
-        with open("{}_inp.txt".format(tempfile.NamedTemporaryFile(dir=MEDIA_ROOT, mode="w").name), "w") as f:
-            inputfile = os.path.abspath(f.name)
-            f.write(sInput)
-        outputfile = inputfile.replace("_inp.txt", "_out.txt")
-        outtreefile = inputfile.replace("_inp.txt", "_tre.txt")
-
-        # Identify the library, depending on the platform
-        if platform.system() == "Windows":
-            sLibrary = "d:/data files/vs2010/projects/RU-passim/stemmac/fitch.dll"
-        else:
-            sLibrary = "/var/www/passim/live/repo/stemmac/bin/fitch.so"
-        do_fitch = cdll.LoadLibrary(sLibrary).do_fitch
-        do_fitch.restype = c_bool  # C-type boolean
-        do_fitch.argtypes = [POINTER(c_char),POINTER(c_char),POINTER(c_char)]
-
-        response = do_fitch(inputfile.encode(), outputfile.encode(), outtreefile.encode())
+
+        # Let C-fitch calculate the tree in memory
+        do_fitch_mem = get_library("fitch").do_fitch_mem
+        with CALC_LOCK:
+            sTree = call_buffered(do_fitch_mem, sInput.encode())
 
         # Is the response okay?
-        if response:
-            # Response is okay: read the result
-            with open(outtreefile, "r") as f:
-                # Not sure if any string conversion needs to take place...
-                sBack = f.read()
-
-        # Remove everything nicely
-        garbage_remove(inputfile)
-        garbage_remove(outputfile)
-        garbage_remove(outtreefile)
-        
+        if not sTree is None:
+            sBack = sTree
+
     except:
         msg = oErr.get_error_message()
         oErr.DoError("myfitch")
-        # Try remove everything
-        garbage_remove(inputfile)
-        garbage_remove(outputfile)
-        garbage_remove(outtreefile)
 
     # Return what we have gathered
     return sBack
@@ -122,65 +129,33 @@ def myfitch(distNames, distMatrix):
 
 def mydrawtree(sTree):
     """
-    Given a newick type tree in a string, use the DRAWTREE algorithm 
+    Given a newick type tree in a string, use the DRAWTREE algorithm
       to convert this into a SVG
     """
 
     sBack = ""
-    sPostscript = ""
-    treefile = None
-    outputfile = None
     oErr = ErrHandle()
     try:
-        treefile = None
-
-        # Think of a name where to save this
-        with open("{}_tree.txt".format(tempfile.NamedTemporaryFile(dir=MEDIA_ROOT, mode="w").name), "w") as f:
-            treefile = os.path.abspath(f.name)
-            f.write(sTree)
-        # Determine the POSTSCRIPT file name
-        outputfile = treefile.replace("_tree.txt", "_tree.ps")
+        # An empty tree cannot be drawn (and would crash drawtree)
+        if sTree is None or sTree.strip() == "":
+            return sBack
 
         # The fontfile should be taken from media stemma
         fontfile = os.path.abspath(os.path.join(MEDIA_ROOT, "stemma", "fontfile"))
 
-
-        # Identify the library, depending on the platform
-        if platform.system() == "Windows":
-            sLibrary = "d:/data files/vs2010/projects/RU-passim/stemmac/drawtree.dll"
-        else:
-            sLibrary = "/var/www/passim/live/repo/stemmac/bin/drawtree.so"
-        psdrawtree = cdll.LoadLibrary(sLibrary).psdrawtree
-        psdrawtree.restype = c_bool  # C-type boolean
-        psdrawtree.argtypes = [POINTER(c_char),POINTER(c_char),POINTER(c_char)]
-
-        response = psdrawtree(treefile.encode(), fontfile.encode(), outputfile.encode())
+        # Let C-drawtree draw the tree as SVG in memory
+        svgdrawtree = get_library("drawtree").svgdrawtree
+        with CALC_LOCK:
+            sSvg = call_buffered(svgdrawtree, sTree.encode(), fontfile.encode())
 
         # Is the response okay?
-        if response:
-            sPostscript = ""
-            # Response is okay: read the result
-            with open(outputfile, "r") as f:
-                # Not sure if any string conversion needs to take place...
-                sPostscript = f.read()
-
-            # Now the postscript needs to be converted into SVG
-            # sSvg = ps2svg_string(sPostscript)
-            sSvg = ps2svg_simple(sPostscript)
-            # This will be returned
+        if not sSvg is None:
             sBack = sSvg
 
-        # Remove everything nicely
-        garbage_remove(treefile)
-        garbage_remove(outputfile)
-
     except:
         msg = oErr.get_error_message()
         oErr.DoError("mydrawtree")
-        # Try remove garbage
-        garbage_remove(treefile)
-        garbage_remove(outputfile)
 
     # Return what we have gathered
-    return sBack, sPostscript
+    return sBack
 
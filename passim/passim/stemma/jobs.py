@@ -0,0 +1,179 @@
+"""
+Job runner for the STEMMA app.
+
+The stemma pipeline (Leitfehler, Fitch, Drawtree) can take minutes, so it is not
+executed inside the HTTP request. StemmaStart only prepares the input and submits
+a StemmaJob; the job is picked up by the worker (management command 'stemma_worker'),
+which runs the jobs in a pool of processes. The browser follows the job through
+StemmaProgress.
+
+Jobs are keyed by a hash of their input: identical calculations share one job,
+and the results of a finished job are served again without calculating.
+
+When no worker is alive (it leaves a heartbeat in the cache), a submitted job is
+run in a thread of the web process instead, so that the site keeps working. The
+heartbeat can only be seen with a cache that is shared between processes (Redis):
+see STEMMA_THREAD_FALLBACK in settings.py.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, connections
+
+# ======= imports from my own application ======
+from passim.utils import ErrHandle
+from passim.settings import STEMMA_THREAD_FALLBACK
+from passim.stemma.algorithms import lf_new4
+from passim.stemma.external import myfitch, mydrawtree
+
+
+def run_job(job_id):
+    """Run the stemma pipeline for one (claimed) StemmaJob; returns the final status"""
+
+    sStatus = "error"
+    oErr = ErrHandle()
+    try:
+        from passim.stemma.models import get_lf_html
+
+        StemmaJob = apps.get_model("stemma", "StemmaJob")
+        job = StemmaJob.objects.filter(id=job_id).first()
+        if job is None:
+            return sStatus
+        sTexts, lst_names = job.get_input()
+
+        # (1) Execute the Leitfehler Algorithm on the combined fulltexts
+        if job.set_status("leitfehler", "", True) == "interrupt":
+            return job.set_status("error", "interrupted", True)
+        lst_leitfehler, distMatrix, distNames = lf_new4(sTexts, job)
+        if job.status == "error":
+            return sStatus
+        if len(lst_leitfehler) == 0:
+            return job.set_status("error", "The Leitfehler algorithm gave no results", True)
+
+        # (2) Collect the data into one table
+        oData = dict(leitfehler=lst_leitfehler, names=lst_names)
+        sTable = get_lf_html(lst_leitfehler, lst_names)
+
+        # (3) Convert into tree using FITCH
+        if job.set_status("Fitch", sTable) == "interrupt":
+            return job.set_status("error", "interrupted", True)
+        str_tree = myfitch(distNames, distMatrix)
+        if not str_tree is None and str_tree != "":
+            oData['fitch'] = str_tree
+
+        # (4) Convert the tree into SVG
+        if job.set_status("Drawtree") == "interrupt":
+            return job.set_status("error", "interrupted", True)
+        str_svg = mydrawtree(str_tree)
+        if not str_svg is None and str_svg != "":
+            oData['svg'] = str_svg
+            iStart = str_svg.find("<svg")
+            if iStart >= 0:
+                str_svg = str_svg[iStart:]
+
+        # (5) Store the results
+        job.data = json.dumps(oData, indent=2)
+        job.svg = str_svg
+        job.message = sTable
+        job.status = "finished"
+        job.save()
+        sStatus = job.status
+    except:
+        msg = oErr.get_error_message()
+        oErr.DoError("run_job")
+        StemmaJob = apps.get_model("stemma", "StemmaJob")
+        StemmaJob.objects.filter(id=job_id).update(status="error", message=msg)
+    finally:
+        # Threads and pool processes have their own database connection
+        connection.close()
+    return sStatus
+
+def init_process():
+    """Make sure Django is set up in a pool process that has not been forked"""
+
+    if not apps.ready:
+        import django
+        django.setup()
+
+def start_job(job):
+    """Make sure [job] gets calculated: by the worker, or else in a thread of this process"""
+
+    StemmaJob = apps.get_model("stemma", "StemmaJob")
+    if job.status == "queued" and STEMMA_THREAD_FALLBACK and not StemmaWorker.is_alive():
+        if StemmaJob.claim(job.id) == job.id:
+            thread = threading.Thread(target=run_job, args=(job.id,), daemon=True)
+            thread.start()
+
+
+class StemmaWorker():
+    """Takes queued StemmaJob objects and runs them in a pool of processes"""
+
+    heartbeat_key = "passim_stemma_worker"
+    poll_interval = 2       # Seconds between two looks at the queue
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        # Future => job id
+        self.running = {}
+
+    @staticmethod
+    def is_alive():
+        return cache.get(StemmaWorker.heartbeat_key) != None
+
+    def beat(self):
+        cache.set(self.heartbeat_key, os.getpid(), self.poll_interval * 5)
+
+    def recover(self):
+        """Queue the jobs again that were left running by a previous worker"""
+
+        StemmaJob = apps.get_model("stemma", "StemmaJob")
+        return StemmaJob.get_stale().update(status="queued", message="queued")
+
+    def harvest(self):
+        """Remove the jobs that are done from the running ones"""
+
+        StemmaJob = apps.get_model("stemma", "StemmaJob")
+        for future in [x for x in self.running if x.done()]:
+            job_id = self.running.pop(future)
+            exc = future.exception()
+            if not exc is None:
+                # The pool process itself went wrong
+                StemmaJob.objects.filter(id=job_id).update(status="error", message=str(exc))
+
+    def run(self, once=False):
+        """Keep running queued jobs; with [once], stop when the queue is empty"""
+
+        oErr = ErrHandle()
+        iCount = 0
+        try:
+            StemmaJob = apps.get_model("stemma", "StemmaJob")
+            self.beat()
+            self.recover()
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_process) as executor:
+                while True:
+                    self.beat()
+                    self.harvest()
+                    while len(self.running) < self.max_workers:
+                        job_id = StemmaJob.claim()
+                        if job_id is None:
+                            break
+                        # Pool processes must not share our database connection
+                        connections.close_all()
+                        self.running[executor.submit(run_job, job_id)] = job_id
+                        iCount += 1
+                    if once and len(self.running) == 0:
+                        break
+                    time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("StemmaWorker/run")
+        finally:
+            cache.delete(self.heartbeat_key)
+        return iCount
@@ -0,0 +1,23 @@
+"""
+Run the queued stemma calculations (see passim/stemma/jobs.py).
+
+Usage: python manage.py stemma_worker [--workers N] [--once]
+"""
+
+from django.core.management.base import BaseCommand
+
+# ======= imports from my own application ======
+from passim.stemma.jobs import StemmaWorker
+
+
+class Command(BaseCommand):
+    help = "Run queued stemma calculations in a pool of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of calculations running at the same time")
+        parser.add_argument("--once", action="store_true", help="Stop when there are no more queued jobs")
+
+    def handle(self, *args, **options):
+        oWorker = StemmaWorker(max_workers=options['workers'])
+        iCount = oWorker.run(once=options['once'])
+        self.stdout.write("{} stemma jobs run".format(iCount))
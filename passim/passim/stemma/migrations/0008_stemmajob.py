@@ -0,0 +1,34 @@
+# Generated by Django 4.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import passim.seeker.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stemma', '0007_stemmaset_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StemmaJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jobhash', models.CharField(max_length=64, unique=True, verbose_name='Hash')),
+                ('input', models.TextField(default='{}', verbose_name='Input')),
+                ('data', models.TextField(blank=True, null=True, verbose_name='Leitfehler data')),
+                ('svg', models.TextField(blank=True, null=True, verbose_name='SVG')),
+                ('status', models.CharField(default='queued', max_length=20, verbose_name='Status')),
+                ('message', models.TextField(blank=True, null=True, verbose_name='Message')),
+                ('created', models.DateTimeField(default=passim.seeker.models.get_current_datetime)),
+                ('saved', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stemmacalc',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job_calcs', to='stemma.stemmajob'),
+        ),
+    ]
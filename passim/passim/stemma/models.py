@@ -12,16 +12,18 @@ from django.urls import reverse
 
 
 from markdown import markdown
-import json, copy
+import json, copy, hashlib, time
+from datetime import timedelta
 
 # Take from my own app
 from passim.utils import ErrHandle
 from passim.settings import TIME_ZONE
 from passim.basic.models import UserSearch
 from passim.basic.views import base64_decode, base64_encode
-from passim.seeker.models import get_current_datetime, get_crpp_date, build_abbr_list, COLLECTION_SCOPE, \
+from passim.seeker.models import get_current_datetime, get_crpp_date, lazy_abbr_list, COLLECTION_SCOPE, \
     EqualGold, Manuscript, Profile, CollectionSuper, Signature, SermonDescrKeyword, \
     SermonDescr, EqualGold
+from passim.dct.matching import calculate_matches
 
 STANDARD_LENGTH=255
 ABBR_LENGTH = 5
@@ -49,7 +51,7 @@ class StemmaSet(models.Model):
 
     # [1] The scope of this collection: who can view it?
     #     E.g: private, team, global - default is 'private'
-    scope = models.CharField("Scope", choices=build_abbr_list(COLLECTION_SCOPE), default="priv", max_length=5)
+    scope = models.CharField("Scope", choices=lazy_abbr_list(COLLECTION_SCOPE), default="priv", max_length=5)
 
     # [1] And a date: the date of saving this manuscript
     created = models.DateTimeField(default=get_current_datetime)
@@ -98,49 +100,8 @@ class StemmaSet(models.Model):
         oErr = ErrHandle()
         lBack = []
         try:
-            # Preparation: create a list of SSG ids per list
-            for oItem in ssglists:
-                oItem['ssgid'] = [x['super'] for x in oItem['ssglist']]
-                oItem['unique_matches'] = 0
-
-            # Calculate the number of matches for each SSglist
-            for idx_list in range(len(ssglists)):
-                # Take this as the possible pivot list
-                lPivot = ssglists[idx_list]['ssgid']
-
-                # Walk all lists that are not this pivot and count matches
-                lUnique = []
-                oMatches = {}
-                if 'matchset' in ssglists[idx_list]['title']:
-                    oMatches = ssglists[idx_list]['title']['matchset']
-                for idx, setlist in enumerate(ssglists):
-                    if idx != idx_list:
-                        # Get this ssglist
-                        lSsgId = setlist['ssgid']
-
-                        # Start calculating the number of matches this list has with the currently suggested PM
-                        sKey = str(ssglists[idx]['title']['order'])
-                        lMatches = []
-
-                        # Consider all ssg id's in this list
-                        for ssg_id in lSsgId:
-                            # Global unique matches
-                            if ssg_id in lPivot and not ssg_id in lUnique:
-                                lUnique.append(ssg_id)
-                            # Calculation with respect to the currently suggested PM
-                            if ssg_id in lPivot: # and not ssg_id in lMatches:
-                                lMatches.append(ssg_id)
-                        # Keep track of the matches (for sorting)
-                        oMatches[sKey] = len(lMatches)
-                # Store the between-list matches
-                ssglists[idx_list]['title']['matchset'] = oMatches
-
-                # Store the number of matches for this list
-                unique_matches = len(lUnique)
-                ssglists[idx_list]['unique_matches'] = unique_matches
-
-            # What we return
-            lBack = ssglists
+            # The matching itself is shared with the DCT research sets
+            lBack = calculate_matches(ssglists)
         except:
             msg = oErr.get_error_message()
             oErr.DoError("StemmaSet/calculate_matches")
@@ -317,6 +278,182 @@ class StemmaSet(models.Model):
         return bOkay
 
 
+def get_lf_html(lst_leitfehler, lst_names):
+    """Get the Leitfehler and the names of the witnesses as an HTML table"""
+
+    lHtml = []
+    lHtml.append("<table class='func-view'><thead><tr><th>Name</th><th>Label</th><th>numbers</th></tr>")
+    lHtml.append("<tbody>")
+    for idx, oLeitRow in enumerate(lst_leitfehler):
+        sName = lst_names[idx]
+        lHtml.append("<tr>")
+        lHtml.append("<td>{}</td>".format(sName))
+        lHtml.append("<td>{}</td>".format(oLeitRow[0]))
+        lHtml.append("<td>")
+        for item in oLeitRow[1:]:
+            lHtml.append("{} ".format(item))
+        lHtml.append("</td>")
+        lHtml.append("</tr>")
+    lHtml.append("</tbody></table>")
+    return "\n".join(lHtml)
+
+
+class StemmaJob(models.Model):
+    """One run of the stemma pipeline (Leitfehler, Fitch, Drawtree) on a particular input
+
+    Jobs are keyed by a hash of their input, so that StemmaCalc objects asking for the
+    same calculation share one job, and a finished job serves as cache for later requests.
+    Jobs are executed by the 'stemma_worker' management command (see jobs.py).
+    """
+
+    # [1] Hash of the input texts and names
+    jobhash = models.CharField("Hash", max_length=64, unique=True)
+
+    # [1] The input of the pipeline: texts and names as JSON
+    input = models.TextField("Input", default="{}")
+
+    # [0-1] The output of the pipeline, in the same format as StemmaCalc.data
+    data = models.TextField("Leitfehler data", null=True, blank=True)
+
+    # [0-1] The SVG output
+    svg = models.TextField("SVG", blank=True, null=True)
+
+    # [1] Status of this job: new, queued, running, (pipeline steps), finished or error
+    status = models.CharField("Status", default="queued", max_length=20)
+
+    # [0-1] Message that accompanies the status
+    message = models.TextField("Message", null=True, blank=True)
+
+    # [1] And a date: the date of saving this job
+    created = models.DateTimeField(default=get_current_datetime)
+    saved = models.DateTimeField(null=True, blank=True)
+
+    # Bump this when the pipeline changes, so that older results are not re-used
+    version = 2
+    # Minimum number of seconds between two status writes with the same status
+    status_interval = 2
+    # Seconds after which a running job without status update is run again
+    stale_after = 600
+
+    def __str__(self):
+        sBack = "stemmajob_{}".format(self.id)
+        return sBack
+
+    def save(self, force_insert = False, force_update = False, using = None, update_fields = None):
+        # Adapt the save date
+        self.saved = get_current_datetime()
+        response = super(StemmaJob, self).save(force_insert, force_update, using, update_fields)
+
+        # Return the response when saving
+        return response
+
+    @staticmethod
+    def get_hash(sTexts, lst_names):
+        """Get the hash that identifies the calculation on this input"""
+
+        sInput = json.dumps(dict(version=StemmaJob.version, texts=sTexts, names=lst_names))
+        return hashlib.sha256(sInput.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_stale():
+        """Get the jobs that were left running: their status has not been updated for [stale_after] seconds"""
+
+        qs = StemmaJob.objects.exclude(status__in=["new", "queued", "finished", "error"])
+        return qs.filter(saved__lt=get_current_datetime() - timedelta(seconds=StemmaJob.stale_after))
+
+    @staticmethod
+    def submit(sTexts, lst_names):
+        """Get the job for this input; a job that has not been calculated (successfully) is 'new'
+
+        A new job is only picked up after queue(): first link the StemmaCalc to it,
+        otherwise the calculation is interrupted right away (see set_status).
+        A job that was left running (its process died) is new again, like in StemmaWorker.recover().
+        """
+
+        oErr = ErrHandle()
+        job = None
+        try:
+            jobhash = StemmaJob.get_hash(sTexts, lst_names)
+            job = StemmaJob.objects.filter(jobhash=jobhash).first()
+            if job is None:
+                sInput = json.dumps(dict(texts=sTexts, names=lst_names))
+                job = StemmaJob.objects.create(jobhash=jobhash, input=sInput, status="new", message="new")
+            elif job.status == "error":
+                # Try again
+                job.status = "new"
+                job.message = "new"
+                job.save()
+            elif StemmaJob.get_stale().filter(id=job.id).update(status="new", message="new") == 1:
+                # Nobody is calculating this job anymore: start again
+                job.status = "new"
+                job.message = "new"
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("StemmaJob/submit")
+        return job
+
+    def queue(self):
+        """Make this new job available to the worker"""
+
+        if StemmaJob.objects.filter(id=self.id, status="new").update(status="queued", message="queued") == 1:
+            self.status = "queued"
+            self.message = "queued"
+        return self.status
+
+    @staticmethod
+    def claim(job_id=None):
+        """Take the oldest queued job (or job [job_id]) and mark it as running; returns the job id or None"""
+
+        qs = StemmaJob.objects.filter(status="queued")
+        if not job_id is None:
+            qs = qs.filter(id=job_id)
+        for job_id in qs.order_by("created").values_list("id", flat=True):
+            # Another worker may have been quicker
+            if StemmaJob.objects.filter(id=job_id, status="queued").update(
+                    status="running", message="started", saved=get_current_datetime()) == 1:
+                return job_id
+        return None
+
+    def get_input(self):
+        oInput = json.loads(self.input)
+        return oInput.get("texts", ""), oInput.get("names", [])
+
+    def set_status(self, sStatus, message=None, force=False):
+        """Set the status of this job, writing it at most once per [status_interval] seconds
+
+        A change of status is always written. Returns "interrupt" if no StemmaCalc
+        is waiting for this job anymore, so that the calculation can be stopped.
+        """
+
+        sBack = sStatus
+        oErr = ErrHandle()
+        try:
+            bChanged = (sStatus != self.status)
+            self.status = sStatus
+            if not message is None:
+                self.message = message
+            if force or bChanged or time.time() - getattr(self, "last_status", 0) >= self.status_interval:
+                self.last_status = time.time()
+                self.saved = get_current_datetime()
+                StemmaJob.objects.filter(id=self.id).update(status=self.status, message=self.message, saved=self.saved)
+                if not sStatus in ["finished", "error"] and not self.job_calcs.exists():
+                    sBack = "interrupt"
+        except:
+            msg = oErr.get_error_message()
+            oErr.DoError("StemmaJob/set_status")
+        return sBack
+
+    def copy_to(self, calc):
+        """Copy the results of this (finished) job to the StemmaCalc [calc]"""
+
+        calc.data = self.data
+        calc.svg = self.svg
+        calc.message = self.message
+        calc.status = "finished"
+        calc.signal = "none"
+        calc.save()
+
+
 class StemmaCalc(models.Model):
     """Calculations on one stemma set"""
 
@@ -338,6 +475,9 @@ class StemmaCalc(models.Model):
     # [0-1] This is where the calculation process can be interrupted
     signal = models.CharField("Signal", default="none", max_length=20)
 
+    # [0-1] The job that calculates (or has calculated) the results
+    job = models.ForeignKey(StemmaJob, null=True, blank=True, on_delete=models.SET_NULL, related_name="job_calcs")
+
     # [1] And a date: the date of saving this manuscript
     created = models.DateTimeField(default=get_current_datetime)
     saved = models.DateTimeField(null=True, blank=True)
@@ -381,21 +521,7 @@ class StemmaCalc(models.Model):
             if len(lst_leitfehler) > 0 and len(lst_names) > 0:
 
                 # Collect the data into one table
-                lHtml = []
-                lHtml.append("<table class='func-view'><thead><tr><th>Name</th><th>Label</th><th>numbers</th></tr>")
-                lHtml.append("<tbody>")
-                for idx, oLeitRow in enumerate(lst_leitfehler):
-                    sName = lst_names[idx]
-                    lHtml.append("<tr>")
-                    lHtml.append("<td>{}</td>".format(sName))
-                    lHtml.append("<td>{}</td>".format(oLeitRow[0]))
-                    lHtml.append("<td>")
-                    for item in oLeitRow[1:]:
-                        lHtml.append("{} ".format(item))
-                    lHtml.append("</td>")
-                    lHtml.append("</tr>")
-                lHtml.append("</tbody></table>")
-                sBack = "\n".join(lHtml)
+                sBack = get_lf_html(lst_leitfehler, lst_names)
 
                 # Also store the table in the message
                 self.message = sBack
@@ -560,6 +560,12 @@ var ru = (function ($, ru) {
                   $(target_progress).html("Stopped by error");
                   $(target_details).html(response.message);
                   break;
+                case "queued":
+                case "started":
+                  // The calculation is done by a job: the progress calls follow it
+                  $(target_progress).html(response.status);
+                  $(target_details).html(response.message);
+                  break;
                 default:
                   // Something went wrong -- show the page or not?
                   private_methods.errMsg("The status returned is unknown: " + response.status);
@@ -585,12 +591,14 @@ var ru = (function ($, ru) {
             elThis = "",
             target_details = null,
             target_progress = null,
+            target_result = null,
             frm = null,
             data = null;
 
         try {
           target_details = "#calc_details_" + sSyncType;
           target_progress = "#calc_progress_" + sSyncType;
+          target_result = "#calc_result_" + sSyncType;
           frm = "#calc_form_" + sSyncType;
           elThis = "#calc_start_" + sSyncType;
           progress_url = $(elThis).attr("calc-progress");
@@ -618,6 +626,10 @@ var ru = (function ($, ru) {
                   // Default action is to show the status
                   $(target_progress).html(response.status);
                   $(target_details).html(response.message);
+                  // If we have results, show them
+                  if ($(target_result).length > 0 && response.svg !== undefined && response.svg !== null) {
+                    $(target_result).html(response.svg);
+                  }
                   // Finish nicely
                   ru.stemma.calc_stop(sSyncType, response, false);
                   return;
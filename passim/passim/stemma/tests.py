@@ -6,8 +6,15 @@ Replace this with more appropriate tests for your application.
 """
 
 import django
+import random
+from datetime import timedelta
+from unittest import mock
 from django.test import TestCase
 
+from passim.seeker.models import get_current_datetime
+from passim.stemma import algdiffblock, algorithms, jobs
+from passim.stemma.models import StemmaJob
+
 # TODO: Configure your database in settings.py and sync before running tests.
 
 class SimpleTest(TestCase):
@@ -23,3 +30,241 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class DiffTest(TestCase):
+    """Property tests of algdiffblock.diff() against the reference implementation"""
+
+    @classmethod
+    def setUpClass(cls):
+        django.setup()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def get_lcs_length(self, a, b):
+        """Length of the longest common subsequence (dynamic programming)"""
+
+        lst_prev = [0] * (len(b) + 1)
+        for x in a:
+            lst_row = [0]
+            for j, y in enumerate(b):
+                lst_row.append(lst_prev[j] + 1 if x == y else max(lst_prev[j + 1], lst_row[j]))
+            lst_prev = lst_row
+        return lst_prev[-1]
+
+    def get_kept(self, a, b, hunks):
+        """Check the hunks against [a] and [b]; return the number of deleted elements, or None if invalid"""
+
+        lst_del = [x for hunk in hunks for x in hunk if x[0] == "-"]
+        lst_add = [x for hunk in hunks for x in hunk if x[0] == "+"]
+        if any(a[idx] != value for _, idx, value in lst_del) or any(b[idx] != value for _, idx, value in lst_add):
+            return None
+        set_del = set(x[1] for x in lst_del)
+        set_add = set(x[1] for x in lst_add)
+        kept_a = [x for idx, x in enumerate(a) if not idx in set_del]
+        kept_b = [x for idx, x in enumerate(b) if not idx in set_add]
+        return len(lst_del) if kept_a == kept_b else None
+
+    def get_applied(self, a, hunks):
+        """Apply the hunks to [a]: drop the '-' elements and insert the '+' elements at their position in b"""
+
+        set_del = set(x[1] for hunk in hunks for x in hunk if x[0] == "-")
+        lst_result = [x for idx, x in enumerate(a) if not idx in set_del]
+        for _, idx, value in sorted(x for hunk in hunks for x in hunk if x[0] == "+"):
+            lst_result.insert(idx, value)
+        return lst_result
+
+    def get_pair(self, rnd):
+        """Get a random text and an edited copy of it"""
+
+        alphabet = rnd.randint(1, 8)
+        a = [str(rnd.randrange(alphabet)) for _ in range(rnd.randint(0, 25))]
+        b = list(a)
+        for _ in range(rnd.randint(0, 8)):
+            op = rnd.random()
+            if op < 0.4 and len(b) > 0:
+                b.pop(rnd.randrange(len(b)))
+            elif op < 0.8:
+                b.insert(rnd.randrange(len(b) + 1), str(rnd.randrange(alphabet)))
+            elif len(b) > 0:
+                b[rnd.randrange(len(b))] = str(rnd.randrange(alphabet))
+        if rnd.random() < 0.2:
+            b = [str(rnd.randrange(alphabet)) for _ in range(rnd.randint(0, 25))]
+        return a, b
+
+    def test_minimal(self):
+        """The diff is a valid edit script with as few changes as possible, never worse than the reference"""
+
+        # Hand-checked scripts: equal texts, a pure insertion, a pure deletion and one change between a common prefix and suffix
+        a = "in principio erat verbum".split()
+        lst_check = [
+            (list(a), []),
+            ("in principio autem erat verbum".split(), [[['+', 2, 'autem']]]),
+            ("in erat verbum".split(), [[['-', 1, 'principio']]]),
+            ("in principio fuit verbum".split(), [[['-', 2, 'erat'], ['+', 2, 'fuit']]]),
+            ]
+        for b, lst_expected in lst_check:
+            self.assertEqual(algdiffblock.diff(a, b), lst_expected, b)
+            self.assertEqual(self.get_applied(a, lst_expected), b)
+
+        rnd = random.Random(7)
+        for _ in range(1000):
+            a, b = self.get_pair(rnd)
+            hunks = algdiffblock.diff(a, b)
+            self.assertEqual(self.get_applied(a, hunks), b, (a, b))
+            iDeleted = self.get_kept(a, b, hunks)
+            self.assertEqual(iDeleted, len(a) - self.get_lcs_length(a, b), (a, b))
+            iReference = self.get_kept(a, b, algdiffblock.diff_reference(a, b))
+            if not iReference is None:
+                self.assertLessEqual(iDeleted, iReference, (a, b))
+
+    def test_reference(self):
+        """Simple changes give the same hunks as the reference"""
+
+        a = "Et dixit Dominus ad Moysen loquere filiis Israel".split()
+        lst_b = [list(a), [], "Ita est".split(), a[:3] + ["Deus"] + a[3:],
+                 a[:2] + a[3:], a[:5] + ["dic"] + a[6:], ["Tunc"] + a + ["dicens"]]
+        for b in lst_b:
+            self.assertEqual(algdiffblock.diff(a, b), algdiffblock.diff_reference(a, b), b)
+            self.assertEqual(algdiffblock.diff(b, a), algdiffblock.diff_reference(b, a), b)
+
+    def test_long_text(self):
+        """The numpy path for long texts gives the same hunks as the list path"""
+
+        rnd = random.Random(11)
+        lst_word = ["w{}".format(x) for x in range(300)]
+        a = [rnd.choice(lst_word) for _ in range(3 * algdiffblock.LONG_TEXT)]
+        b = list(a)
+        for _ in range(100):
+            b[rnd.randrange(len(b))] = rnd.choice(lst_word)
+        hunks = algdiffblock.diff(a, b)
+        iLongText = algdiffblock.LONG_TEXT
+        try:
+            algdiffblock.LONG_TEXT = len(a) + len(b) + 1
+            self.assertEqual(hunks, algdiffblock.diff(a, b))
+        finally:
+            algdiffblock.LONG_TEXT = iLongText
+
+
+class LeitfehlerTest(TestCase):
+    """Regression tests of the LeitfehlerEngine against the output of the original lf_new4()"""
+
+    # Witnesses of John 1:1-4, each copied from an earlier one with a few changes and a word of its own
+    #   (the original lf_new4 failed on witnesses that do not differ from the first one in a leitfehler)
+    TEXTS = [
+        (
+         "M00       In principio erat verbum et verbum erat apud deum et deus erat verbum hoc erat in principio apud deum omnia per ipsum facta sunt et sine ipso factum est nihil quod factum est in ipso vita erat et vita erat lux hominum proprium0\n"
+         "M01       In principio erat verbum et verbum erat apud dominum et deus erat verbum lumen erat in principio apud deum homines per ipsum facta sunt et sine ipso factum est nihil quod factum homines in ipso vita erat et vita proprium1 erat lux hominum proprium0\n"
+         "M02       In principio erat verbum cuncta verbum erat apud dominum et deus erat verbum lumen erat in principio apud deum homines per ipsum proprium2 facta sunt et sine ipso factum est nihil quod factum homines in ipso dominum erat et vita proprium1 erat lux hominum proprium0\n"
+         "M03       In principio erat verbum et verbum erat apud dominum et deus erat verbum erat in principio sermo apud deum homines per ipsum facta sunt et sine ipso factum est nihil quod homines factum homines in proprium3 ipso vita erat et vita proprium1 erat lux hominum proprium0\n"
+         "M04       In principio erat verbum et verbum erat apud deum et deus erat verbum hoc erat in principio apud deum omnia per ipsum facta sunt et ipso factum est nihil quod factum est in ipso vita erat et vita erat lux proprium4 hominum proprium0\n"
+         "M05       In principio erat verbum verbum erat apud deum et lumen erat verbum hoc erat in principio apud deum omnia per fuit ipsum facta sunt et sine ipso factum proprium5 est nihil quod factum est in ipso vita fuit et vita erat lux hominum proprium0\n"
+         "M06       In principio erat verbum et verbum proprium6 erat apud deum et deus erat verbum hoc erat in principio apud deum omnia per ipsum facta sunt et sine ipso factum est nihil quod factum homines est in ipso vita erat et vita erat lux hominum proprium0\n"
+         "M07       In principio erat verbum cuncta verbum erat apud dominum et deus erat verbum lumen erat in principio apud deum homines per ipsum proprium2 facta sunt et sine ipso factum est nihil quod factum homines fuit dominum erat proprium7 et lumen vita proprium1 erat lux hominum proprium0\n"
+         "M08       In principio erat verbum et verbum erat apud deum et deus sermo verbum hoc erat in apud omnia per ipsum facta sunt illo ipso factum est nihil quod factum est proprium8 in ipso vita erat et vita erat lux proprium4 hominum proprium0\n"
+         "M09       In principio erat verbum et verbum erat apud et proprium9 deus erat verbum lumen erat in principio apud deum homines per ipsum facta sunt et sine ipso factum est nihil quod factum homines in ipso vita erat et vita proprium1 erat lux hominum proprium0"),
+        (
+         "M00       In principio erat verbum et verbum erat apud deum et deus erat verbum hoc erat in principio apud deum omnia per ipsum facta sunt et sine ipso factum est nihil quod factum est in ipso vita erat et vita erat lux hominum proprium0\n"
+         "M01       In principio erat verbum et proprium1 verbum erat apud deum et deus verbum hoc erat in principio apud deum omnia dominus ipsum facta sunt et sine ipso factum est nihil quod factum homines in ipso vita erat fuit vita erat lux hominum proprium0\n"
+         "M02       In principio fuit verbum et verbum erat apud deum et erat verbum hoc erat in proprium2 principio apud deum omnia per ipsum facta sunt et sine ipso factum est nihil quod factum est in vita erat et vita erat lux autem hominum proprium0\n"
+         "M03       In principio fuit verbum et verbum erat apud deum et erat verbum hoc erat in proprium2 principio apud deum omnia homines per ipsum facta sunt et sine ipso factum est nihil quod factum est in vita erat proprium3 et vita erat lux autem hominum proprium0\n"
+         "M04       In principio erat verbum et homines verbum erat apud deum et deus verbum hoc erat in principio apud deum omnia dominus ipsum facta sunt et sine ipso factum est nihil quod homines in ipso vita erat fuit vita erat lux hominum proprium4 proprium0\n"
+         "M05       In principio fuit verbum facta autem verbum erat apud deum et erat verbum hoc lumen in proprium2 principio proprium5 apud deum omnia per ipsum facta sunt dominum et sine ipso factum est nihil quod factum est in vita erat et vita erat lux autem hominum proprium0\n"
+         "M06       In principio fuit verbum et verbum erat apud deum et erat verbum hoc proprium6 erat in proprium2 principio apud deum omnia homines per ipsum facta sunt et sine ipso factum est nihil quod factum est in vita erat proprium3 et vita erat lux autem sermo hominum proprium0\n"
+         "M07       In principio erat verbum proprium7 et proprium1 verbum erat apud deum et deus verbum hoc erat in principio apud deum omnia dominus ipsum facta sunt et nichil ipso factum est nihil quod factum homines in ipso vita erat fuit vita erat lux hominum proprium0\n"
+         "M08       In principio fuit proprium8 verbum et verbum sermo apud deum et erat verbum hoc erat in proprium2 principio apud deum illo homines per ipsum facta sunt et dominum ipso factum est nihil quod factum est in vita erat proprium3 et vita erat lux autem hominum proprium0\n"
+         "M09       In principio erat verbum proprium7 et proprium1 verbum erat apud deum et autem proprium9 verbum hoc erat in principio apud deum omnia dominus ipsum facta sunt nichil cuncta nichil ipso factum est nihil quod factum homines in fuit vita erat fuit vita erat lux hominum proprium0"),
+        ]
+    # The distance matrices calculated by the original lf_new4() for the TEXTS, with the original
+    #   diff() that is now algdiffblock.diff_reference (each text in a new process, since lf_new4() kept global state)
+    MATRICES = [
+        [
+         [0],
+         [55, 0],
+         [50, 37, 0],
+         [60, 12, 59, 0],
+         [23, 33, 93, 34, 0],
+         [23, 35, 51, 69, 29, 0],
+         [14, 54, 84, 59, 46, 45, 0],
+         [59, 46, 12, 50, 74, 61, 58, 0],
+         [26, 39, 99, 44, 11, 76, 62, 105, 0],
+         [52, 5, 51, 29, 52, 70, 54, 80, 58, 0],
+         ],
+        [
+         [0],
+         [27, 0],
+         [22, 65, 0],
+         [39, 82, 18, 0],
+         [30, 39, 66, 83, 0],
+         [36, 79, 36, 43, 81, 0],
+         [48, 91, 56, 56, 93, 77, 0],
+         [66, 41, 74, 92, 49, 88, 93, 0],
+         [56, 100, 43, 25, 101, 43, 25, 109, 0],
+         [79, 54, 81, 98, 63, 95, 99, 19, 115, 0],
+         ],
+        ]
+
+    @classmethod
+    def setUpClass(cls):
+        django.setup()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def test_reference(self):
+        """The distance matrix and the result table are those of the original lf_new4()"""
+
+        for sTexts, lst_expected in zip(self.TEXTS, self.MATRICES):
+            # Use the same diff as the original, so that only the engine is tested
+            with mock.patch.object(algorithms, "diff", algdiffblock.diff_reference):
+                lst_result, lst_matrix, lst_label = algorithms.LeitfehlerEngine().run(sTexts)
+            self.assertEqual(lst_label, ["M{:02d}".format(x) for x in range(len(lst_expected))])
+            self.assertEqual(lst_matrix, lst_expected)
+            lst_table = [[lst_label[idx]] + ["{}".format(x) for x in row[:-1]] for idx, row in enumerate(lst_expected)]
+            self.assertEqual(lst_result, lst_table)
+
+    def test_no_shared_state(self):
+        """A calculation does not depend on the calculations before it"""
+
+        lst_first = algorithms.lf_new4(self.TEXTS[0])[1]
+        algorithms.lf_new4(self.TEXTS[1])
+        self.assertEqual(algorithms.lf_new4(self.TEXTS[0])[1], lst_first)
+
+
+class StemmaJobTest(TestCase):
+    """Tests of the queue of StemmaJob objects"""
+
+    @classmethod
+    def setUpClass(cls):
+        django.setup()
+        super(StemmaJobTest, cls).setUpClass()
+
+    def test_stale_job(self):
+        """A job that was left running by a process that died is calculated again when it is submitted"""
+
+        sTexts = "M00       In principio erat verbum\nM01       In principio fuit verbum"
+        lst_names = ["A", "B"]
+        job = StemmaJob.submit(sTexts, lst_names)
+        self.assertEqual(job.status, "new")
+        self.assertEqual(job.queue(), "queued")
+        self.assertEqual(StemmaJob.claim(job.id), job.id)
+
+        # A job that is still being calculated is left alone
+        StemmaJob.objects.filter(id=job.id).update(status="Fitch")
+        self.assertEqual(StemmaJob.submit(sTexts, lst_names).status, "Fitch")
+
+        # Without status updates for [stale_after] seconds it is picked up again
+        saved = get_current_datetime() - timedelta(seconds=StemmaJob.stale_after + 1)
+        StemmaJob.objects.filter(id=job.id).update(saved=saved)
+        job = StemmaJob.submit(sTexts, lst_names)
+        self.assertEqual(job.status, "new")
+        self.assertEqual(job.queue(), "queued")
+        with mock.patch.object(jobs, "STEMMA_THREAD_FALLBACK", True), \
+             mock.patch.object(jobs.StemmaWorker, "is_alive", return_value=False), \
+             mock.patch.object(jobs.threading, "Thread") as thread:
+            jobs.start_job(job)
+        thread.assert_called_once_with(target=jobs.run_job, args=(job.id,), daemon=True)
+        self.assertEqual(StemmaJob.objects.get(id=job.id).status, "running")
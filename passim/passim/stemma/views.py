@@ -35,12 +35,11 @@ from passim.basic.views import BasicList, BasicDetails, BasicPart, \
 #from passim.seeker.views import get_application_context, get_breadcrumbs, user_is_ingroup, nlogin, user_is_authenticated, \
 #    user_is_superuser, get_selectitem_info
 from passim.seeker.models import Profile, EqualGold
-from passim.stemma.models import StemmaItem, StemmaSet, StemmaCalc
+from passim.stemma.models import StemmaItem, StemmaSet, StemmaCalc, StemmaJob
 from passim.stemma.forms import StemmaSetForm, EqualSelectForm
 from passim.seeker.views import stemma_editor, stemma_user
 from passim.seeker.views import EqualGoldListView
-from passim.stemma.algorithms import lf_new4
-from passim.stemma.external import myfitch, mydrawtree
+from passim.stemma.jobs import start_job
 
 def get_application_name():
     """Try to get the name of this application"""
@@ -100,20 +99,10 @@ class StemmaDashboard(BasicDetails):
                 # Create one
                 obj = StemmaCalc.objects.create(stemmaset=instance)
             else:
-                # There already is one
-                sStatus = obj.get_status()
-                if not sStatus in ["ok", "ready", "finished"]:
-                    # Now reset the status
-                    obj.set_status("reset")
-                else:
-                    # Need a real reset
-                    # stop the current calculation
-                    obj.signal = "interrupt"
-                    obj.save()
-                    # Wait for three seconds
-                    time.sleep(4)
-                    # Now reset the status
-                    obj.set_status("reset")
+                # There already is one: let go of its job (a job nobody waits for is stopped)
+                obj.job = None
+                # Now reset the status
+                obj.set_status("reset")
 
             context['stemmacalc_id'] = obj.id
             # Get the name of the stemmaset
@@ -159,45 +148,28 @@ class StemmaStart(BasicPart):
             if instance.set_status("preparing") == "interrupt": return context
             sTexts, lst_codes, lst_names = self.prepare_texts()
 
-            # (2) Execute the Leitfehler Algorithm on the combined fulltexts
-            if instance.set_status("leitfehler") == "interrupt": return context
-            lst_leitfehler, distMatrix, distNames = lf_new4(sTexts, instance)
-
-            # (3) Store the result within the StemmaSet object
-            if instance.set_status("Store results") == "interrupt": return context
-            instance.store_lf(lst_leitfehler, lst_names)
-
-            # (4) Make sure to indicate that we are ready
-            if instance.set_status("ready") == "interrupt": return context
-
-            # (5) Collect the data into one table
-            sTable = instance.get_lf_table()
-            if instance.set_status("leitfehler", sTable) == "interrupt": return context
-
-            # (6) Convert into tree using FITCH
-            if instance.set_status("Fitch") == "interrupt": return context
-            str_tree = myfitch(distNames, distMatrix)
-            instance.store_data("fitch", str_tree)
-
-            # (7) Convert the tree into SVG
-            if instance.set_status("Drawtree") == "interrupt": return context
-            str_svg, str_ps = mydrawtree(str_tree)
-            instance.store_data("ps", str_ps)
-            instance.store_data("svg", str_svg)
-
-            # (8) Add the SVG to the output to be shown
-            iStart = str_svg.find("<svg")
-            if iStart >= 0:
-                str_svg = str_svg[iStart:]
-            data['svg'] = str_svg
-
-            # (9) Also make sure to save the SVG output to the Stemmaset object
-            instance.svg = str_svg
+            # (2) Get the job for these texts: the calculation itself is done by the worker
+            #     NOTE: the job must be linked to [instance] before it is queued
+            job = StemmaJob.submit(sTexts, lst_names)
+            if job is None:
+                return context
+            instance.job = job
             instance.save()
 
+            if job.status == "finished":
+                # (3) This calculation has been done before: show the results right away
+                job.copy_to(instance)
+                data['svg'] = job.svg
+            else:
+                # (3) Make sure the job gets calculated
+                job.queue()
+                start_job(job)
+                instance.set_status("queued", "Waiting for the calculation (job {})".format(job.id))
+
             # FIll in the [data] part of the context with all necessary information
-            data['status'] = "finished"
-            data['message'] = sTable
+            data['status'] = instance.status
+            data['message'] = instance.message
+            data['job'] = job.id
             context['data'] = data
         except:
             msg = oErr.get_error_message()
@@ -286,8 +258,18 @@ class StemmaProgress(BasicPart):
 
             # HERE IS WHERE THE PROGRESS OF THE ANALYSIS IS MONITORED
             data['type'] = "stemma"
+            job = instance.job
+            if not job is None and instance.status != "finished":
+                if job.status == "finished":
+                    # Take over the results of the job
+                    job.copy_to(instance)
+                elif not job.status in ["new", "queued"]:
+                    instance.status = job.status
+                    instance.message = job.message
             data['status'] = instance.get_status()
             data['message'] = instance.get_message()
+            if data['status'] == "finished":
+                data['svg'] = instance.svg
 
             # FIll in the [data] part of the context with all necessary information
             context['data'] = data
@@ -330,9 +312,9 @@ class StemmaDownload(BasicPart):
             elif dtype == "hist-png":
                 pass
             elif dtype == "ps":
-                # Retrieve the postscript data 
+                # Retrieve the postscript data (only older calculations have it: drawtree now makes SVG directly)
                 oData = json.loads(self.obj.data)
-                sData = oData['ps']
+                sData = oData.get('ps', "")
                 # Note: this would still need to be processed in BASIC
 
         except:
@@ -1,7 +1,10 @@
+import os
 import sys
+import threading
+import time
 from django.conf import settings
 from django import http
-from passim.basic.models import Address
+from django.core.cache import cache
 
 
 
@@ -105,14 +108,91 @@ class RomanNumbers:
         return sRomNum
 
 
+class CacheVersion():
+    """Version number in the (shared) cache of data that every process keeps a copy of
+
+    The version is the time of the latest change: invalidate() bumps it, and ensure()
+    loads the copy again when it is out of date. A process looks at the version in
+    the cache at most once per [recheck_interval] seconds.
+
+    Without Redis the cache belongs to one process, so the version is kept in a file
+    in the WRITABLE_DIR instead.
+    """
+
+    def __init__(self, key, recheck_interval=10):
+        self.key = key
+        self.recheck_interval = recheck_interval
+        # The version of the copy in this process (None: nothing loaded yet)
+        self.version = None
+        self.checked = 0
+        self.lock = threading.Lock()
+        self.filename = None
+        if not settings.USE_REDIS:
+            self.filename = os.path.join(settings.WRITABLE_DIR, "{}.version".format(key))
+
+    def get(self):
+        """Get the current version from the cache (or the file)"""
+
+        version = None
+        if self.filename == None:
+            version = cache.get(self.key)
+        else:
+            try:
+                with open(self.filename, "r") as f:
+                    version = float(f.read())
+            except (OSError, ValueError):
+                version = None
+        if version == None:
+            version = time.time()
+            self.set(version)
+        return version
+
+    def set(self, version):
+        """Store the version where all processes can see it"""
+
+        if self.filename == None:
+            cache.set(self.key, version, None)
+        else:
+            oErr = ErrHandle()
+            try:
+                # Replace the file as a whole, so that no process reads half a version
+                sTemp = "{}.{}_{}".format(self.filename, os.getpid(), threading.get_ident())
+                with open(sTemp, "w") as f:
+                    f.write(repr(version))
+                os.replace(sTemp, self.filename)
+            except:
+                msg = oErr.get_error_message()
+                oErr.DoError("CacheVersion/set")
+
+    def ensure(self, load):
+        """Call load(version) when this process has no copy yet, or an out of date one"""
+
+        if self.version == None or time.time() - self.checked > self.recheck_interval:
+            with self.lock:
+                version = self.get()
+                self.checked = time.time()
+                if self.version == None or version != self.version:
+                    load(version)
+                    self.version = version
+
+    def invalidate(self):
+        """Tell all processes that the data have changed"""
+
+        self.set(time.time())
+        self.checked = 0
+
+
 class BlockedIpMiddleware(object):
 
-    bot_list = ['googlebot', 'bot.htm', 'bot.com', '/petalbot', 'crawler.com', 'robot', 'crawler',
-                'semrush', 'bingbot' ]
     bDebug = False
 
     def __init__(self, get_response):
+        # NOTE: the blocklist uses CacheVersion, so it cannot be imported at the top
+        from passim.basic.blocklist import BLOCKLIST, BOT_LIST
+
         self.get_response = get_response
+        self.blocklist = BLOCKLIST
+        self.bot_list = BOT_LIST
 
     def __call__(self, request):
 
@@ -143,8 +223,8 @@ class BlockedIpMiddleware(object):
             if self.bDebug:
                 oErr.Status("BlockedIpMiddleware: remote addr = [{}]".format(remote_ip))
 
-            # Check for blocked IP
-            if Address.is_blocked(remote_ip, request):
+            # Check for blocked IP (Address table, BLOCKED_IPS and suspicious paths)
+            if self.blocklist.is_blocked(remote_ip, request):
                 # Reject this IP address
                 oErr.Status("Blocked IP: {}".format(remote_ip))
                 return http.HttpResponseForbidden('<h1>Forbidden</h1>')
@@ -159,35 +239,24 @@ class BlockedIpMiddleware(object):
                 oErr.Status("Rejecting host: [{}]".format(remote_host))
                 return http.HttpResponseForbidden('<h1>Forbidden</h1>')
 
-            if remote_ip in settings.BLOCKED_IPS:
-                oErr.Status("Blocking IP: {}".format(remote_ip))
+            # Get the user agent
+            user_agent = request.META.get('HTTP_USER_AGENT')
+
+            if self.bDebug:
+                oErr.Status("BlockedIpMiddleware: http user agent = [{}]".format(user_agent))
+
+            if user_agent == None or user_agent == "":
+                # This is forbidden...
+                oErr.Status("Blocking empty user agent")
                 return http.HttpResponseForbidden('<h1>Forbidden</h1>')
             else:
-                # Try the IP addresses the other way around
-                for block_ip in settings.BLOCKED_IPS:
-                    if block_ip in remote_ip:
-                        oErr.Status("Blocking IP: {}".format(remote_ip))
-                        return http.HttpResponseForbidden('<h1>Forbidden</h1>')
-                # Get the user agent
-                user_agent = request.META.get('HTTP_USER_AGENT')
-
-                if self.bDebug:
-                    oErr.Status("BlockedIpMiddleware: http user agent = [{}]".format(user_agent))
-
-                if user_agent == None or user_agent == "":
-                    # This is forbidden...
-                    oErr.Status("Blocking empty user agent")
+                # Check what the user agent is...
+                bot = self.blocklist.get_bot(user_agent)
+                if bot != None:
+                    # Print it for logging
+                    msg = "blocking bot: [{}] {}: {}".format(remote_ip, bot, user_agent.lower())
+                    print(msg, file=sys.stderr)
                     return http.HttpResponseForbidden('<h1>Forbidden</h1>')
-                else:
-                    # Check what the user agent is...
-                    user_agent = user_agent.lower()
-                    for bot in self.bot_list:
-                        if bot in user_agent:
-                            ip = request.META.get('REMOTE_ADDR')
-                            # Print it for logging
-                            msg = "blocking bot: [{}] {}: {}".format(ip, bot, user_agent)
-                            print(msg, file=sys.stderr)
-                            return http.HttpResponseForbidden('<h1>Forbidden</h1>')
         except:
             msg = oErr.get_error_message()
             oErr.DoError("BlockedIpMiddleware/process_request")
@@ -421,6 +421,88 @@ void pictoutint(FILE *file, long pictint)
  *
  *********************************************************************/
 
+/* SVG output: when [svgoutput] is set, the lw plotter writes SVG elements
+   with the postscript coordinates instead of postscript */
+#define SVGOFFSET 18.0  /* Added to the labels to compensate for the mirrored y axis */
+
+boolean svgoutput = false;
+static long svgindex;
+static double svgminy;
+
+void svgstart(void)
+{ /* start a new SVG drawing */
+  svgindex = 14;
+  svgminy  = (72.0 / 2.54) * pagey;
+}  /* svgstart */
+
+
+void svgline(double x1, double y1, double x2, double y2)
+{ /* draw one line */
+  fprintf(plotfile, "<g id=\"line%ld\"><line x1=\"%.2f\" y1=\"%.2f\" x2=\"%.2f\" y2=\"%.2f\" "
+          "style=\"stroke:black;stroke-width:1\" stroke-linecap=\"round\" /></g>\n",
+          svgindex, x1, y1, x2, y2);
+  svgindex += 2;
+  if (y1 < svgminy)
+    svgminy = y1;
+  if (y2 < svgminy)
+    svgminy = y2;
+}  /* svgline */
+
+
+void svgtext(Char *pstring, double x, double y)
+{ /* draw one label */
+  Char *p;
+
+  fprintf(plotfile, "<g id=\"text%ld\"><text y=\"%f\" x=\"%f\" style=\"fill:blue;font-family:Times\">",
+          svgindex, y + SVGOFFSET, x);
+  for (p = pstring; *p != '\0'; p++) {
+    if (*p == '<')
+      fputs("&lt;", plotfile);
+    else if (*p == '>')
+      fputs("&gt;", plotfile);
+    else if (*p == '&')
+      fputs("&amp;", plotfile);
+    else
+      putc(*p, plotfile);
+  }
+  fprintf(plotfile, "</text></g>\n");
+  svgindex += 2;
+  if (y < svgminy)
+    svgminy = y;
+}  /* svgtext */
+
+
+long svgfinish(memstream *body, char *svg, long svgsize)
+{ /* put the SVG document with the drawing from [body] into [svg], which has
+     room for [svgsize] characters; returns the length of the document */
+  static double unit = (double)( 72.0 / 2.54 );
+  memstream doc;
+  char *drawing, *data;
+  long length;
+  int width = (int)( unit * pagex );
+  double height = (int)( unit * pagey ) - 2 * svgminy + SVGOFFSET;
+
+  drawing = memtake(body, &length);
+  if (memwrite(&doc) == NULL) {
+    free(drawing);
+    return -1;
+  }
+  fprintf(doc.fp, "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"no\"?>\n");
+  fprintf(doc.fp, "<!-- Passim research project (https://www.ru.nl) -->\n");
+  fprintf(doc.fp, "<svg xmlns=\"http://www.w3.org/2000/svg\" viewBox=\"0 %.2f %d %.2f\" width=\"%d\" height=\"%.2f\" "
+          "xml:space=\"preserve\" id=\"svg2\" version=\"1.1\">\n",
+          svgminy, width, height, width, height);
+  if (drawing != NULL)
+    fputs(drawing, doc.fp);
+  fprintf(doc.fp, "</svg>\n");
+  free(drawing);
+  data = memtake(&doc, &length);
+  length = memstore(data, length, svg, svgsize);
+  free(data);
+  return length;
+}  /* svgfinish */
+
+
 void postscript_header( void )
 {
     static double unit = (double)( 72.0 / 2.54 );
@@ -712,7 +794,10 @@ initplotter
 
   case lw:     /* write conforming postscript */
 
-    postscript_header();
+    if (svgoutput)
+      svgstart();
+    else
+      postscript_header();
 
     break;
 
@@ -866,6 +951,8 @@ void finishplotter()
     break;
 
   case lw:
+    if (svgoutput)
+      break;
     fprintf(plotfile, "stroke showpage \n\n");
     fprintf(plotfile,"%%%%PageTrailer\n");
     fprintf(plotfile,"%%%%PageFonts: %s\n",
@@ -2436,7 +2523,7 @@ void changepen(pentype pen)
     linewidth = treeline;
     if (plotter == hp)
       fprintf(plotfile, "SP1;\n");
-    if (plotter == lw) {
+    if (plotter == lw && !svgoutput) {
       fprintf(plotfile, "stroke %8.2f setlinewidth \n", treeline);
       fprintf(plotfile, " 1 setlinecap 1 setlinejoin \n");
     }
@@ -2446,7 +2533,7 @@ void changepen(pentype pen)
     linewidth = labelline;
     if (plotter == hp)
       fprintf(plotfile, "SP2;\n");
-    if (plotter == lw) {
+    if (plotter == lw && !svgoutput) {
       fprintf(plotfile, " stroke%8.2f setlinewidth \n", labelline);
       fprintf(plotfile, "1 setlinecap 1 setlinejoin \n");
     }
@@ -2828,7 +2915,7 @@ drawit
         //printf("paperx: %f  papery: %f  clipx0: %f clipx1: %f  clipy0: %f clipy1: %f\n", paperx, papery, clipx0, //clipx1,clipy0, clipy1); /* debug */
         plottree(root,root);
         plotlabels(fontname);
-        if (!(i == xpag - 1 && j == ypag - 1) && plotter == lw)
+        if (!(i == xpag - 1 && j == ypag - 1) && plotter == lw && !svgoutput)
           plotpb(); /* page break */
       }
   }
@@ -3107,7 +3194,10 @@ void plottext(Char *pstring,long nchars,double height_,double cmpress2,
       /28.346;
 
     /* if rectangles intersect, print it. */
-    if (rectintersects(px0,py0,px1,py1,clipx0,clipy0,clipx1,clipy1)) {
+    if (rectintersects(px0,py0,px1,py1,clipx0,clipy0,clipx1,clipy1) && svgoutput) {
+      svgtext(pstring, x-(clipx0*xunitspercm), y-(clipy0*xunitspercm));
+    }
+    else if (rectintersects(px0,py0,px1,py1,clipx0,clipy0,clipx1,clipy1)) {
       fprintf(plotfile,"gsave\n");
       fprintf(plotfile,"/%s findfont %f scalefont setfont\n",fontname,
               pointsize);
@@ -88,6 +88,13 @@ void plotlabels(char *fontname);
 void   pout(long);
 double computeAngle(double oldx, double oldy, double newx, double newy);
 
+/* In-memory SVG output instead of postscript for the lw plotter (see svgdrawtree) */
+extern boolean svgoutput;
+void   svgstart(void);
+void   svgline(double, double, double, double);
+void   svgtext(Char *, double, double);
+long   svgfinish(memstream *, char *, long);
+
 
 /* For povray, added by Dan F. */
 #define TREE_TEXTURE "T_Tree\0"
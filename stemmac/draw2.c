@@ -503,6 +503,10 @@ void plot(pensttstype pen, double xabs, double yabs)
                     oldx-(clipx0*xunitspercm), oldy-(clipy0*yunitspercm),
                     xabs-(clipx0*xunitspercm), yabs-(clipy0*yunitspercm));
                     */
+                    if (svgoutput)
+                      svgline(oldx-(clipx0*xunitspercm), oldy-(clipy0*yunitspercm),
+                              xabs-(clipx0*xunitspercm), yabs-(clipy0*yunitspercm));
+                    else
                     fprintf(plotfile, "%8.2f %8.2f %8.2f %8.2f l\n",
                     oldx-(clipx0*xunitspercm), oldy-(clipy0*yunitspercm),
                     xabs-(clipx0*xunitspercm), yabs-(clipy0*yunitspercm));
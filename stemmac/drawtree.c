@@ -144,6 +144,8 @@ void   calculate(void);
 void   rescale(void);
 void   user_loop(boolean);
 void setup_environment(int argc, Char *argv[]);
+void setup_environment_alt(Char *progname, Char *treefile, Char *fontfile);
+void setup_environment_read(Char *progname, Char *fontfile);
 void polarize(node *p, double *xx, double *yy);
 void   makebox(char *, double *, double *, double *, long);
 double vCounterClkwiseU(double Xu, double Yu, double Xv, double Yv);
@@ -2443,11 +2445,6 @@ void setup_environment(int argc, Char *argv[])
 void setup_environment_alt(Char *progname, Char *treefile, Char *fontfile)
 {
   /* Set up all kinds of fun stuff */
-  node *q, *r;
-
-  char *pChar;
-  double i;
-  boolean firsttree;
   treenode = NULL;
 
 #ifdef TURBOC
@@ -2465,6 +2462,18 @@ void setup_environment_alt(Char *progname, Char *treefile, Char *fontfile)
 
   /* Open in binary: ftell() is broken for UNIX line-endings under WIN32 */
   openfile(&intree, treefile, "input tree file", "rb", progname, NULL);
+  setup_environment_read(progname, fontfile);
+}  /* setup_environment_alt */
+
+
+void setup_environment_read(Char *progname, Char *fontfile)
+{
+  /* Read the tree from the opened [intree] and set up the rest */
+  static Char loadedfont[FNMLNGTH] = "";
+  node *q, *r;
+  boolean firsttree;
+
+  treenode = NULL;
   printf("Reading tree ... \n");
   firsttree = true;
   allocate_nodep(&nodep, &intree, &spp);
@@ -2481,9 +2490,13 @@ void setup_environment_alt(Char *progname, Char *treefile, Char *fontfile)
   where = root;
   rotate = true;
   printf("Tree has been read.\n");
-  printf("Loading the font ... \n");
-  loadfont(font, fontfile, progname);
-  printf("Font loaded.\n");
+  /* The font only needs to be loaded once per process */
+  if (strcmp(loadedfont, fontfile) != 0) {
+    printf("Loading the font ... \n");
+    loadfont(font, fontfile, progname);
+    strcpy(loadedfont, fontfile);
+    printf("Font loaded.\n");
+  }
   ansi = ANSICRT;
   ibmpc = IBMCRT;
   firstscreens = true;
@@ -2492,7 +2505,7 @@ void setup_environment_alt(Char *progname, Char *treefile, Char *fontfile)
   /* 2nd. argument is not entered; use default. */
   maxNumOfIter = 50;
   return;
-}  /* setup_environment_alt */
+}  /* setup_environment_read */
 
 
 void drawtree(
@@ -3147,6 +3160,56 @@ boolean psdrawtree(Char *treefname, Char *fontfname, Char *plotfname) {
   return bResult;
 }
 
+/*
+ * svgdrawtree
+ *
+ * Transform the tree (newick style) in the string [tree] into an SVG document
+ * - Make use of the fontfile in [fontfname]
+ * - The SVG is put into [svg], which has room for [svgsize] characters
+ * - Returns the length of the SVG; if this is not smaller than [svgsize],
+ *   the SVG has not been copied. A negative value means failure.
+ *
+*/
+#if defined(_WIN32)
+__declspec(dllexport)
+#endif
+long svgdrawtree(Char *tree, Char *fontfname, Char *svg, long svgsize) {
+  long length = -1;
+  memstream body;
+
+  javarun = false;
+  init(0, NULL);
+  progname = "drawtree";
+  grbg = NULL;
+
+  // The tree is read from memory
+  strcpy(outtreename, "(memory)");
+  intree = memread(tree);
+  if (intree == NULL)
+    return length;
+  setup_environment_read(progname, fontfname);
+
+  user_loop(false);
+
+  if (!(winaction == quitnow)) {
+    // The drawing is written to memory as SVG
+    plotfile = memwrite(&body);
+    if (plotfile != NULL) {
+      svgoutput = true;
+      initplotter(spp, fontname);
+      numlines = dotmatrix ? ((long)floor(yunitspercm * ysize + 0.5) / strpdeep) : 1;
+      drawit(fontname, &xoffset, &yoffset, numlines, root);
+      finishplotter();
+      svgoutput = false;
+      length = svgfinish(&body, svg, svgsize);
+      plotfile = NULL;
+    }
+  }
+
+  FClose(intree);
+  return length;
+}
+
 int main(int argc, Char *argv[])
 {
   char *thisarg;
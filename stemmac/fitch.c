@@ -1163,32 +1163,12 @@ void maketree()
 
 
 /* --------------------------------------
-  name: do_fitch
-  function: perform the FITCH algorithm
+  name: fitch_run
+  function: perform the FITCH algorithm on the
+            opened infile, outfile and outtree
    -------------------------------------- */
-#if defined(_WIN32)
-__declspec(dllexport)
-#endif
-boolean do_fitch(char *iname, char *oname, char *tname) {
+static void fitch_run(void) {
   int i;
-  boolean bResult = true;
-  const char application[] = "do_fitch";
-
-  // Copy the strings
-  strcpy(infilename, iname);
-  strcpy(outfilename, oname);
-  strcpy(outtreename, tname);
-
-  // Must perform initialization
-  init(0, NULL);
-
-  // Debugging message
-  printf("Starting to do_fitch:\n");
-
-  // Create file pointers
-  openfile(&infile, infilename, "input file", "r", application, infilename);
-  openfile(&outfile, outfilename, "output file", "w", application, outfilename);
-  openfile(&outtree, outtreename, "output tree file", "w", application, outtreename);
 
   ibmpc = IBMCRT;
   ansi = ANSICRT;
@@ -1215,6 +1195,38 @@ boolean do_fitch(char *iname, char *oname, char *tname) {
     if (eoln(infile) && (ith < datasets))
       scan_eoln(infile);
   }
+}
+
+
+/* --------------------------------------
+  name: do_fitch
+  function: perform the FITCH algorithm
+   -------------------------------------- */
+#if defined(_WIN32)
+__declspec(dllexport)
+#endif
+boolean do_fitch(char *iname, char *oname, char *tname) {
+  boolean bResult = true;
+  const char application[] = "do_fitch";
+
+  // Copy the strings
+  strcpy(infilename, iname);
+  strcpy(outfilename, oname);
+  strcpy(outtreename, tname);
+
+  // Must perform initialization
+  init(0, NULL);
+
+  // Debugging message
+  printf("Starting to do_fitch:\n");
+
+  // Create file pointers
+  openfile(&infile, infilename, "input file", "r", application, infilename);
+  openfile(&outfile, outfilename, "output file", "w", application, outfilename);
+  openfile(&outtree, outtreename, "output tree file", "w", application, outtreename);
+
+  fitch_run();
+
   if (trout)
     FClose(outtree);
   FClose(outfile);
@@ -1227,6 +1239,54 @@ boolean do_fitch(char *iname, char *oname, char *tname) {
 }
 
 
+/* --------------------------------------
+  name: do_fitch_mem
+  function: perform the FITCH algorithm on the distance matrix
+            in the string [input] and put the tree (newick style)
+            into [tree], which has room for [treesize] characters.
+  returns:  the length of the tree; if this is not smaller than
+            [treesize], the tree has not been copied.
+            A negative value means failure.
+   -------------------------------------- */
+#if defined(_WIN32)
+__declspec(dllexport)
+#endif
+long do_fitch_mem(char *input, char *tree, long treesize) {
+  memstream report, treeout;
+  char *data;
+  long length = -1;
+
+  // Must perform initialization
+  init(0, NULL);
+
+  // The input comes from memory, the report and the tree go to memory
+  strcpy(infilename, "(memory)");
+  strcpy(outfilename, "(memory)");
+  strcpy(outtreename, "(memory)");
+  infile = memread(input);
+  outfile = memwrite(&report);
+  outtree = memwrite(&treeout);
+  if (infile == NULL || outfile == NULL || outtree == NULL) {
+    FClose(infile);
+    free(memtake(&report, &length));
+    free(memtake(&treeout, &length));
+    return -1;
+  }
+
+  fitch_run();
+
+  // The report is not needed
+  free(memtake(&report, &length));
+  outfile = NULL;
+  data = memtake(&treeout, &length);
+  outtree = NULL;
+  FClose(infile);
+  length = memstore(data, length, tree, treesize);
+  free(data);
+  return length;
+}
+
+
 //int main(int argc, Char *argv[])
 //{
 //  int i;
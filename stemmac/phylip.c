@@ -254,6 +254,75 @@ void countup(long *loopcount, long maxcount)
 } /* countup */
 
 
+FILE *memread(const char *data)
+{ /* open a stream that reads from the string [data] */
+  FILE *fp;
+#if defined(_WIN32)
+  fp = tmpfile();
+  if (fp != NULL) {
+    fputs(data, fp);
+    rewind(fp);
+  }
+#else
+  fp = fmemopen((void *)data, strlen(data), "r");
+#endif
+  return fp;
+} /* memread */
+
+
+FILE *memwrite(memstream *ms)
+{ /* open a stream that writes into memory */
+  ms->data = NULL;
+  ms->size = 0;
+#if defined(_WIN32)
+  ms->fp = tmpfile();
+#else
+  ms->fp = open_memstream(&ms->data, &ms->size);
+#endif
+  return ms->fp;
+} /* memwrite */
+
+
+char *memtake(memstream *ms, long *length)
+{ /* close a memory stream and return what has been written to it;
+     the caller must free() the result */
+  char *data = NULL;
+
+  *length = 0;
+  if (ms->fp == NULL)
+    return NULL;
+#if defined(_WIN32)
+  fflush(ms->fp);
+  fseek(ms->fp, 0, SEEK_END);
+  ms->size = (size_t)ftell(ms->fp);
+  rewind(ms->fp);
+  ms->data = (char *)malloc(ms->size + 1);
+  if (ms->data != NULL) {
+    ms->size = fread(ms->data, 1, ms->size, ms->fp);
+    ms->data[ms->size] = '\0';
+  }
+#endif
+  fclose(ms->fp);
+  ms->fp = NULL;
+  data = ms->data;
+  if (data != NULL)
+    *length = (long)ms->size;
+  ms->data = NULL;
+  ms->size = 0;
+  return data;
+} /* memtake */
+
+
+long memstore(const char *data, long length, char *buffer, long size)
+{ /* copy [data] into [buffer], if it fits; returns the length of [data] */
+  if (data != NULL && buffer != NULL && length < size) {
+    memcpy(buffer, data, length);
+    buffer[length] = '\0';
+  }
+  return length;
+} /* memstore */
+
+
 void openfile(FILE **fp,const char *filename,const char *filedesc,
               const char *mode,const char *application, char *perm)
 { /* open a file, testing whether it exists etc. */
@@ -236,6 +236,13 @@ void phyFillScreenColor(void);
 
 
 #define FClose(file) if (file) fclose(file) ; file=NULL
+
+/* An output stream in memory (see memwrite and memtake) */
+typedef struct memstream {
+  FILE *fp;
+  char *data;
+  size_t size;
+} memstream;
 #define Malloc(x) mymalloc((long)x)
 
 typedef void *Anyptr;
@@ -585,6 +592,10 @@ void   EOF_error(void);
 void   getstryng(char *);
 void   openfile(FILE **,const char *,const char *,const char *,const char *,
                 char *);
+FILE  *memread(const char *);
+FILE  *memwrite(memstream *);
+char  *memtake(memstream *, long *);
+long   memstore(const char *, long, char *, long);
 void   cleerhome(void);
 void   loopcount(long *, long);
 double randum(longer);